@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Throughput benchmark: block-parallel BGZF reading.
+
+Writes a synthetic UniProt-like FASTA file, BGZF-compresses it, then times
+``protfasta.read_fasta_stream`` over the compressed file with
+``workers=1`` (a single gzip stream) and with each requested worker count,
+checks that every run returns identical records, and reports throughput in
+MB/s of uncompressed FASTA. Speedups need as many free cores as workers.
+
+Usage::
+
+    python devtools/benchmarks/benchmark_bgzf.py --records 200000 --workers 4 8 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+import protfasta
+from protfasta import _bgzf
+
+from benchmark_parse_engines import make_fasta
+
+
+def time_workers(filename: str, workers: list[int], repeats: int) -> tuple[dict, dict]:
+    """Return the best wall time per worker count over *repeats* runs, plus the records."""
+    best = {n: float('inf') for n in workers}
+    results: dict = {}
+    for _ in range(repeats):
+        for n in workers:
+            start = time.perf_counter()
+            results[n] = list(protfasta.read_fasta_stream(filename, invalid_sequence_action='ignore', workers=n))
+            best[n] = min(best[n], time.perf_counter() - start)
+    return best, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000, help='Number of synthetic records (default 200000)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Timed repeats per setting; the best is reported (default 3)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4],
+                        help='Worker counts to compare against workers=1 (default 2 4)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plain = os.path.join(tmpdir, 'benchmark.fasta')
+        make_fasta(plain, args.records)
+        with open(plain, 'rb') as fh:
+            data = fh.read()
+
+        filename = plain + '.gz'
+        with open(filename, 'wb') as fh:
+            fh.write(_bgzf.compress(data))
+
+        size_mb = len(data) / 1e6
+        print('File: %i records, %.1f MB uncompressed, %.1f MB BGZF, %i CPUs'
+              % (args.records, size_mb, os.path.getsize(filename) / 1e6, os.cpu_count() or 1))
+
+        workers = [1] + [n for n in args.workers if n > 1]
+        best, results = time_workers(filename, workers, args.repeats)
+        for n in workers:
+            print('  workers=%-3i %8.3f s  %8.1f MB/s  %.2fx' % (n, best[n], size_mb / best[n], best[1] / best[n]))
+
+        if any(results[n] != results[1] for n in workers):
+            raise SystemExit('ERROR: worker counts returned different records')
+        print('  all worker counts returned identical records')
+
+
+if __name__ == '__main__':
+    main()
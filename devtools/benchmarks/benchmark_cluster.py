@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Time and cluster count of ``protfasta.cluster``.
+
+Builds synthetic families -- random proteins of 200-600 residues, each
+with point mutants and N- or C-terminally truncated copies -- and, for
+every size, identity threshold and ``workers`` count, reports the wall
+time, the time per sequence and the number of clusters found next to
+the number of families planted.
+
+Usage::
+
+    python devtools/benchmarks/benchmark_cluster.py --families 2000 10000 --identity 0.9 0.7 --workers 1 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+import protfasta
+from protfasta._configs import STANDARD_AAS
+
+
+def make_families(n: int, seed: int = 0) -> list[tuple[str, str]]:
+    """Return records for *n* families: a base sequence plus up to two close variants."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        seq = ''.join(rng.choices(STANDARD_AAS, k=rng.randint(200, 600)))
+        records.append(('fam%i_base' % i, seq))
+        if rng.random() < 0.6:
+            mutant = list(seq)
+            for _ in range(rng.randint(1, len(seq) // 50)):
+                mutant[rng.randrange(len(seq))] = rng.choice(STANDARD_AAS)
+            records.append(('fam%i_mutant' % i, ''.join(mutant)))
+        if rng.random() < 0.4:
+            cut = rng.randint(1, len(seq) // 20)
+            records.append(('fam%i_truncated' % i, seq[cut:] if rng.random() < 0.5 else seq[:-cut]))
+    rng.shuffle(records)
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--families', type=int, nargs='+', default=[2000, 10000],
+                        help='Numbers of families (default 2000 10000)')
+    parser.add_argument('--identity', type=float, nargs='+', default=[0.9, 0.7],
+                        help='Identity thresholds (default 0.9 0.7)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4], help='Worker counts (default 1 4)')
+    args = parser.parse_args()
+
+    print('%10s %10s %9s %8s %10s %12s %10s'
+          % ('families', 'sequences', 'identity', 'workers', 'time (s)', 'us/sequence', 'clusters'))
+    for n in args.families:
+        records = make_families(n)
+        for identity in args.identity:
+            for workers in args.workers:
+                start = time.perf_counter()
+                (representatives, _membership) = protfasta.cluster(records, identity=identity, workers=workers)
+                elapsed = time.perf_counter() - start
+                print('%10i %10i %9.2f %8i %10.2f %12.0f %10i' % (n, len(records), identity, workers, elapsed,
+                                                                   elapsed / len(records) * 1e6, len(representatives)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""Throughput benchmark: compressed FASTA output.
+
+Writes a synthetic UniProt-like FASTA file, reads it once, then times
+``protfasta.write_fasta`` for plain text, gzip, xz and BGZF with each
+requested thread count, checks that every BGZF thread count produces
+identical bytes, and reports throughput in MB/s of uncompressed FASTA.
+BGZF speedups need as many free cores as threads.
+
+Usage::
+
+    python devtools/benchmarks/benchmark_compressed_write.py --records 200000 --threads 2 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+import protfasta
+
+from benchmark_parse_engines import make_fasta
+
+
+def time_write(records: list, filename: str, repeats: int, **kwargs) -> float:
+    """Return the best wall time of *repeats* ``write_fasta`` calls."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        protfasta.write_fasta(records, filename, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000, help='Number of synthetic records (default 200000)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Timed repeats per setting; the best is reported (default 3)')
+    parser.add_argument('--threads', type=int, nargs='+', default=[2, 4],
+                        help='BGZF thread counts to compare against threads=1 (default 2 4)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plain = os.path.join(tmpdir, 'benchmark.fasta')
+        make_fasta(plain, args.records)
+        records = protfasta.read_fasta(plain, return_list=True, invalid_sequence_action='ignore')
+
+        out = os.path.join(tmpdir, 'out.fasta')
+        t = time_write(records, out, args.repeats)
+        size_mb = os.path.getsize(out) / 1e6
+        print('File: %i records, %.1f MB uncompressed, %i CPUs' % (args.records, size_mb, os.cpu_count() or 1))
+        print('  %-16s %8.3f s  %8.1f MB/s' % ('plain', t, size_mb / t))
+
+        for compression in ['gzip', 'xz']:
+            t = time_write(records, out + '.' + compression, args.repeats, compression=compression)
+            compressed_mb = os.path.getsize(out + '.' + compression) / 1e6
+            print('  %-16s %8.3f s  %8.1f MB/s  %5.1f MB' % (compression, t, size_mb / t, compressed_mb))
+
+        outputs = {}
+        threads = [1] + [n for n in args.threads if n > 1]
+        for n in threads:
+            filename = os.path.join(tmpdir, 'out.%i.fasta.gz' % n)
+            t = time_write(records, filename, args.repeats, compression='bgzf', threads=n)
+            with open(filename, 'rb') as fh:
+                outputs[n] = fh.read()
+            print('  %-16s %8.3f s  %8.1f MB/s  %5.1f MB'
+                  % ('bgzf threads=%i' % n, t, size_mb / t, len(outputs[n]) / 1e6))
+
+        if any(outputs[n] != outputs[1] for n in threads):
+            raise SystemExit('ERROR: BGZF thread counts produced different output')
+        print('  all BGZF thread counts produced identical output')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Per-record cost of each ``duplicate_digest`` on every duplicate-handling path.
+
+Builds two synthetic files of distinct sequences -- short peptides and
+long proteins -- and, for every available digest, reports in nanoseconds
+per record:
+
+* ``digest``: the digest function alone;
+* ``record-fail`` / ``record-remove`` / ``seq-fail`` / ``seq-remove``:
+  the in-memory duplicate stages of ``read_fasta``, timed on the parsed
+  records;
+* ``stream``, ``stream-spill``, ``stream-bloom``: the whole cost of
+  ``read_fasta_stream(..., duplicate_sequence_action='remove')`` with the
+  in-memory table, ``duplicate_memory_limit`` and ``duplicate_filter='bloom'``,
+  next to the cost of the same stream with no duplicate checks (the
+  ``no checks`` line).
+
+Every sequence is distinct, so the ``'fail'`` paths check every record.
+
+Usage::
+
+    python devtools/benchmarks/benchmark_duplicate_digest.py --short 200000 --long 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import protfasta
+from protfasta import utilities as _utilities
+from protfasta._configs import STANDARD_AAS
+
+
+def make_unique_fasta(filename: str, n: int, min_length: int, max_length: int, seed: int = 0) -> None:
+    """Write *n* records with distinct random sequences of *min_length*..*max_length* residues."""
+    rng = random.Random(seed)
+    seen = set()
+    with open(filename, 'w') as fh:
+        while len(seen) < n:
+            seq = ''.join(rng.choices(STANDARD_AAS, k=rng.randint(min_length, max_length)))
+            if seq in seen:
+                continue
+            seen.add(seq)
+            fh.write('>seq_%i\n%s\n' % (len(seen), seq))
+
+
+def time_call(func, repeats: int, setup=None) -> float:
+    """Return the best wall time of *repeats* calls to *func* (given ``setup()``, if set)."""
+    best = float('inf')
+    for _ in range(repeats):
+        arg = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        func(*arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fresh_copy(records: list) -> list:
+    """Copy *records* into new string objects, as a fresh parse would produce.
+
+    ``builtin-64`` uses the hash Python caches on each string, so timing
+    the same objects twice would only measure the cache.
+    """
+    return [[header, seq.encode().decode()] for (header, seq) in records]
+
+
+def available_digests() -> list[str]:
+    names = []
+    for name in _utilities.SEQUENCE_DIGESTS:
+        try:
+            _utilities._digest_function(name)
+        except protfasta.ProtfastaException:
+            print('  (skipping %s: not available)' % (name))
+            continue
+        names.append(name)
+    return names
+
+
+def drain(filename: str, **kwargs) -> None:
+    for _record in protfasta.read_fasta_stream(filename, silence_warnings=True, **kwargs):
+        pass
+
+
+def bench_file(filename: str, digests: list[str], repeats: int, tmpdir: str) -> None:
+    records = protfasta.read_fasta(filename, return_list=True)
+    n = len(records)
+    mean_length = sum(len(seq) for (_header, seq) in records) / n
+    print('\n%s: %i records, mean length %.0f' % (os.path.basename(filename), n, mean_length))
+
+    paths = {
+        'record-fail': _utilities.fail_on_duplicates,
+        'record-remove': _utilities.remove_duplicates,
+        'seq-fail': _utilities.fail_on_duplicate_sequences,
+        'seq-remove': _utilities.remove_duplicate_sequences,
+    }
+    stream_paths = {
+        'stream': {},
+        'stream-spill': {'duplicate_memory_limit': 8 * 1024 ** 2, 'duplicate_spill_dir': tmpdir},
+        'stream-bloom': {'duplicate_filter': 'bloom'},
+    }
+    columns = ['digest'] + list(paths) + list(stream_paths)
+    print('  %-12s' % ('ns/record') + ''.join('%14s' % c for c in columns))
+
+    t_plain = time_call(lambda: drain(filename), repeats)
+    print('  %-12s' % ('no checks') + ' ' * 14 * (len(columns) - len(stream_paths)) + '%14.0f' % (t_plain / n * 1e9))
+    for name in digests:
+        digest = _utilities._digest_function(name)
+
+        def digest_all(copy):
+            for (_header, seq) in copy:
+                digest(seq)
+
+        row = [time_call(digest_all, repeats, lambda: fresh_copy(records))]
+        for func in paths.values():
+            row.append(time_call(lambda copy: func(copy, digest), repeats, lambda: fresh_copy(records)))
+        for kwargs in stream_paths.values():
+            row.append(time_call(lambda: drain(filename, duplicate_sequence_action='remove', duplicate_digest=name,
+                                               **kwargs), repeats))
+        print('  %-12s' % (name) + ''.join('%14.0f' % (t / n * 1e9) for t in row))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--short', type=int, default=200000,
+                        help='Number of short peptides, 8-15 residues (default 200000)')
+    parser.add_argument('--long', type=int, default=20000,
+                        help='Number of long proteins, 1000-3000 residues (default 20000)')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='Timed repeats per setting; the best is reported (default 5)')
+    args = parser.parse_args()
+
+    digests = available_digests()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        short = os.path.join(tmpdir, 'peptides.fasta')
+        make_unique_fasta(short, args.short, 8, 15)
+        long = os.path.join(tmpdir, 'proteins.fasta')
+        make_unique_fasta(long, args.long, 1000, 3000, seed=1)
+
+        bench_file(short, digests, args.repeats, tmpdir)
+        bench_file(long, digests, args.repeats, tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""Time duplicate detection in sharded reads against the serial scan.
+
+Writes a synthetic FASTA file -- records drawn from a pool of distinct
+sequences, so most are duplicates -- and times ``read_fasta`` on it with
+each requested worker count, with and without duplicate-record and
+duplicate-sequence removal, checking that every run keeps the same
+records.  The difference between the two columns is what the duplicate
+checks cost on top of parsing.  Speedups need as many free cores as
+workers.
+
+Usage::
+
+    python devtools/benchmarks/benchmark_parallel_dedup.py --records 2000000 --workers 2 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import protfasta
+from protfasta import utilities as _utilities
+from protfasta._configs import STANDARD_AAS
+
+
+def write_records(filename: str, n: int, pool: int, seed: int = 0) -> None:
+    """Write *n* records drawn from *pool* distinct sequences to *filename*."""
+    rng = random.Random(seed)
+    seqs = [''.join(rng.choices(STANDARD_AAS, k=rng.randint(100, 500))) for _ in range(pool)]
+    with open(filename, 'w') as fh:
+        for i in range(n):
+            fh.write('>seq_%i\n%s\n' % (i % (n // 2), rng.choice(seqs)))
+
+
+def time_read(filename: str, workers: int, **kwargs) -> tuple[float, list[list[str]]]:
+    """Return the time and result of one ``read_fasta`` call."""
+    start = time.perf_counter()
+    records = protfasta.read_fasta(filename, expect_unique_header=False, return_list=True, workers=workers, **kwargs)
+    return (time.perf_counter() - start, records)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1000000, help='Number of records (default 1000000)')
+    parser.add_argument('--pool', type=int, default=200000, help='Number of distinct sequences (default 200000)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4],
+                        help='Worker counts to compare against workers=1 (default 2 4)')
+    parser.add_argument('--digest', default='blake2b-16', choices=_utilities.SEQUENCE_DIGESTS,
+                        help='Sequence digest (default blake2b-16)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'dups.fasta')
+        write_records(filename, args.records, args.pool)
+        print('%i records, %i distinct sequences, %i CPUs' % (args.records, args.pool, os.cpu_count() or 1))
+        print('  %-10s %12s %12s %12s' % ('workers', 'parse (s)', 'dedup (s)', 'dedup cost'))
+
+        expected = None
+        for workers in [1] + [n for n in args.workers if n > 1]:
+            (parse_only, _records) = time_read(filename, workers, duplicate_record_action='ignore')
+            (dedup, kept) = time_read(filename, workers, duplicate_record_action='remove',
+                                      duplicate_sequence_action='remove', duplicate_digest=args.digest)
+            if expected is None:
+                expected = kept
+            elif kept != expected:
+                raise SystemExit('ERROR: workers=%i kept different records' % (workers))
+            print('  %-10i %12.3f %12.3f %12.3f' % (workers, parse_only, dedup, dedup - parse_only))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Throughput benchmark: sharded multi-process read_fasta.
+
+Writes a synthetic UniProt-like FASTA file and times ``protfasta.read_fasta``
+with ``workers=1`` and with each requested worker count (using
+``invalid_sequence_action='convert'`` so that the per-record sanitization
+the workers take over is included), checks that every run returns identical
+records, and reports throughput in MB/s. Speedups need as many free cores as
+workers.
+
+Usage::
+
+    python devtools/benchmarks/benchmark_sharded_read.py --records 500000 --workers 4 8 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+import protfasta
+
+from benchmark_parse_engines import make_fasta
+
+
+def time_workers(filename: str, workers: list[int], repeats: int) -> tuple[dict, dict]:
+    """Return the best wall time per worker count over *repeats* runs, plus the records."""
+    best = {n: float('inf') for n in workers}
+    results: dict = {}
+    for _ in range(repeats):
+        for n in workers:
+            start = time.perf_counter()
+            results[n] = protfasta.read_fasta(filename, invalid_sequence_action='convert', return_list=True, workers=n)
+            best[n] = min(best[n], time.perf_counter() - start)
+    return best, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000, help='Number of synthetic records (default 200000)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Timed repeats per setting; the best is reported (default 3)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4],
+                        help='Worker counts to compare against workers=1 (default 2 4)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'benchmark.fasta')
+        make_fasta(filename, args.records)
+        size_mb = os.path.getsize(filename) / 1e6
+
+        print('File: %i records, %.1f MB, %i CPUs' % (args.records, size_mb, os.cpu_count() or 1))
+
+        workers = [1] + [n for n in args.workers if n > 1]
+        best, results = time_workers(filename, workers, args.repeats)
+        for n in workers:
+            print('  workers=%-3i %8.3f s  %8.1f MB/s  %.2fx' % (n, best[n], size_mb / best[n], best[1] / best[n]))
+
+        if any(results[n] != results[1] for n in workers):
+            raise SystemExit('ERROR: worker counts returned different records')
+        print('  all worker counts returned identical records')
+
+
+if __name__ == '__main__':
+    main()
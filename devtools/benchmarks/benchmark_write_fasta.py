@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Throughput benchmark: batched write_fasta formatting vs per-line writes.
+
+Reads a synthetic UniProt-like FASTA file once, then times
+``protfasta.write_fasta`` against a reference writer that issues one
+``write`` call per header piece and per sequence line (the formatting loop
+``write_fasta`` used before records were formatted in batches), for each
+requested ``linelength``. Checks that both produce byte-identical files and
+reports throughput in MB/s of FASTA written.
+
+Usage::
+
+    python devtools/benchmarks/benchmark_write_fasta.py --records 200000 --linelength 60 80 0
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+import protfasta
+from protfasta import writer as _writer
+
+from benchmark_parse_engines import make_fasta
+
+
+def per_line_write(records: list, filename: str, linelength) -> None:
+    """Write *records* with one ``write`` call per line piece (the pre-batching loop)."""
+    linelength = _writer.normalize_linelength(linelength)
+    with open(filename, 'w', buffering=1024 * 1024) as fh:
+        for (header, seq) in records:
+            fh.write('>')
+            fh.write(header)
+            fh.write('\n')
+            if linelength:
+                for start in range(0, len(seq), linelength):
+                    fh.write(seq[start:start + linelength])
+                    fh.write('\n')
+                fh.write('\n')
+            else:
+                fh.write(seq)
+                fh.write('\n\n')
+
+
+def time_call(func, repeats: int) -> float:
+    """Return the best wall time of *repeats* calls to *func*."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000, help='Number of synthetic records (default 200000)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Timed repeats per setting; the best is reported (default 3)')
+    parser.add_argument('--linelength', type=int, nargs='+', default=[60, 0],
+                        help='Line lengths to compare; 0 writes one line per sequence (default 60 0)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plain = os.path.join(tmpdir, 'benchmark.fasta')
+        make_fasta(plain, args.records)
+        records = protfasta.read_fasta(plain, return_list=True, invalid_sequence_action='ignore')
+        print('Input: %i records, %i CPUs' % (len(records), os.cpu_count() or 1))
+
+        ref = os.path.join(tmpdir, 'per_line.fasta')
+        out = os.path.join(tmpdir, 'write_fasta.fasta')
+        for linelength in args.linelength:
+            t_ref = time_call(lambda: per_line_write(records, ref, linelength), args.repeats)
+            t_new = time_call(lambda: protfasta.write_fasta(records, out, linelength=linelength), args.repeats)
+            size_mb = os.path.getsize(out) / 1e6
+            print('  linelength=%-4i per-line %7.3f s %7.1f MB/s   write_fasta %7.3f s %7.1f MB/s   %.2fx'
+                  % (linelength, t_ref, size_mb / t_ref, t_new, size_mb / t_new, t_ref / t_new))
+
+            with open(ref, 'rb') as a, open(out, 'rb') as b:
+                if a.read() != b.read():
+                    raise SystemExit('ERROR: output differs for linelength=%i' % (linelength))
+        print('  all outputs byte-identical')
+
+
+if __name__ == '__main__':
+    main()
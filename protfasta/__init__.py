@@ -1,11 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import glob
+import inspect
 import os
 import warnings
-from typing import Callable, Iterator, Optional, Union
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Union
 
 from protfasta import utilities as _utilities
 from protfasta import io as _io
+from protfasta import _parallel
+from protfasta import _cluster
+from protfasta import aio as _aio
+from protfasta import encode as _encode
+from protfasta import cache as _cache
+from protfasta import dedup as _dedup
+from protfasta.cache import FastaCache
+from protfasta.index import FastaIndex, index_fasta
+from protfasta.headers import CompactFastaMapping
+from protfasta.lazy import LazyFastaMapping
+from protfasta.store import SequenceStore
+from protfasta import writer as _writer
+from protfasta.writer import FastaWriter
 from protfasta._configs import STANDARD_AAS, STANDARD_CONVERSION
 from protfasta import protfasta as _protfasta
 from protfasta.protfasta_exceptions import ProtfastaException
@@ -29,7 +47,18 @@ else:
 __all__ = [
     'read_fasta',
     'read_fasta_stream',
+    'read_fasta_async',
+    'read_fasta_stream_async',
+    'read_fasta_many',
+    'remove_near_duplicates',
+    'cluster',
     'write_fasta',
+    'FastaWriter',
+    'index_fasta',
+    'FastaIndex',
+    'SequenceStore',
+    'CompactFastaMapping',
+    'FastaCache',
     'ProtfastaException',
     'STANDARD_AAS',
     'STANDARD_CONVERSION',
@@ -71,7 +100,17 @@ def read_fasta(
     output_filename: Optional[str] = None,
     correction_dictionary: Optional[dict[str, str]] = None,
     verbose: bool = False,
-) -> Union[dict[str, str], list[list[str]]]:
+    engine: str = 'line',
+    mmap: bool = False,
+    workers: int = 1,
+    lazy: bool = False,
+    return_store: bool = False,
+    encode: Optional[str] = None,
+    cache: Union[bool, str, os.PathLike, FastaCache] = False,
+    output_compression: Optional[str] = None,
+    duplicate_digest: str = 'blake2b-16',
+    compact_headers: bool = False,
+) -> Union[dict[str, str], list[list[str]], LazyFastaMapping, SequenceStore, CompactFastaMapping]:
     """Read a FASTA file, sanitize sequences, and return a dict or list.
 
     This is the primary entry point for **protfasta**.  At its simplest::
@@ -97,8 +136,12 @@ def read_fasta(
 
     Parameters
     ----------
-    filename : str or os.PathLike
-        Path to the FASTA file to read.
+    filename : str, os.PathLike or file object
+        Path to the FASTA file to read.  ``'-'`` reads standard input,
+        and an open binary or text file object (such as a pipe) is read
+        from its current position and left open.  Compressed streams are
+        detected as for files.  Streams cannot be combined with *lazy*
+        or *cache*, which need to re-open the file.
 
     expect_unique_header : bool, optional
         If ``True`` (default), an exception is raised when a duplicate
@@ -162,9 +205,11 @@ def read_fasta(
         instead of a dictionary.  Required when duplicate headers are
         present and you want to keep all of them.  Default ``False``.
 
-    output_filename : str, os.PathLike, or None, optional
+    output_filename : str, os.PathLike, file object, or None, optional
         If provided, the final (sanitized) set of sequences is written
         to a new FASTA file at this path before the function returns.
+        Accepts anything :func:`write_fasta` does, including ``'-'``
+        for standard output.
 
     correction_dictionary : dict or None, optional
         A mapping of non-standard characters to replacement strings used
@@ -180,13 +225,146 @@ def read_fasta(
         If ``True``, informational messages are printed to stdout
         during each processing step.  Default ``False``.
 
+    engine : str, optional
+        Which parser reads the file.  Default ``'line'``.
+
+        * ``'line'``  -- decode and strip the file one line at a time.
+        * ``'block'`` -- read large binary blocks, locate records with
+          C-level byte searches and strip newlines from each record in
+          a single call.  Guaranteed to return exactly the same records
+          as ``'line'``.  Speed depends on the file: on wrapped
+          (60-column) sequences the two engines measure about the same,
+          and on single-line records ``'line'`` is faster (see
+          ``devtools/benchmarks/benchmark_parse_engines.py``).
+
+    mmap : bool, optional
+        If ``True``, memory-map the file and parse record boundaries
+        straight out of the mapping, with no intermediate read buffer.
+        Pages are shared through the OS page cache, so many processes
+        reading the same large file do not each hold a private copy.
+        Uses the block parser (``engine`` is ignored) and returns
+        exactly the same records.  Only regular files can be mapped.
+        Default ``False``.
+
+    workers : int, optional
+        Number of worker processes.  Default 1.
+
+        * Uncompressed files are split into ``workers`` byte ranges at
+          record boundaries, and each range is parsed and checked for
+          invalid residues in its own process.  Header-uniqueness and
+          duplicate checks run over the merged records, so results are
+          identical to a single-process read.
+        * BGZF-compressed (blocked gzip, as written by ``bgzip``) files
+          are decompressed and parsed in parallel, one batch of blocks
+          per task, and stitched back into file order; records spanning
+          block boundaries are handled transparently.
+        * Other compressed files are read in a single process.
+        * In a sharded read the duplicate checks are spread over the
+          workers too: each worker digests the records it parsed, and
+          the digests, partitioned by prefix, are scanned for repeats
+          by one worker per slice of the digest space.  Only digests
+          cross processes, and the first occurrence is kept, exactly as
+          with one worker.  Other reads check for duplicates in the
+          main process.
+
+        ``engine`` and ``mmap`` are ignored for sharded reads.
+
+    lazy : bool, optional
+        If ``True``, return a read-only, dictionary-like
+        :class:`~protfasta.lazy.LazyFastaMapping` instead of a ``dict``.
+        The file is scanned once to record where each record lives, and
+        a sequence is only read from disk and sanitized when its header
+        is looked up, so memory use scales with the number of records
+        rather than the size of the file.  Invalid residues are handled
+        on lookup (so ``'fail'`` raises then).  Because no sequence is
+        read up front, ``lazy=True`` requires an uncompressed file,
+        ``duplicate_sequence_action='ignore'``, no record removal
+        (``invalid_sequence_action`` other than ``'remove'`` and
+        ``'convert-remove'``; ``duplicate_record_action='ignore'`` unless
+        headers are unique), ``return_list=False`` and no
+        ``output_filename``.  ``engine``, ``mmap`` and ``workers`` are
+        ignored.  Default ``False``.
+
+    return_store : bool, optional
+        If ``True``, return a :class:`~protfasta.store.SequenceStore`: the
+        same records *return_list* would give, packed into contiguous
+        header and sequence buffers with ``array('q')`` offsets.  The
+        records are packed as they are parsed and every later stage
+        works on the store, so the per-record lists (well over 100 bytes
+        of object overhead each) are never built.  Cannot be combined
+        with *return_list* or *lazy*.  Default ``False``.
+
+    encode : str or None, optional
+        If ``'uint8'``, return every sequence as a NumPy ``uint8`` array
+        of indices into :data:`STANDARD_AAS` (the gap ``'-'`` is 20 when
+        *alignment* is ``True``) instead of a string.  All sequences are
+        encoded in one vectorized table lookup and the arrays are views
+        into a single contiguous array; see :mod:`protfasta.encode` for
+        a concatenated array-plus-offsets form.  Sequences must be valid
+        after *invalid_sequence_action* has run, so with ``'ignore'`` or
+        ``'convert-ignore'`` an invalid residue raises.  Requires NumPy;
+        cannot be combined with *lazy* or *return_store*.  Default
+        ``None``.
+
+    cache : bool, str, os.PathLike or FastaCache, optional
+        Opt-in on-disk cache of the sanitized records.  ``True`` uses a
+        :class:`~protfasta.cache.FastaCache` in the default directory
+        (``$PROTFASTA_CACHE_DIR``, else ``~/.cache/protfasta``); a path
+        uses that directory; a ``FastaCache`` instance also sets the size
+        cap.  Entries are keyed on the file's path, size, modification
+        time and content fingerprint and on every option that changes
+        which records are returned, so a later call with the same file
+        and options skips parsing and sanitization entirely.  A
+        *header_parser* is keyed by its code and the values of its
+        defaults, closure variables and the globals it reads, so it must
+        be deterministic; a bound method, ``functools.partial``, callable
+        object, or function reading a global that is not plain data
+        cannot be keyed reliably, and the read then bypasses the cache.
+        Cannot be combined with *lazy*.  Default ``False``.
+
+    output_compression : str or None, optional
+        Compress *output_filename* with ``'gzip'``, ``'bgzf'`` or
+        ``'xz'``, as :func:`write_fasta` does with *compression*.
+        Default ``None``.
+
+    duplicate_digest : str, optional
+        Digest that the duplicate-record and duplicate-sequence checks
+        compare sequences by; two sequences with the same digest count
+        as the same sequence.  ``'blake2b-16'`` (default) is a 128-bit
+        cryptographic hash -- about 1.5e-21 chance of any collision
+        among 10**9 distinct sequences.  The 64-bit ``'blake2b-8'`` and
+        ``'builtin-64'`` (Python's own string hash, several times
+        faster and with no encode step) cost half the memory per digest
+        but raise that chance to ~2.7e-4 at 10**8 and ~0.027 at 10**9
+        sequences, where a collision would wrongly flag a sequence as a
+        duplicate.  ``'xxh3-64'`` and ``'xxh3-128'`` need the optional
+        ``xxhash`` package.
+
+    compact_headers : bool, optional
+        If ``True``, return a read-only, dictionary-like
+        :class:`~protfasta.headers.CompactFastaMapping` whose headers are
+        held in a sorted, front-coded table -- each header stored as the
+        prefix it shares with the previous one plus the rest -- and only
+        decoded when accessed, with the sequences packed as in a
+        :class:`~protfasta.store.SequenceStore`.  Long, similar headers
+        such as UniProt's take a fraction of the memory of ``str``
+        keys; a lookup is a binary search, slower than a ``dict``'s.
+        Records are packed as they are parsed (as with *return_store*),
+        and the header-uniqueness check keeps 16-byte header digests
+        rather than the headers.  Cannot be combined with
+        *return_list*, *lazy*, *return_store* or *encode*.  Default
+        ``False``.
+
     Returns
     -------
-    dict[str, str] or list[list[str]]
+    dict[str, str], list[list[str]], LazyFastaMapping, SequenceStore or CompactFastaMapping
         When *return_list* is ``False`` (default), a dictionary mapping
         headers to sequences.  When ``True``, a list of two-element
-        lists ``[header, sequence]``.  Ordering always matches the
-        original file.
+        lists ``[header, sequence]``.  When *lazy* is ``True``, a lazy
+        read-only mapping, when *return_store* is ``True``, a
+        :class:`~protfasta.store.SequenceStore`, and when
+        *compact_headers* is ``True``, a compact read-only mapping.
+        Ordering always matches the original file.
 
     Raises
     ------
@@ -196,35 +374,289 @@ def read_fasta(
     """
 
     # first we sanity check all of the inputs provided. NOTE. If additional functionality is added, new
-    # keywords MUST be sanity checked in this function
+    # keywords MUST be sanity checked in _check_read_fasta_options
     _io.check_filename(filename)
+    _check_read_fasta_options(expect_unique_header=expect_unique_header,
+                              header_parser=header_parser,
+                              check_header_parser=check_header_parser,
+                              duplicate_sequence_action=duplicate_sequence_action,
+                              duplicate_record_action=duplicate_record_action,
+                              invalid_sequence_action=invalid_sequence_action,
+                              alignment=alignment,
+                              return_list=return_list,
+                              output_filename=output_filename,
+                              correction_dictionary=correction_dictionary,
+                              verbose=verbose,
+                              engine=engine,
+                              mmap=mmap,
+                              workers=workers,
+                              lazy=lazy,
+                              return_store=return_store,
+                              encode=encode,
+                              cache=cache,
+                              output_compression=output_compression,
+                              duplicate_digest=duplicate_digest,
+                              compact_headers=compact_headers)
+
+    # a stream can only be read once, front to back
+    if _io.is_stream(filename):
+        if lazy:
+            raise ProtfastaException("keyword 'lazy' requires a file path, not standard input or a file object")
+        if cache is not False:
+            raise ProtfastaException("keyword 'cache' requires a file path, not standard input or a file object")
+
+    # a lazy mapping does its own (deferred) parsing and sanitization
+    if lazy:
+        return LazyFastaMapping(filename,
+                                expect_unique_header=expect_unique_header,
+                                header_parser=header_parser,
+                                invalid_sequence_action=invalid_sequence_action,
+                                alignment=alignment,
+                                correction_dictionary=correction_dictionary,
+                                verbose=verbose)
+
+    # an opt-in on-disk cache of the sanitized records, keyed on the file
+    # and on every option that changes which records come back
+    fasta_cache = _cache.resolve(cache)
+    updated = None
+    if fasta_cache is not None:
+        cache_options = dict(expect_unique_header=expect_unique_header,
+                             header_parser=header_parser,
+                             duplicate_record_action=duplicate_record_action,
+                             duplicate_sequence_action=duplicate_sequence_action,
+                             invalid_sequence_action=invalid_sequence_action,
+                             alignment=alignment,
+                             correction_dictionary=correction_dictionary,
+                             duplicate_digest=duplicate_digest,
+                             version=__version__)
+        cache_key = fasta_cache.key(filename, cache_options)
+
+        # a header_parser that cannot be keyed reliably (a bound method, a
+        # partial, a function reading a mutable global) bypasses the cache
+        if cache_key is None:
+            if verbose:
+                print('[INFO]: header_parser cannot be keyed reliably, so %s is read without the cache' % (filename))
+            fasta_cache = None
+        else:
+            cached = fasta_cache.get(cache_key)
+            if cached is not None:
+                if verbose:
+                    print('[INFO]: Loaded %i sequences for %s from cache %s'
+                          % (len(cached), filename, fasta_cache.directory))
+                updated = cached if return_store or compact_headers else cached.to_list()
+
+    if updated is None:
+        updated = _read_and_sanitize(filename,
+                                     expect_unique_header=expect_unique_header,
+                                     header_parser=header_parser,
+                                     duplicate_record_action=duplicate_record_action,
+                                     duplicate_sequence_action=duplicate_sequence_action,
+                                     invalid_sequence_action=invalid_sequence_action,
+                                     alignment=alignment,
+                                     correction_dictionary=correction_dictionary,
+                                     verbose=verbose,
+                                     engine=engine,
+                                     use_mmap=mmap,
+                                     workers=workers,
+                                     store=return_store or compact_headers,
+                                     digest_function=_utilities._digest_function(duplicate_digest))
+        if fasta_cache is not None:
+            fasta_cache.put(cache_key, updated, metadata=dict(filename=os.path.abspath(filename), **cache_options))
+
+    # If we wanted to write the final set of sequences we're going to use...:
+    if output_filename:
+        write_fasta(updated, output_filename, compression=output_compression)
+
+    # if we asked for integer-encoded sequences...
+    if encode is not None:
+        if return_list is True:
+            return _encode.encode_sequences(updated, alignment=alignment)
+        return _encode.encode_sequences(_utilities.convert_list_to_dictionary(updated, verbose), alignment=alignment)
+
+    # if we asked for a list...
+    if return_list is True:
+        return updated
+
+    # if we asked for front-coded headers...
+    if compact_headers is True:
+        return CompactFastaMapping(updated)
+
+    # if we asked for a store (sharded reads go through a list, which is
+    # packed here)
+    if return_store is True:
+        if isinstance(updated, SequenceStore):
+            return updated
+        return SequenceStore(updated)
+
+    return _utilities.convert_list_to_dictionary(updated, verbose)
+
+
+
+# ------------------------------------------------------------------
+#
+def _check_read_fasta_options(
+    expect_unique_header: bool,
+    header_parser: Optional[Callable[[str], str]],
+    check_header_parser: bool,
+    duplicate_sequence_action: str,
+    duplicate_record_action: str,
+    invalid_sequence_action: str,
+    alignment: bool,
+    return_list: bool,
+    output_filename: Optional[str],
+    correction_dictionary: Optional[dict[str, str]],
+    verbose: bool,
+    engine: str,
+    mmap: bool,
+    workers: int,
+    lazy: bool,
+    return_store: bool,
+    encode: Optional[str],
+    cache: Union[bool, str, os.PathLike, FastaCache],
+    output_compression: Optional[str],
+    duplicate_digest: str,
+    compact_headers: bool,
+) -> None:
+    """Validate every option of :func:`read_fasta` other than the filename.
+
+    Shared by :func:`read_fasta` and :func:`read_fasta_many`, so that an
+    invalid option or combination of options is rejected the same way
+    by both, before any file is read.  Takes :func:`read_fasta`'s
+    keywords, with the same names.
+
+    Raises
+    ------
+    ProtfastaException
+        If any validation check fails or incompatible options are
+        provided.
+    """
     _io.check_inputs(expect_unique_header,
-                     header_parser, 
+                     header_parser,
                      check_header_parser,
                      duplicate_record_action,
                      duplicate_sequence_action,
-                     invalid_sequence_action, 
+                     invalid_sequence_action,
                      alignment,
-                     return_list, 
+                     return_list,
                      output_filename,
                      verbose,
-                     correction_dictionary)
-    
+                     correction_dictionary,
+                     engine=engine,
+                     use_mmap=mmap,
+                     workers=workers,
+                     lazy=lazy,
+                     return_store=return_store,
+                     encode=encode,
+                     cache=cache,
+                     output_compression=output_compression,
+                     duplicate_digest=duplicate_digest,
+                     compact_headers=compact_headers)
+
+    # front-coded headers come back in their own mapping
+    if compact_headers:
+        for (keyword, value) in (('return_list', return_list), ('lazy', lazy), ('return_store', return_store)):
+            if value:
+                raise ProtfastaException("keyword 'compact_headers' cannot be combined with %s=True" % (keyword))
+        if encode is not None:
+            raise ProtfastaException("keyword 'compact_headers' cannot be combined with 'encode'")
 
-    # the actual file i/o happens here
-    raw = _io.internal_parse_fasta_file(filename, expect_unique_header=expect_unique_header, header_parser=header_parser, verbose=verbose)
 
-    # first deal with duplicate records
-    updated = _protfasta._deal_with_duplicate_records(raw, duplicate_record_action, verbose)
 
-    # deal with duplicate sequences
-    updated = _protfasta._deal_with_duplicate_sequences(updated, duplicate_sequence_action, verbose)
+# ------------------------------------------------------------------
+#
+def _read_and_sanitize(
+    filename: str,
+    expect_unique_header: bool,
+    header_parser: Optional[Callable[[str], str]],
+    duplicate_record_action: str,
+    duplicate_sequence_action: str,
+    invalid_sequence_action: str,
+    alignment: bool,
+    correction_dictionary: Optional[dict[str, str]],
+    verbose: bool,
+    engine: str,
+    use_mmap: bool,
+    workers: int,
+    store: bool,
+    digest_function: Callable[[str], bytes] = _utilities._seq_hash,
+) -> Union[list[list[str]], SequenceStore]:
+    """Parse *filename* and run the duplicate and invalid-residue stages.
+
+    Steps 1-4 of :func:`read_fasta` (see there for the arguments), with
+    inputs already validated.  Returns the surviving records as a list
+    of ``[header, sequence]`` pairs, or a
+    :class:`~protfasta.store.SequenceStore` when *store* is ``True``
+    (sharded reads always return a list).
+    """
+
+    # the actual file i/o happens here. With several workers an uncompressed
+    # file is sharded, and each worker also pre-computes invalid-residue
+    # handling for its records (applied below, after duplicate handling)
+    # and digests them, so the duplicates are found without sending records
+    # between processes (duplicate records only when headers are not parsed)
+    sharded = None
+    if workers > 1:
+        find_repeats = []
+        if _parallel.digests_agree_across_processes(digest_function):
+            if duplicate_record_action != 'ignore' and header_parser is None:
+                find_repeats.append(True)
+            if duplicate_sequence_action != 'ignore':
+                find_repeats.append(False)
+        sharded = _parallel.parse_sharded(filename,
+                                          workers,
+                                          expect_unique_header=expect_unique_header,
+                                          header_parser=header_parser,
+                                          invalid_sequence_action=invalid_sequence_action,
+                                          alignment=alignment,
+                                          correction_dictionary=correction_dictionary,
+                                          verbose=verbose,
+                                          find_repeats=tuple(find_repeats),
+                                          digest_function=digest_function)
+
+    if sharded is None:
+        raw = _io.internal_parse_fasta_file(filename,
+                                            expect_unique_header=expect_unique_header,
+                                            header_parser=header_parser,
+                                            verbose=verbose,
+                                            engine=engine,
+                                            use_mmap=use_mmap,
+                                            workers=workers,
+                                            store=store)
+        repeats = {}
+    else:
+        (raw, outcomes, repeats) = sharded
+
+    # first deal with duplicate records
+    record_repeats = repeats.get(True)
+    updated = _protfasta._deal_with_duplicate_records(raw, duplicate_record_action, verbose, digest_function,
+                                                      repeats=record_repeats)
+
+    # deal with duplicate sequences; repeats the workers found refer to
+    # positions before any duplicate records were removed
+    sequence_repeats = repeats.get(False)
+    if sequence_repeats is not None and len(updated) != len(raw):
+        if record_repeats is not None:
+            removed = [position for (position, _earlier) in record_repeats]
+        else:
+            kept = {id(entry) for entry in updated}
+            removed = [position for (position, entry) in enumerate(raw) if id(entry) not in kept]
+        sequence_repeats = _protfasta._repeats_among(sequence_repeats, removed)
+    updated = _protfasta._deal_with_duplicate_sequences(updated, duplicate_sequence_action, verbose, digest_function,
+                                                        repeats=sequence_repeats)
 
     # next decide how we deal with invalid amino acid sequences
 
+    ##
+    ## If the workers already did the work, apply it to the surviving entries
+    if sharded is not None:
+        updated = _protfasta._apply_invalid_outcomes(updated,
+                                                     outcomes,
+                                                     invalid_sequence_action,
+                                                     verbose=verbose)
+
     ##
     ## If we're using the convert-remove action...
-    if invalid_sequence_action == 'convert-remove':
+    elif invalid_sequence_action == 'convert-remove':
 
         # first run a convert ignore
         updated = _protfasta._deal_with_invalid_sequences(updated, 
@@ -246,17 +678,8 @@ def read_fasta(
                                                           alignment=alignment,
                                                           verbose=verbose, 
                                                           correction_dictionary=correction_dictionary)
-        
 
-    # If we wanted to write the final set of sequences we're going to use...:
-    if output_filename:
-        write_fasta(updated, output_filename)
-
-    # if we asked for a list...
-    if return_list is True:
-        return updated
-
-    return _utilities.convert_list_to_dictionary(updated, verbose)
+    return updated
 
 
 
@@ -276,7 +699,21 @@ def read_fasta_stream(
     correction_dictionary: Optional[dict[str, str]] = None,
     verbose: bool = False,
     silence_warnings: bool = False,
-) -> Iterator[Union[tuple[str, str], list[str]]]:
+    engine: str = 'line',
+    mmap: bool = False,
+    workers: int = 1,
+    prefetch: int = 0,
+    batch_size: Optional[int] = None,
+    batch_residues: Optional[int] = None,
+    return_store: bool = False,
+    output_compression: Optional[str] = None,
+    duplicate_memory_limit: Optional[int] = None,
+    duplicate_spill_dir: Optional[Union[str, os.PathLike]] = None,
+    duplicate_filter: Optional[str] = None,
+    duplicate_filter_fpr: float = 0.01,
+    duplicate_digest: str = 'blake2b-16',
+    compact_headers: bool = False,
+) -> Iterator[Union[tuple[str, str], list[str], list, SequenceStore]]:
     """Stream a FASTA file record-by-record, sanitizing as it goes.
 
     This is the streaming counterpart to :func:`read_fasta`.  It takes the
@@ -343,8 +780,11 @@ def read_fasta_stream(
 
     Parameters
     ----------
-    filename : str or os.PathLike
-        Path to the FASTA file to read.
+    filename : str, os.PathLike or file object
+        Path to the FASTA file to read, ``'-'`` for standard input, or a
+        readable binary or text file object, which is consumed as the
+        generator advances (see :func:`read_fasta`).  Memory stays flat
+        for streams too.
 
     expect_unique_header : bool, optional
         As in :func:`read_fasta`, but **defaults to ``False`` here** so that
@@ -384,8 +824,9 @@ def read_fasta_stream(
         otherwise yield ``(header, sequence)`` tuples.  Default
         ``False``.
 
-    output_filename : str, os.PathLike, or None, optional
-        If provided, each sanitized record is written to this path as it
+    output_filename : str, os.PathLike, file object, or None, optional
+        If provided, each sanitized record is written to this path (or
+        ``'-'`` for standard output, or a writable file object) as it
         is yielded (60 residues per line, as in :func:`write_fasta`).
         The file is only complete once the generator has been fully
         consumed.  Must differ from *filename*.
@@ -404,12 +845,114 @@ def read_fasta_stream(
         memory-growing duplicate/uniqueness check is enabled (see the
         Memory section above).  Default ``False``.
 
+    engine : str, optional
+        As in :func:`read_fasta`.  With ``'block'`` peak memory is one
+        read block (4 MiB) plus the current record rather than a single
+        record.  Default ``'line'``.
+
+    mmap : bool, optional
+        As in :func:`read_fasta`.  The mapping is walked in 4 MiB
+        windows, so resident memory stays bounded while other processes
+        share the same cached pages.  Default ``False``.
+
+    workers : int, optional
+        Number of processes used to decompress and parse a
+        BGZF-compressed file (see :func:`read_fasta`); has no effect on
+        other files, since streaming sanitization is inherently
+        sequential.  Decompressed batches are yielded in file order, and at most ``2 * workers`` batches (about 4 MiB
+        each) are in flight at once, so memory stays bounded.
+        Default 1.
+
+    prefetch : int, optional
+        If positive, the file is read, parsed and hashed for duplicate
+        checks in a background thread that runs up to *prefetch*
+        records ahead of the consumer, so disk reads and decompression
+        overlap with the work done on each record.  Records are still
+        yielded in file order, and an error in the background thread is
+        raised from the loop at the record where it occurred.  Pays off
+        when the consumer spends its time outside the interpreter lock
+        (I/O, NumPy, native model code).  Default 0 (no thread).
+
+    batch_size : int or None, optional
+        If set, yield lists of up to *batch_size* sanitized records
+        instead of one record at a time, which removes the per-record
+        generator overhead and hands vectorized downstream code ready
+        batches.  Every batch but the last is full.  Default ``None``.
+
+    batch_residues : int or None, optional
+        If set, yield a batch as soon as its sequences hold at least
+        *batch_residues* residues, so batches have a roughly constant
+        amount of sequence data however long the records are (a single
+        very long record forms a batch on its own).  With *batch_size*
+        as well, whichever limit is reached first closes the batch.
+        Default ``None``.
+
+    return_store : bool, optional
+        If ``True``, each batch is a
+        :class:`~protfasta.store.SequenceStore` instead of a list.
+        Requires *batch_size* or *batch_residues*.  Default ``False``.
+
+    output_compression : str or None, optional
+        Compress *output_filename* with ``'gzip'``, ``'bgzf'`` or
+        ``'xz'`` as records are written.  Default ``None``.
+
+    duplicate_memory_limit : int or None, optional
+        Memory budget in bytes for *duplicate_sequence_action*
+        ``'fail'``/``'remove'``.  When set, duplicate sequences are found
+        in a first pass over the file by an external sort of their
+        digests -- sorted runs of at most this size are spilled to disk
+        and merged -- rather than by holding every digest in memory.
+        The second pass yields exactly the records (and raises exactly
+        the error) of the in-memory check.  Needs about 24 bytes of disk
+        per record, and *filename* must be a path, since it is read
+        twice.  Default ``None`` (in-memory).
+
+    duplicate_spill_dir : str, os.PathLike or None, optional
+        Directory for the spill files of *duplicate_memory_limit*; they
+        are removed when the stream is exhausted or closed.  ``None``
+        (default) uses the system temporary directory.
+
+    duplicate_filter : str or None, optional
+        ``'bloom'`` puts a Bloom filter in front of the exact
+        duplicate-sequence table of *duplicate_sequence_action*
+        ``'fail'``/``'remove'``.  A first pass over the file adds every
+        sequence digest to the filter (about 2 bytes per record at the
+        default rate) and keeps only the digests it flags as possible
+        repeats; the exact table then stores and consults just those.
+        When duplicates are rare this shrinks the duplicate state by
+        well over an order of magnitude.  Results are identical to the
+        exact check -- a false positive only costs one table entry.
+        *filename* must be a path, since it is read twice; cannot be
+        combined with *duplicate_memory_limit*.  Default ``None``.
+
+    duplicate_filter_fpr : float, optional
+        Target false-positive rate of *duplicate_filter*.  Lower rates
+        use more bits per record and flag fewer unique sequences.
+        Default ``0.01``.
+
+    duplicate_digest : str, optional
+        Digest that the duplicate checks compare sequences by, as in
+        :func:`read_fasta`.  A 64-bit digest halves the per-record
+        duplicate state (and the spill files of
+        *duplicate_memory_limit*).  Default ``'blake2b-16'``.
+
+    compact_headers : bool, optional
+        If ``True``, the bookkeeping of *expect_unique_header* and
+        *duplicate_record_action* keys on a 16-byte digest of each
+        header instead of keeping every header string seen, so long
+        headers no longer dominate its memory.  The duplicate-sequence
+        table still keeps the first header of each sequence, for its
+        error message.  Records yielded are unchanged.  Default
+        ``False``.
+
     Returns
     -------
     Iterator[tuple[str, str]] or Iterator[list[str]]
         A generator yielding ``(header, sequence)`` tuples (or
         ``[header, sequence]`` lists when *return_list* is ``True``) in
-        file order.  Sequences are upper-cased and sanitized.
+        file order.  Sequences are upper-cased and sanitized.  With
+        *batch_size* or *batch_residues* it yields non-empty lists of
+        those records (or SequenceStore batches with *return_store*).
 
     Raises
     ------
@@ -446,15 +989,41 @@ def read_fasta_stream(
                      return_list,
                      output_filename,
                      verbose,
-                     correction_dictionary)
+                     correction_dictionary,
+                     engine=engine,
+                     use_mmap=mmap,
+                     workers=workers,
+                     return_store=return_store,
+                     prefetch=prefetch,
+                     batch_size=batch_size,
+                     batch_residues=batch_residues,
+                     output_compression=output_compression,
+                     duplicate_memory_limit=duplicate_memory_limit,
+                     duplicate_spill_dir=duplicate_spill_dir,
+                     duplicate_filter=duplicate_filter,
+                     duplicate_filter_fpr=duplicate_filter_fpr,
+                     duplicate_digest=duplicate_digest,
+                     compact_headers=compact_headers)
 
     # Streaming-specific guard: reading and simultaneously overwriting the
     # same file would corrupt the input mid-stream.  read_fasta is immune
     # because it reads the whole file before writing, but streaming is not.
-    if output_filename is not None:
+    if output_filename is not None and not _io.is_stream(filename) and not _io.is_stream(output_filename):
         if os.path.abspath(output_filename) == os.path.abspath(filename):
             raise ProtfastaException("keyword 'output_filename' must differ from 'filename' when streaming")
 
+    # spilling and pre-filtered duplicate detection read the file twice
+    if duplicate_memory_limit is not None and _io.is_stream(filename):
+        raise ProtfastaException("keyword 'duplicate_memory_limit' requires a file path, "
+                                 "not standard input or a file object")
+    if duplicate_filter is not None and _io.is_stream(filename):
+        raise ProtfastaException("keyword 'duplicate_filter' requires a file path, "
+                                 "not standard input or a file object")
+
+    # a store holds many records, so it is only a batch type here
+    if return_store and batch_size is None and batch_residues is None:
+        raise ProtfastaException("keyword 'return_store' requires 'batch_size' or 'batch_residues' when streaming")
+
     # Warn (once, eagerly) if a memory-growing check is enabled, so the caller
     # knows their peak memory will scale with the number of records rather than
     # staying flat. The checks are still performed -- this only surfaces the cost
@@ -465,7 +1034,7 @@ def read_fasta_stream(
             growing.append("expect_unique_header=True")
         if duplicate_record_action in ('fail', 'remove'):
             growing.append("duplicate_record_action=%r" % duplicate_record_action)
-        if duplicate_sequence_action in ('fail', 'remove'):
+        if duplicate_sequence_action in ('fail', 'remove') and duplicate_memory_limit is None:
             growing.append("duplicate_sequence_action=%r" % duplicate_sequence_action)
         if growing:
             warnings.warn(
@@ -488,17 +1057,519 @@ def read_fasta_stream(
                              return_list=return_list,
                              output_filename=output_filename,
                              correction_dictionary=correction_dictionary,
-                             verbose=verbose)
+                             verbose=verbose,
+                             engine=engine,
+                             use_mmap=mmap,
+                             workers=workers,
+                             prefetch=prefetch,
+                             batch_size=batch_size,
+                             batch_residues=batch_residues,
+                             return_store=return_store,
+                             output_compression=output_compression,
+                             duplicate_memory_limit=duplicate_memory_limit,
+                             duplicate_spill_dir=duplicate_spill_dir,
+                             duplicate_filter=duplicate_filter,
+                             duplicate_filter_fpr=duplicate_filter_fpr,
+                             duplicate_digest=duplicate_digest,
+                             compact_headers=compact_headers)
+
+
+
+# ------------------------------------------------------------------
+#
+async def read_fasta_async(
+    filename: str,
+    executor: Optional[Executor] = None,
+    **kwargs,
+) -> Union[dict[str, str], list[list[str]], SequenceStore]:
+    """Asynchronous version of :func:`read_fasta`.
+
+    The whole read -- file I/O, parsing and sanitization -- runs in an
+    executor thread, so the event loop stays responsive while a large
+    file is loaded::
+
+        sequences = await protfasta.read_fasta_async('proteins.fasta',
+                                                     invalid_sequence_action='convert')
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to the FASTA file to read.
+
+    executor : concurrent.futures.Executor or None, optional
+        Executor to run the read in.  ``None`` (default) uses the event
+        loop's default thread pool.
+
+    **kwargs
+        Any keyword accepted by :func:`read_fasta`, validated exactly as
+        there.  ``lazy=True`` is not supported, because lookups on the
+        returned mapping would block the event loop.
+
+    Returns
+    -------
+    dict[str, str], list[list[str]] or SequenceStore
+        Whatever :func:`read_fasta` returns for the same arguments.
+
+    Raises
+    ------
+    ProtfastaException
+        If any validation check fails or incompatible options are
+        provided.
+    """
+    if kwargs.get('lazy'):
+        raise ProtfastaException("keyword 'lazy' is not supported by read_fasta_async")
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(read_fasta, filename, **kwargs))
+
+
+
+# ------------------------------------------------------------------
+#
+def read_fasta_stream_async(
+    filename: str,
+    read_ahead: int = _aio.DEFAULT_READ_AHEAD,
+    chunk_size: int = _aio.DEFAULT_CHUNK_SIZE,
+    executor: Optional[Executor] = None,
+    **kwargs,
+) -> _aio.AsyncRecordStream:
+    """Asynchronous version of :func:`read_fasta_stream`, for ``async for``.
+
+    Records are read, parsed and sanitized by :func:`read_fasta_stream`
+    in an executor thread and handed to the event loop in batches
+    through a bounded queue.  When the consumer falls behind, the queue
+    fills and the reader waits, so at most ``read_ahead * chunk_size``
+    items are held in memory::
+
+        async with protfasta.read_fasta_stream_async('huge.fasta') as records:
+            async for header, seq in records:
+                await handle(header, seq)
+
+    Arguments are validated when this function is called, before any
+    iteration begins, exactly as by :func:`read_fasta_stream`.
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to the FASTA file to read.
+
+    read_ahead : int, optional
+        Maximum number of chunks the reader may buffer ahead of the
+        consumer.  Default 8.
+
+    chunk_size : int, optional
+        Number of items handed to the event loop at a time.  Default
+        1024.  This only sets the hand-off size and does not change what
+        is yielded; ``batch_size`` and ``batch_residues`` in *kwargs* are
+        passed on to :func:`read_fasta_stream` and group the yielded
+        records into batches, exactly as there.
+
+    executor : concurrent.futures.Executor or None, optional
+        Executor that runs the reader.  ``None`` (default) uses the
+        event loop's default thread pool.
+
+    **kwargs
+        Any keyword accepted by :func:`read_fasta_stream`.
+
+    Returns
+    -------
+    AsyncRecordStream
+        An async iterator (and async context manager) yielding what
+        :func:`read_fasta_stream` yields.  Use ``async with`` or call
+        ``aclose()`` to stop reading early and close the file.
+
+    Raises
+    ------
+    ProtfastaException
+        If any validation check fails or incompatible options are
+        provided.
+    """
+    for (name, value) in (('read_ahead', read_ahead), ('chunk_size', chunk_size)):
+        if type(value) != int or value < 1:
+            raise ProtfastaException("keyword '%s' must be a positive integer" % (name))
+
+    # read_fasta_stream validates eagerly and only opens the file on first
+    # iteration, which then happens in the reader thread
+    records = read_fasta_stream(filename, **kwargs)
+    return _aio.AsyncRecordStream(lambda: records,
+                                  read_ahead=read_ahead,
+                                  chunk_size=chunk_size,
+                                  executor=executor)
+
+
+
+# ------------------------------------------------------------------
+#
+def read_fasta_many(
+    paths: Union[str, os.PathLike, Iterable[Union[str, os.PathLike]]],
+    workers: int = 1,
+    pool: str = 'thread',
+    merge: bool = False,
+    **kwargs,
+) -> tuple[Union[dict[str, object], list[tuple[str, str, str]]], dict[str, Exception]]:
+    """Read many FASTA files concurrently with the same options.
+
+    Built for directories of thousands of small files (one per proteome,
+    say), where calling :func:`read_fasta` in a loop pays for argument
+    validation -- including the trial call of *header_parser* -- and
+    file handling one file at a time::
+
+        (proteomes, failures) = protfasta.read_fasta_many('proteomes/*.fasta', workers=8,
+                                                          invalid_sequence_action='convert')
+        for path, exc in failures.items():
+            print('skipped %s: %s' % (path, exc))
+
+    The options are validated once, up front; each file is then read
+    with exactly the sanitization :func:`read_fasta` would apply.  A
+    file that fails (missing, unreadable, a duplicate header, an invalid
+    residue under ``'fail'``...) is reported in *failures* and does not
+    stop the others.
+
+    Parameters
+    ----------
+    paths : str, os.PathLike or iterable of them
+        Either a list of files, or a single glob pattern (expanded with
+        :func:`glob.glob`, ``**`` allowed, and sorted).  A single path
+        without wildcards reads just that file.
+
+    workers : int, optional
+        Number of files read at once.  ``1`` (default) reads them in
+        order in the calling thread.  Each file itself is read with
+        ``read_fasta(..., workers=1)``.
+
+    pool : str, optional
+        ``'thread'`` (default) or ``'process'``.  Threads suit files on
+        network or otherwise slow storage; parsing itself holds the
+        interpreter lock, so use processes to spread parsing over CPU
+        cores (*header_parser* and *correction_dictionary* must then be
+        picklable, e.g. a module-level function rather than a lambda).
+
+    merge : bool, optional
+        If ``True``, return one list of ``(source, header, sequence)``
+        tuples -- every record of every successfully read file, in the
+        order of *paths* and then file order -- instead of a per-file
+        mapping.  Default ``False``.
+
+    **kwargs
+        Any keyword accepted by :func:`read_fasta` except ``workers``,
+        ``lazy`` and ``output_filename``.  ``return_store`` and
+        ``encode`` cannot be combined with *merge*.
+
+    Returns
+    -------
+    tuple[dict or list, dict[str, Exception]]
+        ``(results, failures)``.  *results* maps each successfully read
+        path (as a string, in the order of *paths*) to what
+        :func:`read_fasta` returned for it, or with *merge* is the merged
+        list.  *failures* maps each path that could not be read to the
+        exception raised for it.
+
+    Raises
+    ------
+    ProtfastaException
+        If the options are invalid, or a glob pattern matches no files.
+        Problems with individual files are reported in *failures*
+        instead.
+    """
+
+    if type(workers) != int or workers < 1:
+        raise ProtfastaException("keyword 'workers' must be a positive integer")
+
+    if pool not in ['thread', 'process']:
+        raise ProtfastaException("keyword 'pool' must be one of 'thread', 'process'")
+
+    if type(merge) != bool:
+        raise ProtfastaException("keyword 'merge' must be a boolean")
+
+    for keyword in ['workers', 'lazy', 'output_filename']:
+        if keyword in kwargs:
+            raise ProtfastaException("keyword '%s' is not supported by read_fasta_many" % (keyword))
+
+    if merge:
+        if kwargs.get('return_store') or kwargs.get('encode') is not None:
+            raise ProtfastaException("keyword 'merge' cannot be combined with return_store or encode")
+        kwargs['return_list'] = True
+
+    # validate every option once, exactly as read_fasta would
+    try:
+        bound = inspect.signature(read_fasta).bind('', **kwargs)
+    except TypeError as e:
+        raise ProtfastaException('Invalid keyword for read_fasta_many: %s' % (e))
+    bound.apply_defaults()
+    options = dict(bound.arguments)
+    del options['filename']
+    _check_read_fasta_options(**options)
+
+    # ... so the per-file reads need not repeat the header_parser trial
+    kwargs['check_header_parser'] = False
+
+    if isinstance(paths, (str, os.PathLike)):
+        pattern = os.fspath(paths)
+        if glob.has_magic(pattern):
+            filenames = sorted(glob.glob(pattern, recursive=True))
+            if not filenames:
+                raise ProtfastaException('No files match %s' % (pattern))
+        else:
+            filenames = [pattern]
+    else:
+        filenames = [os.fspath(filename) for filename in paths]
+
+    if workers == 1 or len(filenames) < 2:
+        outcomes = [_read_one(filename, kwargs) for filename in filenames]
+    else:
+        executor = ThreadPoolExecutor if pool == 'thread' else ProcessPoolExecutor
+        with executor(max_workers=min(workers, len(filenames))) as pool_executor:
+            # several files per task keeps inter-process traffic down
+            chunksize = max(1, len(filenames) // (4 * workers)) if pool == 'process' else 1
+            outcomes = list(pool_executor.map(_read_one, filenames, [kwargs] * len(filenames), chunksize=chunksize))
+
+    results = [] if merge else {}
+    failures = {}
+    for (filename, (result, exc)) in zip(filenames, outcomes):
+        if exc is not None:
+            failures[filename] = exc
+        elif merge:
+            results.extend((filename, header, seq) for (header, seq) in result)
+        else:
+            results[filename] = result
+
+    return (results, failures)
+
+
+def _read_one(filename: str, kwargs: dict) -> tuple[object, Optional[Exception]]:
+    """Read one file for :func:`read_fasta_many`, returning ``(result, None)`` or ``(None, exception)``."""
+    try:
+        return (read_fasta(filename, **kwargs), None)
+    except Exception as e:
+        return (None, e)
+
+
+
+# ------------------------------------------------------------------
+#
+def remove_near_duplicates(
+    sequences: Union[dict[str, str], SequenceStore, Iterable[Sequence[str]]],
+    threshold: float = 0.9,
+    kmer: int = 5,
+    num_perm: int = 128,
+    seed: int = 0,
+    workers: int = 1,
+    verbose: bool = False,
+) -> Union[dict[str, str], SequenceStore, list]:
+    """Remove sequences that nearly duplicate an earlier sequence.
+
+    ``duplicate_sequence_action='remove'`` only drops identical
+    sequences; this also drops a sequence that differs from an earlier
+    one by a few substitutions or a terminal truncation.  Similarity is
+    the Jaccard similarity of the two sequences' sets of *kmer*-mers,
+    estimated from MinHash signatures, and locality-sensitive hashing
+    keeps the comparison roughly linear in the number of sequences
+    instead of quadratic::
+
+        seqs = protfasta.read_fasta('proteome.fasta')
+        nonredundant = protfasta.remove_near_duplicates(seqs, threshold=0.9, workers=4)
+
+    Sequences are taken in order and the first of each group of near
+    duplicates is kept.  The detection is probabilistic: a pair exactly
+    at *threshold* is caught about 80% of the time, and with the default
+    *num_perm* the similarity estimate has a standard deviation of about
+    0.03 near 0.9, but for a given *seed* the result is always the same,
+    whatever *workers* is.  See :func:`protfasta.dedup.near_duplicates`
+    for a lazy version that also reports which sequence each duplicate
+    matched.
+
+    Parameters
+    ----------
+    sequences : dict, SequenceStore or iterable of (header, sequence)
+        The sequences, such as the result of :func:`read_fasta`, or a
+        generator such as :func:`read_fasta_stream`, which is consumed
+        in a single pass.
+
+    threshold : float, optional
+        Estimated Jaccard similarity at or above which a sequence is a
+        near duplicate; greater than 0 and at most 1.  Default ``0.9``.
+
+    kmer : int, optional
+        K-mer length, from 1 to 8.  Shorter k-mers suit shorter
+        sequences.  Default ``5``.
+
+    num_perm : int, optional
+        Number of MinHash functions per signature.  More give a finer
+        estimate, at proportional cost in time and memory.  Default
+        ``128``.
+
+    seed : int, optional
+        Seed of the hash functions.  Default ``0``.
+
+    workers : int, optional
+        Number of processes computing signatures.  Default ``1``.
+
+    verbose : bool, optional
+        If ``True``, print how many sequences were removed.  Default
+        ``False``.
+
+    Returns
+    -------
+    dict[str, str], SequenceStore or list
+        The kept sequences, in order: a dictionary for a dictionary, a
+        store for a store, and otherwise a list of the kept elements.
+
+    Raises
+    ------
+    ProtfastaException
+        If an option is invalid, or NumPy is not installed.
+    """
+    _dedup.check_near_duplicate_options(threshold, kmer, num_perm, seed, workers)
+
+    if isinstance(sequences, dict):
+        records = sequences.items()
+    else:
+        records = sequences
+
+    kept = []
+    n_read = 0
+    for (record, match) in _dedup.near_duplicates(records, threshold=threshold, kmer=kmer, num_perm=num_perm,
+                                                  seed=seed, workers=workers):
+        n_read += 1
+        if match is None:
+            kept.append(record)
+
+    if verbose:
+        print('[INFO]: Removed %i of %i due to near-duplicate sequences' % (n_read - len(kept), n_read))
+
+    if isinstance(sequences, dict):
+        return dict(kept)
+    if isinstance(sequences, SequenceStore):
+        return SequenceStore(kept)
+    return kept
+
+
+
+# ------------------------------------------------------------------
+#
+def cluster(
+    filename: Union[str, os.PathLike, dict[str, str], SequenceStore, Iterable[Sequence[str]]],
+    identity: float = 0.9,
+    word_length: Optional[int] = None,
+    workers: int = 1,
+    verbose: bool = False,
+    **kwargs,
+) -> tuple[dict[str, str], dict[str, tuple[str, float]]]:
+    """Cluster sequences greedily at an identity threshold, CD-HIT style.
+
+    Cuts redundancy from a set of sequences without a round trip through
+    an external tool::
+
+        (representatives, membership) = protfasta.cluster('uniref.fasta', identity=0.9, workers=8)
+        protfasta.write_fasta(representatives, 'uniref_nr90.fasta')
+
+    Sequences are visited from longest to shortest.  Each one joins the
+    cluster of the first representative it matches with at least
+    *identity*, or otherwise becomes the representative of a new
+    cluster, so every representative is the longest member of its
+    cluster.  Identity comes from aligning the shorter sequence against
+    the longer one, whose ends may overhang for free: it is the length
+    of the shorter sequence less the fewest substitutions, insertions
+    and deletions in such an alignment, divided by that length.  Every
+    gap counts against it, so a short sequence cannot match a long,
+    unrelated one by finding its residues scattered along it.
+
+    Only representatives that share enough short words (k-mers) with a
+    sequence to possibly reach *identity* -- CD-HIT's short-word filter
+    -- are compared with it.  The comparisons run in a pool of *workers*
+    processes, a batch of sequences at a time, and the clustering is
+    identical for any *workers*.  Sequences shorter than *word_length*
+    only cluster with identical sequences.
+
+    Parameters
+    ----------
+    filename : str, os.PathLike, file object, dict, SequenceStore or iterable
+        A FASTA file, read with :func:`read_fasta` (passing on
+        *kwargs*), or sequences already in memory: a dictionary, a
+        store, or an iterable of ``(header, sequence)`` pairs with
+        unique headers.
+
+    identity : float, optional
+        Identity threshold, between 0.5 and 1.  Default ``0.9``.
+
+    word_length : int or None, optional
+        Word length of the short-word filter, from 2 to 5.  ``None``
+        (default) uses CD-HIT's choice for *identity*: 5 from 0.7, 4
+        from 0.6 and 3 below.
+
+    workers : int, optional
+        Number of processes comparing sequences.  Default ``1``.
+
+    verbose : bool, optional
+        If ``True``, print the number of clusters.  Default ``False``.
+
+    **kwargs
+        Passed to :func:`read_fasta` when *filename* is a file (for
+        example ``invalid_sequence_action``).
+
+    Returns
+    -------
+    tuple[dict[str, str], dict[str, tuple[str, float]]]
+        ``(representatives, membership)``: the representative sequences
+        by header, and for every sequence its representative's header
+        and their identity (``1.0`` for a representative itself), both
+        in input order.
+
+    Raises
+    ------
+    ProtfastaException
+        If an option is invalid, reading the file fails, or headers are
+        not unique.
+    """
+    _cluster.check_cluster_options(identity, word_length, workers)
+    if word_length is None:
+        word_length = _cluster.default_word_length(identity)
+
+    if isinstance(filename, (str, os.PathLike)) or callable(getattr(filename, 'read', None)):
+        kwargs['return_list'] = True
+        records = read_fasta(filename, **kwargs)
+    elif kwargs:
+        raise ProtfastaException("keyword '%s' is only used when reading a file" % (sorted(kwargs)[0]))
+    elif isinstance(filename, dict):
+        records = list(filename.items())
+    else:
+        records = list(filename)
+
+    headers = [record[0] for record in records]
+    seqs = [record[1] for record in records]
+    if len(set(headers)) != len(headers):
+        seen = set()
+        for header in headers:
+            if header in seen:
+                raise ProtfastaException('cluster requires unique headers (found duplicate header %s)' % (header))
+            seen.add(header)
+
+    assigned = _cluster.greedy_cluster(seqs, identity, word_length, workers=workers)
+
+    representatives = {}
+    membership = {}
+    for (position, (rep, common)) in enumerate(assigned):
+        if rep == position:
+            representatives[headers[position]] = seqs[position]
+        membership[headers[position]] = (headers[rep], common / len(seqs[position]) if seqs[position] else 1.0)
+
+    if verbose:
+        print('[INFO]: Clustered %i sequences into %i clusters at identity %s'
+              % (len(records), len(representatives), identity))
+
+    return (representatives, membership)
 
 
 
 # ------------------------------------------------------------------
 #
 def write_fasta(
-    fasta_data: Union[dict[str, str], list[list[str]]],
+    fasta_data: Union[dict[str, str], list[list[str]], SequenceStore],
     filename: str,
     linelength: Union[int, bool, None] = 60,    
     append_to_fasta: bool = False,
+    compression: Optional[str] = None,
+    threads: Optional[int] = None,
 ) -> None:
     """Write sequences to a FASTA file.
 
@@ -508,14 +1579,17 @@ def write_fasta(
 
     Parameters
     ----------
-    fasta_data : dict[str, str] or list[list[str]]
+    fasta_data : dict[str, str], list[list[str]] or SequenceStore
         Sequence data.  If a dictionary, keys are headers and values are
         amino-acid sequences.  If a list, each element must be a
-        two-element list ``[header, sequence]``.
+        two-element list ``[header, sequence]``.  A
+        :class:`~protfasta.store.SequenceStore` is written in order.
 
-    filename : str or os.PathLike
+    filename : str, os.PathLike or file object
         Destination file path.  Should conventionally end with
-        ``.fasta`` or ``.fa``, but this is not enforced.
+        ``.fasta`` or ``.fa``, but this is not enforced.  ``'-'``
+        writes to standard output, and a writable binary or text file
+        object is written to (through a 1 MiB buffer) and left open.
 
     linelength : int, bool, or None, optional
         Maximum number of residues per line in the output.  Default is
@@ -528,6 +1602,19 @@ def write_fasta(
         already exists; otherwise the file is created.  If ``False``
         (default), any existing file is overwritten.
 
+    compression : str or None, optional
+        Compress the output as it is written: ``'gzip'``, ``'bgzf'``
+        (blocked gzip, as written by ``bgzip``; readable by any gzip
+        reader and by ``read_fasta(..., workers=N)`` in parallel) or
+        ``'xz'``.  Requires a path, ``'-'`` or a binary file object.
+        Default ``None`` (plain text).
+
+    threads : int or None, optional
+        Number of threads compressing ``'bgzf'`` output.  BGZF blocks
+        are independent, so they are compressed in parallel and written
+        in order.  ``None`` (default) uses one thread per CPU.  Ignored
+        for other formats.
+
     Returns
     -------
     None
@@ -545,12 +1632,13 @@ def write_fasta(
     # in for write_fasta to deal with
 
     if isinstance(fasta_data, dict):
-        def get_sequence():
-            return (entry, fasta_data[entry])
+        records = fasta_data.items()
+
+    elif isinstance(fasta_data, SequenceStore):
+        records = fasta_data
 
     elif isinstance(fasta_data, list):
-        def get_sequence():
-            return (entry[0], entry[1])
+        records = fasta_data
 
         # quick validate
         for i in fasta_data:
@@ -560,24 +1648,11 @@ def write_fasta(
     else:
         raise ProtfastaException("keyword 'fasta_data' must be a dictionary of header:sequence pairs or a list of [header, sequence] pairs (got %s)" % (type(fasta_data).__name__))
 
-    # override line length for sane input. Note the int() cast happens before
-    # any numerical comparison so that a non-numerical linelength raises a
-    # protfasta exception rather than an opaque TypeError.
-    if linelength is None or linelength is False:
-        linelength = False
+    # override line length for sane input (0/None/False -> one line per
+    # sequence, otherwise at least 5 residues per line)
+    linelength = _writer.normalize_linelength(linelength)
 
-    else:
-        # cast linelength to an integer here as a soft type checking, and
-        # if it's shorter than 5 then reset to 5
-        try:
-            linelength = int(linelength)
-        except (TypeError, ValueError):
-            raise ProtfastaException("keyword 'linelength' must be an integer, or one of 0/None/False (got %s)" % (repr(linelength)))
-
-        if linelength < 1:
-            linelength = False
-        elif linelength < 5:
-            linelength = 5
+    _io.check_compression(compression, threads)
 
     # set the 'mode' for open. If append_to_file==False, use 'w' and overwrite
     # existing .fasta file. Otherwise use 'a' and add to existing file if it exists.
@@ -587,34 +1662,9 @@ def write_fasta(
         open_mode='a'
 
     # Use a large write buffer (1 MiB) to minimise syscall overhead when
-    # writing very large files.
-    with open(filename, open_mode, buffering=1024 * 1024) as fh:
-
-        # for each entry
-        for entry in fasta_data:
-
-            (header, seq) = get_sequence()
-            if len(seq) < 1:
-                raise ProtfastaException('Sequence associated with [%s] is empty'%(header))
-
-            # write the header line
-            fh.write('>')
-            fh.write(header)
-            fh.write('\n')
-
-            if linelength:
-                # Slice the sequence into line-length chunks and write
-                # each chunk followed by a newline.  This is O(n) with
-                # a handful of Python-level write calls, vs one write
-                # per residue in the naive implementation.
-                seq_len = len(seq)
-                for start in range(0, seq_len, linelength):
-                    fh.write(seq[start:start + linelength])
-                    fh.write('\n')
-                # Blank separator line between records.
-                fh.write('\n')
-            else:
-                # Single-line sequence output.
-                fh.write(seq)
-                fh.write('\n\n')
+    # writing very large files (and for stdout or a caller's file object).
+    # Records are formatted in batches of ~1M residues, each emitted with a
+    # single write call rather than several calls per line.
+    with _io._open_output(filename, open_mode, compression=compression, threads=threads) as fh:
+        _writer.write_records(fh, records, linelength)
     
@@ -0,0 +1,181 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module handles the BGZF (blocked gzip) container format used by
+samtools/htslib.  A BGZF file is a series of independent gzip members,
+each holding at most 64 KiB of data and recording its own compressed size
+in a ``BC`` extra subfield, so blocks can be located without
+decompressing anything and then decompressed in any order.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import BinaryIO, Iterator
+
+from .protfasta_exceptions import ProtfastaException
+
+
+# Largest amount of uncompressed data a single BGZF block may hold. htslib
+# fills blocks to just under 64 KiB so that the compressed block (which must
+# also fit in 64 KiB) survives incompressible input.
+MAX_BLOCK_DATA = 0xff00
+
+# The fixed 18-byte header of a BGZF block: gzip magic, deflate, FEXTRA set,
+# zeroed mtime, XFL, OS=unknown, XLEN=6, then the 'BC' subfield (SLEN=2)
+# whose 2-byte value, BSIZE, is filled in per block.
+_HEADER = struct.Struct('<4sI2sH2sHH')
+_HEADER_PREFIX = b'\x1f\x8b\x08\x04'
+
+# The empty block htslib writes as an end-of-file marker.
+EOF_BLOCK = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def is_bgzf(head: bytes) -> bool:
+    """Return whether *head* is the start of a BGZF file.
+
+    Parameters
+    ----------
+    head : bytes
+        The first (at least 18) bytes of the file.
+
+    Returns
+    -------
+    bool
+        ``True`` if the bytes are a gzip header carrying a ``BC`` extra
+        subfield, as every BGZF block does.
+    """
+    return head[:4] == _HEADER_PREFIX and head[12:14] == b'BC'
+
+
+def iter_blocks(fh: BinaryIO) -> Iterator[tuple[bytes, int]]:
+    """Yield the raw compressed blocks of a BGZF stream, in order.
+
+    Only the block headers and trailers are read; nothing is decompressed.
+
+    Parameters
+    ----------
+    fh : binary file object
+        Stream positioned at the start of a block.
+
+    Yields
+    ------
+    tuple[bytes, int]
+        ``(block, size)`` pairs, where *block* is one complete gzip
+        member and *size* is its uncompressed length (from the gzip
+        ``ISIZE`` trailer).
+
+    Raises
+    ------
+    ProtfastaException
+        If the stream is not BGZF or ends part-way through a block.
+    """
+    while True:
+        header = fh.read(12)
+        if not header:
+            return
+
+        if len(header) < 12 or header[:4] != _HEADER_PREFIX:
+            raise ProtfastaException('Invalid or truncated BGZF block header')
+
+        xlen = struct.unpack_from('<H', header, 10)[0]
+        extra = fh.read(xlen)
+        if len(extra) < xlen:
+            raise ProtfastaException('Invalid or truncated BGZF block header')
+
+        # walk the extra subfields looking for BC (there is normally only one)
+        bsize = None
+        pos = 0
+        while pos + 4 <= xlen:
+            si, slen = extra[pos:pos + 2], struct.unpack_from('<H', extra, pos + 2)[0]
+            if si == b'BC' and slen == 2:
+                bsize = struct.unpack_from('<H', extra, pos + 4)[0]
+            pos += 4 + slen
+
+        if bsize is None:
+            raise ProtfastaException('gzip member without a BGZF block size; not a BGZF file')
+
+        remaining = bsize + 1 - 12 - xlen
+        body = fh.read(remaining)
+        if len(body) < remaining:
+            raise ProtfastaException('Truncated BGZF block')
+
+        yield (header + extra + body, struct.unpack_from('<I', body, remaining - 4)[0])
+
+
+def decompress_block(block: bytes) -> bytes:
+    """Decompress one BGZF block, checking its CRC.
+
+    Parameters
+    ----------
+    block : bytes
+        One complete gzip member as yielded by :func:`iter_blocks`.
+
+    Returns
+    -------
+    bytes
+        The uncompressed data.
+    """
+    return zlib.decompress(block, 31)
+
+
+def compress_block(data: bytes, level: int = 6) -> bytes:
+    """Compress *data* into a single BGZF block.
+
+    Parameters
+    ----------
+    data : bytes
+        At most :data:`MAX_BLOCK_DATA` bytes of uncompressed data.
+
+    level : int, optional
+        zlib compression level (0-9).  Default 6.
+
+    Returns
+    -------
+    bytes
+        A complete BGZF block.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+
+    # incompressible input can overflow the 64 KiB block limit; store it raw
+    if len(deflated) + 26 > 0x10000:
+        compressor = zlib.compressobj(0, zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+
+    header = _HEADER.pack(_HEADER_PREFIX, 0, b'\x00\xff', 6, b'BC', 2, len(deflated) + 25)
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def compress(data: bytes, level: int = 6) -> bytes:
+    """Compress *data* into a complete BGZF file, including the EOF marker.
+
+    Parameters
+    ----------
+    data : bytes
+        Uncompressed data of any length.
+
+    level : int, optional
+        zlib compression level (0-9).  Default 6.
+
+    Returns
+    -------
+    bytes
+        The BGZF-compressed data.
+    """
+    blocks = [compress_block(data[i:i + MAX_BLOCK_DATA], level) for i in range(0, len(data), MAX_BLOCK_DATA)]
+    blocks.append(EOF_BLOCK)
+    return b''.join(blocks)
@@ -0,0 +1,354 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module implements the greedy, identity-threshold clustering behind
+:func:`protfasta.cluster`, in the style of CD-HIT.  Sequences are taken
+longest first; each one joins the first existing cluster whose
+representative it matches at the identity threshold, or else founds a new
+cluster.  A short-word (k-mer) index of the representatives prunes the
+candidates, so only the few representatives sharing enough k-mers with a
+sequence are aligned against it, and the alignments can run in a process
+pool.  Identity is taken from a semi-global alignment that penalises
+gaps, so a short sequence does not match a long, unrelated one just by
+finding its residues scattered along it.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import bisect
+import collections
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .protfasta_exceptions import ProtfastaException
+
+
+# Word length used for each identity range (as recommended for CD-HIT):
+# (lowest identity, word length), highest first.
+_WORD_LENGTHS = [(0.7, 5), (0.6, 4), (0.5, 3)]
+
+# Lowest identity threshold supported; below it the short-word filter
+# prunes almost nothing.
+MIN_IDENTITY = 0.5
+
+# Sequences whose candidates are verified together, in parallel, before
+# the new representatives among them are added to the index.
+_BATCH = 1024
+
+# Verification tasks per worker process per batch.
+_TASKS_PER_WORKER = 4
+
+# Sequences of the current clustering in a worker process (set by
+# _init_worker, so they are sent to each process once).
+_SEQUENCES: list[str] = []
+
+
+####################################################################################################
+#
+#
+def default_word_length(identity: float) -> int:
+    """Return the word length for *identity*: 5 from 0.7, 4 from 0.6, else 3."""
+    for (lowest, word_length) in _WORD_LENGTHS:
+        if identity >= lowest:
+            return word_length
+    return _WORD_LENGTHS[-1][1]
+
+
+def residue_masks(seq: str) -> dict[str, int]:
+    """Return, for every residue in *seq*, the bitmask of its positions.
+
+    The input of :func:`lcs_length` and :func:`edit_distance`.
+    """
+    masks: dict[str, int] = {}
+    bit = 1
+    for residue in seq:
+        masks[residue] = masks.get(residue, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def lcs_length(length: int, masks: dict[str, int], other: str) -> int:
+    """Return the length of the longest common subsequence of a sequence and *other*.
+
+    The sequence is given by its *length* and :func:`residue_masks`.  Uses the
+    bit-parallel algorithm of Crochemore et al. (2001): one row of the
+    dynamic-programming table is held in the bits of a single integer,
+    so each residue of *other* costs a few big-integer operations rather
+    than a Python loop over the sequence.
+    """
+    full = (1 << length) - 1
+    row = full
+    get = masks.get
+    for residue in other:
+        matched = row & get(residue, 0)
+        row = ((row + matched) | (row - matched)) & full
+    return length - bin(row).count('1')
+
+
+def edit_distance(length: int, masks: dict[str, int], other: str) -> int:
+    """Return the fewest edits turning a sequence into a stretch of *other*.
+
+    Edits are substitutions, insertions and deletions, each costing 1,
+    and *other* may overhang the sequence at either end for free (a
+    semi-global alignment, as CD-HIT aligns a sequence against a longer
+    representative).  The sequence is given by its *length* and
+    :func:`residue_masks`.  Uses the bit-parallel algorithm of Myers
+    (1999), holding one column of the dynamic-programming table as two
+    integers of vertical deltas, so each residue of *other* costs a few
+    big-integer operations.
+
+    ``length - edit_distance(...)`` never exceeds :func:`lcs_length`, as
+    the matched residues of any alignment form a common subsequence.
+    """
+    full = (1 << length) - 1
+    last = 1 << (length - 1) if length else 0
+    plus = full
+    minus = 0
+    score = length
+    best = length
+    get = masks.get
+    for residue in other:
+        match = get(residue, 0)
+        vertical = match | minus
+        horizontal = (((match & plus) + plus) ^ plus) | match
+        h_plus = minus | (full & ~(horizontal | plus))
+        h_minus = plus & horizontal
+        if h_plus & last:
+            score += 1
+        elif h_minus & last:
+            score -= 1
+        # no carry into the first row: the alignment may start anywhere in other
+        h_plus = (h_plus << 1) & full
+        h_minus = (h_minus << 1) & full
+        plus = h_minus | (full & ~(vertical | h_plus))
+        minus = h_plus & vertical
+        if score < best:
+            best = score
+    return best
+
+
+def _first_match(seqs: list[str], query: int, candidates: list[int], need: int) -> tuple[int, int]:
+    """Return ``(candidate, aligned)`` for the first of *candidates* that *query* aligns to with *need* identities.
+
+    *aligned* is the length of *query* less its :func:`edit_distance` to
+    the candidate.  The cheaper :func:`lcs_length` bounds it from above,
+    so candidates falling short on it are not aligned.  ``(-1, 0)`` if
+    there is none.
+    """
+    if not candidates:
+        return (-1, 0)
+
+    seq = seqs[query]
+    length = len(seq)
+    masks = residue_masks(seq)
+    for candidate in candidates:
+        other = seqs[candidate]
+        if lcs_length(length, masks, other) < need:
+            continue
+        aligned = length - edit_distance(length, masks, other)
+        if aligned >= need:
+            return (candidate, aligned)
+    return (-1, 0)
+
+
+def _init_worker(seqs: list[str]) -> None:
+    global _SEQUENCES
+    _SEQUENCES = seqs
+
+
+def _verify(tasks: list[tuple[int, list[int], int]]) -> list[tuple[int, int]]:
+    """Run :func:`_first_match` for each ``(query, candidates, need)`` in *tasks* (worker process)."""
+    return [_first_match(_SEQUENCES, query, candidates, need) for (query, candidates, need) in tasks]
+
+
+####################################################################################################
+#
+#
+class _WordIndex:
+    """Map every k-mer to the representatives that contain it, in the order they were added.
+
+    Most words belong to a single representative, so a word maps to a
+    plain ``int`` until a second representative shares it, and only then
+    to a list -- half the time and a fraction of the memory of a list
+    per word.
+    """
+
+    def __init__(self, word_length: int):
+        self.word_length = word_length
+        self._index: dict[str, object] = {}
+
+    def words(self, seq: str) -> set[str]:
+        """Return the distinct words of *seq*; a sequence shorter than a word is its own word."""
+        k = self.word_length
+        if len(seq) < k:
+            return {seq}
+        return {seq[i:i + k] for i in range(len(seq) - k + 1)}
+
+    def add(self, rep: int, words: set[str]) -> None:
+        """Add representative *rep*; it must be larger than every one added before."""
+        index = self._index
+        get = index.get
+        for word in words:
+            reps = get(word)
+            if reps is None:
+                index[word] = rep
+            elif reps.__class__ is int:
+                index[word] = [reps, rep]
+            else:
+                reps.append(rep)
+
+    def candidates(self, words: set[str], need: int, since: int = 0) -> list[int]:
+        """Return the representatives (from *since* on) sharing at least *need* of *words*, oldest first."""
+        single = []
+        several = []
+        get = self._index.get
+        for word in words:
+            reps = get(word)
+            if reps is None:
+                continue
+            if reps.__class__ is int:
+                if reps >= since:
+                    single.append(reps)
+            elif since:
+                several.append(reps[bisect.bisect_left(reps, since):])
+            else:
+                several.append(reps)
+
+        counts = collections.Counter(itertools.chain(single, itertools.chain.from_iterable(several)))
+        return sorted(rep for (rep, shared) in counts.items() if shared >= need)
+
+
+def _shared_words_needed(n_words: int, length: int, identity: float, word_length: int) -> int:
+    """Smallest number of its *n_words* distinct words a sequence of *length* shares with a match (at least 1).
+
+    At *identity*, a match is at most ``(1 - identity) * length`` edits
+    away, and each edit breaks at most *word_length* word positions --
+    the short-word filter of CD-HIT.  A broken position loses at most
+    one distinct word, so the bound holds for the distinct words that
+    :meth:`_WordIndex.candidates` counts, however often a word repeats.
+    """
+    return max(1, n_words - word_length * math.ceil((1 - identity) * length - 1e-9))
+
+
+def greedy_cluster(
+    seqs: list[str],
+    identity: float,
+    word_length: int,
+    workers: int = 1,
+) -> list[tuple[int, int]]:
+    """Cluster *seqs* greedily at *identity*; return each sequence's representative.
+
+    Sequences are visited longest first (ties in input order).  A
+    sequence joins the oldest representative, among those passing the
+    short-word filter, that it aligns to with at least *identity*: its
+    length less its :func:`edit_distance` to the representative, over
+    its length (that of the shorter of the two).  Otherwise it becomes
+    a representative itself.
+
+    Verification runs a batch of :data:`_BATCH` sequences at a time
+    against the representatives found before the batch -- in a process
+    pool when *workers* > 1 -- after which the sequences left unmatched
+    are checked, in order, against the representatives created earlier
+    in the same batch.  The result is the same as visiting every
+    sequence one by one, with the same filter, whatever *workers* is.
+
+    Parameters
+    ----------
+    seqs : list[str]
+        The sequences.
+
+    identity : float
+        Identity threshold, from :data:`MIN_IDENTITY` to 1.
+
+    word_length : int
+        Length of the words in the short-word index.
+
+    workers : int, optional
+        Number of verification processes.  Default ``1``.
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        For every sequence (in input order), ``(representative, aligned)``:
+        the position of its representative (itself for a representative)
+        and the sequence's length less its edit distance to it.
+    """
+    order = sorted(range(len(seqs)), key=lambda i: -len(seqs[i]))
+    ordered = [seqs[i] for i in order]
+    index = _WordIndex(word_length)
+
+    # assignment by sorted position
+    assigned: list[tuple[int, int]] = [(-1, 0)] * len(ordered)
+
+    pool = None
+    if workers > 1 and len(ordered) > _BATCH:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ordered,))
+
+    try:
+        for start in range(0, len(ordered), _BATCH):
+            batch = range(start, min(start + _BATCH, len(ordered)))
+
+            # 1. candidates among the representatives found before this batch
+            words = [index.words(ordered[query]) for query in batch]
+            needs = [(_shared_words_needed(len(query_words), len(ordered[query]), identity, word_length),
+                      math.ceil(identity * len(ordered[query]) - 1e-9)) for (query, query_words) in zip(batch, words)]
+            tasks = [(query, index.candidates(query_words, shared), need)
+                     for (query, query_words, (shared, need)) in zip(batch, words, needs)]
+
+            # 2. verify them, in parallel when there is a pool
+            if pool is None:
+                matches = [_first_match(ordered, query, candidates, need) for (query, candidates, need) in tasks]
+            else:
+                size = max(1, math.ceil(len(tasks) / (workers * _TASKS_PER_WORKER)))
+                chunks = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+                matches = [match for chunk in pool.map(_verify, chunks) for match in chunk]
+
+            # 3. in order, check the unmatched against this batch's new representatives
+            for (query, query_words, (shared, need), match) in zip(batch, words, needs, matches):
+                if match[0] < 0:
+                    match = _first_match(ordered, query, index.candidates(query_words, shared, since=start), need)
+                if match[0] < 0:
+                    index.add(query, query_words)
+                    match = (query, len(ordered[query]))
+                assigned[query] = match
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # back to input positions
+    result: list[tuple[int, int]] = [(-1, 0)] * len(seqs)
+    for (position, (rep, common)) in enumerate(assigned):
+        result[order[position]] = (order[rep], common)
+    return result
+
+
+def check_cluster_options(identity: float, word_length: Optional[int], workers: int) -> None:
+    """Validate the options of :func:`protfasta.cluster`.
+
+    Raises
+    ------
+    ProtfastaException
+        If any option is invalid.
+    """
+    if type(identity) not in (int, float) or not MIN_IDENTITY <= identity <= 1:
+        raise ProtfastaException("keyword 'identity' must be a number between %s and 1" % (MIN_IDENTITY))
+
+    if word_length is not None and (type(word_length) != int or not 2 <= word_length <= 5):
+        raise ProtfastaException("keyword 'word_length' must be None or an integer between 2 and 5")
+
+    if type(workers) != int or workers < 1:
+        raise ProtfastaException("keyword 'workers' must be a positive integer")
@@ -0,0 +1,414 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module implements sharded, multi-process parsing of a single large
+uncompressed FASTA file for ``read_fasta(..., workers=N)``.  The file is
+split into byte ranges at record boundaries, and each range is parsed and
+checked for invalid residues in its own process.  Everything that needs a
+global view of the file -- header uniqueness and duplicate records and
+sequences -- is left to the parent, which runs the usual pipeline stages
+over the merged, in-order records.
+
+The workers can also digest their records for those duplicate stages,
+partitioned by digest prefix; the partitions are then scanned for
+repeats in the same pool, each by the worker owning that slice of the
+digest space.  Only digests and positions cross processes for this,
+never the records themselves.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import itertools
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Union
+
+from . import io as _io
+from . import utilities as _utilities
+
+
+####################################################################################################
+#
+#
+def shard_offsets(buf, n_shards: int) -> list[tuple[int, int]]:
+    """Split *buf* into up to *n_shards* byte ranges at record boundaries.
+
+    The buffer is cut into equal-sized ranges and every cut point is moved
+    forward to the next ``'>'`` that starts a line, so no record is split
+    between shards.  Ranges that end up empty (for example when one record
+    spans several cut points) are dropped.
+
+    Parameters
+    ----------
+    buf : mmap.mmap or bytes-like
+        The whole file.
+
+    n_shards : int
+        Number of ranges to aim for.
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        ``(start, end)`` byte ranges that together cover *buf* in order.
+    """
+    size = len(buf)
+    cuts = [0]
+    for k in range(1, n_shards):
+        pos = max(k * size // n_shards, cuts[-1] + 1)
+        if pos >= size:
+            break
+
+        # start the search one byte early so a '>' sitting exactly on the
+        # cut point (with its newline just before it) is found
+        found = buf.find(b'\n>', pos - 1)
+        if found == -1:
+            break
+
+        cut = found + 1
+        if cut > cuts[-1]:
+            cuts.append(cut)
+    cuts.append(size)
+
+    return [(start, end) for start, end in zip(cuts, cuts[1:]) if start < end]
+
+
+####################################################################################################
+#
+#
+def _parse_shard(
+    filename: str,
+    start: int,
+    end: int,
+    encoding: str,
+    invalid_sequence_action: str,
+    alignment: bool,
+    correction_dictionary: Optional[dict[str, str]],
+    digest_kinds: tuple[bool, ...] = (),
+    digest_function: Optional[Callable[[str], bytes]] = None,
+    n_parts: int = 1,
+) -> tuple[list[tuple[str, str]], dict[int, tuple[Optional[str], Union[str, int]]], list[list[tuple[bytes, bytes]]]]:
+    """Parse one shard, pre-compute its invalid-residue handling and digest it (worker-side).
+
+    Parameters
+    ----------
+    filename : str
+        Path to the (uncompressed) FASTA file.
+
+    start, end : int
+        Byte range of the shard, as returned by :func:`shard_offsets`.
+
+    encoding : str
+        Codec used to decode headers and non-ASCII sequences.
+
+    invalid_sequence_action : str
+        As in :func:`protfasta.read_fasta`.
+
+    alignment : bool
+        If ``True``, dashes are treated as valid gap characters.
+
+    correction_dictionary : dict or None
+        Custom conversion table for the ``'convert'`` actions.
+
+    digest_kinds : tuple[bool, ...], optional
+        The duplicate checks to digest the records for, each given by
+        its *by_record* flag (see :func:`_digest_chunk`).  Default none.
+
+    digest_function : callable or None, optional
+        Sequence digest used for *digest_kinds*.
+
+    n_parts : int, optional
+        Number of partitions of the digest space.  Default 1.
+
+    Returns
+    -------
+    tuple
+        ``(records, outcomes, digests)``.  *records* are the raw ``(header,
+        sequence)`` pairs of the shard, in order.  *outcomes* maps the
+        index (within the shard) of every record that
+        invalid-residue handling would change to ``(new_seq, info)``:
+        *new_seq* is the converted sequence, or ``None`` if conversion
+        left it unchanged (or was not requested), and *info* is the
+        first invalid residue left in the sequence, or ``0`` if there is
+        none.  Records absent from *outcomes* are valid and unchanged.
+        *digests* holds, for each of *digest_kinds*, the records'
+        digests split into *n_parts* partitions by :func:`_digest_chunk`,
+        with positions counted from the start of the shard.
+    """
+    convert = invalid_sequence_action in ('convert', 'convert-ignore', 'convert-remove')
+    check = invalid_sequence_action != 'convert-ignore'
+
+    mapping = _io._map_fasta(filename)
+    try:
+        records = list(_io._iter_fasta_mmap(mapping, encoding, start=start, end=end))
+    finally:
+        mapping.close()
+
+    # digests of the raw records: duplicates are handled before invalid residues
+    digests = [_digest_chunk(records, n_parts, by_record, digest_function) for by_record in digest_kinds]
+
+    outcomes = {}
+    if invalid_sequence_action == 'ignore':
+        return (records, outcomes, digests)
+
+    for idx, (_header, seq) in enumerate(records):
+        new_seq = None
+        if convert:
+            converted = _utilities.convert_to_valid(seq, correction_dictionary, alignment)
+            if converted != seq:
+                new_seq = seq = converted
+
+        info = _utilities.check_sequence_is_valid(seq, alignment)[1] if check else 0
+        if new_seq is not None or info:
+            outcomes[idx] = (new_seq, info)
+
+    return (records, outcomes, digests)
+
+
+####################################################################################################
+#
+#
+def parse_sharded(
+    filename: str,
+    workers: int,
+    expect_unique_header: bool = True,
+    header_parser: Optional[Callable[[str], str]] = None,
+    invalid_sequence_action: str = 'fail',
+    alignment: bool = False,
+    correction_dictionary: Optional[dict[str, str]] = None,
+    verbose: bool = False,
+    find_repeats: tuple[bool, ...] = (),
+    digest_function: Callable[[str], bytes] = _utilities._seq_hash,
+) -> Optional[tuple[list[list[str]],
+                    dict[int, tuple[Optional[str], Union[str, int]]],
+                    dict[bool, list[tuple[int, int]]]]]:
+    """Parse an uncompressed FASTA file in *workers* processes.
+
+    The file is memory-mapped and cut into *workers* shards with
+    :func:`shard_offsets`.  Each shard is parsed (and its invalid-residue
+    handling pre-computed) by :func:`_parse_shard` in a process pool, and
+    the results are merged back in file order.  *header_parser* and the
+    header-uniqueness check run in the parent, so the parser need not be
+    picklable and duplicate headers are caught across shards.
+
+    For each duplicate check in *find_repeats*, the shard workers also
+    digest their records and split the digests into *workers* partitions
+    by prefix; each partition -- a disjoint slice of the digest space,
+    so no repeat spans two -- is then scanned for repeats by one worker
+    of the same pool (:func:`_repeats_in_partition`).  The records stay
+    where they were parsed: only their digests and positions are passed
+    between processes.  The caller must check
+    :func:`digests_agree_across_processes` first.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the FASTA file.
+
+    workers : int
+        Number of worker processes (and shards).
+
+    expect_unique_header : bool, optional
+        If ``True``, raise on the first duplicate header.  Default
+        ``True``.
+
+    header_parser : callable or None, optional
+        Optional ``(str) -> str`` transform applied to every raw header.
+
+    invalid_sequence_action : str, optional
+        As in :func:`protfasta.read_fasta`.  Default ``'fail'``.
+
+    alignment : bool, optional
+        If ``True``, dashes are treated as valid gap characters.
+
+    correction_dictionary : dict or None, optional
+        Custom conversion table for the ``'convert'`` actions.
+
+    verbose : bool, optional
+        If ``True``, print progress information to stdout.
+
+    find_repeats : tuple[bool, ...], optional
+        The duplicate checks to run in the workers: ``True`` for
+        duplicate records (same raw header and sequence, so only valid
+        without a *header_parser*), ``False`` for duplicate sequences.
+        Default none.
+
+    digest_function : callable, optional
+        Sequence digest for *find_repeats* (see
+        :func:`protfasta.utilities._digest_function`).
+
+    Returns
+    -------
+    tuple or None
+        ``(raw, outcomes, repeats)``, where *raw* is the list of ``[header,
+        sequence]`` pairs exactly as :func:`protfasta.io.internal_parse_fasta_file`
+        would return it and *outcomes* maps ``id(entry)`` of every entry
+        in *raw* that invalid-residue handling would change to the
+        ``(new_seq, info)`` pair described in :func:`_parse_shard`.  The
+        duplicate-handling stages pass entries through by reference, so
+        the ids still identify the survivors afterwards (see
+        :func:`protfasta.protfasta._apply_invalid_outcomes`).  *repeats*
+        maps each check in *find_repeats* to ``(position, earlier)`` for
+        every entry of *raw* repeating the one at position *earlier* (its
+        first occurrence), sorted by position -- exactly what a serial
+        first-occurrence scan finds with the same digest.
+
+        ``None`` if the file cannot be sharded (it is compressed or
+        empty); the caller should fall back to the serial parser.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file cannot be opened or a duplicate header is found.
+    """
+    mapping = _io._map_fasta(filename)
+    if mapping is None:
+        return None
+    try:
+        shards = shard_offsets(mapping, workers)
+    finally:
+        mapping.close()
+
+    if verbose:
+        print('[INFO]: Read in file %s (%i shards)' % (filename, len(shards)))
+
+    encoding = _io._text_encoding()
+    n_parts = min(workers, len(shards))
+    with ProcessPoolExecutor(max_workers=n_parts) as pool:
+        futures = [pool.submit(_parse_shard, filename, start, end, encoding,
+                               invalid_sequence_action, alignment, correction_dictionary,
+                               find_repeats, digest_function, n_parts)
+                   for start, end in shards]
+        results = [future.result() for future in futures]
+
+        # every partition gathers its pieces from all shards, in file order
+        offsets = list(itertools.accumulate((len(records) for (records, _outcomes, _digests) in results), initial=0))
+        repeats = {}
+        for (kind, by_record) in enumerate(find_repeats):
+            partitions = [[digests[kind][part] + (offset,) for ((_records, _outcomes, digests), offset)
+                           in zip(results, offsets)] for part in range(n_parts)]
+            found = pool.map(_repeats_in_partition, partitions)
+            repeats[by_record] = sorted(repeat for part_repeats in found for repeat in part_repeats)
+
+    def merged():
+        for records, _outcomes, _digests in results:
+            if header_parser:
+                for header, seq in records:
+                    yield (header_parser(header), seq)
+            else:
+                yield from records
+
+    raw = _io._collect_records(merged(), expect_unique_header=expect_unique_header, verbose=verbose)
+
+    outcomes = {}
+    offset = 0
+    for records, shard_outcomes, _digests in results:
+        for idx, outcome in shard_outcomes.items():
+            outcomes[id(raw[offset + idx])] = outcome
+        offset += len(records)
+
+    return (raw, outcomes, repeats)
+
+
+
+####################################################################################################
+#
+#
+def _digest_chunk(
+    records: list[tuple[str, str]],
+    n_parts: int,
+    by_record: bool,
+    digest_function: Callable[[str], bytes],
+) -> list[tuple[bytes, bytes]]:
+    """Digest *records* and split them by digest prefix (worker-side).
+
+    Parameters
+    ----------
+    records : list[tuple[str, str]]
+        The ``(header, sequence)`` records of a shard.
+
+    n_parts : int
+        Number of partitions of the digest space.
+
+    by_record : bool
+        If ``True``, digest header and sequence together (duplicate
+        records); otherwise the sequence alone (duplicate sequences).
+
+    digest_function : callable
+        Sequence digest (see :func:`protfasta.utilities._digest_function`).
+
+    Returns
+    -------
+    list[tuple[bytes, bytes]]
+        For every partition, the concatenated digests of its records and
+        their positions in *records* (an ``array('q')`` as bytes), in
+        order.
+    """
+    digests = [[] for _ in range(n_parts)]
+    positions = [array('q') for _ in range(n_parts)]
+    for (position, record) in enumerate(records):
+        digest = digest_function('%s\n%s' % (record[0], record[1]) if by_record else record[1])
+        part = (digest[0] << 8 | digest[1]) % n_parts
+        digests[part].append(digest)
+        positions[part].append(position)
+    return [(b''.join(part_digests), part_positions.tobytes())
+            for (part_digests, part_positions) in zip(digests, positions)]
+
+
+def _repeats_in_partition(pieces: list[tuple[bytes, bytes, int]]) -> list[tuple[int, int]]:
+    """Find the repeated digests of one partition (worker-side).
+
+    *pieces* are the partition's ``(digests, positions, offset)`` from
+    every shard, in file order (see :func:`_digest_chunk`); *offset* is
+    the position of the shard's first record in the file.  Returns
+    ``(position, earlier)`` for every record whose digest occurred
+    before, at *earlier*.
+    """
+    seen: dict[bytes, int] = {}
+    repeats = []
+    for (digests, raw_positions, offset) in pieces:
+        positions = array('q')
+        positions.frombytes(raw_positions)
+        if not positions:
+            continue
+
+        width = len(digests) // len(positions)
+        for (i, position) in enumerate(positions):
+            position += offset
+            earlier = seen.setdefault(digests[i * width:(i + 1) * width], position)
+            if earlier != position:
+                repeats.append((position, earlier))
+    return repeats
+
+
+def digests_agree_across_processes(digest_function: Callable[[str], bytes]) -> bool:
+    """Return ``True`` if worker processes compute the same digests for the same sequence.
+
+    Only ``'builtin-64'`` (Python's salted ``hash``) can differ: processes
+    started with ``'spawn'`` or ``'forkserver'`` each draw their own salt
+    unless ``PYTHONHASHSEED`` is set, while forked workers share it.  The
+    pool uses the platform's default start method (see
+    :func:`parse_sharded`), so that is the one checked.
+    """
+    if digest_function is not _utilities._seq_hash_builtin_64:
+        return True
+    return _start_method() == 'fork' or bool(os.environ.get('PYTHONHASHSEED'))
+
+
+def _start_method() -> str:
+    """Return the start method a default process pool will use, without fixing it."""
+    # the first of get_all_start_methods() is the platform default
+    return multiprocessing.get_start_method(allow_none=True) or multiprocessing.get_all_start_methods()[0]
@@ -0,0 +1,229 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module contains the asyncio plumbing behind
+:func:`protfasta.read_fasta_async` and
+:func:`protfasta.read_fasta_stream_async`: blocking file I/O and parsing
+run in an executor thread, and records are handed to the event loop in
+chunks through a bounded queue, so a slow consumer applies backpressure
+instead of letting the reader run ahead without limit.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterator, Optional
+
+
+# Default number of record chunks the reader may run ahead of the consumer,
+# and records per chunk. Chunking keeps the per-record cost of crossing from
+# the reader thread to the event loop negligible.
+DEFAULT_READ_AHEAD = 8
+DEFAULT_CHUNK_SIZE = 1024
+
+# How often (seconds) a reader waiting for queue space checks whether the
+# stream has been closed or discarded.
+_POLL_INTERVAL = 0.1
+
+# Queue item marking the end of the records.
+_DONE = object()
+
+
+class _Failure:
+    """Queue item carrying an exception raised in the reader thread."""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+####################################################################################################
+#
+#
+def _put(queue: asyncio.Queue, loop, stop: threading.Event, item) -> bool:
+    """Hand *item* to the event loop, waiting for queue space (reader thread).
+
+    Returns ``False``, without queueing *item*, once *stop* is set (or the
+    event loop has gone away).
+    """
+    while not stop.is_set():
+        try:
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        except RuntimeError:
+            return False
+
+        try:
+            future.result(timeout=_POLL_INTERVAL)
+            return True
+        except concurrent.futures.TimeoutError:
+            # if the put completed in the meantime it cannot be cancelled
+            if not future.cancel():
+                return True
+        except concurrent.futures.CancelledError:
+            return False
+    return False
+
+
+def _produce(factory, queue: asyncio.Queue, loop, stop: threading.Event, chunk_size: int) -> None:
+    """Run the blocking iterator and queue its records in chunks (reader thread).
+
+    Deliberately holds no reference to the :class:`AsyncRecordStream`, so
+    a stream that is dropped mid-iteration can be garbage collected, which
+    sets *stop* and ends this reader.
+    """
+    chunk = []
+    try:
+        records = factory()
+        try:
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    if not _put(queue, loop, stop, chunk):
+                        return
+                    chunk = []
+            if chunk and not _put(queue, loop, stop, chunk):
+                return
+        finally:
+            close = getattr(records, 'close', None)
+            if close is not None:
+                close()
+    except BaseException as e:
+        # the records read before the error come first, whatever chunk_size is
+        if not chunk or _put(queue, loop, stop, chunk):
+            _put(queue, loop, stop, _Failure(e))
+        return
+
+    _put(queue, loop, stop, _DONE)
+
+
+####################################################################################################
+#
+#
+class AsyncRecordStream:
+    """Async iterator over records produced by a blocking iterator.
+
+    Returned by :func:`protfasta.read_fasta_stream_async`.  The blocking
+    iterator is created and consumed in an executor thread once iteration
+    starts; records reach the event loop in chunks of *chunk_size*
+    through a queue holding at most *read_ahead* chunks.  When the
+    queue is full the reader thread waits, so memory stays bounded
+    however slow the consumer is.
+
+    Leaving an ``async for`` loop early only stops the reader once the
+    stream is garbage collected; use it as an async context manager (or
+    call :meth:`aclose`) to stop the reader and close the file promptly::
+
+        async with protfasta.read_fasta_stream_async('huge.fasta') as records:
+            async for header, seq in records:
+                ...
+
+    Parameters
+    ----------
+    factory : callable
+        Zero-argument callable returning the blocking iterator.  It is
+        called in the executor thread.
+
+    read_ahead : int, optional
+        Maximum number of chunks buffered ahead of the consumer.
+
+    chunk_size : int, optional
+        Number of records handed over per chunk.
+
+    executor : concurrent.futures.Executor or None, optional
+        Executor that runs the reader.  ``None`` uses the event loop's
+        default executor.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Iterator[Any]],
+        read_ahead: int = DEFAULT_READ_AHEAD,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        executor: Optional[Executor] = None,
+    ):
+        self._factory = factory
+        self._read_ahead = read_ahead
+        self._chunk_size = chunk_size
+        self._executor = executor
+
+        self._queue = None
+        self._reader = None
+        self._stop = threading.Event()
+        self._chunk: Iterator[Any] = iter(())
+        self._finished = False
+
+    # ..............................................................................
+    #
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self._read_ahead)
+        self._reader = loop.run_in_executor(self._executor, _produce, self._factory, self._queue,
+                                            loop, self._stop, self._chunk_size)
+
+    def __del__(self):
+        # a stream abandoned mid-iteration releases its reader thread
+        self._stop.set()
+
+    # ..............................................................................
+    #
+    def __aiter__(self) -> 'AsyncRecordStream':
+        return self
+
+    async def __anext__(self):
+        for record in self._chunk:
+            return record
+
+        if self._finished:
+            raise StopAsyncIteration
+
+        if self._queue is None:
+            self._start()
+
+        item = await self._queue.get()
+        if item is _DONE:
+            self._finished = True
+            await self._reader
+            raise StopAsyncIteration
+
+        if isinstance(item, _Failure):
+            self._finished = True
+            await self._reader
+            raise item.exc
+
+        self._chunk = iter(item)
+        return next(self._chunk)
+
+    async def aclose(self) -> None:
+        """Stop the reader thread and wait for it to close the file."""
+        self._finished = True
+        self._chunk = iter(())
+        if self._reader is None:
+            return
+
+        self._stop.set()
+
+        # free the queue so a reader waiting for space wakes up promptly
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+        await self._reader
+
+    async def __aenter__(self) -> 'AsyncRecordStream':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
@@ -0,0 +1,464 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module implements the opt-in on-disk cache used by
+``read_fasta(..., cache=...)``.  The sanitized records of a read are
+stored in a compact binary file -- the packed buffers of a
+:class:`~protfasta.store.SequenceStore` -- keyed on the identity of the
+FASTA file (path, size, modification time and a content fingerprint) and
+on every option that affects which records come back.  A later call with
+the same file and options reads the buffers straight back instead of
+parsing and sanitizing the file again.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import struct
+import types
+from typing import Callable, Optional
+
+from .protfasta_exceptions import ProtfastaException
+from .store import SequenceStore
+
+
+# Bumped whenever the entry layout, or the meaning of a key, changes.
+_FORMAT_VERSION = 2
+
+# Entry header: magic, metadata length, record count, header and sequence
+# buffer lengths.
+_MAGIC = b'PFCACHE%i' % (_FORMAT_VERSION)
+_ENTRY_HEADER = struct.Struct('<8sQQQQ')
+_SUFFIX = '.pfc'
+
+# Default size cap for a cache directory.
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+# Bytes hashed from each end of a FASTA file for its content fingerprint.
+_FINGERPRINT_BYTES = 1024 * 1024
+
+# Values whose repr shows all of their state, so a header_parser may read
+# them (as defaults, closure variables or globals) and still be keyed.
+_PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+####################################################################################################
+#
+#
+def default_cache_dir() -> str:
+    """Return the default cache directory.
+
+    ``$PROTFASTA_CACHE_DIR`` if set, otherwise ``protfasta`` under
+    ``$XDG_CACHE_HOME`` (default ``~/.cache``).
+    """
+    path = os.environ.get('PROTFASTA_CACHE_DIR')
+    if path:
+        return path
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'protfasta')
+
+
+####################################################################################################
+#
+#
+def _fingerprint(filename: str, size: int) -> str:
+    """Hash the first and last :data:`_FINGERPRINT_BYTES` of *filename*.
+
+    A sampled fingerprint keeps the key cheap to compute for very large
+    files; together with the size and modification time it catches a
+    file that was replaced or rewritten.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as fh:
+        digest.update(fh.read(_FINGERPRINT_BYTES))
+        if size > 2 * _FINGERPRINT_BYTES:
+            fh.seek(size - _FINGERPRINT_BYTES)
+        digest.update(fh.read(_FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+
+class _Unkeyable(Exception):
+    """Raised while keying a callable whose result cannot be pinned down by a key."""
+
+
+def _callable_key(func: Optional[Callable]) -> Optional[str]:
+    """Return a string that identifies what *func* computes, or ``None`` if nothing can.
+
+    Plain functions and lambdas are identified by their compiled code plus
+    the values of their defaults, closure variables and the globals they
+    read, so the same ``header_parser`` gives the same key in a new
+    interpreter and a changed global gives a new one.  Those values may
+    be plain data (numbers, strings, and tuples, lists, sets and dicts
+    of them), compiled regular expressions, modules, builtins or other
+    such functions.
+
+    Anything else cannot be keyed reliably and gives ``None``: a bound
+    method (its result depends on the state of its instance), a
+    ``functools.partial`` or other callable object, or a function
+    reading a global of any other type.
+    """
+    if func is None:
+        return None
+
+    try:
+        key = repr(_function_key(func, set()))
+    except _Unkeyable:
+        return None
+    digest = hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=16)
+    return digest.hexdigest()
+
+
+def _function_key(func, seen: set[int]) -> tuple:
+    """Key a plain function: its code, defaults, closure values and the globals it reads."""
+    if not isinstance(func, types.FunctionType):
+        raise _Unkeyable(func)
+
+    # a function that (indirectly) calls itself is keyed once
+    if id(func) in seen:
+        return ('function', func.__qualname__)
+    seen.add(id(func))
+
+    try:
+        closure = tuple(_value_key(cell.cell_contents, seen) for cell in (func.__closure__ or ()))
+    except ValueError:
+        # an empty cell: a variable the function reads before it is bound
+        raise _Unkeyable(func)
+
+    # co_names also holds attribute names, so this may key a global that
+    # is never read -- which only ever makes the key stricter
+    namespace = func.__globals__
+    read = sorted(name for name in _code_names(func.__code__) if name in namespace)
+    globals_read = tuple((name, _value_key(namespace[name], seen)) for name in read)
+
+    defaults = (_value_key(func.__defaults__, seen), _value_key(func.__kwdefaults__, seen))
+    return (_code_key(func.__code__), defaults, closure, globals_read)
+
+
+def _value_key(value, seen: set[int]):
+    """Key a value read by a keyed function; raise :class:`_Unkeyable` if its state is not all visible."""
+    if isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, (tuple, list)):
+        return (type(value).__name__,) + tuple(_value_key(v, seen) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return (type(value).__name__,) + tuple(sorted((_value_key(v, seen) for v in value), key=repr))
+    if isinstance(value, dict):
+        items = ((_value_key(k, seen), _value_key(v, seen)) for (k, v) in value.items())
+        return ('dict',) + tuple(sorted(items, key=repr))
+    if isinstance(value, re.Pattern):
+        return ('pattern', value.pattern, value.flags)
+    if isinstance(value, types.ModuleType):
+        return ('module', value.__name__)
+    if isinstance(value, types.BuiltinFunctionType) and (value.__self__ is None
+                                                         or isinstance(value.__self__, types.ModuleType)):
+        return ('builtin', value.__module__, value.__qualname__)
+    if isinstance(value, types.FunctionType):
+        return _function_key(value, seen)
+    raise _Unkeyable(value)
+
+
+def _code_names(code) -> set[str]:
+    """The global (and attribute) names *code* and the code nested in it refer to."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            names |= _code_names(const)
+    return names
+
+
+def _code_key(code) -> tuple:
+    """The parts of a code object that define its behaviour (not where it was written)."""
+    consts = tuple(_code_key(c) if hasattr(c, 'co_code') else c for c in code.co_consts)
+    return (code.co_code, consts, code.co_names, code.co_varnames, code.co_freevars)
+
+
+####################################################################################################
+#
+#
+def resolve(cache) -> Optional['FastaCache']:
+    """Turn the ``cache`` keyword of :func:`protfasta.read_fasta` into a cache.
+
+    ``False`` gives ``None``, ``True`` a cache in :func:`default_cache_dir`,
+    a path a cache in that directory, and a :class:`FastaCache` itself.
+    """
+    if cache is False:
+        return None
+    if cache is True:
+        return FastaCache()
+    if isinstance(cache, FastaCache):
+        return cache
+    return FastaCache(cache)
+
+
+####################################################################################################
+#
+#
+class FastaCache:
+    """Directory of cached, sanitized :func:`protfasta.read_fasta` results.
+
+    Passed (or created implicitly) through ``read_fasta(..., cache=...)``::
+
+        cache = protfasta.FastaCache('/scratch/fasta-cache', max_bytes=50 * 1024**3)
+        seqs = protfasta.read_fasta('uniref90.fasta', cache=cache)
+
+    Each entry holds the records of one read in the packed layout of a
+    :class:`~protfasta.store.SequenceStore`, so a hit costs a handful of
+    large reads.  Entries are keyed on the file's absolute path, size,
+    modification time and a fingerprint of its first and last MiB, plus
+    every option that changes the records returned, so a modified file or
+    different options never load a stale entry.  When the directory
+    grows past *max_bytes*, the least recently used entries are removed.
+
+    Parameters
+    ----------
+    directory : str, os.PathLike or None, optional
+        Cache directory, created if needed.  Default
+        :func:`default_cache_dir`.
+
+    max_bytes : int, optional
+        Size cap for the directory.  Default :data:`DEFAULT_MAX_BYTES`
+        (20 GiB).
+
+    Raises
+    ------
+    ProtfastaException
+        If *max_bytes* is not a positive integer.
+    """
+
+    def __init__(self, directory=None, max_bytes: int = DEFAULT_MAX_BYTES):
+        if type(max_bytes) != int or max_bytes < 1:
+            raise ProtfastaException("keyword 'max_bytes' must be a positive integer")
+
+        self.directory = default_cache_dir() if directory is None else os.fspath(directory)
+        self.max_bytes = max_bytes
+
+    def __repr__(self) -> str:
+        return 'FastaCache(%r, max_bytes=%i)' % (self.directory, self.max_bytes)
+
+    # ..............................................................................
+    #
+    @staticmethod
+    def _file_prefix(filename) -> str:
+        path = os.path.abspath(os.fspath(filename))
+        return hashlib.blake2b(path.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+
+    def key(self, filename, options: dict) -> Optional[str]:
+        """Return the entry name for *filename* read with *options*, or ``None`` if it cannot be keyed.
+
+        Parameters
+        ----------
+        filename : str or os.PathLike
+            The FASTA file.
+
+        options : dict
+            Every option that affects the records returned.  Callables
+            (such as ``header_parser``) are keyed by what they compute.
+
+        Returns
+        -------
+        str or None
+            The entry's file name within the cache directory, or ``None``
+            if a callable in *options* cannot be keyed reliably (see
+            :func:`_callable_key`), in which case the read must bypass
+            the cache.
+        """
+        path = os.path.abspath(os.fspath(filename))
+        try:
+            st = os.stat(path)
+            fingerprint = _fingerprint(path, st.st_size)
+        except OSError as e:
+            raise ProtfastaException('Unable to read file: %s\nException: %s' % (path, e))
+
+        keyed = {name: (_callable_key(value) if callable(value) else value) for name, value in options.items()}
+        if any(callable(value) and keyed[name] is None for (name, value) in options.items()):
+            return None
+        identity = json.dumps([_FORMAT_VERSION, path, st.st_size, st.st_mtime_ns, fingerprint,
+                               sorted(keyed.items())], default=repr, sort_keys=True)
+        digest = hashlib.blake2b(identity.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+        return '%s-%s%s' % (self._file_prefix(path), digest, _SUFFIX)
+
+    def _entries(self) -> list[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.endswith(_SUFFIX) and entry.is_file()]
+        except FileNotFoundError:
+            return []
+
+    # ..............................................................................
+    #
+    def get(self, key: str) -> Optional[SequenceStore]:
+        """Load the entry *key*, or return ``None`` if it is not cached.
+
+        A hit marks the entry as recently used.  An unreadable or corrupt
+        entry is removed and treated as a miss.
+        """
+        path = os.path.join(self.directory, key)
+        try:
+            fh = open(path, 'rb')
+        except OSError:
+            return None
+
+        try:
+            with fh:
+                store = self._read_entry(fh)
+        except (OSError, EOFError, ValueError, struct.error):
+            self._remove(path)
+            return None
+
+        # file modification time doubles as the LRU clock
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return store
+
+    @staticmethod
+    def _read_entry(fh) -> SequenceStore:
+        (magic, meta_len, n_records, headers_len, seqs_len) = _ENTRY_HEADER.unpack(fh.read(_ENTRY_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError('not a protfasta cache entry')
+        fh.seek(meta_len, os.SEEK_CUR)
+
+        # read each buffer straight into the store
+        store = SequenceStore()
+        store._headers = bytearray(headers_len)
+        if fh.readinto(store._headers) != headers_len:
+            raise ValueError('truncated cache entry')
+        store._header_ends.fromfile(fh, n_records)
+
+        store._sequences = bytearray(seqs_len)
+        if fh.readinto(store._sequences) != seqs_len:
+            raise ValueError('truncated cache entry')
+        store._sequence_ends.fromfile(fh, n_records)
+        return store
+
+    def put(self, key: str, records, metadata: Optional[dict] = None) -> bool:
+        """Store *records* as entry *key*, then evict down to the size cap.
+
+        Parameters
+        ----------
+        key : str
+            Entry name, as returned by :meth:`key`.
+
+        records : list[list[str]] or SequenceStore
+            The sanitized records.
+
+        metadata : dict or None, optional
+            JSON-serializable description stored alongside the records
+            (for inspection only).
+
+        Returns
+        -------
+        bool
+            ``True`` if the entry was written; ``False`` if it is larger
+            than *max_bytes* on its own.
+
+        Raises
+        ------
+        ProtfastaException
+            If the cache directory cannot be written.
+        """
+        store = records if isinstance(records, SequenceStore) else SequenceStore(records)
+        meta = json.dumps(metadata or {}, default=repr).encode('utf-8')
+
+        size = (_ENTRY_HEADER.size + len(meta) + len(store._headers) + len(store._sequences)
+                + 16 * len(store))
+        if size > self.max_bytes:
+            return False
+
+        path = os.path.join(self.directory, key)
+        tmp_path = '%s.%i.tmp' % (path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as fh:
+                fh.write(_ENTRY_HEADER.pack(_MAGIC, len(meta), len(store), len(store._headers), len(store._sequences)))
+                fh.write(meta)
+                fh.write(store._headers)
+                store._header_ends.tofile(fh)
+                fh.write(store._sequences)
+                store._sequence_ends.tofile(fh)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self._remove(tmp_path)
+            raise ProtfastaException('Unable to write cache entry: %s\nException: %s' % (path, e))
+
+        self._evict(keep=key)
+        return True
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used entries until the directory fits *max_bytes*."""
+        entries = []
+        for entry in self._entries():
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, entry.name == keep, st.st_size, entry.path))
+
+        total = sum(size for (_mtime, _keep, size, _path) in entries)
+        for (_mtime, is_kept, size, path) in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if not is_kept:
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # ..............................................................................
+    #
+    def clear(self, filename=None) -> int:
+        """Invalidate cached entries.
+
+        Parameters
+        ----------
+        filename : str, os.PathLike or None, optional
+            If given, remove only the entries for this FASTA file (for
+            any options).  Default: remove every entry.
+
+        Returns
+        -------
+        int
+            The number of entries removed.
+        """
+        prefix = None if filename is None else self._file_prefix(filename) + '-'
+        removed = 0
+        for entry in self._entries():
+            if prefix is None or entry.name.startswith(prefix):
+                self._remove(entry.path)
+                removed += 1
+        return removed
+
+    @property
+    def size(self) -> int:
+        """Total size in bytes of the entries in the cache directory."""
+        total = 0
+        for entry in self._entries():
+            try:
+                total += entry.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def __len__(self) -> int:
+        return len(self._entries())
@@ -0,0 +1,700 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module holds the duplicate-detection machinery that does not fit in
+a plain in-memory dictionary.  :func:`spill_duplicates` finds repeated
+sequence digests with an external merge sort -- sorted runs spilled to
+disk under a memory budget, then merged -- so duplicate detection in
+:func:`protfasta.read_fasta_stream` scales to files whose digests alone
+would not fit in RAM.  :func:`bloom_candidates` runs every digest through
+a :class:`BloomFilter` and keeps only the few it flags, so the exact
+lookup table holds the candidates rather than every sequence.
+:func:`near_duplicates` goes beyond exact matches: k-mer MinHash
+signatures and locality-sensitive hashing (LSH) find sequences whose
+k-mer sets are nearly identical in roughly linear time.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import collections
+import functools
+import heapq
+import itertools
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from .protfasta_exceptions import ProtfastaException
+
+
+# Approximate resident cost (bytes) of one key held in a sort buffer: the
+# bytes object (~33 bytes of header plus the key) and its list slot.
+_KEY_OVERHEAD = 48
+
+# Maximum number of runs merged at once; more runs are merged in passes.
+_MERGE_FAN_IN = 64
+
+# Width of the record ordinal appended to every key (big-endian, so byte
+# order matches numerical order).
+_ORDINAL_BYTES = 8
+
+# Bloom filter block: one 64-byte cache line (512 bits) holds every bit of
+# an item, so a membership test touches a single line.
+_BLOCK_BYTES = 64
+_BLOCK_BITS = _BLOCK_BYTES * 8
+
+# Largest number of bits set per item.
+_MAX_HASHES = 16
+
+# Extra bits over the classic sizing formula, to make up for the uneven
+# load of a blocked filter.
+_BLOCKED_OVERHEAD = 1.5
+
+# Each new stage of a growing filter holds this many times the items of the
+# previous one, at this fraction of its false-positive rate.
+_STAGE_GROWTH = 2
+_STAGE_TIGHTENING = 0.5
+
+# Assumed bytes per FASTA record when sizing a filter from the file size.
+_BYTES_PER_RECORD = 256
+
+# MinHash k-mers are packed one byte per residue into a 64-bit integer.
+_MAX_KMER = 8
+
+# Shingles hashed at once, as one (num_perm x block) array, when computing
+# signatures.
+_SIGNATURE_BLOCK = 16384
+
+# Records per signature task, and tasks in flight per worker process.
+_SIGNATURE_CHUNK = 2048
+_CHUNKS_PER_WORKER = 2
+
+# Relative cost of a missed near-duplicate against a needless candidate
+# check when choosing the LSH banding.
+_FALSE_NEGATIVE_WEIGHT = 0.9
+
+
+####################################################################################################
+#
+#
+class ExternalSorter:
+    """Sort fixed-width byte keys under a memory budget, spilling to disk.
+
+    Keys are buffered until the budget is reached, then sorted and written
+    to a run file; :meth:`sorted` merges the runs (in several passes when
+    there are more than :data:`_MERGE_FAN_IN`) and yields every key in
+    ascending byte order.  Nothing touches the disk if all keys fit in
+    the budget.  Use it as a context manager so the run files are removed.
+
+    Parameters
+    ----------
+    memory_limit : int
+        Approximate budget in bytes for buffered keys and merge buffers.
+
+    directory : str, os.PathLike or None, optional
+        Where run files are written.  ``None`` uses the system temporary
+        directory.
+    """
+
+    def __init__(self, memory_limit: int, directory=None):
+        self._memory_limit = memory_limit
+        self._directory = directory
+        self._buffer: list[bytes] = []
+        self._buffer_bytes = 0
+        self._width = None
+        self._runs: list[str] = []
+        self._n_runs = 0
+        self._tmpdir: Optional[str] = None
+
+    # ..............................................................................
+    #
+    def add(self, key: bytes) -> None:
+        """Add one key.  Every key must have the same length."""
+        if self._width is None:
+            self._width = len(key)
+        self._buffer.append(key)
+        self._buffer_bytes += len(key) + _KEY_OVERHEAD
+        if self._buffer_bytes >= self._memory_limit:
+            self._spill()
+
+    def _new_run(self) -> str:
+        if self._tmpdir is None:
+            try:
+                self._tmpdir = tempfile.mkdtemp(prefix='protfasta-dedup-', dir=self._directory)
+            except OSError as e:
+                raise ProtfastaException('Unable to create spill directory in %s\nException: %s'
+                                         % (self._directory or tempfile.gettempdir(), e))
+        self._n_runs += 1
+        return os.path.join(self._tmpdir, 'run-%i' % (self._n_runs))
+
+    def _write_run(self, keys: Iterable[bytes]) -> str:
+        path = self._new_run()
+        try:
+            with open(path, 'wb', buffering=self._read_size()) as fh:
+                for key in keys:
+                    fh.write(key)
+        except OSError as e:
+            raise ProtfastaException('Unable to write spill file: %s\nException: %s' % (path, e))
+        return path
+
+    def _spill(self) -> None:
+        self._buffer.sort()
+        self._runs.append(self._write_run(self._buffer))
+        self._buffer = []
+        self._buffer_bytes = 0
+
+    def _read_size(self) -> int:
+        """Bytes read per run at a time, so a full merge stays within budget."""
+        width = self._width or 1
+        return max(width, (self._memory_limit // (_MERGE_FAN_IN + 1)) // width * width)
+
+    def _read_run(self, path: str) -> Iterator[bytes]:
+        width = self._width
+        size = self._read_size()
+        with open(path, 'rb') as fh:
+            while True:
+                chunk = fh.read(size)
+                if not chunk:
+                    return
+                for start in range(0, len(chunk), width):
+                    yield chunk[start:start + width]
+
+    # ..............................................................................
+    #
+    def sorted(self) -> Iterator[bytes]:
+        """Yield every key added so far, in ascending order."""
+        if not self._runs:
+            self._buffer.sort()
+            yield from self._buffer
+            return
+
+        if self._buffer:
+            self._spill()
+
+        # merge in passes until one final merge can read every run at once
+        runs = self._runs
+        while len(runs) > _MERGE_FAN_IN:
+            merged = []
+            for start in range(0, len(runs), _MERGE_FAN_IN):
+                group = runs[start:start + _MERGE_FAN_IN]
+                merged.append(self._write_run(heapq.merge(*[self._read_run(path) for path in group])))
+                for path in group:
+                    os.remove(path)
+            runs = merged
+            self._runs = runs
+
+        yield from heapq.merge(*[self._read_run(path) for path in runs])
+
+    def close(self) -> None:
+        """Remove the run files."""
+        self._buffer = []
+        self._runs = []
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def __enter__(self) -> 'ExternalSorter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+####################################################################################################
+#
+#
+def spill_duplicates(
+    entries: Iterable[tuple[int, bytes]],
+    memory_limit: int,
+    directory=None,
+) -> Iterator[tuple[int, int]]:
+    """Find repeated digests with bounded memory.
+
+    Every ``(ordinal, digest)`` pair is sorted externally by digest, so
+    equal digests become adjacent; each occurrence after the one with the
+    smallest ordinal is a duplicate.  The duplicates are then sorted
+    externally by ordinal, so they come back in file order -- the order in
+    which an in-memory ``seen`` set would have flagged them.
+
+    Parameters
+    ----------
+    entries : iterable of (int, bytes)
+        Record ordinals (non-negative, unique) and their fixed-width
+        sequence digests.
+
+    memory_limit : int
+        Approximate memory budget in bytes for each sort.
+
+    directory : str, os.PathLike or None, optional
+        Where spill files are written.  ``None`` uses the system
+        temporary directory.  Each record costs ``len(digest) + 8`` bytes
+        of disk, plus 16 bytes per duplicate.
+
+    Yields
+    ------
+    tuple[int, int]
+        ``(duplicate_ordinal, first_ordinal)`` in ascending
+        *duplicate_ordinal* order, where *first_ordinal* is the earliest
+        record with the same digest.
+    """
+    with ExternalSorter(memory_limit, directory) as by_digest, ExternalSorter(memory_limit, directory) as by_ordinal:
+        for (ordinal, digest) in entries:
+            by_digest.add(digest + ordinal.to_bytes(_ORDINAL_BYTES, 'big'))
+
+        previous = None
+        first = b''
+        for key in by_digest.sorted():
+            digest = key[:-_ORDINAL_BYTES]
+            if digest == previous:
+                by_ordinal.add(key[-_ORDINAL_BYTES:] + first)
+            else:
+                previous = digest
+                first = key[-_ORDINAL_BYTES:]
+        by_digest.close()
+
+        for key in by_ordinal.sorted():
+            yield (int.from_bytes(key[:_ORDINAL_BYTES], 'big'), int.from_bytes(key[_ORDINAL_BYTES:], 'big'))
+
+
+####################################################################################################
+#
+#
+class BloomFilter:
+    """Blocked Bloom filter over fixed-width sequence digests.
+
+    Each digest selects one 64-byte block and sets *k* bits inside it
+    (double hashing on the digest's remaining bits), so adding or testing
+    an item touches a single cache line.  Digests are already uniformly
+    distributed, so no further hashing is done.  Once more than
+    *capacity* items have been added the filter grows, scalable-Bloom
+    style: a new stage with twice the capacity and half the
+    false-positive rate receives new items, which keeps the overall
+    false-positive rate bounded (within a small factor of *fpr*) however
+    many items arrive.  A well-sized *capacity* avoids growing at all.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of items the first stage is sized for.
+
+    fpr : float
+        Target false-positive rate, between 0 and 1 (exclusive).
+    """
+
+    def __init__(self, capacity: int, fpr: float):
+        self._fpr = fpr
+        self._stages: list[tuple[bytearray, int, int]] = []
+        self._count = 0
+        self._add_stage(max(1, capacity), fpr * (1 - _STAGE_TIGHTENING))
+
+    def _add_stage(self, capacity: int, fpr: float) -> None:
+        # standard sizing, plus headroom for the extra collisions of the
+        # blocked layout, rounded up to whole blocks
+        bits = _BLOCKED_OVERHEAD * -capacity * math.log(fpr) / (math.log(2) ** 2)
+        n_blocks = max(1, math.ceil(bits / _BLOCK_BITS))
+        k = min(_MAX_HASHES, max(1, round(-math.log2(fpr))))
+        self._stages.append((bytearray(n_blocks * _BLOCK_BYTES), n_blocks, k))
+        self._capacity = capacity
+        self._limit = self._count + capacity
+
+    @staticmethod
+    def _probe(stage, h: int, insert: bool) -> bool:
+        """Test (and optionally set) the bits of digest value *h*; return whether all were set."""
+        (bits, n_blocks, k) = stage
+        (rest, block) = divmod(h, n_blocks)
+        base = block * _BLOCK_BITS
+        first = rest & (_BLOCK_BITS - 1)
+        step = ((rest >> 9) & (_BLOCK_BITS - 1)) | 1
+
+        present = True
+        for i in range(k):
+            pos = base + ((first + i * step) & (_BLOCK_BITS - 1))
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                if not insert:
+                    return False
+                present = False
+                bits[pos >> 3] |= mask
+        return present
+
+    # ..............................................................................
+    #
+    def __contains__(self, digest: bytes) -> bool:
+        h = int.from_bytes(digest, 'little')
+        probe = self._probe
+        return any(probe(stage, h, False) for stage in self._stages)
+
+    def add(self, digest: bytes) -> bool:
+        """Add *digest*; return ``True`` if it was (possibly) present already."""
+        h = int.from_bytes(digest, 'little')
+        probe = self._probe
+        stages = self._stages
+        for stage in stages[:-1]:
+            if probe(stage, h, False):
+                return True
+        if probe(stages[-1], h, True):
+            return True
+
+        self._count += 1
+        if self._count > self._limit:
+            fpr = self._fpr * (1 - _STAGE_TIGHTENING) * _STAGE_TIGHTENING ** len(stages)
+            self._add_stage(self._capacity * _STAGE_GROWTH, fpr)
+        return False
+
+    def __len__(self) -> int:
+        """Number of distinct items added (approximately; false positives are not counted)."""
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the bit arrays, in bytes."""
+        return sum(len(stage[0]) for stage in self._stages)
+
+
+####################################################################################################
+#
+#
+def estimate_records(filename) -> int:
+    """Rough upper estimate of the number of records in *filename*, from its size."""
+    try:
+        size = os.path.getsize(filename)
+    except OSError:
+        size = 0
+    return max(1024, size // _BYTES_PER_RECORD)
+
+
+def bloom_candidates(
+    entries: Iterable[tuple[int, bytes]],
+    capacity: int,
+    fpr: float,
+) -> set[bytes]:
+    """Return the digests that may occur more than once.
+
+    Every digest is added to a :class:`BloomFilter`; a digest the filter
+    reports as already present is a candidate duplicate.  Every true
+    duplicate is among the candidates (a filter has no false negatives),
+    together with roughly *fpr* of the unique digests, so an exact lookup
+    table restricted to the candidates finds exactly the duplicates an
+    unrestricted one would.
+
+    Parameters
+    ----------
+    entries : iterable of (int, bytes)
+        Record ordinals and sequence digests; the ordinals are ignored.
+
+    capacity : int
+        Expected number of records (see :func:`estimate_records`); the
+        filter grows if it is exceeded.
+
+    fpr : float
+        Target false-positive rate of the filter.
+
+    Returns
+    -------
+    set[bytes]
+        The candidate digests.
+    """
+    bloom = BloomFilter(capacity, fpr)
+    add = bloom.add
+    candidates = set()
+    for (_ordinal, digest) in entries:
+        if add(digest):
+            candidates.add(digest)
+    return candidates
+
+
+####################################################################################################
+#
+#
+def _numpy():
+    """Import and return NumPy, or raise a ProtfastaException explaining how to get it."""
+    try:
+        import numpy
+    except ImportError:
+        raise ProtfastaException('Near-duplicate detection requires numpy (pip install numpy)')
+    return numpy
+
+
+def _minhash_parameters(num_perm: int, seed: int):
+    """Return the ``(a, b)`` arrays of the *num_perm* hash functions drawn from *seed*."""
+    np = _numpy()
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2 ** 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 64, size=num_perm, dtype=np.uint64)
+    return (a, b)
+
+
+def _shingles(seqs: list[str], kmer: int):
+    """Return the 32-bit hashed k-mers of *seqs*, concatenated, and where each sequence's start.
+
+    Each k-mer is packed one byte per residue into a 64-bit integer and
+    mixed (the splitmix64 finalizer) down to 32 bits.  A sequence shorter
+    than *kmer* contributes itself as its only shingle.
+    """
+    np = _numpy()
+    encoded = [seq.encode('utf-8', 'surrogatepass') for seq in seqs]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b''.join(encoded) + bytes(kmer), dtype=np.uint8).astype(np.uint64)
+
+    # packed k-mer starting at every position of the joined buffer
+    n_positions = len(buf) - kmer + 1
+    codes = np.zeros(n_positions, dtype=np.uint64)
+    for j in range(kmer):
+        codes = (codes << np.uint64(8)) | buf[j:j + n_positions]
+
+    counts = np.maximum(lengths - kmer + 1, 1)
+    offsets = np.cumsum(lengths) - lengths
+    starts = np.cumsum(counts) - counts
+    shingles = codes[np.repeat(offsets - starts, counts) + np.arange(int(counts.sum()))]
+
+    # a short sequence's code ran on into the next sequence; keep only its own bytes
+    short = np.flatnonzero(lengths < kmer)
+    if len(short):
+        shift = (8 * (kmer - lengths[short])).astype(np.uint64)
+        shifted = shingles[starts[short]] >> np.minimum(shift, np.uint64(56))
+        shingles[starts[short]] = np.where(lengths[short] > 0, shifted, 0)
+
+    z = shingles
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(32), starts)
+
+
+def minhash_signatures(seqs: list[str], kmer: int, a, b):
+    """Return the MinHash signatures of *seqs* as an ``(n, num_perm)`` ``uint32`` array.
+
+    Hash function *i* maps a 32-bit shingle *x* to the top 32 bits of
+    ``a[i] * x + b[i]`` (modulo 2**64), a universal multiply-shift family;
+    a sequence's signature holds, for every function, the smallest value
+    over its shingles.  The fraction of positions at which two
+    signatures agree estimates the Jaccard similarity of the two k-mer
+    sets.
+
+    Parameters
+    ----------
+    seqs : list[str]
+        The sequences.
+
+    kmer : int
+        K-mer (shingle) length, from 1 to :data:`_MAX_KMER`.
+
+    a, b : numpy.ndarray
+        ``uint64`` parameters of the hash functions (see
+        :func:`_minhash_parameters`).
+    """
+    np = _numpy()
+    (x, starts) = _shingles(seqs, kmer)
+    n = len(seqs)
+    signatures = np.empty((n, len(a)), dtype=np.uint32)
+    a = a[:, None]
+    b = b[:, None]
+    shift = np.uint64(32)
+
+    # whole sequences, about _SIGNATURE_BLOCK shingles at a time, hashed in
+    # place in one reused buffer (several times faster than temporaries)
+    buf = np.empty((len(a), _SIGNATURE_BLOCK), dtype=np.uint64)
+    i = 0
+    while i < n:
+        j = min(n, max(i + 1, int(np.searchsorted(starts, starts[i] + _SIGNATURE_BLOCK, 'right') - 1)))
+        lo = starts[i]
+        hi = starts[j] if j < n else len(x)
+        if hi - lo > buf.shape[1]:
+            buf = np.empty((len(a), hi - lo), dtype=np.uint64)
+        hashed = buf[:, :hi - lo]
+        np.multiply(a, x[lo:hi], out=hashed)
+        hashed += b
+        hashed >>= shift
+        signatures[i:j] = np.minimum.reduceat(hashed, starts[i:j] - lo, axis=1).T
+        i = j
+    return signatures
+
+
+@functools.lru_cache(maxsize=None)
+def lsh_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """Return the ``(bands, rows)`` LSH banding for *num_perm* and *threshold*.
+
+    Two signatures become candidates when all *rows* values of at least
+    one of the *bands* bands agree, which for Jaccard similarity *s*
+    happens with probability ``1 - (1 - s**rows)**bands``.  The banding
+    minimises the weighted area of false positives below *threshold*
+    and of false negatives above it, with misses weighted more heavily
+    (:data:`_FALSE_NEGATIVE_WEIGHT`), since candidates are verified
+    anyway.
+    """
+    grid = [(i + 0.5) / 200 for i in range(200)]
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            fp = sum(1 - (1 - s ** rows) ** bands for s in grid if s < threshold)
+            fn = sum((1 - s ** rows) ** bands for s in grid if s >= threshold)
+            cost = (1 - _FALSE_NEGATIVE_WEIGHT) * fp + _FALSE_NEGATIVE_WEIGHT * fn
+            if best is None or cost < best[0]:
+                best = (cost, bands, rows)
+    return (best[1], best[2])
+
+
+def _signature_batches(records: Iterable, kmer: int, a, b, workers: int):
+    """Yield ``(records, signatures)`` for consecutive chunks of *records*, in order.
+
+    With several *workers* the signatures are computed in a process pool,
+    with at most :data:`_CHUNKS_PER_WORKER` chunks per worker in flight.
+    """
+    chunks = iter(lambda: list(itertools.islice(records, _SIGNATURE_CHUNK)), [])
+    if workers == 1:
+        for chunk in chunks:
+            yield (chunk, minhash_signatures([record[1] for record in chunk], kmer, a, b))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(minhash_signatures, [record[1] for record in chunk], kmer, a, b)))
+            if len(pending) >= _CHUNKS_PER_WORKER * workers:
+                (done, future) = pending.popleft()
+                yield (done, future.result())
+        while pending:
+            (done, future) = pending.popleft()
+            yield (done, future.result())
+
+
+def check_near_duplicate_options(threshold: float, kmer: int, num_perm: int, seed: int, workers: int) -> None:
+    """Validate the options of :func:`near_duplicates`.
+
+    Raises
+    ------
+    ProtfastaException
+        If any option is invalid, or NumPy is not installed.
+    """
+    if type(threshold) not in (int, float) or not 0 < threshold <= 1:
+        raise ProtfastaException("keyword 'threshold' must be a number greater than 0 and at most 1")
+
+    if type(kmer) != int or not 1 <= kmer <= _MAX_KMER:
+        raise ProtfastaException("keyword 'kmer' must be an integer between 1 and %i" % (_MAX_KMER))
+
+    if type(num_perm) != int or num_perm < 1:
+        raise ProtfastaException("keyword 'num_perm' must be a positive integer")
+
+    if type(seed) != int or seed < 0:
+        raise ProtfastaException("keyword 'seed' must be a non-negative integer")
+
+    if type(workers) != int or workers < 1:
+        raise ProtfastaException("keyword 'workers' must be a positive integer")
+
+    _numpy()
+
+
+def near_duplicates(
+    records: Iterable,
+    threshold: float = 0.9,
+    kmer: int = 5,
+    num_perm: int = 128,
+    seed: int = 0,
+    workers: int = 1,
+) -> Iterator[tuple[object, Optional[int]]]:
+    """Flag sequences that nearly duplicate an earlier one, in a single pass.
+
+    Each sequence's k-mer set is summarised by a MinHash signature of
+    *num_perm* values, and signatures are bucketed by LSH bands (see
+    :func:`lsh_bands`), so only sequences sharing a band are compared
+    instead of every pair.  Records are taken in order: a record whose
+    estimated Jaccard similarity to an earlier *kept* record is at least
+    *threshold* is a near duplicate of the earliest such record;
+    otherwise it is kept and added to the index.  Exact duplicates always
+    count as near duplicates.
+
+    The result depends only on the records, their order and the options
+    -- not on *workers* -- so a given *seed* always gives the same
+    output.  Memory grows with the number of kept sequences (the
+    signature, ``4 * num_perm`` bytes, plus one bucket entry per band).
+
+    Parameters
+    ----------
+    records : iterable of (header, sequence)
+        Consumed lazily, in chunks of :data:`_SIGNATURE_CHUNK` records.
+
+    threshold : float, optional
+        Estimated Jaccard similarity (of k-mer sets) at or above which a
+        sequence is a near duplicate.  Default ``0.9``.
+
+    kmer : int, optional
+        K-mer length, 1 to 8.  Default ``5``.
+
+    num_perm : int, optional
+        Number of MinHash functions; more give a finer similarity
+        estimate at a proportional cost.  Default ``128``.
+
+    seed : int, optional
+        Seed for the hash functions.  Default ``0``.
+
+    workers : int, optional
+        Number of processes computing signatures.  Default ``1``.
+
+    Yields
+    ------
+    tuple[object, int or None]
+        Every input record, with the 0-based position of the earlier
+        record it nearly duplicates, or ``None`` if it is kept.
+
+    Raises
+    ------
+    ProtfastaException
+        If an option is invalid, or NumPy is not installed.
+    """
+    check_near_duplicate_options(threshold, kmer, num_perm, seed, workers)
+    np = _numpy()
+
+    (a, b) = _minhash_parameters(num_perm, seed)
+    (n_bands, rows) = lsh_bands(num_perm, threshold)
+    buckets = [{} for _ in range(n_bands)]
+    need = math.ceil(threshold * num_perm - 1e-9)
+
+    # signatures of the kept records, by kept position (grown by doubling)
+    kept = np.empty((1024, num_perm), dtype=np.uint32)
+    kept_positions = []
+
+    position = 0
+    for (chunk, signatures) in _signature_batches(iter(records), kmer, a, b, workers):
+        for (record, signature) in zip(chunk, signatures):
+            keys = [hash(signature[i * rows:(i + 1) * rows].tobytes()) for i in range(n_bands)]
+
+            candidates = set()
+            for (bucket, key) in zip(buckets, keys):
+                found = bucket.get(key)
+                if found is not None:
+                    candidates.update(found)
+
+            match = None
+            if candidates:
+                candidates = sorted(candidates)
+                agree = np.count_nonzero(kept[candidates] == signature, axis=1)
+                hits = np.flatnonzero(agree >= need)
+                if len(hits):
+                    match = kept_positions[candidates[hits[0]]]
+
+            if match is None:
+                n_kept = len(kept_positions)
+                if n_kept == len(kept):
+                    kept = np.concatenate([kept, np.empty_like(kept)])
+                kept[n_kept] = signature
+                kept_positions.append(position)
+                for (bucket, key) in zip(buckets, keys):
+                    bucket.setdefault(key, []).append(n_kept)
+
+            yield (record, match)
+            position += 1
@@ -0,0 +1,274 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module integer-encodes sanitized sequences as NumPy ``uint8`` arrays
+of indices into :data:`protfasta.STANDARD_AAS` (with the gap character
+``'-'`` encoded as 20 when ``alignment=True``), for machine-learning
+pipelines that would otherwise re-encode every sequence in Python.
+
+Encoding is one vectorized lookup through a 256-entry table over the raw
+bytes of all sequences at once; no per-residue Python object is created.
+NumPy is an optional dependency, imported only when encoding is used.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+from typing import Union
+
+from ._configs import STANDARD_AAS, STANDARD_AAS_WITH_GAP
+from .protfasta_exceptions import ProtfastaException
+from .store import SequenceStore
+
+
+# Table entry for bytes that are not residues of the alphabet.
+_INVALID = 255
+
+
+####################################################################################################
+#
+#
+def _numpy():
+    """Import and return NumPy, or raise a ProtfastaException explaining how to get it."""
+    try:
+        import numpy
+    except ImportError:
+        raise ProtfastaException('Encoding sequences requires numpy (pip install numpy)')
+    return numpy
+
+
+def _lookup_table(alignment: bool):
+    """Return the 256-entry byte -> residue index table for the alphabet."""
+    np = _numpy()
+    table = np.full(256, _INVALID, dtype=np.uint8)
+    alphabet = STANDARD_AAS_WITH_GAP if alignment else STANDARD_AAS
+    for (code, residue) in enumerate(alphabet):
+        table[ord(residue)] = code
+        table[ord(residue.lower())] = code
+    return table
+
+
+####################################################################################################
+#
+#
+def _encode_buffer(buf, offsets, headers, alignment: bool):
+    """Encode the concatenated sequence bytes in *buf*.
+
+    Parameters
+    ----------
+    buf : bytes-like
+        All sequences, concatenated.
+
+    offsets : numpy.ndarray
+        ``int64`` array of ``len(headers) + 1`` offsets into *buf*.
+
+    headers : sequence of str
+        Record headers, used to report the first unencodable residue.
+
+    alignment : bool
+        If ``True``, ``'-'`` is encoded as a gap.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``uint8`` codes, one per byte of *buf*.
+
+    Raises
+    ------
+    ProtfastaException
+        If any byte is not a residue of the alphabet.
+    """
+    np = _numpy()
+    codes = _lookup_table(alignment)[np.frombuffer(buf, dtype=np.uint8)]
+
+    bad = np.flatnonzero(codes == _INVALID)
+    if len(bad):
+        idx = int(np.searchsorted(offsets, bad[0], side='right')) - 1
+        seq = bytes(buf[offsets[idx]:offsets[idx + 1]]).decode('utf-8', 'surrogatepass')
+        alphabet = STANDARD_AAS_WITH_GAP if alignment else STANDARD_AAS
+        residue = next(c for c in seq if c.upper() not in alphabet)
+        raise _invalid_residue(residue, headers[idx])
+    return codes
+
+
+def _invalid_residue(residue: str, header: str) -> ProtfastaException:
+    return ProtfastaException("Cannot encode invalid amino acid '%s' in entry >%s\n"
+                              "Use an invalid_sequence_action that converts or removes invalid residues"
+                              % (residue, header))
+
+
+def _concatenate(fasta_data):
+    """Return ``(headers, buf, offsets)`` for a dict, list or SequenceStore."""
+    np = _numpy()
+
+    if isinstance(fasta_data, SequenceStore):
+        offsets = np.zeros(len(fasta_data) + 1, dtype=np.int64)
+        offsets[1:] = fasta_data._sequence_ends
+        return (list(fasta_data.headers()), fasta_data._sequences, offsets)
+
+    if isinstance(fasta_data, dict):
+        headers = list(fasta_data)
+        seqs = list(fasta_data.values())
+    elif isinstance(fasta_data, list):
+        headers = [entry[0] for entry in fasta_data]
+        seqs = [entry[1] for entry in fasta_data]
+    else:
+        raise ProtfastaException('Sequences to encode must be a dictionary, a list of [header, sequence] pairs '
+                                 'or a SequenceStore (got %s)' % (type(fasta_data).__name__))
+
+    offsets = np.zeros(len(seqs) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in seqs], out=offsets[1:])
+
+    # one bytes object for the whole set; a non-ASCII character would shift
+    # every later offset, so find it and report it as unencodable
+    joined = ''.join(seqs)
+    try:
+        buf = joined.encode('ascii')
+    except UnicodeEncodeError as e:
+        idx = int(np.searchsorted(offsets, e.start, side='right')) - 1
+        raise _invalid_residue(joined[e.start], headers[idx])
+
+    return (headers, buf, offsets)
+
+
+####################################################################################################
+#
+#
+def encode_sequence(seq: str, alignment: bool = False):
+    """Encode one sequence as a ``uint8`` array of residue indices.
+
+    Parameters
+    ----------
+    seq : str
+        Amino-acid sequence.  Lower-case residues are accepted.
+
+    alignment : bool, optional
+        If ``True``, the gap character ``'-'`` is encoded as 20.
+        Default ``False``.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``uint8`` array where ``STANDARD_AAS[code]`` is the residue.
+
+    Raises
+    ------
+    ProtfastaException
+        If NumPy is not installed, or *seq* contains a residue outside
+        the alphabet.
+    """
+    (_headers, data, _offsets) = encode_concatenated([['sequence', seq]], alignment=alignment)
+    return data
+
+
+def encode_concatenated(
+    fasta_data: Union[dict[str, str], list[list[str]], SequenceStore],
+    alignment: bool = False,
+):
+    """Encode a set of sequences as one array plus record offsets.
+
+    Sequence ``i`` is ``data[offsets[i]:offsets[i + 1]]``.  For a
+    :class:`~protfasta.store.SequenceStore` the store's packed sequence
+    buffer is encoded directly, without decoding any sequence.
+
+    Parameters
+    ----------
+    fasta_data : dict[str, str], list[list[str]] or SequenceStore
+        Sequences as returned by :func:`protfasta.read_fasta`.
+
+    alignment : bool, optional
+        If ``True``, the gap character ``'-'`` is encoded as 20.
+        Default ``False``.
+
+    Returns
+    -------
+    tuple[list[str], numpy.ndarray, numpy.ndarray]
+        ``(headers, data, offsets)``: the headers in order, the
+        ``uint8`` codes of every residue, and an ``int64`` array of
+        ``len(headers) + 1`` offsets into *data*.
+
+    Raises
+    ------
+    ProtfastaException
+        If NumPy is not installed, or a sequence contains a residue
+        outside the alphabet.
+    """
+    (headers, buf, offsets) = _concatenate(fasta_data)
+    return (headers, _encode_buffer(buf, offsets, headers, alignment), offsets)
+
+
+def encode_sequences(
+    fasta_data: Union[dict[str, str], list[list[str]], SequenceStore],
+    alignment: bool = False,
+) -> Union[dict, list]:
+    """Replace every sequence with its ``uint8`` encoding.
+
+    All sequences are encoded in a single pass (see
+    :func:`encode_concatenated`), and each returned array is a view into
+    that one contiguous array.
+
+    Parameters
+    ----------
+    fasta_data : dict[str, str], list[list[str]] or SequenceStore
+        Sequences as returned by :func:`protfasta.read_fasta`.
+
+    alignment : bool, optional
+        If ``True``, the gap character ``'-'`` is encoded as 20.
+        Default ``False``.
+
+    Returns
+    -------
+    dict or list
+        A ``header -> array`` dictionary if *fasta_data* is a
+        dictionary, otherwise a list of ``[header, array]`` pairs.
+
+    Raises
+    ------
+    ProtfastaException
+        If NumPy is not installed, or a sequence contains a residue
+        outside the alphabet.
+    """
+    (headers, data, offsets) = encode_concatenated(fasta_data, alignment=alignment)
+    bounds = offsets.tolist()
+    arrays = [data[bounds[i]:bounds[i + 1]] for i in range(len(headers))]
+
+    if isinstance(fasta_data, dict):
+        return dict(zip(headers, arrays))
+    return [[header, arr] for (header, arr) in zip(headers, arrays)]
+
+
+def decode_sequence(codes, alignment: bool = False) -> str:
+    """Turn an array of residue indices back into a sequence string.
+
+    Parameters
+    ----------
+    codes : numpy.ndarray or sequence of int
+        Residue indices, as returned by :func:`encode_sequence`.
+
+    alignment : bool, optional
+        If ``True``, 20 decodes to the gap character ``'-'``.
+
+    Returns
+    -------
+    str
+        The amino-acid sequence.
+    """
+    np = _numpy()
+    alphabet = STANDARD_AAS_WITH_GAP if alignment else STANDARD_AAS
+    letters = np.frombuffer(''.join(alphabet).encode('ascii'), dtype=np.uint8)
+    codes = np.asarray(codes)
+    if codes.size and int(codes.max()) >= len(alphabet):
+        raise ProtfastaException('Cannot decode residue index %i (alphabet has %i residues)'
+                                 % (int(codes.max()), len(alphabet)))
+    return letters[codes].tobytes().decode('ascii')
@@ -0,0 +1,328 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module implements compact header storage for
+``read_fasta(..., compact_headers=True)``.  :class:`FrontCodedHeaders` is
+a sorted, front-coded string table: headers are sorted and grouped into
+small blocks, and within a block each header is stored as the length of
+the prefix it shares with the one before plus the remaining bytes.
+UniProt-style headers (``sp|P12345|NAME_HUMAN ... OS=Homo sapiens
+OX=9606``) share long prefixes with their sorted neighbours, so the table
+is a fraction of the size of the ``str`` objects it replaces, and a
+header is only decoded when it is looked up.  :class:`CompactFastaMapping`
+pairs the table with the sequences to give a read-only ``header ->
+sequence`` mapping.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import ItemsView, Mapping
+from typing import Iterable, Iterator, Sequence, Union
+
+from .store import SequenceStore, _ENCODING, _ERRORS
+
+
+# Headers per front-coded block: the first is stored in full and the rest
+# as (shared prefix, suffix).  A lookup decodes at most one block after a
+# binary search over the block heads.
+BLOCK_SIZE = 16
+
+
+####################################################################################################
+#
+#
+def _write_varint(out: bytearray, value: int) -> None:
+    """Append *value* to *out* as an unsigned LEB128 varint."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    """Return ``(value, next position)`` for the varint at *pos* in *buf*."""
+    value = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value, pos)
+        shift += 7
+
+
+def _shared_prefix(a: bytes, b: bytes) -> int:
+    """Return the length of the common prefix of *a* and *b*."""
+    n = min(len(a), len(b))
+    i = 0
+    # compare 8 bytes at a time before narrowing down
+    while i + 8 <= n and a[i:i + 8] == b[i:i + 8]:
+        i += 8
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+####################################################################################################
+#
+#
+class FrontCodedHeaders:
+    """Sorted, front-coded table of distinct header strings.
+
+    Headers are held as UTF-8 bytes in one buffer, sorted, in blocks of
+    :data:`BLOCK_SIZE`.  The first header of a block is stored as its
+    length and bytes, and each following one as the length of the prefix
+    it shares with its predecessor, its remaining length, and the
+    remaining bytes (lengths as varints).  ``table[rank]`` decodes one
+    header and :meth:`rank` finds a header's position by binary search
+    over the block heads, so neither needs more than one block decoded.
+
+    Parameters
+    ----------
+    headers : iterable of bytes
+        Distinct UTF-8 encoded headers, in ascending byte order.
+    """
+
+    def __init__(self, headers: Iterable[bytes]):
+        data = bytearray()
+        offsets = array('q')
+        previous = b''
+        count = 0
+        for header in headers:
+            if count % BLOCK_SIZE == 0:
+                offsets.append(len(data))
+                _write_varint(data, len(header))
+                data += header
+            else:
+                shared = _shared_prefix(previous, header)
+                _write_varint(data, shared)
+                _write_varint(data, len(header) - shared)
+                data += header[shared:]
+            previous = header
+            count += 1
+
+        self._data = bytes(data)
+        self._offsets = offsets
+        self._count = count
+
+    # ..............................................................................
+    #
+    def _head(self, block: int) -> bytes:
+        """Return the first header of *block*, encoded."""
+        (length, pos) = _read_varint(self._data, self._offsets[block])
+        return self._data[pos:pos + length]
+
+    def _block(self, block: int) -> Iterator[bytes]:
+        """Yield the encoded headers of *block*, in order."""
+        data = self._data
+        (length, pos) = _read_varint(data, self._offsets[block])
+        current = data[pos:pos + length]
+        pos += length
+        yield current
+
+        for _ in range(min(BLOCK_SIZE, self._count - block * BLOCK_SIZE) - 1):
+            (shared, pos) = _read_varint(data, pos)
+            (length, pos) = _read_varint(data, pos)
+            current = current[:shared] + data[pos:pos + length]
+            pos += length
+            yield current
+
+    def encoded(self, rank: int) -> bytes:
+        """Return the header at *rank* (in sorted order) as UTF-8 bytes."""
+        if not 0 <= rank < self._count:
+            raise IndexError('FrontCodedHeaders index out of range')
+        (block, within) = divmod(rank, BLOCK_SIZE)
+        for (i, header) in enumerate(self._block(block)):
+            if i == within:
+                return header
+
+    def rank(self, header: str) -> int:
+        """Return the position of *header* in sorted order, or ``-1`` if absent."""
+        try:
+            key = header.encode(_ENCODING, _ERRORS)
+        except (AttributeError, UnicodeEncodeError):
+            return -1
+
+        # last block whose head is <= key
+        (lo, hi) = (0, len(self._offsets))
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._head(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return -1
+
+        block = lo - 1
+        for (i, candidate) in enumerate(self._block(block)):
+            if candidate == key:
+                return block * BLOCK_SIZE + i
+            if candidate > key:
+                break
+        return -1
+
+    # ..............................................................................
+    #
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, rank: int) -> str:
+        return self.encoded(rank).decode(_ENCODING, _ERRORS)
+
+    def __iter__(self) -> Iterator[str]:
+        for block in range(len(self._offsets)):
+            for header in self._block(block):
+                yield header.decode(_ENCODING, _ERRORS)
+
+    def __repr__(self) -> str:
+        return 'FrontCodedHeaders(%i headers, %i bytes)' % (self._count, self.nbytes)
+
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes held in the table's buffers."""
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+
+####################################################################################################
+#
+#
+class CompactFastaMapping(Mapping):
+    """Read-only ``header -> sequence`` mapping with front-coded headers.
+
+    Returned by ``read_fasta(..., compact_headers=True)``.  Headers live
+    in a :class:`FrontCodedHeaders` table and sequences in a
+    :class:`~protfasta.store.SequenceStore`, with two ``array('q')``
+    columns linking them, so a record costs its sequence bytes, the
+    front-coded remainder of its header and about 32 bytes of offsets --
+    against two ``str`` objects and a dictionary slot for a ``dict``.
+    Headers and sequences are decoded when they are accessed.
+
+    Iteration follows file order, as for the dictionary returned by
+    :func:`protfasta.read_fasta`, and when headers are not unique the
+    last record with a given header wins, again as for that dictionary.
+    A lookup is a binary search over the table, so it is slower than a
+    ``dict`` lookup; use :meth:`to_dict` for heavy random access.
+
+    Parameters
+    ----------
+    records : list of (header, sequence) or SequenceStore
+        The records, in file order.
+    """
+
+    def __init__(self, records: Union[Sequence[Sequence[str]], SequenceStore]):
+        if isinstance(records, SequenceStore):
+            encoded = [bytes(records._headers[start:end]) for (start, end) in _spans(records._header_ends)]
+            sequences = records.sequences()
+        else:
+            encoded = [record[0].encode(_ENCODING, _ERRORS) for record in records]
+            sequences = (record[1] for record in records)
+
+        # sort positions by header; equal headers keep file order, so the
+        # first of a run fixes the key's place and the last its sequence
+        order = sorted(range(len(encoded)), key=encoded.__getitem__)
+        firsts = []
+        lasts = {}
+        distinct = []
+        for position in order:
+            header = encoded[position]
+            if distinct and distinct[-1] == header:
+                lasts[firsts[-1][1]] = position
+                continue
+            firsts.append((position, len(distinct)))
+            distinct.append(header)
+        del order
+
+        self._headers = FrontCodedHeaders(distinct)
+        del distinct
+        firsts.sort()
+
+        # key i (in file order of first appearance) has header rank _ranks[i]
+        # and its sequence is record _records[i] of the sequence store
+        self._ranks = array('q', [rank for (_position, rank) in firsts])
+        self._keys = array('q', bytes(8 * len(firsts)))
+        for (i, rank) in enumerate(self._ranks):
+            self._keys[rank] = i
+
+        # the key whose sequence each record supplies, or -1
+        supplies = array('q', [-1]) * len(encoded)
+        for (i, (position, rank)) in enumerate(firsts):
+            supplies[lasts.get(rank, position)] = i
+        del firsts, lasts
+
+        self._sequences = SequenceStore()
+        self._records = array('q', bytes(8 * len(self._ranks)))
+        for (position, seq) in enumerate(sequences):
+            i = supplies[position]
+            if i >= 0:
+                self._records[i] = len(self._sequences)
+                self._sequences.append(('', seq))
+
+    # ..............................................................................
+    #
+    def __getitem__(self, header: str) -> str:
+        rank = self._headers.rank(header)
+        if rank < 0:
+            raise KeyError(header)
+        return self._sequences.sequence(self._records[self._keys[rank]])
+
+    def __iter__(self) -> Iterator[str]:
+        headers = self._headers
+        for rank in self._ranks:
+            yield headers[rank]
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    def __contains__(self, header) -> bool:
+        return self._headers.rank(header) >= 0
+
+    def items(self) -> ItemsView:
+        return _CompactItemsView(self)
+
+    def __repr__(self) -> str:
+        return 'CompactFastaMapping(%i records, %i bytes)' % (len(self), self.nbytes)
+
+    # ..............................................................................
+    #
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes held in the mapping's buffers."""
+        return (self._headers.nbytes + self._sequences.nbytes
+                + self._ranks.itemsize * (len(self._ranks) + len(self._keys) + len(self._records)))
+
+    def to_dict(self) -> dict[str, str]:
+        """Return a ``header -> sequence`` dictionary, as ``read_fasta`` returns by default."""
+        return dict(self.items())
+
+
+class _CompactItemsView(ItemsView):
+    """Items of a :class:`CompactFastaMapping`, iterated without a lookup per key."""
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        mapping = self._mapping
+        sequences = mapping._sequences
+        for (i, header) in enumerate(mapping):
+            yield (header, sequences.sequence(mapping._records[i]))
+
+
+def _spans(ends: array) -> Iterator[tuple[int, int]]:
+    """Yield the ``(start, end)`` buffer span of every record given its end offsets."""
+    start = 0
+    for end in ends:
+        yield (start, end)
+        start = end
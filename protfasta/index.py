@@ -0,0 +1,399 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module builds and reads samtools-compatible ``.fai`` indexes, giving
+random access to individual records (and subsequences) of a large FASTA
+file without parsing the whole thing.
+
+A ``.fai`` file has one tab-separated line per record::
+
+    NAME  LENGTH  OFFSET  LINEBASES  LINEWIDTH
+
+where NAME is the header up to the first whitespace, LENGTH the number of
+residues, OFFSET the byte offset of the first residue, LINEBASES the
+residues per sequence line and LINEWIDTH the bytes per line including the
+line terminator.  Because every line of a record (except its last) must be
+the same length, the byte position of any residue can be computed directly.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import os
+from collections import namedtuple
+from collections.abc import Mapping
+from typing import Iterator, Optional
+
+from . import io as _io
+from .protfasta_exceptions import ProtfastaException
+
+
+# One line of a .fai file.
+FaiRecord = namedtuple('FaiRecord', ['name', 'length', 'offset', 'linebases', 'linewidth'])
+
+
+####################################################################################################
+#
+#
+def _fai_path(filename) -> str:
+    """Return the conventional index path for *filename* (``<filename>.fai``)."""
+    return os.fspath(filename) + '.fai'
+
+
+####################################################################################################
+#
+#
+def _scan_records(filename) -> Iterator[FaiRecord]:
+    """Yield one :class:`FaiRecord` per record of an uncompressed FASTA file.
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to the FASTA file.
+
+    Yields
+    ------
+    FaiRecord
+        Index entries in file order.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file is compressed, or a record cannot be indexed because
+        its sequence lines differ in length (other than a shorter last
+        line) or are interrupted by blank lines.
+    """
+    fh = _io._open_raw(filename, _io._READ_BUFFER)
+    with fh:
+        if _io._sniff_compression(fh.peek(6)[:6]) is not None:
+            raise ProtfastaException('Cannot index a compressed file: %s' % (filename))
+
+        name = None
+        pos = 0
+
+        for line in fh:
+            width = len(line)
+
+            if line[:1] == b'>':
+                if name is not None:
+                    yield FaiRecord(name, length, offset, linebases, linewidth)
+
+                words = line[1:].split(None, 1)
+                if not words:
+                    raise ProtfastaException('Cannot index a record with an empty header (byte offset %i)' % (pos))
+
+                name = words[0].decode(_io._text_encoding())
+                offset = pos + width
+                length = 0
+                linebases = 0
+                linewidth = 0
+                ended = False
+
+            elif name is not None:
+                bases = len(line.rstrip(b'\r\n'))
+
+                # blank lines may only trail the sequence
+                if bases == 0:
+                    ended = True
+                elif ended or bases > linebases > 0:
+                    raise ProtfastaException('Cannot index record %s: sequence lines have different lengths' % (name))
+                else:
+                    if linebases == 0:
+                        linebases = bases
+                        linewidth = width
+                    elif bases == linebases and width != linewidth and line[-1:] == b'\n':
+                        raise ProtfastaException('Cannot index record %s: sequence lines have different line endings'
+                                                 % (name))
+
+                    # a short (or unterminated) line must be the last one
+                    if bases < linebases or line[-1:] != b'\n':
+                        ended = True
+                    length += bases
+
+            pos += width
+
+        if name is not None:
+            yield FaiRecord(name, length, offset, linebases, linewidth)
+
+
+####################################################################################################
+#
+#
+def index_fasta(filename, output_filename=None) -> str:
+    """Build a samtools-compatible ``.fai`` index for a FASTA file.
+
+    The index can be used by :class:`FastaIndex` (and by ``samtools
+    faidx``, pysam, pyfaidx, ...) to fetch individual records or
+    subsequences without reading the rest of the file.
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to an uncompressed FASTA file.
+
+    output_filename : str, os.PathLike or None, optional
+        Where to write the index.  Default ``<filename>.fai``.
+
+    Returns
+    -------
+    str
+        Path of the index that was written.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file cannot be read, is compressed, has a record whose
+        sequence lines are not all the same length (except the last), or
+        has two records with the same name (the header up to the first
+        whitespace).
+    """
+    _io.check_filename(filename)
+    output_filename = _fai_path(filename) if output_filename is None else os.fspath(output_filename)
+
+    seen = set()
+    lines = []
+    for rec in _scan_records(filename):
+        if rec.name in seen:
+            raise ProtfastaException('Cannot index file: duplicate record name (%s)' % (rec.name))
+        seen.add(rec.name)
+        lines.append('%s\t%i\t%i\t%i\t%i\n' % rec)
+
+    # write to a temporary file first so a reader never sees a partial index
+    tmp_filename = output_filename + '.tmp'
+    try:
+        with open(tmp_filename, 'w') as fh:
+            fh.write(''.join(lines))
+        os.replace(tmp_filename, output_filename)
+    except OSError as e:
+        raise ProtfastaException('Unable to write index file: %s\nException: %s' % (output_filename, e))
+
+    return output_filename
+
+
+####################################################################################################
+#
+#
+class FastaIndex(Mapping):
+    """Random access to the records of a FASTA file via a ``.fai`` index.
+
+    A read-only mapping from record name (the header up to the first
+    whitespace, as in samtools) to sequence.  Each lookup costs a single
+    seek and read, however large the file::
+
+        with protfasta.FastaIndex('uniprot_sprot.fasta') as idx:
+            seq = idx['sp|P04637|P53_HUMAN']
+            domain = idx.fetch('sp|P04637|P53_HUMAN', 94, 292)
+
+    Sequences are upper-cased, as by :func:`protfasta.read_fasta`, but
+    are otherwise returned exactly as stored (no invalid-residue
+    handling).
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to an uncompressed FASTA file.
+
+    index_filename : str, os.PathLike or None, optional
+        Path of the ``.fai`` index.  Default ``<filename>.fai``.
+
+    build : bool, optional
+        If ``True`` (default), build the index when it is missing and
+        rebuild it when it is out of date.  If ``False``, raise instead.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file cannot be read, or the index is missing or out of
+        date and *build* is ``False``.
+
+    Notes
+    -----
+    The index is out of date when the FASTA file was modified after the
+    index was written, or is too short to hold the records the index
+    describes.  The file is checked again before every fetch, so an
+    index is never used to read from a file that changed underneath it.
+    """
+
+    def __init__(self, filename, index_filename=None, build: bool = True):
+        _io.check_filename(filename)
+        if type(build) != bool:
+            raise ProtfastaException("keyword 'build' must be a boolean")
+
+        self.filename = os.fspath(filename)
+        self.index_filename = _fai_path(filename) if index_filename is None else os.fspath(index_filename)
+
+        self._fh = _io._open_raw(self.filename)
+        try:
+            if self._stale():
+                if not build:
+                    raise ProtfastaException('Index %s is missing or out of date for %s; rebuild it with '
+                                             'protfasta.index_fasta()' % (self.index_filename, self.filename))
+                index_fasta(self.filename, self.index_filename)
+
+            self._records = self._load()
+            if self._truncated():
+                if not build:
+                    raise ProtfastaException('Index %s is out of date for %s; rebuild it with protfasta.index_fasta()'
+                                             % (self.index_filename, self.filename))
+                index_fasta(self.filename, self.index_filename)
+                self._records = self._load()
+
+            self._stat = self._file_stat()
+        except BaseException:
+            self._fh.close()
+            raise
+
+    # ..............................................................................
+    #
+    def _file_stat(self) -> tuple[int, int]:
+        st = os.fstat(self._fh.fileno())
+        return (st.st_mtime_ns, st.st_size)
+
+    def _stale(self) -> bool:
+        """True if the index is missing or older than the FASTA file."""
+        try:
+            index_mtime = os.stat(self.index_filename).st_mtime_ns
+        except OSError:
+            return True
+        return self._file_stat()[0] > index_mtime
+
+    def _truncated(self) -> bool:
+        """True if the file is too short to hold the indexed records."""
+        size = self._file_stat()[1]
+        return any(self._sequence_end(rec) > size for rec in self._records.values())
+
+    def _load(self) -> dict[str, FaiRecord]:
+        """Read the ``.fai`` file into a name -> :class:`FaiRecord` dict."""
+        records = {}
+        try:
+            with open(self.index_filename, 'r') as fh:
+                for line in fh:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) < 5:
+                        raise ValueError('expected 5 tab-separated fields, got %i' % (len(fields)))
+                    rec = FaiRecord(fields[0], *(int(f) for f in fields[1:5]))
+                    records[rec.name] = rec
+        except (OSError, ValueError) as e:
+            raise ProtfastaException('Unable to read index file: %s\nException: %s' % (self.index_filename, e))
+        return records
+
+    @staticmethod
+    def _byte_position(rec: FaiRecord, pos: int) -> int:
+        """Byte offset in the file of residue *pos* of *rec*."""
+        if rec.linebases == 0:
+            return rec.offset
+        return rec.offset + (pos // rec.linebases) * rec.linewidth + pos % rec.linebases
+
+    @classmethod
+    def _sequence_end(cls, rec: FaiRecord) -> int:
+        """Byte offset in the file just past the last residue of *rec*.
+
+        Not ``_byte_position(rec, rec.length)``: when the last line is full,
+        that is the start of the line after it, one byte past the end of a
+        file whose final line has no newline.
+        """
+        if rec.length == 0:
+            return rec.offset
+        return cls._byte_position(rec, rec.length - 1) + 1
+
+    # ..............................................................................
+    #
+    def fetch(self, name: str, start: Optional[int] = None, end: Optional[int] = None) -> str:
+        """Return a record's sequence, or a slice of it.
+
+        Coordinates are 0-based and half-open, like Python slicing:
+        ``fetch(name, 0, 10)`` returns the first ten residues.  Only the
+        requested bytes are read from disk.
+
+        Parameters
+        ----------
+        name : str
+            Record name (the header up to the first whitespace).
+
+        start : int or None, optional
+            First residue to return.  Default 0.
+
+        end : int or None, optional
+            One past the last residue to return.  Default: the end of
+            the sequence.
+
+        Returns
+        -------
+        str
+            The upper-cased (sub)sequence.
+
+        Raises
+        ------
+        ProtfastaException
+            If *name* is not in the index, the coordinates fall outside
+            the sequence, or the file has changed since the index was
+            loaded.
+        """
+        rec = self._records.get(name)
+        if rec is None:
+            raise ProtfastaException('Record not found in index: %s' % (name))
+
+        start = 0 if start is None else start
+        end = rec.length if end is None else end
+        if not (0 <= start <= end <= rec.length):
+            raise ProtfastaException('Invalid coordinates [%s, %s) for record %s of length %i'
+                                     % (start, end, name, rec.length))
+
+        if self._file_stat() != self._stat:
+            raise ProtfastaException('%s has changed since its index was loaded; rebuild it with '
+                                     'protfasta.index_fasta()' % (self.filename))
+
+        first = self._byte_position(rec, start)
+        self._fh.seek(first)
+        data = self._fh.read(self._byte_position(rec, end) - first)
+
+        return data.translate(None, b'\r\n').decode(_io._text_encoding()).upper()
+
+    def length(self, name: str) -> int:
+        """Return the number of residues in record *name*."""
+        rec = self._records.get(name)
+        if rec is None:
+            raise ProtfastaException('Record not found in index: %s' % (name))
+        return rec.length
+
+    # ..............................................................................
+    #
+    def __getitem__(self, name: str) -> str:
+        if name not in self._records:
+            raise KeyError(name)
+        return self.fetch(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, name) -> bool:
+        return name in self._records
+
+    def __repr__(self) -> str:
+        return 'FastaIndex(%r, %i records)' % (self.filename, len(self._records))
+
+    # ..............................................................................
+    #
+    def close(self) -> None:
+        """Close the underlying FASTA file."""
+        self._fh.close()
+
+    def __enter__(self) -> 'FastaIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
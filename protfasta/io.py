@@ -19,11 +19,86 @@ Be kind to each other.
 
 from __future__ import annotations
 
+import bz2
+import codecs
+import functools
+import gzip
+import io
+import locale
+import lzma
+import mmap
 import os
-from typing import Callable, Iterator, Optional, Union
-
+import queue
+import sys
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+from . import _bgzf
+from . import cache as _cache
+from . import dedup as _dedup
+from . import encode as _encode
 from . import utilities as _utilities
 from .protfasta_exceptions import ProtfastaException
+from .store import SequenceStore
+
+
+# Size of each binary read made by the block parser. Large enough that the
+# per-block Python overhead is negligible, small enough that a block plus the
+# carried-over partial record stays cheap to hold in memory.
+_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Translation table for the block parser's fast path. Bytes that can never
+# change a sequence line under ``str.rstrip()`` -- every printable, non-space
+# ASCII character -- map to their upper-case form; everything else (spaces,
+# control characters, non-ASCII bytes) maps to NUL. One ``bytes.translate``
+# call with this table, deleting newlines as it goes, therefore joins and
+# upper-cases a record's sequence while flagging any byte that needs the
+# slower line-by-line treatment.
+_BLOCK_TABLE = bytes(
+    (b - 32 if 0x61 <= b <= 0x7a else b) if 0x21 <= b <= 0x7e else 0
+    for b in range(256)
+)
+
+# Leading magic bytes of the compressed formats recognised on input.
+_COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+# Read buffer used for compressed input, both for the compressed bytes coming
+# off disk and for the decompressed stream handed to the parsers, so neither
+# side is throttled by the 8 KiB default.
+_READ_BUFFER = 1024 * 1024
+
+# Write buffer for FASTA output, to minimise syscall overhead on large files.
+_WRITE_BUFFER = 1024 * 1024
+
+# Filename meaning standard input (for readers) or standard output (for writers).
+STDIO = '-'
+
+# Compressed formats the writers can produce.
+OUTPUT_COMPRESSION = ['gzip', 'bgzf', 'xz']
+
+# Errors a decompressor can raise part-way through a corrupt or truncated file.
+_DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError)
+
+# Fixed-size digest that header bookkeeping keys on when the header strings
+# themselves are not kept (128-bit, so a false "duplicate header" is
+# vanishingly unlikely).
+_header_digest = _utilities._seq_hash
+
+# Records per hand-off from the prefetch thread to the consumer, so the
+# queue round trip is paid once per batch rather than once per record.
+_PREFETCH_BATCH = 256
+
+# How often (seconds) a prefetch thread waiting for queue space checks
+# whether the consumer has gone away.
+_PREFETCH_POLL = 0.1
 
 
 def check_filename(filename) -> None:
@@ -33,7 +108,9 @@ def check_filename(filename) -> None:
     file descriptor, so a mistyped call such as ``read_fasta(0)`` would
     silently read from stdin rather than reporting a bad argument.  This guard
     restricts the input to a path -- a string or any
-    :class:`os.PathLike` (e.g. :class:`pathlib.Path`).
+    :class:`os.PathLike` (e.g. :class:`pathlib.Path`) -- ``'-'`` for
+    standard input, or an already-open readable file object (binary or
+    text).
 
     Parameters
     ----------
@@ -43,17 +120,346 @@ def check_filename(filename) -> None:
     Raises
     ------
     ProtfastaException
-        If *filename* is not a string or path-like object.
+        If *filename* is not a string, path-like object or readable file
+        object.
     """
-    if not isinstance(filename, (str, os.PathLike)):
-        raise ProtfastaException("keyword 'filename' must be a string or path-like object (got %s)" % (type(filename).__name__))
+    if not isinstance(filename, (str, os.PathLike)) and not callable(getattr(filename, 'read', None)):
+        raise ProtfastaException("keyword 'filename' must be a string, path-like object or readable file object "
+                                 "(got %s)" % (type(filename).__name__))
 
 
-def _open_fasta(filename):
-    """Open a FASTA file for reading, converting OS errors into protfasta errors.
+def is_stream(source) -> bool:
+    """Return ``True`` if *source* is ``'-'`` or an open file object rather than a path.
+
+    Streams can only be read once, front to back, so features that need
+    to seek or re-open the file (lazy loading, caching, sharded reads,
+    memory mapping) are unavailable for them.
+    """
+    return not isinstance(source, (str, os.PathLike)) or (isinstance(source, str) and source == STDIO)
+
+
+def _is_text(fh, mode: str) -> bool:
+    """Guess whether the caller-owned file object *fh* is a text stream.
+
+    *mode* is ``'r'`` or ``'w'``; file-like objects outside the
+    :mod:`io` hierarchy are probed with a zero-length read or write.
+    """
+    if isinstance(fh, io.TextIOBase):
+        return True
+    if isinstance(fh, (io.RawIOBase, io.BufferedIOBase)):
+        return False
+
+    try:
+        if mode == 'r':
+            return isinstance(fh.read(0), str)
+        fh.write('')
+        return True
+    except TypeError:
+        return False
+
+
+class _BorrowedStream(io.RawIOBase):
+    """Raw binary stream over a caller-owned file object.
+
+    Lets a file object (or stdin/stdout) be read and written through the
+    same large-buffered binary layers as a file opened by path.  Closing
+    it flushes but never closes the wrapped object, which belongs to the
+    caller.  Text file objects are bridged by encoding what is read, and
+    decoding what is written, with :func:`_text_encoding`.
+    """
+
+    def __init__(self, fh, mode: str):
+        self._fh = fh
+        self._mode = mode
+        self._text = _is_text(fh, mode)
+        self._pending = b''
+        if self._text and mode == 'w':
+            self._decoder = codecs.getincrementaldecoder(_text_encoding())()
+
+    def readable(self) -> bool:
+        return self._mode == 'r'
+
+    def writable(self) -> bool:
+        return self._mode == 'w'
+
+    def readinto(self, b) -> int:
+        if not self._text:
+            readinto = getattr(self._fh, 'readinto', None)
+            if readinto is not None:
+                return readinto(b)
+
+        if not self._pending:
+            data = self._fh.read(len(b))
+            self._pending = data.encode(_text_encoding()) if self._text else data
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def write(self, b) -> int:
+        if self._text:
+            self._fh.write(self._decoder.decode(bytes(b)))
+        else:
+            self._fh.write(bytes(b))
+        return len(b)
+
+    def close(self) -> None:
+        if not self.closed and self._mode == 'w':
+            self._fh.flush()
+        super().close()
+
+
+def _input_stream(source):
+    """Return the caller-owned file object behind *source*, or ``None`` for a path."""
+    if not is_stream(source):
+        return None
+    if isinstance(source, str):
+        return getattr(sys.stdin, 'buffer', sys.stdin)
+    return source
+
+
+def check_compression(compression, threads=None) -> None:
+    """Validate the output ``compression`` and ``threads`` keywords.
+
+    Raises
+    ------
+    ProtfastaException
+        If *compression* is not ``None`` or one of
+        :data:`OUTPUT_COMPRESSION`, or *threads* is not ``None`` or a
+        positive integer.
+    """
+    if compression is not None and compression not in OUTPUT_COMPRESSION:
+        raise ProtfastaException("keyword 'compression' must be None or one of %s"
+                                 % (', '.join("'%s'" % c for c in OUTPUT_COMPRESSION)))
+
+    if threads is not None and (type(threads) != int or threads < 1):
+        raise ProtfastaException("keyword 'threads' must be None or a positive integer")
+
+
+class _BgzfWriter(io.RawIOBase):
+    """Raw writer that BGZF-compresses everything written to it.
+
+    Data is cut into :data:`~protfasta._bgzf.MAX_BLOCK_DATA` blocks, which
+    are independent, so with several *threads* they are compressed in a
+    thread pool (zlib releases the GIL while it deflates) and written to
+    *fh* in order.  At most ``2 * threads`` blocks are in flight, so memory
+    stays bounded.  Closing writes the last partial block and the BGZF
+    end-of-file marker, but does not close *fh*.
+    """
+
+    def __init__(self, fh, threads: int, level: int):
+        self._fh = fh
+        self._level = level
+        self._threads = threads
+        self._pending = bytearray()
+        self._blocks = deque()
+        self._pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        pending = self._pending
+        pending += b
+        while len(pending) >= _bgzf.MAX_BLOCK_DATA:
+            self._submit(bytes(pending[:_bgzf.MAX_BLOCK_DATA]))
+            del pending[:_bgzf.MAX_BLOCK_DATA]
+        return len(b)
+
+    def _submit(self, data: bytes) -> None:
+        if self._pool is None:
+            self._fh.write(_bgzf.compress_block(data, self._level))
+            return
+
+        self._blocks.append(self._pool.submit(_bgzf.compress_block, data, self._level))
+        while len(self._blocks) > 2 * self._threads:
+            self._fh.write(self._blocks.popleft().result())
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._pending:
+                self._submit(bytes(self._pending))
+                self._pending.clear()
+            while self._blocks:
+                self._fh.write(self._blocks.popleft().result())
+            self._fh.write(_bgzf.EOF_BLOCK)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+            super().close()
+
+
+class _CompressedOutput(io.BufferedWriter):
+    """Buffered compressing stream that also closes the file underneath.
+
+    The compressors are handed an already-open binary file (so a path, a
+    caller's file object and stdout are treated alike), and none of them
+    close a file object they did not open; this wrapper closes it after
+    the compressor has written its trailer.
+    """
+
+    def __init__(self, stream, fh, buffer_size: int):
+        super().__init__(stream, buffer_size)
+        self._fh = fh
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._fh.close()
+
+
+def _open_output(target, mode: str = 'w', buffer_size: int = _WRITE_BUFFER,
+                 compression: Optional[str] = None, threads: Optional[int] = None, level: Optional[int] = None):
+    """Open *target* for writing FASTA text with a large (default 1 MiB) buffer.
+
+    *target* may be a path, ``'-'`` for standard output, or a writable
+    binary or text file object.  Closing the returned handle flushes it;
+    only files opened here by path are actually closed.
+
+    Parameters
+    ----------
+    target : str, os.PathLike or file object
+        Where to write.
+
+    mode : str, optional
+        ``'w'`` (default) or ``'a'``; only meaningful for paths.
+        Appending compressed output adds a new gzip member or xz stream,
+        which readers treat as a continuation of the file.
+
+    buffer_size : int, optional
+        Output buffer size in bytes.  Default 1 MiB.
+
+    compression : str or None, optional
+        ``'gzip'``, ``'bgzf'`` or ``'xz'`` to compress the output (see
+        :func:`check_compression`); needs a path or a binary target.
+        Default ``None``.
+
+    threads : int or None, optional
+        Compression threads for ``'bgzf'`` (see :class:`_BgzfWriter`).
+        ``None`` uses one per CPU.
+
+    level : int or None, optional
+        Compression level 0-9.  ``None`` uses 6 for gzip/BGZF and the
+        xz default preset.
+
+    Returns
+    -------
+    file object
+        A writable text handle.
+
+    Raises
+    ------
+    ProtfastaException
+        If compressed output is requested for a text file object.
+    """
+    if compression is None and not is_stream(target):
+        return open(target, mode, buffering=buffer_size)
+
+    if is_stream(target):
+        if isinstance(target, str):
+            # anything already printed must come out before the records
+            sys.stdout.flush()
+            target = getattr(sys.stdout, 'buffer', sys.stdout)
+        raw = _BorrowedStream(target, 'w')
+    else:
+        raw = None
+
+    if compression is None:
+        # a text target does its own newline translation
+        return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size), encoding=_text_encoding(),
+                                newline='' if raw._text else None)
+
+    if raw is not None and raw._text:
+        raise ProtfastaException('Compressed output needs a path or a binary file object, not a text stream')
+
+    fh = open(target, mode + 'b', buffering=buffer_size) if raw is None else io.BufferedWriter(raw, buffer_size)
+    try:
+        if compression == 'gzip':
+            stream = gzip.GzipFile(fileobj=fh, mode='wb', compresslevel=6 if level is None else level)
+        elif compression == 'xz':
+            stream = lzma.LZMAFile(fh, mode='wb', preset=level)
+        else:
+            stream = _BgzfWriter(fh, threads or os.cpu_count() or 1, 6 if level is None else level)
+    except BaseException:
+        fh.close()
+        raise
+
+    return io.TextIOWrapper(_CompressedOutput(stream, fh, buffer_size), encoding=_text_encoding())
+
+
+def _sniff_compression(head: bytes) -> Optional[str]:
+    """Identify a compressed format from the first bytes of a file.
+
+    Parameters
+    ----------
+    head : bytes
+        The first few (at least six) bytes of the file.
+
+    Returns
+    -------
+    str or None
+        ``'gzip'``, ``'bz2'``, ``'xz'`` or ``'zstd'``, or ``None`` if the
+        bytes match no known compressed format.
+    """
+    for magic, name in _COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def _zstd_reader(fh):
+    """Return a binary zstd decompressing reader over *fh*.
+
+    Uses the standard library ``compression.zstd`` module (Python 3.14+)
+    and otherwise the third-party ``zstandard`` package.
+
+    Raises
+    ------
+    ProtfastaException
+        If neither zstd implementation is available.
+    """
+    try:
+        from compression import zstd
+        return zstd.ZstdFile(fh)
+    except ImportError:
+        pass
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ProtfastaException('File is zstd-compressed, but zstd support requires Python 3.14+ '
+                                 'or the zstandard package (pip install zstandard)')
+
+    return zstandard.ZstdDecompressor().stream_reader(fh, read_size=_READ_BUFFER, closefd=False)
+
+
+class _DecompressedFile(io.BufferedReader):
+    """Buffered decompressed stream that also closes the underlying file.
+
+    The decompressors are given an already-open file object (so that it can
+    carry a large read buffer), and none of them close a file object they
+    did not open themselves; this wrapper closes it alongside the stream.
+    """
+
+    def __init__(self, stream, compressed, buffer_size=_READ_BUFFER):
+        super().__init__(stream, buffer_size)
+        self._compressed = compressed
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._compressed.close()
+
 
-    Every failure mode of :func:`open` -- a missing file, a directory passed
-    in place of a file, a permissions problem -- is surfaced as a
+def _open_raw(filename, buffering: int = -1):
+    """Open *filename* as a raw binary file, converting OS errors.
+
+    Every failure mode of :func:`open` -- a missing file, a directory
+    passed in place of a file, a permissions problem -- is surfaced as a
     :class:`~protfasta.protfasta_exceptions.ProtfastaException` so that
     callers only ever need to catch one exception type.
 
@@ -62,10 +468,13 @@ def _open_fasta(filename):
     filename : str or os.PathLike
         Path to the file to open.
 
+    buffering : int, optional
+        Passed to :func:`open`.  Default ``-1`` (the system default).
+
     Returns
     -------
     file object
-        An open, readable text file handle.
+        An open binary file handle.  No decompression is applied.
 
     Raises
     ------
@@ -73,13 +482,189 @@ def _open_fasta(filename):
         If the file cannot be opened for any reason.
     """
     try:
-        return open(filename, 'r')
+        return open(filename, 'rb', buffering=buffering)
     except FileNotFoundError:
         raise ProtfastaException('Unable to find file: %s' % (filename))
     except OSError as e:
         raise ProtfastaException('Unable to read file: %s\nException: %s' % (filename, e))
 
 
+def _open_fasta_binary(filename):
+    """Open a FASTA file for reading in binary mode, decompressing if needed.
+
+    Compression is detected from the file's magic bytes (not its
+    extension): gzip (including BGZF), bzip2 and xz are always supported,
+    and zstd is supported when :func:`_zstd_reader` can find an
+    implementation.  Compressed files are returned as a streaming
+    decompressor, so nothing is written to disk and memory stays bounded.
+    As in :func:`_open_raw`, failures (including a corrupt compressed
+    header) are raised as
+    :class:`~protfasta.protfasta_exceptions.ProtfastaException`.
+
+    A file object (or ``'-'`` for standard input) is read through a
+    :class:`_BorrowedStream`, so it is decompressed and buffered in the
+    same way but left open when the returned handle is closed.
+
+    Parameters
+    ----------
+    filename : str, os.PathLike or file object
+        Path to the file to open, ``'-'``, or a readable file object.
+
+    Returns
+    -------
+    file object
+        An open, readable binary file handle yielding the (decompressed)
+        FASTA bytes.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file cannot be opened for any reason.
+    """
+    stream = _input_stream(filename)
+    if stream is None:
+        fh = _open_raw(filename)
+    else:
+        fh = io.BufferedReader(_BorrowedStream(stream, 'r'), _READ_BUFFER)
+
+    try:
+        compression = _sniff_compression(fh.peek(6)[:6])
+        if compression is None:
+            return fh
+
+        # only compressed input gets the large raw buffer; plain files are
+        # read in 4 MiB blocks or through a TextIOWrapper that sizes its own reads.
+        # Only a regular file can be reopened: on a pipe or FIFO the peeked
+        # bytes live in this handle's buffer, so it is kept as it is
+        if stream is None and os.path.isfile(filename):
+            fh.close()
+            fh = _open_raw(filename, _READ_BUFFER)
+
+        if compression == 'gzip':
+            stream = gzip.GzipFile(fileobj=fh, mode='rb')
+        elif compression == 'bz2':
+            stream = bz2.BZ2File(fh, mode='rb')
+        elif compression == 'xz':
+            stream = lzma.LZMAFile(fh, mode='rb')
+        else:
+            stream = _zstd_reader(fh)
+
+        return _DecompressedFile(stream, fh)
+
+    except ProtfastaException:
+        fh.close()
+        raise
+    except _DECOMPRESSION_ERRORS as e:
+        fh.close()
+        raise ProtfastaException('Unable to read file: %s\nException: %s' % (filename, e))
+
+
+def _open_bgzf(filename):
+    """Open *filename* for block-parallel reading if it is BGZF-compressed.
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to the file to open.
+
+    Returns
+    -------
+    file object or None
+        A raw (still compressed) binary handle positioned at the first
+        block, or ``None`` if the file is not BGZF.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file cannot be opened.
+    """
+    # a stream cannot be handed to worker processes block by block
+    if is_stream(filename):
+        return None
+
+    fh = _open_raw(filename, _READ_BUFFER)
+    if _bgzf.is_bgzf(fh.peek(18)[:18]):
+        return fh
+    fh.close()
+    return None
+
+
+def _open_fasta(filename):
+    """Open a FASTA file for reading as text, decompressing if needed.
+
+    Text counterpart to :func:`_open_fasta_binary`: the binary stream is
+    decoded with the locale's preferred encoding and universal newlines,
+    exactly as :func:`open` does in text mode.  Errors are converted to
+    :class:`~protfasta.protfasta_exceptions.ProtfastaException` as in
+    :func:`_open_fasta_binary`.
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to the file to open.
+
+    Returns
+    -------
+    file object
+        An open, readable text file handle.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file cannot be opened for any reason.
+    """
+    # wrapping the binary handle is exactly what open(filename, 'r') does, so
+    # plain files decode just as they always have
+    return io.TextIOWrapper(_open_fasta_binary(filename))
+
+
+def _text_encoding() -> str:
+    """Return the encoding :func:`open` uses for text-mode reads.
+
+    The block parser decodes raw bytes itself, and must use the same codec
+    as the text-mode line parser for the two engines to agree on non-ASCII
+    input.  This honours Python's UTF-8 mode just as :func:`open` does.
+    """
+    return locale.getpreferredencoding(False)
+
+
+def _map_fasta(filename):
+    """Memory-map a FASTA file read-only.
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to the file to map.
+
+    Returns
+    -------
+    mmap.mmap or None
+        A read-only mapping of the whole file, or ``None`` if the file is
+        empty, compressed or a stream (see :func:`is_stream`).  None of
+        these can be parsed from a mapping, so callers fall back to the
+        streaming block parser.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file cannot be opened or mapped (for example, a pipe or
+        other non-regular file).
+    """
+    if is_stream(filename):
+        return None
+
+    fh = _open_fasta_binary(filename)
+    try:
+        if isinstance(fh, _DecompressedFile) or os.fstat(fh.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise ProtfastaException('Unable to memory-map file: %s\nException: %s' % (filename, e))
+    finally:
+        # the mapping holds its own reference to the file
+        fh.close()
+
+
 def check_inputs(
     expect_unique_header: bool,
     header_parser: Optional[Callable[[str], str]],
@@ -92,6 +677,23 @@ def check_inputs(
     output_filename: Optional[str],
     verbose: bool,
     correction_dictionary: Optional[dict[str, str]],
+    engine: str = 'line',
+    use_mmap: bool = False,
+    workers: int = 1,
+    lazy: bool = False,
+    return_store: bool = False,
+    encode: Optional[str] = None,
+    cache=False,
+    prefetch: int = 0,
+    batch_size: Optional[int] = None,
+    batch_residues: Optional[int] = None,
+    output_compression: Optional[str] = None,
+    duplicate_memory_limit: Optional[int] = None,
+    duplicate_spill_dir: Optional[Union[str, os.PathLike]] = None,
+    duplicate_filter: Optional[str] = None,
+    duplicate_filter_fpr: float = 0.01,
+    duplicate_digest: str = 'blake2b-16',
+    compact_headers: bool = False,
 ) -> None:
     """Validate all input arguments passed to :func:`read_fasta`.
 
@@ -138,8 +740,9 @@ def check_inputs(
         Whether the caller expects a list (``True``) or dict (``False``)
         return type.
 
-    output_filename : str, os.PathLike, or None
-        Optional path to write the final processed sequences to.
+    output_filename : str, os.PathLike, file object, or None
+        Optional path (``'-'`` for standard output) or writable file
+        object to write the final processed sequences to.
 
     verbose : bool
         Whether to emit informational messages to stdout.
@@ -149,6 +752,84 @@ def check_inputs(
         replacements (e.g. ``{'B': 'N'}``).  Overrides the built-in
         conversion table when provided.
 
+    engine : str, optional
+        Which parser reads the file.  Must be one of ``'line'`` or
+        ``'block'``.  Default ``'line'``.
+
+    use_mmap : bool, optional
+        Whether to memory-map the input file (the public ``mmap``
+        keyword).  Default ``False``.
+
+    workers : int, optional
+        Number of worker processes.  Must be a positive integer.
+        Default 1.
+
+    lazy : bool, optional
+        Whether :func:`read_fasta` should return a lazy mapping.  Options
+        that need every sequence up front (removing records, duplicate
+        sequence checks, returning a list, writing an output file) cannot
+        be combined with it.  Default ``False``.
+
+    return_store : bool, optional
+        Whether :func:`read_fasta` should return a
+        :class:`~protfasta.store.SequenceStore`.  Cannot be combined with
+        *return_list* or *lazy*.  Default ``False``.
+
+    encode : str or None, optional
+        Integer encoding for the returned sequences.  Must be ``None`` or
+        ``'uint8'``, and needs NumPy.  Cannot be combined with *lazy* or
+        *return_store*.  Default ``None``.
+
+    cache : bool, str, os.PathLike or FastaCache, optional
+        Whether (and where) to cache the sanitized records on disk.
+        Cannot be combined with *lazy*.  Default ``False``.
+
+    prefetch : int, optional
+        Number of records :func:`protfasta.read_fasta_stream` may read
+        ahead in a background thread.  Must be a non-negative integer;
+        0 disables the thread.  Default 0.
+
+    batch_size : int or None, optional
+        Number of records per batch yielded by
+        :func:`protfasta.read_fasta_stream`.  Must be ``None`` or a
+        positive integer.  Default ``None``.
+
+    batch_residues : int or None, optional
+        Target number of residues per batch yielded by
+        :func:`protfasta.read_fasta_stream`.  Must be ``None`` or a
+        positive integer.  Default ``None``.
+
+    output_compression : str or None, optional
+        Compression for *output_filename*; ``None`` or one of
+        :data:`OUTPUT_COMPRESSION`.  Default ``None``.
+
+    duplicate_memory_limit : int or None, optional
+        Memory budget in bytes for disk-spilling duplicate-sequence
+        detection in :func:`protfasta.read_fasta_stream`.  Must be
+        ``None`` or a positive integer.  Default ``None``.
+
+    duplicate_spill_dir : str, os.PathLike or None, optional
+        Directory for the spill files.  Default ``None``.
+
+    duplicate_filter : str or None, optional
+        Probabilistic pre-filter for duplicate-sequence detection in
+        :func:`protfasta.read_fasta_stream`.  Must be ``None`` or
+        ``'bloom'``.  Default ``None``.
+
+    duplicate_filter_fpr : float, optional
+        Target false-positive rate of *duplicate_filter*; strictly
+        between 0 and 1.  Default ``0.01``.
+
+    duplicate_digest : str, optional
+        Sequence digest used by the duplicate checks; one of
+        :data:`~protfasta.utilities.SEQUENCE_DIGESTS` whose
+        implementation is available.  Default ``'blake2b-16'``.
+
+    compact_headers : bool, optional
+        Whether headers are kept front-coded (:func:`read_fasta`) or
+        header bookkeeping runs on digests
+        (:func:`protfasta.read_fasta_stream`).  Default ``False``.
+
     Raises
     ------
     ProtfastaException
@@ -193,8 +874,10 @@ def check_inputs(
 
     # check the output_filename
     if output_filename is not None:
-        if not isinstance(output_filename, (str, os.PathLike)):
-            raise ProtfastaException("keyword 'output_filename' must be a string or path-like object")
+        writable = callable(getattr(output_filename, 'write', None))
+        if not isinstance(output_filename, (str, os.PathLike)) and not writable:
+            raise ProtfastaException("keyword 'output_filename' must be a string, path-like object "
+                                     "or writable file object")
 
     # check verbose
     if type(verbose) != bool:
@@ -212,6 +895,98 @@ def check_inputs(
         if type(correction_dictionary) != dict:
             raise ProtfastaException("If provided, keyword 'correction_dictionary' must be a dictionary")
 
+    # check the parser engine
+    if engine not in ['line', 'block']:
+        raise ProtfastaException("keyword 'engine' must be one of 'line', 'block'")
+
+    if type(use_mmap) != bool:
+        raise ProtfastaException("keyword 'mmap' must be a boolean")
+
+    if type(workers) != int or workers < 1:
+        raise ProtfastaException("keyword 'workers' must be a positive integer")
+
+    if type(lazy) != bool:
+        raise ProtfastaException("keyword 'lazy' must be a boolean")
+
+    # a lazy mapping only ever looks at one record at a time, so anything
+    # that decides membership from the sequences themselves is unavailable
+    if lazy:
+        if return_list:
+            raise ProtfastaException("keyword 'lazy' cannot be combined with return_list=True")
+        if output_filename is not None:
+            raise ProtfastaException("keyword 'lazy' cannot be combined with 'output_filename'")
+        if duplicate_sequence_action != 'ignore':
+            raise ProtfastaException("keyword 'lazy' requires duplicate_sequence_action='ignore'")
+        if duplicate_record_action != 'ignore' and not expect_unique_header:
+            raise ProtfastaException("keyword 'lazy' requires duplicate_record_action='ignore' "
+                                     "unless expect_unique_header=True")
+        if invalid_sequence_action in ('remove', 'convert-remove'):
+            raise ProtfastaException("keyword 'lazy' cannot be combined with invalid_sequence_action=%r"
+                                     % (invalid_sequence_action))
+
+    if type(return_store) != bool:
+        raise ProtfastaException("keyword 'return_store' must be a boolean")
+
+    if return_store:
+        if return_list:
+            raise ProtfastaException("keyword 'return_store' cannot be combined with return_list=True")
+        if lazy:
+            raise ProtfastaException("keyword 'return_store' cannot be combined with lazy=True")
+
+    if encode is not None:
+        if encode != 'uint8':
+            raise ProtfastaException("keyword 'encode' must be None or 'uint8'")
+        if lazy or return_store:
+            raise ProtfastaException("keyword 'encode' cannot be combined with lazy=True or return_store=True; "
+                                     "use protfasta.encode.encode_concatenated() on a SequenceStore instead")
+
+        # fail before reading the file if numpy is missing
+        _encode._numpy()
+
+    if type(cache) != bool and not isinstance(cache, (str, os.PathLike, _cache.FastaCache)):
+        raise ProtfastaException("keyword 'cache' must be a boolean, a directory path or a FastaCache")
+
+    if lazy and cache is not False:
+        raise ProtfastaException("keyword 'cache' cannot be combined with lazy=True")
+
+    if type(prefetch) != int or prefetch < 0:
+        raise ProtfastaException("keyword 'prefetch' must be a non-negative integer")
+
+    if batch_size is not None and (type(batch_size) != int or batch_size < 1):
+        raise ProtfastaException("keyword 'batch_size' must be None or a positive integer")
+
+    if batch_residues is not None and (type(batch_residues) != int or batch_residues < 1):
+        raise ProtfastaException("keyword 'batch_residues' must be None or a positive integer")
+
+    if output_compression is not None and output_compression not in OUTPUT_COMPRESSION:
+        raise ProtfastaException("keyword 'output_compression' must be None or one of %s"
+                                 % (', '.join("'%s'" % c for c in OUTPUT_COMPRESSION)))
+
+    if duplicate_memory_limit is not None and (type(duplicate_memory_limit) != int or duplicate_memory_limit < 1):
+        raise ProtfastaException("keyword 'duplicate_memory_limit' must be None or a positive integer (bytes)")
+
+    if duplicate_spill_dir is not None and not isinstance(duplicate_spill_dir, (str, os.PathLike)):
+        raise ProtfastaException("keyword 'duplicate_spill_dir' must be None, a string or a path-like object")
+
+    if duplicate_filter not in (None, 'bloom'):
+        raise ProtfastaException("keyword 'duplicate_filter' must be None or 'bloom'")
+
+    if type(duplicate_filter_fpr) not in (int, float) or not 0 < duplicate_filter_fpr < 1:
+        raise ProtfastaException("keyword 'duplicate_filter_fpr' must be a number strictly between 0 and 1")
+
+    if duplicate_filter is not None and duplicate_memory_limit is not None:
+        raise ProtfastaException("keyword 'duplicate_filter' cannot be combined with 'duplicate_memory_limit'")
+
+    if duplicate_digest not in _utilities.SEQUENCE_DIGESTS:
+        raise ProtfastaException("keyword 'duplicate_digest' must be one of %s"
+                                 % (', '.join("'%s'" % d for d in _utilities.SEQUENCE_DIGESTS)))
+
+    # raises if the implementation (e.g. xxhash) is unavailable
+    _utilities._digest_function(duplicate_digest)
+
+    if type(compact_headers) != bool:
+        raise ProtfastaException("keyword 'compact_headers' must be a boolean")
+
 
 
 
@@ -224,7 +999,11 @@ def internal_parse_fasta_file(
     expect_unique_header: bool = True,
     header_parser: Optional[Callable[[str], str]] = None,
     verbose: bool = False,
-) -> list[list[str]]:
+    engine: str = 'line',
+    use_mmap: bool = False,
+    workers: int = 1,
+    store: bool = False,
+) -> Union[list[list[str]], SequenceStore]:
     """Low-level FASTA file parser.
 
     Reads a FASTA file from disk and returns its contents as a list of
@@ -236,8 +1015,9 @@ def internal_parse_fasta_file(
 
     Parameters
     ----------
-    filename : str
-        Absolute or relative path to a FASTA file.
+    filename : str, os.PathLike or file object
+        Absolute or relative path to a FASTA file, ``'-'`` for standard
+        input, or a readable file object.
 
     expect_unique_header : bool, optional
         If ``True`` (the default), a
@@ -254,11 +1034,32 @@ def internal_parse_fasta_file(
         If ``True``, informational messages are printed to stdout
         during parsing.
 
+    engine : str, optional
+        ``'line'`` (default) parses the file one text line at a time;
+        ``'block'`` reads large binary blocks and splits them into
+        records with C-level byte searches (see
+        :func:`_iter_fasta_blocks`).  Both engines return identical
+        results.
+
+    use_mmap : bool, optional
+        If ``True``, memory-map the file and parse records straight out
+        of the mapping with the block parser (see
+        :func:`_iter_fasta_mmap`).  Implies ``engine='block'``.
+
+    workers : int, optional
+        Number of processes used to decompress and parse a
+        BGZF-compressed file (see :func:`_iter_fasta_bgzf`).  Default 1.
+
+    store : bool, optional
+        If ``True``, pack the records into a
+        :class:`~protfasta.store.SequenceStore` as they are parsed, so a
+        per-record list is never built.  Default ``False``.
+
     Returns
     -------
-    list[list[str]]
-        A list of two-element lists ``[header, sequence]`` in the order
-        they appear in the file.  Sequences are upper-cased.
+    list[list[str]] or SequenceStore
+        A list of two-element lists ``[header, sequence]`` (or a store)
+        in the order they appear in the file.  Sequences are upper-cased.
 
     Raises
     ------
@@ -266,7 +1067,24 @@ def internal_parse_fasta_file(
         If the file cannot be found or a duplicate header is detected
         (when *expect_unique_header* is ``True``).
     """
-        
+
+    if engine == 'block' or use_mmap or workers > 1:
+        if verbose:
+            if use_mmap:
+                mode = 'memory-mapped'
+            elif workers > 1:
+                mode = 'streaming, %i workers' % (workers)
+            else:
+                mode = 'streaming, block engine'
+            print('[INFO]: Read in file %s (%s)' % (filename, mode))
+
+        return _collect_records(
+            _iter_fasta(filename, header_parser=header_parser, engine=engine, use_mmap=use_mmap, workers=workers),
+            expect_unique_header=expect_unique_header,
+            verbose=verbose,
+            store=store,
+        )
+
     # Stream the file line-by-line rather than materializing the whole
     # file with readlines().  This keeps peak memory to O(single record)
     # which is essential for multi-gigabyte FASTA files.
@@ -276,12 +1094,84 @@ def internal_parse_fasta_file(
         print('[INFO]: Read in file %s (streaming)' % (filename))
 
     with fh:
-        return _parse_fasta_all(
-            fh,
-            expect_unique_header=expect_unique_header,
-            header_parser=header_parser,
-            verbose=verbose,
-        )
+        try:
+            return _parse_fasta_all(
+                fh,
+                expect_unique_header=expect_unique_header,
+                header_parser=header_parser,
+                verbose=verbose,
+                store=store,
+            )
+        except _DECOMPRESSION_ERRORS as e:
+            raise ProtfastaException('Unable to read file: %s\nException: %s' % (filename, e))
+
+
+####################################################################################################
+#
+#
+def _collect_records(
+    records: Iterable[tuple[str, str]],
+    expect_unique_header: bool = True,
+    verbose: bool = False,
+    store: bool = False,
+) -> Union[list[list[str]], SequenceStore]:
+    """Materialize parsed ``(header, sequence)`` pairs into a list.
+
+    The list-building half of :func:`_parse_fasta_all`, for record
+    sources that have already done their own parsing (such as the block
+    engine).  Header uniqueness is checked exactly as in
+    :func:`_parse_fasta_all`.
+
+    Parameters
+    ----------
+    records : Iterable[tuple[str, str]]
+        ``(header, sequence)`` pairs in file order.
+
+    expect_unique_header : bool, optional
+        If ``True`` (the default), raise on the first duplicate header.
+
+    verbose : bool, optional
+        If ``True``, prints the number of recovered sequences to stdout.
+
+    store : bool, optional
+        If ``True``, pack the records into a
+        :class:`~protfasta.store.SequenceStore` as they arrive instead of
+        building a list.  The header-uniqueness check then keeps a
+        16-byte digest of each header rather than the ``str`` itself,
+        which the store does not retain.  Default ``False``.
+
+    Returns
+    -------
+    list[list[str]] or SequenceStore
+        A list of two-element lists ``[header, sequence]``, or a store of
+        the same records when *store* is ``True``.
+
+    Raises
+    ------
+    ProtfastaException
+        If *expect_unique_header* is ``True`` and a duplicate header is
+        found.
+    """
+    seen_headers: Optional[set[str]] = set() if expect_unique_header else None
+
+    # a list keeps every header string anyway, so the set shares them; a
+    # store does not, so the set holds fixed-size digests instead
+    header_key = _header_digest if store else None
+
+    return_data: Union[list[list[str]], SequenceStore] = SequenceStore() if store else []
+
+    for header, seq in records:
+        if seen_headers is not None:
+            key = header_key(header) if header_key else header
+            if key in seen_headers:
+                raise ProtfastaException('Found duplicate header (%s)' % (header))
+            seen_headers.add(key)
+        return_data.append((header, seq) if store else [header, seq])
+
+    if verbose:
+        print('[INFO]: Parsed file to recover %i sequences' % (len(return_data)))
+
+    return return_data
 
 
 ####################################################################################################
@@ -292,7 +1182,8 @@ def _parse_fasta_all(
     expect_unique_header: bool = True,
     header_parser: Optional[Callable[[str], str]] = None,
     verbose: bool = False,
-) -> list[list[str]]:
+    store: bool = False,
+) -> Union[list[list[str]], SequenceStore]:
     """Parse FASTA content into ``[header, sequence]`` pairs.
 
     This is the core parsing engine used by
@@ -323,9 +1214,13 @@ def _parse_fasta_all(
     verbose : bool, optional
         If ``True``, prints the number of recovered sequences to stdout.
 
+    store : bool, optional
+        If ``True``, return a :class:`~protfasta.store.SequenceStore`
+        instead of a list.  Default ``False``.
+
     Returns
     -------
-    list[list[str]]
+    list[list[str]] or SequenceStore
         A list of two-element lists ``[header, sequence]``.  Sequences
         are upper-cased and concatenated from any multi-line runs in the
         input.
@@ -337,62 +1232,12 @@ def _parse_fasta_all(
         found.
     """
 
-    return_data: list[list[str]] = []
-
-    # Only allocate a header-tracking set when we actually need it.
-    # Using a set (not a dict-with-True-values) saves memory; skipping
-    # it entirely when expect_unique_header is False saves even more
-    # on files with hundreds of millions of records.
-    seen_headers: Optional[set[str]] = set() if expect_unique_header else None
-
-    # Accumulate sequence lines into a list and join once per record;
-    # this is O(n) per sequence instead of the O(n^2) that repeated
-    # string concatenation can degenerate into.
-    seq_parts: list[str] = []
-    header = ''
-    have_record = False
-
-    for line in content:
-
-        # rstrip() handles \n, \r, and any trailing whitespace in one
-        # C-level pass.  This is cheaper than a full strip() and a
-        # subsequent test, since most FASTA lines have no leading WS.
-        line = line.rstrip()
-
-        if not line:
-            continue
-
-        if line[0] == '>':
-            # Flush the previous record, but only if we accumulated at
-            # least one sequence line (matching the original behaviour
-            # of silently skipping headers with no sequence).
-            if have_record and seq_parts:
-                if seen_headers is not None:
-                    if header in seen_headers:
-                        raise ProtfastaException('Found duplicate header (%s)' % (header))
-                    seen_headers.add(header)
-                return_data.append([header, ''.join(seq_parts).upper()])
-
-            # Start the new record.
-            h = line[1:]
-            header = header_parser(h) if header_parser else h
-            seq_parts = []
-            have_record = True
-        else:
-            seq_parts.append(line)
-
-    # Flush the final record if the file didn't end with a blank line.
-    if have_record and seq_parts:
-        if seen_headers is not None:
-            if header in seen_headers:
-                raise ProtfastaException('Found duplicate header (%s)' % (header))
-            seen_headers.add(header)
-        return_data.append([header, ''.join(seq_parts).upper()])
-
-    if verbose:
-        print('[INFO]: Parsed file to recover %i sequences' % (len(return_data)))
-
-    return return_data
+    return _collect_records(
+        _iter_lines(content, header_parser),
+        expect_unique_header=expect_unique_header,
+        verbose=verbose,
+        store=store,
+    )
 
 
 
@@ -402,6 +1247,9 @@ def _parse_fasta_all(
 def _iter_fasta(
     filename: str,
     header_parser: Optional[Callable[[str], str]] = None,
+    engine: str = 'line',
+    use_mmap: bool = False,
+    workers: int = 1,
 ):
     """Yield raw ``(header, sequence)`` pairs from a FASTA file, streaming.
 
@@ -418,12 +1266,28 @@ def _iter_fasta(
 
     Parameters
     ----------
-    filename : str
-        Path to a FASTA file.
+    filename : str, os.PathLike or file object
+        Path to a FASTA file, ``'-'`` for standard input, or a readable
+        file object (see :func:`_open_fasta_binary`).
 
     header_parser : callable or None, optional
         Optional ``(str) -> str`` transform applied to every raw header.
 
+    engine : str, optional
+        ``'line'`` (default) or ``'block'``.  With ``'block'`` the file
+        is read in large binary blocks by :func:`_iter_fasta_blocks`
+        (peak memory is then ``O(block + single record)``).  Both
+        engines yield identical records.
+
+    use_mmap : bool, optional
+        If ``True``, memory-map the file and parse it with
+        :func:`_iter_fasta_mmap` (implies ``engine='block'``).
+
+    workers : int, optional
+        If greater than 1 and the file is BGZF-compressed, decompress and
+        parse its blocks in a pool of this many processes (see
+        :func:`_iter_fasta_bgzf`).  Otherwise ignored.  Default 1.
+
     Yields
     ------
     tuple[str, str]
@@ -435,32 +1299,415 @@ def _iter_fasta(
     ProtfastaException
         If the file cannot be opened.
     """
-    fh = _open_fasta(filename)
+    encoding = _text_encoding()
+
+    handle = _map_fasta(filename) if use_mmap else None
+    if handle is not None:
+        records = _iter_fasta_mmap(handle, encoding)
+    else:
+        handle = _open_bgzf(filename) if workers > 1 else None
+        if handle is not None:
+            records = _iter_fasta_bgzf(handle, encoding, workers)
+        elif engine == 'block' or use_mmap:
+            handle = _open_fasta_binary(filename)
+            records = _iter_fasta_blocks(handle, encoding)
+        else:
+            handle = _open_fasta(filename)
+            records = _iter_lines(handle)
+
+    try:
+        if header_parser:
+            for header, seq in records:
+                yield (header_parser(header), seq)
+        else:
+            yield from records
+    except _DECOMPRESSION_ERRORS as e:
+        raise ProtfastaException('Unable to read file: %s\nException: %s' % (filename, e))
+    finally:
+        handle.close()
 
+
+####################################################################################################
+#
+#
+def _iter_lines(
+    lines: Iterable[str],
+    header_parser: Optional[Callable[[str], str]] = None,
+):
+    """Yield ``(header, sequence)`` pairs from an iterable of text lines.
+
+    This is the line-oriented state machine shared by the ``'line'``
+    engine and by the block engine's fallback path.  Lines are
+    right-stripped, blank lines are skipped, and headers with no
+    sequence lines are dropped.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        Lines of FASTA text, optionally newline-terminated.
+
+    header_parser : callable or None, optional
+        Optional ``(str) -> str`` transform applied to every raw header.
+
+    Yields
+    ------
+    tuple[str, str]
+        ``(header, sequence)`` pairs.  Sequences are upper-cased.
+    """
     seq_parts: list[str] = []
     header = ''
     have_record = False
 
+    for line in lines:
+        line = line.rstrip()
+        if not line:
+            continue
+
+        if line[0] == '>':
+            if have_record and seq_parts:
+                yield (header, ''.join(seq_parts).upper())
+            h = line[1:]
+            header = header_parser(h) if header_parser else h
+            seq_parts = []
+            have_record = True
+        else:
+            seq_parts.append(line)
+
+    if have_record and seq_parts:
+        yield (header, ''.join(seq_parts).upper())
+
+
+####################################################################################################
+#
+#
+def _iter_fasta_blocks(fh, encoding: str, block_size: int = _BLOCK_SIZE):
+    """Yield raw ``(header, sequence)`` pairs from a binary stream in blocks.
+
+    This is the ``'block'`` engine.  Rather than decoding and stripping
+    the file one line at a time, it reads *block_size* bytes at once and
+    cuts the data after the last ``b'\\n>'`` -- a boundary that always
+    starts a new record -- so each flushed segment holds only complete
+    records.  The unfinished tail is carried into the next block.
+    Segments are then split into records by :func:`_iter_block_segment`.
+
+    Output is identical to the ``'line'`` engine (see
+    :func:`_iter_block_segment` for how that is guaranteed).  Headers are
+    returned raw; any header parser is applied by the caller.
+
+    Parameters
+    ----------
+    fh : file object
+        An open, readable binary file handle.
+
+    encoding : str
+        Codec used to decode headers and non-ASCII sequences.  Should
+        match the codec the line engine would use (see
+        :func:`_text_encoding`).
+
+    block_size : int, optional
+        Number of bytes to read per block.  Default 4 MiB.
+
+    Yields
+    ------
+    tuple[str, str]
+        ``(header, sequence)`` pairs in file order.  Sequences are
+        upper-cased.
+    """
+    # Pieces of the current unfinished segment. They are only joined once a
+    # record boundary turns up, so a record spanning many blocks is still
+    # copied a constant number of times.
+    parts: list[bytes] = []
+
+    while True:
+        block = fh.read(block_size)
+        if not block:
+            break
+
+        cut = block.rfind(b'\n>')
+        if cut == -1:
+            parts.append(block)
+            continue
+
+        parts.append(block[:cut + 1])
+        yield from _iter_block_segment(b''.join(parts), encoding)
+        parts = [block[cut + 1:]]
+
+    if parts:
+        yield from _iter_block_segment(b''.join(parts), encoding)
+
+
+####################################################################################################
+#
+#
+def _iter_fasta_mmap(buf, encoding: str, window: int = _BLOCK_SIZE, start: int = 0, end: Optional[int] = None):
+    """Yield raw ``(header, sequence)`` pairs from a memory-mapped file.
+
+    The mapping is walked in windows of roughly *window* bytes.  Each
+    window is trimmed back to the last ``b'\\n>'`` record boundary it
+    contains (or stretched forward to the next one, for a record longer
+    than the window) and sliced straight out of the mapping, so the
+    bytes move from the OS page cache into the segment in one copy with
+    no intermediate file buffer, and no partial records need to be
+    carried between reads.  Segments are parsed by
+    :func:`_iter_block_segment`, so output is identical to the other
+    engines.
+
+    Because the pages belong to the OS page cache, any number of
+    processes mapping the same file share a single copy of it.
+
+    Parameters
+    ----------
+    buf : mmap.mmap or bytes-like
+        The mapped file.  Anything supporting ``len``, ``find``,
+        ``rfind`` and slicing works, which keeps this easy to test.
+
+    encoding : str
+        Codec used to decode headers and non-ASCII sequences.
+
+    window : int, optional
+        Target segment size in bytes.  Default 4 MiB.
+
+    start, end : int, optional
+        Byte range of *buf* to parse (default: all of it).  *start* must
+        be 0 or the ``'>'`` of a header at the start of a line, and *end*
+        must fall just after a newline or at the end of *buf*.
+
+    Yields
+    ------
+    tuple[str, str]
+        ``(header, sequence)`` pairs in file order.
+    """
+    end = len(buf) if end is None else end
+
+    while start < end:
+        stop = start + window
+        if stop >= end:
+            stop = end
+        else:
+            cut = buf.rfind(b'\n>', start, stop)
+            if cut == -1:
+                cut = buf.find(b'\n>', stop, end)
+            stop = end if cut == -1 else cut + 1
+
+        yield from _iter_block_segment(buf[start:stop], encoding)
+        start = stop
+
+
+####################################################################################################
+#
+#
+def _iter_fasta_bgzf(fh, encoding: str, workers: int, batch_size: int = _BLOCK_SIZE):
+    """Yield raw ``(header, sequence)`` pairs from a BGZF file using a process pool.
+
+    BGZF blocks are independent gzip members, so the parent only walks
+    the block headers (see :func:`protfasta._bgzf.iter_blocks`) and groups
+    consecutive blocks into batches of roughly *batch_size* uncompressed
+    bytes.  Each batch is decompressed and parsed in a worker by
+    :func:`_parse_bgzf_batch`, and results are consumed strictly in
+    submission order, so records come out in file order.  At most
+    ``2 * workers`` batches are in flight, which bounds memory no matter
+    how far the workers get ahead of the consumer.
+
+    Batch edges fall at arbitrary byte offsets, so each worker returns
+    the bytes before its first ``b'\\n>'`` boundary and after its last
+    one unparsed; the parent joins each batch's trailing bytes to the
+    next batch's leading bytes, which yields complete records that are
+    parsed by :func:`_iter_block_segment` exactly as the block engine
+    would.
+
+    Parameters
+    ----------
+    fh : binary file object
+        Raw BGZF stream positioned at the first block.
+
+    encoding : str
+        Codec used to decode headers and non-ASCII sequences.
+
+    workers : int
+        Number of worker processes.
+
+    batch_size : int, optional
+        Target uncompressed size of each batch in bytes.  Default 4 MiB.
+
+    Yields
+    ------
+    tuple[str, str]
+        ``(header, sequence)`` pairs in file order.
+    """
+
+    def batches():
+        batch = []
+        size = 0
+        for block, block_size in _bgzf.iter_blocks(fh):
+            batch.append(block)
+            size += block_size
+            if size >= batch_size:
+                yield batch
+                batch = []
+                size = 0
+        if batch:
+            yield batch
+
+    def results(pool):
+        pending = deque()
+        for batch in batches():
+            pending.append(pool.submit(_parse_bgzf_batch, batch, encoding))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    pool = ProcessPoolExecutor(max_workers=workers)
     try:
-        for line in fh:
-            line = line.rstrip()
-            if not line:
+        # bytes of the record (or preamble) that straddles batch edges
+        parts = []
+        for head, records, tail in results(pool):
+            parts.append(head)
+            if records is None:
                 continue
+            yield from _iter_block_segment(b''.join(parts), encoding)
+            yield from records
+            parts = [tail]
 
-            if line[0] == '>':
-                if have_record and seq_parts:
-                    yield (header, ''.join(seq_parts).upper())
-                h = line[1:]
-                header = header_parser(h) if header_parser else h
-                seq_parts = []
-                have_record = True
-            else:
-                seq_parts.append(line)
-
-        if have_record and seq_parts:
-            yield (header, ''.join(seq_parts).upper())
+        if parts:
+            yield from _iter_block_segment(b''.join(parts), encoding)
     finally:
-        fh.close()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _parse_bgzf_batch(blocks: list[bytes], encoding: str):
+    """Decompress and parse one batch of BGZF blocks (worker-side).
+
+    Parameters
+    ----------
+    blocks : list[bytes]
+        Consecutive BGZF blocks.
+
+    encoding : str
+        Codec used to decode headers and non-ASCII sequences.
+
+    Returns
+    -------
+    tuple
+        ``(head, records, tail)``.  *head* is the raw bytes up to and
+        including the newline of the first ``b'\\n>'`` boundary, *records*
+        the parsed ``(header, sequence)`` pairs between the first and
+        last boundaries, and *tail* the raw bytes from the last boundary's
+        ``'>'`` onwards.  If the batch holds no boundary, *head* is the
+        whole batch, *records* is ``None`` and *tail* is empty.
+    """
+    data = b''.join([_bgzf.decompress_block(block) for block in blocks])
+
+    first = data.find(b'\n>')
+    if first == -1:
+        return (data, None, b'')
+
+    last = data.rfind(b'\n>')
+    records = list(_iter_block_segment(data[first + 1:last + 1], encoding)) if last > first else []
+    return (data[:first + 1], records, data[last + 1:])
+
+
+####################################################################################################
+#
+#
+def _iter_block_segment(segment: bytes, encoding: str):
+    """Yield the records held in a segment of raw FASTA bytes.
+
+    The segment must end at a line boundary (or the end of the file), and
+    either begin with ``'>'`` or be the very start of the file, in which
+    case any text before the first header is skipped just as the line
+    engine skips it.
+
+    The whole segment is split into records with a single
+    ``bytes.split(b'\\n>')`` and each record's sequence lines are joined
+    and upper-cased by one C-level ``bytes.translate`` call that deletes
+    newlines.  That is only equivalent to the line engine's per-line
+    ``rstrip()`` when no line carries trailing whitespace, so the fast
+    path is taken only when every remaining byte is printable, non-space
+    ASCII (anything else is flagged by :data:`_BLOCK_TABLE`).  Anything
+    else -- spaces, tabs, control characters, non-ASCII text -- falls
+    back to decoding the body and stripping it line by line (see
+    :func:`_strip_sequence_lines`).  A record containing a bare carriage
+    return, which text mode treats as a line break that may even start a
+    new header, is handed to the line state machine wholesale.
+
+    Parameters
+    ----------
+    segment : bytes
+        Raw FASTA bytes holding only complete records.
+
+    encoding : str
+        Codec used to decode headers and non-ASCII sequences.
+
+    Yields
+    ------
+    tuple[str, str]
+        Raw ``(header, sequence)`` pairs.  Headers with no sequence lines
+        are dropped.
+    """
+    records = segment.split(b'\n>')
+
+    if records[0][:1] == b'>':
+        records[0] = records[0][1:]
+    else:
+        # leading text before the first header; a bare carriage return
+        # followed by '>' ends a line (and so starts a header) in text mode
+        preamble = records.pop(0)
+        if b'\r>' in preamble:
+            yield from _iter_text_chunk(preamble, encoding)
+
+    has_cr = b'\r' in segment
+
+    for rec in records:
+        if has_cr and b'\r' in rec:
+            # split() consumed the '\n' after a trailing '\r', so discount it
+            lone_cr = rec.count(b'\r') - rec.count(b'\r\n') - rec.endswith(b'\r')
+            if lone_cr:
+                yield from _iter_text_chunk(b'>' + rec, encoding)
+                continue
+            header, _, body = rec.partition(b'\n')
+            seq = body.translate(_BLOCK_TABLE, b'\r\n')
+        else:
+            header, _, body = rec.partition(b'\n')
+            seq = body.translate(_BLOCK_TABLE, b'\n')
+
+        if b'\x00' not in seq:
+            if seq:
+                yield (header.decode(encoding).rstrip(), seq.decode('ascii'))
+        else:
+            sequence = _strip_sequence_lines(body, encoding)
+            if sequence:
+                yield (header.decode(encoding).rstrip(), sequence)
+
+
+####################################################################################################
+#
+#
+def _strip_sequence_lines(body: bytes, encoding: str) -> str:
+    """Join a record's sequence lines exactly as the line engine would.
+
+    Slow path of :func:`_iter_block_segment`: decode the body, right-strip
+    every line, join and upper-case.  The body must not contain a bare
+    carriage return (``\\r\\n`` line endings are fine).
+    """
+    text = body.decode(encoding)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+    return ''.join([line.rstrip() for line in text.split('\n')]).upper()
+
+
+####################################################################################################
+#
+#
+def _iter_text_chunk(chunk: bytes, encoding: str):
+    """Parse raw bytes with the line engine's universal-newline semantics.
+
+    Slow fallback for the block engine: the chunk is decoded, every
+    ``\\r\\n``/``\\r`` line ending is normalised to ``\\n`` (as text-mode
+    :func:`open` does) and the lines are run through :func:`_iter_lines`.
+    """
+    text = chunk.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+    yield from _iter_lines(text.split('\n'))
 
 
 ####################################################################################################
@@ -497,14 +1744,154 @@ def _write_stream_record(fh, header: str, seq: str, linelength: int = 60) -> Non
     if len(seq) < 1:
         raise ProtfastaException('Sequence associated with [%s] is empty' % (header))
 
-    fh.write('>')
-    fh.write(header)
-    fh.write('\n')
-    for start in range(0, len(seq), linelength):
-        fh.write(seq[start:start + linelength])
-        fh.write('\n')
-    # Blank separator line between records.
-    fh.write('\n')
+    # one write per record, with a blank separator line after it
+    if len(seq) > linelength:
+        seq = '\n'.join([seq[start:start + linelength] for start in range(0, len(seq), linelength)])
+    fh.write('>%s\n%s\n\n' % (header, seq))
+
+
+####################################################################################################
+#
+#
+def _sequence_digests(
+    records: Iterator[tuple[str, str]],
+    expect_unique_header: bool,
+    duplicate_record_action: str,
+    digest_function: Callable[[str], bytes] = _utilities._seq_hash,
+    compact_headers: bool = False,
+) -> Iterator[tuple[int, bytes]]:
+    """Yield ``(ordinal, digest)`` for each record that reaches the duplicate-sequence check.
+
+    The first pass of disk-spilling duplicate detection in
+    :func:`_stream_fasta`.  Ordinals count every record read, from 1.
+    Records the duplicate-record check removes are skipped, and the pass
+    stops at the first record the header or duplicate-record check would
+    fail on, since the second pass raises there and never reads further.
+    With *compact_headers*, headers are tracked by digest.
+    """
+    seen_headers: Optional[set[str]] = set() if expect_unique_header else None
+    record_lookup: Optional[dict[str, set[bytes]]] = (
+        {} if duplicate_record_action in ('fail', 'remove') else None
+    )
+
+    try:
+        for (ordinal, (header, seq)) in enumerate(records, 1):
+            digest = digest_function(seq)
+            if compact_headers:
+                header = _header_digest(header)
+
+            if seen_headers is not None:
+                if header in seen_headers:
+                    return
+                seen_headers.add(header)
+
+            if record_lookup is not None:
+                seen = record_lookup.get(header)
+                if seen is None:
+                    record_lookup[header] = {digest}
+                elif digest in seen:
+                    if duplicate_record_action == 'fail':
+                        return
+                    continue
+                else:
+                    seen.add(digest)
+
+            yield (ordinal, digest)
+    finally:
+        close = getattr(records, 'close', None)
+        if close is not None:
+            close()
+
+
+####################################################################################################
+#
+#
+def _iter_prefetch(records: Callable[[], Iterable[tuple[str, str]]], prefetch: int,
+                   digest_function: Optional[Callable[[str], bytes]]):
+    """Run *records* in a background thread, up to *prefetch* records ahead.
+
+    Used by :func:`_stream_fasta` (``read_fasta_stream(..., prefetch=N)``)
+    so that reading, decompression, parsing and sequence digesting
+    overlap with whatever the consumer does between records.  The thread
+    hands records over in batches through a bounded queue; when the queue
+    is full it waits, so at most about *prefetch* records are held ahead
+    of the consumer.  Records come out in file order, and an exception
+    raised in the thread is re-raised here, at the point in the stream
+    where it occurred.
+
+    Parameters
+    ----------
+    records : callable
+        Zero-argument callable returning the ``(header, sequence)``
+        iterator.  It is called, and consumed, in the background thread.
+
+    prefetch : int
+        Maximum number of records read ahead.  Must be positive.
+
+    digest_function : callable or None
+        If given, the thread also computes each sequence's duplicate
+        digest with it (e.g. :func:`~protfasta.utilities._seq_hash`).
+
+    Yields
+    ------
+    tuple[str, str, bytes]
+        ``(header, sequence, digest)``, where *digest* is ``b''`` unless
+        requested.
+    """
+    batch_size = min(prefetch, _PREFETCH_BATCH)
+    handoff = queue.Queue(maxsize=max(1, prefetch // batch_size))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # give up if the consumer stopped iterating
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=_PREFETCH_POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        batch = []
+        try:
+            source = records()
+            try:
+                for (header, seq) in source:
+                    batch.append((header, seq, digest_function(seq) if digest_function is not None else b''))
+                    if len(batch) >= batch_size:
+                        if not put(batch):
+                            return
+                        batch = []
+                if batch and not put(batch):
+                    return
+            finally:
+                close = getattr(source, 'close', None)
+                if close is not None:
+                    close()
+        except BaseException as e:
+            # hand over the records read before the error first, so the
+            # consumer sees the same prefix whatever prefetch is
+            if not batch or put(batch):
+                put(e)
+            return
+        put(None)
+
+    thread = threading.Thread(target=produce, name='protfasta-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = handoff.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield from item
+    finally:
+        # the consumer finished, failed or abandoned the stream: release the
+        # thread (which closes the file) and wait for it
+        stop.set()
+        thread.join()
 
 
 ####################################################################################################
@@ -522,7 +1909,21 @@ def _stream_fasta(
     output_filename: Optional[str] = None,
     correction_dictionary: Optional[dict[str, str]] = None,
     verbose: bool = False,
-) -> Iterator[Union[tuple[str, str], list[str]]]:
+    engine: str = 'line',
+    use_mmap: bool = False,
+    workers: int = 1,
+    prefetch: int = 0,
+    batch_size: Optional[int] = None,
+    batch_residues: Optional[int] = None,
+    return_store: bool = False,
+    output_compression: Optional[str] = None,
+    duplicate_memory_limit: Optional[int] = None,
+    duplicate_spill_dir: Optional[Union[str, os.PathLike]] = None,
+    duplicate_filter: Optional[str] = None,
+    duplicate_filter_fpr: float = 0.01,
+    duplicate_digest: str = 'blake2b-16',
+    compact_headers: bool = False,
+) -> Iterator[Union[tuple[str, str], list[str], list, SequenceStore]]:
     """Stream a FASTA file record-by-record with full sanitization.
 
     This is the streaming engine behind :func:`protfasta.read_fasta_stream`.
@@ -548,8 +1949,9 @@ def _stream_fasta(
 
     Parameters
     ----------
-    filename : str
-        Path to the FASTA file to read.
+    filename : str, os.PathLike or file object
+        Path to the FASTA file to read, ``'-'`` for standard input, or a
+        readable file object.
 
     expect_unique_header : bool, optional
         If ``True`` (default), raise on the first duplicate header.
@@ -578,8 +1980,9 @@ def _stream_fasta(
         If ``True``, yield ``[header, sequence]`` lists; otherwise yield
         ``(header, sequence)`` tuples (default).
 
-    output_filename : str or None, optional
-        If provided, each sanitized record is written to this path as it
+    output_filename : str, file object or None, optional
+        If provided, each sanitized record is written to this path (or
+        ``'-'``, or writable file object; see :func:`_open_output`) as it
         is yielded.  The output file is only complete once the generator
         has been fully consumed.
 
@@ -591,11 +1994,81 @@ def _stream_fasta(
         If ``True``, emit an opening message and, when the generator is
         exhausted, a summary of removed/converted counts.
 
+    engine : str, optional
+        ``'line'`` (default) or ``'block'``; see :func:`_iter_fasta`.
+
+    use_mmap : bool, optional
+        If ``True``, memory-map the input; see :func:`_iter_fasta`.
+
+    workers : int, optional
+        Worker processes for BGZF input; see :func:`_iter_fasta`.
+
+    prefetch : int, optional
+        If positive, reading, parsing and digesting run up to this many
+        records ahead in a background thread (see
+        :func:`_iter_prefetch`).  Default 0.
+
+    batch_size : int or None, optional
+        If set, yield lists of up to this many records instead of single
+        records.  Default ``None``.
+
+    batch_residues : int or None, optional
+        If set, yield a batch as soon as it holds at least this many
+        residues (so one long sequence can make up a batch on its own).
+        Combined with *batch_size*, whichever limit is reached first
+        closes the batch.  Default ``None``.
+
+    return_store : bool, optional
+        If ``True`` (only with batching), each batch is a
+        :class:`~protfasta.store.SequenceStore` rather than a list.
+        Default ``False``.
+
+    output_compression : str or None, optional
+        Compress *output_filename* with ``'gzip'``, ``'bgzf'`` or
+        ``'xz'``; see :func:`_open_output`.  Default ``None``.
+
+    duplicate_memory_limit : int or None, optional
+        If set (with *duplicate_sequence_action* ``'fail'`` or
+        ``'remove'``), find duplicate sequences in a first pass over the
+        file with :func:`protfasta.dedup.spill_duplicates`, which keeps
+        at most about this many bytes of digests in memory and spills
+        the rest to disk, instead of holding every digest in a
+        dictionary.  *filename* must be a path (it is read twice).
+        Default ``None``.
+
+    duplicate_spill_dir : str, os.PathLike or None, optional
+        Directory for the spill files.  ``None`` uses the system
+        temporary directory.
+
+    duplicate_filter : str or None, optional
+        ``'bloom'`` (with *duplicate_sequence_action* ``'fail'`` or
+        ``'remove'``) runs every digest through a Bloom filter in a first
+        pass over the file (:func:`protfasta.dedup.bloom_candidates`);
+        the exact lookup table then only stores and checks the digests
+        the filter flagged.  *filename* must be a path.  Default
+        ``None``.
+
+    duplicate_filter_fpr : float, optional
+        Target false-positive rate of the filter.  Default ``0.01``.
+
+    duplicate_digest : str, optional
+        Sequence digest used by the duplicate-record and
+        duplicate-sequence checks (see
+        :func:`~protfasta.utilities._digest_function`).  Default
+        ``'blake2b-16'``.
+
+    compact_headers : bool, optional
+        If ``True``, the header-uniqueness and duplicate-record checks
+        key on a 16-byte digest of each header instead of holding the
+        header string.  Default ``False``.
+
     Yields
     ------
-    tuple[str, str] or list[str]
+    tuple[str, str], list[str], list or SequenceStore
         ``(header, sequence)`` pairs (or ``[header, sequence]`` lists when
-        *return_list* is ``True``) in file order.  Sequences are
+        *return_list* is ``True``) in file order, or -- with
+        *batch_size* or *batch_residues* -- non-empty batches of them (a
+        list, or a SequenceStore with *return_store*).  Sequences are
         upper-cased and sanitized.
 
     Raises
@@ -616,12 +2089,30 @@ def _stream_fasta(
     )
 
     # duplicate sequences: sequence digest -> first header seen (the header
-    # is retained so the 'fail' message can name both offenders).
+    # is retained so the 'fail' message can name both offenders). With a
+    # memory limit the duplicates are instead found up front, on disk.
+    spill = duplicate_memory_limit is not None and duplicate_sequence_action in ('fail', 'remove')
     seq_lookup: Optional[dict[bytes, str]] = (
-        {} if duplicate_sequence_action in ('fail', 'remove') else None
+        {} if duplicate_sequence_action in ('fail', 'remove') and not spill else None
     )
+    spill_dups = None
+
+    # with a pre-filter, only digests it flags as possible repeats (found
+    # in a first pass) ever enter seq_lookup
+    candidates: Optional[set[bytes]] = None
 
     need_digest = record_lookup is not None or seq_lookup is not None
+    digest_function = _utilities._digest_function(duplicate_digest)
+
+    # header bookkeeping on fixed-size digests rather than header strings
+    tracks_headers = seen_headers is not None or record_lookup is not None
+    header_key = _header_digest if compact_headers and tracks_headers else None
+
+    # batched output: records are collected here and yielded a batch at a
+    # time, so the generator resumes once per batch rather than per record
+    batching = batch_size is not None or batch_residues is not None
+    batch = SequenceStore() if return_store else []
+    batch_residue_count = 0
 
     n_read = 0
     n_yielded = 0
@@ -631,28 +2122,58 @@ def _stream_fasta(
     n_converted = 0
 
     # Large write buffer to minimise syscall overhead, matching write_fasta.
-    out_fh = open(output_filename, 'w', buffering=1024 * 1024) if output_filename else None
+    out_fh = _open_output(output_filename, compression=output_compression) if output_filename else None
 
     if verbose:
         print('[INFO]: Streaming file %s' % (filename))
 
+    records = None
     try:
-        for header, seq in _iter_fasta(filename, header_parser=header_parser):
+        records = functools.partial(_iter_fasta, filename, header_parser=header_parser, engine=engine,
+                                    use_mmap=use_mmap, workers=workers)
+
+        # first pass: the ordinal of every duplicate sequence (and of its
+        # first occurrence), in file order
+        if spill:
+            digests = _sequence_digests(records(), expect_unique_header, duplicate_record_action, digest_function,
+                                        compact_headers)
+            spill_dups = _dedup.spill_duplicates(digests, duplicate_memory_limit, duplicate_spill_dir)
+            (dup_at, first_at) = next(spill_dups, (0, 0))
+            first_header = None
+
+        elif seq_lookup is not None and duplicate_filter == 'bloom':
+            digests = _sequence_digests(records(), expect_unique_header, duplicate_record_action, digest_function,
+                                        compact_headers)
+            candidates = _dedup.bloom_candidates(digests, _dedup.estimate_records(filename), duplicate_filter_fpr)
+            if verbose:
+                print('[INFO]: Duplicate filter flagged %i candidate sequences' % (len(candidates)))
+
+        if prefetch:
+            records = _iter_prefetch(records, prefetch, digest_function if need_digest else None)
+        else:
+            records = records()
+
+        for record in records:
             n_read += 1
+            if prefetch:
+                (header, seq, digest) = record
+            else:
+                (header, seq) = record
+                digest = digest_function(seq) if need_digest else b''
+
+            key = header_key(header) if header_key else header
 
             # 1. header uniqueness
             if seen_headers is not None:
-                if header in seen_headers:
+                if key in seen_headers:
                     raise ProtfastaException('Found duplicate header (%s)' % (header))
-                seen_headers.add(header)
-
-            digest = _utilities._seq_hash(seq) if need_digest else b''
+                seen_headers.add(key)
 
             # 2. duplicate records (identical header AND sequence)
             if record_lookup is not None:
-                seen = record_lookup.get(header)
+                seen = record_lookup.get(key)
                 if seen is None:
-                    record_lookup[header] = {digest}
+                    record_lookup[key] = {digest}
                 elif digest in seen:
                     if duplicate_record_action == 'fail':
                         raise ProtfastaException('Found duplicate entries of the following record\n:>%s\n%s' % (header, seq))
@@ -662,7 +2183,7 @@ def _stream_fasta(
                     seen.add(digest)
 
             # 3. duplicate sequences (identical sequence, any header)
-            if seq_lookup is not None:
+            if seq_lookup is not None and (candidates is None or digest in candidates):
                 if digest in seq_lookup:
                     if duplicate_sequence_action == 'fail':
                         raise ProtfastaException('Found duplicate sequences associated with the following headers\n1. %s\n\n2. %s' % (seq_lookup[digest], header))
@@ -670,6 +2191,17 @@ def _stream_fasta(
                     continue
                 seq_lookup[digest] = header
 
+            elif spill:
+                if n_read == first_at:
+                    first_header = header
+                if n_read == dup_at:
+                    if duplicate_sequence_action == 'fail':
+                        raise ProtfastaException('Found duplicate sequences associated with the following headers'
+                                                 '\n1. %s\n\n2. %s' % (first_header, header))
+                    n_dup_seqs_removed += 1
+                    (dup_at, first_at) = next(spill_dups, (0, 0))
+                    continue
+
             # 4. invalid-residue handling (per record)
             if invalid_sequence_action == 'ignore':
                 pass
@@ -716,11 +2248,27 @@ def _stream_fasta(
                 _write_stream_record(out_fh, header, seq)
 
             n_yielded += 1
-            if return_list:
+            if batching:
+                if return_list:
+                    batch.append([header, seq])
+                else:
+                    batch.append((header, seq))
+                batch_residue_count += len(seq)
+
+                if ((batch_size is not None and len(batch) >= batch_size)
+                        or (batch_residues is not None and batch_residue_count >= batch_residues)):
+                    yield batch
+                    batch = SequenceStore() if return_store else []
+                    batch_residue_count = 0
+
+            elif return_list:
                 yield [header, seq]
             else:
                 yield (header, seq)
 
+        if len(batch):
+            yield batch
+
         if verbose:
             if duplicate_record_action == 'remove':
                 print('[INFO]: Removed %i of %i due to duplicate records ' % (n_dup_records_removed, n_read))
@@ -733,6 +2281,12 @@ def _stream_fasta(
             print('[INFO]: Streamed %i of %i records from %s' % (n_yielded, n_read, filename))
 
     finally:
+        # stop a prefetch thread now rather than when the generator is collected
+        close = getattr(records, 'close', None)
+        if close is not None:
+            close()
+        if spill_dups is not None:
+            spill_dups.close()
         if out_fh is not None:
             out_fh.close()
 
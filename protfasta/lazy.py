@@ -0,0 +1,267 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module implements the read-only mapping returned by
+``read_fasta(..., lazy=True)``.  Opening the mapping makes one pass over
+the file that records where each record lives; a sequence is only read
+from disk, parsed and sanitized when its header is looked up, so resident
+memory scales with the number of records rather than the size of the
+file.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from array import array
+from collections.abc import Mapping
+from typing import Callable, Iterator, Optional
+
+from . import io as _io
+from . import utilities as _utilities
+from .protfasta_exceptions import ProtfastaException
+
+
+# Any printable, non-space ASCII byte. A record body containing one is
+# certain to hold a non-empty sequence; anything subtler is left to the parser.
+_RESIDUE = re.compile(rb'[!-~]')
+
+# A carriage return that does not start a \r\n pair, which text mode treats
+# as a line break.
+_BARE_CR = re.compile(rb'\r(?!\n)')
+
+
+####################################################################################################
+#
+#
+def _scan(buf, encoding: str) -> Iterator[tuple[str, int, int, int]]:
+    """Locate every record of a mapped FASTA file without parsing sequences.
+
+    Records are delimited at ``b'\\\\n>'`` exactly as by the block parser.
+    For an ordinary record only the header line is decoded, and a single
+    regex search confirms it holds at least one residue.  A byte range
+    that needs the parser's full treatment -- text before the first
+    header, a bare carriage return, a body without any printable
+    ASCII -- is parsed with :func:`protfasta.io._iter_block_segment`
+    instead, so the records found (and their headers) are always exactly
+    those the parsers return.
+
+    Parameters
+    ----------
+    buf : mmap.mmap or bytes-like
+        The whole file.
+
+    encoding : str
+        Codec used to decode headers.
+
+    Yields
+    ------
+    tuple[str, int, int, int]
+        ``(header, start, end, ordinal)``: the raw header, the byte range
+        holding the record, and the record's position among those parsed
+        from that range (almost always 0).
+    """
+    size = len(buf)
+    start = 0
+
+    while start < size:
+        found = buf.find(b'\n>', start)
+        end = size if found == -1 else found + 1
+
+        if buf[start:start + 1] == b'>' and not _BARE_CR.search(buf, start, end):
+            newline = buf.find(b'\n', start, end)
+            header_end = end if newline == -1 else newline
+            if newline != -1 and _RESIDUE.search(buf, newline, end):
+                yield (buf[start + 1:header_end].decode(encoding).rstrip(), start, end, 0)
+                start = end
+                continue
+
+        for ordinal, (header, _seq) in enumerate(_io._iter_block_segment(buf[start:end], encoding)):
+            yield (header, start, end, ordinal)
+        start = end
+
+
+####################################################################################################
+#
+#
+class LazyFastaMapping(Mapping):
+    """Read-only ``header -> sequence`` mapping that reads sequences on demand.
+
+    Returned by ``read_fasta(..., lazy=True)``.  Construction scans the
+    file once and keeps only a table of byte ranges, so it is fast and
+    small; each lookup then reads, parses and sanitizes one record.
+    Sequences are not cached: look each one up once and keep the result
+    if it is needed repeatedly.
+
+    Iteration follows file order, as for the dictionary returned by
+    :func:`protfasta.read_fasta`, and when headers are not unique the
+    last record with a given header wins, again as for that dictionary.
+
+    Parameters
+    ----------
+    filename : str or os.PathLike
+        Path to an uncompressed FASTA file.
+
+    expect_unique_header : bool, optional
+        If ``True`` (default), raise on the first duplicate header.
+
+    header_parser : callable or None, optional
+        Optional ``(str) -> str`` transform applied to every raw header.
+
+    invalid_sequence_action : str, optional
+        One of ``'ignore'``, ``'fail'``, ``'convert'`` or
+        ``'convert-ignore'``, applied to each sequence as it is looked
+        up (so ``'fail'`` raises on lookup, not construction).  Default
+        ``'fail'``.
+
+    alignment : bool, optional
+        If ``True``, dashes are treated as valid gap characters.
+
+    correction_dictionary : dict or None, optional
+        Custom conversion table for the ``'convert'`` actions.
+
+    verbose : bool, optional
+        If ``True``, print the number of records found.
+
+    Raises
+    ------
+    ProtfastaException
+        If the file cannot be read or is compressed, or a duplicate
+        header is found when *expect_unique_header* is ``True``.
+    """
+
+    def __init__(
+        self,
+        filename,
+        expect_unique_header: bool = True,
+        header_parser: Optional[Callable[[str], str]] = None,
+        invalid_sequence_action: str = 'fail',
+        alignment: bool = False,
+        correction_dictionary: Optional[dict[str, str]] = None,
+        verbose: bool = False,
+    ):
+        self.filename = os.fspath(filename)
+        self._invalid_sequence_action = invalid_sequence_action
+        self._alignment = alignment
+        self._correction_dictionary = correction_dictionary
+        self._encoding = _io._text_encoding()
+
+        # header -> row of the range table; rows are kept in parallel
+        # arrays so each record costs a few bytes beyond its header
+        self._rows: dict[str, int] = {}
+        self._starts = array('q')
+        self._ends = array('q')
+        self._ordinals: dict[int, int] = {}
+
+        self._fh = _io._open_raw(self.filename)
+        try:
+            if _io._sniff_compression(self._fh.peek(6)[:6]) is not None:
+                raise ProtfastaException('lazy=True requires an uncompressed file: %s' % (self.filename))
+
+            self._stat = self._file_stat()
+            mapping = _io._map_fasta(self.filename)
+            if mapping is not None:
+                try:
+                    self._build(mapping, expect_unique_header, header_parser)
+                finally:
+                    mapping.close()
+        except BaseException:
+            self._fh.close()
+            raise
+
+        if verbose:
+            print('[INFO]: Indexed %i sequences in %s (lazy)' % (len(self._rows), self.filename))
+
+    def _build(self, buf, expect_unique_header: bool, header_parser) -> None:
+        rows = self._rows
+        for header, start, end, ordinal in _scan(buf, self._encoding):
+            if header_parser:
+                header = header_parser(header)
+
+            if header in rows and expect_unique_header:
+                raise ProtfastaException('Found duplicate header (%s)' % (header))
+
+            row = len(self._starts)
+            rows[header] = row
+            self._starts.append(start)
+            self._ends.append(end)
+            if ordinal:
+                self._ordinals[row] = ordinal
+
+    def _file_stat(self) -> tuple[int, int]:
+        st = os.fstat(self._fh.fileno())
+        return (st.st_mtime_ns, st.st_size)
+
+    # ..............................................................................
+    #
+    def _read(self, header: str, row: int) -> str:
+        """Read, parse and sanitize the record in *row*."""
+        if self._file_stat() != self._stat:
+            raise ProtfastaException('%s has changed since it was opened with lazy=True' % (self.filename))
+
+        start = self._starts[row]
+        self._fh.seek(start)
+        data = self._fh.read(self._ends[row] - start)
+
+        records = list(_io._iter_block_segment(data, self._encoding))
+        seq = records[self._ordinals.get(row, 0)][1]
+
+        action = self._invalid_sequence_action
+        if action == 'fail':
+            (status, info) = _utilities.check_sequence_is_valid(seq, self._alignment)
+            if status is not True:
+                raise ProtfastaException('Failed on invalid amino acid: %s\nTaken from entry...\n>%s\n%s\n'
+                                         % (info, header, seq))
+
+        elif action in ('convert', 'convert-ignore'):
+            seq = _utilities.convert_to_valid(seq, self._correction_dictionary, self._alignment)
+            if action == 'convert':
+                (status, info) = _utilities.check_sequence_is_valid(seq, self._alignment)
+                if status is not True:
+                    inner = 'Failed on invalid amino acid: %s\nTaken from entry...\n>%s\n%s\n' % (info, header, seq)
+                    raise ProtfastaException('\n\n******* Despite fixing fixable errors, additional problems remain '
+                                             'with the sequence*********\n%s' % (inner))
+
+        return seq
+
+    def __getitem__(self, header: str) -> str:
+        row = self._rows.get(header)
+        if row is None:
+            raise KeyError(header)
+        return self._read(header, row)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, header) -> bool:
+        return header in self._rows
+
+    def __repr__(self) -> str:
+        return 'LazyFastaMapping(%r, %i records)' % (self.filename, len(self._rows))
+
+    # ..............................................................................
+    #
+    def close(self) -> None:
+        """Close the underlying FASTA file."""
+        self._fh.close()
+
+    def __enter__(self) -> 'LazyFastaMapping':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -19,7 +19,8 @@ Be kind to each other.
 
 from __future__ import annotations
 
-from typing import Optional, Union
+import bisect
+from typing import Callable, Optional, Union
 
 from . import utilities as _utilities
 from .protfasta_exceptions import ProtfastaException
@@ -127,6 +128,37 @@ def _deal_with_invalid_sequences(
 
 
 
+####################################################################################################
+#
+#
+def _repeats_among(repeats: list[tuple[int, int]], removed: list[int]) -> list[tuple[int, int]]:
+    """Translate *repeats* to positions in the dataset left once the records at *removed* are dropped.
+
+    *removed* holds the sorted positions of the duplicate records taken
+    out.  Repeats at those positions are dropped; the first occurrence a
+    kept repeat points to is never among them, as a removed record
+    repeats an earlier one, sequence and all.
+    """
+    gone = set(removed)
+    return [(position - bisect.bisect_left(removed, position), earlier - bisect.bisect_left(removed, earlier))
+            for (position, earlier) in repeats if position not in gone]
+
+
+def _without_positions(raw: list[list[str]], repeats: list[tuple[int, int]]) -> list[list[str]]:
+    """Return *raw* (a list or store) without the records at the positions in *repeats*, in order."""
+    dropped = {position for (position, _earlier) in repeats}
+    if isinstance(raw, list):
+        return [entry for (position, entry) in enumerate(raw) if position not in dropped]
+
+    # an empty store to append to
+    updated = raw[:0]
+    for (position, entry) in enumerate(raw):
+        if position not in dropped:
+            updated.append(entry)
+    return updated
+
+
+
 ####################################################################################################
 #
 #
@@ -134,6 +166,8 @@ def _deal_with_duplicate_records(
     raw: list[list[str]],
     duplicate_record_action: str = 'ignore',
     verbose: bool = False,
+    digest_function: Callable[[str], bytes] = _utilities._seq_hash,
+    repeats: Optional[list[tuple[int, int]]] = None,
 ) -> list[list[str]]:
     """Process duplicate FASTA records (same header **and** sequence).
 
@@ -154,6 +188,17 @@ def _deal_with_duplicate_records(
         If ``True``, print the number of removed records to stdout.
         Default ``False``.
 
+    digest_function : callable, optional
+        Sequence digest used to compare sequences.  Default
+        :func:`~protfasta.utilities._seq_hash` (16-byte blake2b).
+
+    repeats : list[tuple[int, int]] or None, optional
+        The duplicate records of *raw*, if already found (by the workers
+        of a sharded read, see
+        :func:`~protfasta._parallel.parse_sharded`): ``(position,
+        earlier)`` for every repeat, sorted by position.  ``None``
+        (default) scans *raw* here.
+
     Returns
     -------
     list[list[str]]
@@ -170,10 +215,18 @@ def _deal_with_duplicate_records(
         pass
 
     if duplicate_record_action == 'fail':
-        _utilities.fail_on_duplicates(raw)
+        if repeats is None:
+            _utilities.fail_on_duplicates(raw, digest_function)
+        elif repeats:
+            entry = raw[repeats[0][0]]
+            raise ProtfastaException('Found duplicate entries of the following record\n:>%s\n%s'
+                                     % (entry[0], entry[1]))
 
     if duplicate_record_action == 'remove':
-        updated = _utilities.remove_duplicates(raw)
+        if repeats is None:
+            updated = _utilities.remove_duplicates(raw, digest_function)
+        else:
+            updated = _without_positions(raw, repeats)
         if verbose:
             print('[INFO]: Removed %i of %i due to duplicate records ' % (len(raw) - len(updated), len(raw)))
         return updated
@@ -189,6 +242,8 @@ def _deal_with_duplicate_sequences(
     raw: list[list[str]],
     duplicate_sequence_action: str = 'ignore',
     verbose: bool = False,
+    digest_function: Callable[[str], bytes] = _utilities._seq_hash,
+    repeats: Optional[list[tuple[int, int]]] = None,
 ) -> list[list[str]]:
     """Process entries that share the same sequence (regardless of header).
 
@@ -208,6 +263,17 @@ def _deal_with_duplicate_sequences(
         If ``True``, print the number of removed entries to stdout.
         Default ``False``.
 
+    digest_function : callable, optional
+        Sequence digest used to compare sequences.  Default
+        :func:`~protfasta.utilities._seq_hash` (16-byte blake2b).
+
+    repeats : list[tuple[int, int]] or None, optional
+        The duplicate sequences of *raw*, if already found (by the
+        workers of a sharded read, see
+        :func:`~protfasta._parallel.parse_sharded`): ``(position,
+        earlier)`` for every repeat, sorted by position.  ``None``
+        (default) scans *raw* here.
+
     Returns
     -------
     list[list[str]]
@@ -224,13 +290,124 @@ def _deal_with_duplicate_sequences(
         pass
 
     if duplicate_sequence_action == 'fail':
-        _utilities.fail_on_duplicate_sequences(raw)
+        if repeats is None:
+            _utilities.fail_on_duplicate_sequences(raw, digest_function)
+        elif repeats:
+            (position, earlier) = repeats[0]
+            raise ProtfastaException('Found duplicate sequences associated with the following headers'
+                                     '\n1. %s\n\n2. %s' % (raw[earlier][0], raw[position][0]))
         
     if duplicate_sequence_action == 'remove':
-        updated = _utilities.remove_duplicate_sequences(raw)
+        if repeats is None:
+            updated = _utilities.remove_duplicate_sequences(raw, digest_function)
+        else:
+            updated = _without_positions(raw, repeats)
         if verbose:
             print('[INFO]: Removed %i of %i due to duplicate sequences ' % (len(raw) - len(updated), len(raw)))
         return updated
 
     return raw
 
+
+
+####################################################################################################
+#
+#
+def _apply_invalid_outcomes(
+    raw: list[list[str]],
+    outcomes: dict[int, tuple[Optional[str], Union[str, int]]],
+    invalid_sequence_action: str = 'fail',
+    verbose: bool = False,
+) -> list[list[str]]:
+    """Apply pre-computed invalid-residue handling to *raw*.
+
+    Counterpart to :func:`_deal_with_invalid_sequences` for sharded reads
+    (``read_fasta(..., workers=N)``), where each worker has already
+    converted and validated its own records (see
+    :func:`protfasta._parallel.parse_sharded`).  Only the outcomes of
+    entries still present in *raw* after duplicate handling are applied,
+    and the result, messages and exceptions are exactly those
+    :func:`_deal_with_invalid_sequences` would produce.
+
+    Parameters
+    ----------
+    raw : list[list[str]]
+        Parsed FASTA data -- a list of ``[header, sequence]`` pairs.
+
+    outcomes : dict
+        Maps ``id(entry)`` to ``(new_seq, info)``: the converted sequence
+        (or ``None`` if unchanged) and the first invalid residue that
+        remains (or ``0``).  Entries without an outcome are valid and
+        unchanged.
+
+    invalid_sequence_action : str, optional
+        As in :func:`_deal_with_invalid_sequences`, including
+        ``'convert-remove'``.  Default ``'fail'``.
+
+    verbose : bool, optional
+        If ``True``, print progress information to stdout.
+        Default ``False``.
+
+    Returns
+    -------
+    list[list[str]]
+        The (possibly modified) list of ``[header, sequence]`` pairs.
+
+    Raises
+    ------
+    ProtfastaException
+        If *invalid_sequence_action* is ``'fail'`` or ``'convert'`` and
+        invalid residues are found (or remain after conversion).
+    """
+
+    if invalid_sequence_action == 'ignore':
+        return raw
+
+    if invalid_sequence_action not in ('fail', 'remove', 'convert', 'convert-ignore', 'convert-remove'):
+        raise ProtfastaException("Invalid option passed to the selector 'invalid_sequence_action': %s"
+                                 % (invalid_sequence_action))
+
+    remove = invalid_sequence_action in ('remove', 'convert-remove')
+
+    updated = []
+    n_converted = 0
+    first_failure = None
+
+    for entry in raw:
+        outcome = outcomes.get(id(entry))
+        if outcome is None:
+            updated.append(entry)
+            continue
+
+        (new_seq, info) = outcome
+        if new_seq is not None:
+            entry = [entry[0], new_seq]
+            n_converted = n_converted + 1
+
+        if info:
+            if remove:
+                continue
+
+            if invalid_sequence_action == 'fail':
+                raise ProtfastaException('Failed on invalid amino acid: %s\nTaken from entry...\n>%s\n%s\n'
+                                         % (info, entry[0], entry[1]))
+
+            # 'convert' only fails once every sequence has been converted
+            if first_failure is None and invalid_sequence_action == 'convert':
+                first_failure = ('Failed on invalid amino acid: %s\nTaken from entry...\n>%s\n%s\n'
+                                 % (info, entry[0], entry[1]))
+
+        updated.append(entry)
+
+    if verbose:
+        if invalid_sequence_action.startswith('convert'):
+            print('[INFO]: Converted %i sequences to valid sequences'%(n_converted))
+        if remove:
+            print('[INFO]: Removed %i of %i due to sequences with invalid characters'
+                  % (len(raw) - len(updated), len(raw)))
+
+    if first_failure is not None:
+        raise ProtfastaException('\n\n******* Despite fixing fixable errors, additional problems remain '
+                                 'with the sequence*********\n%s' % (first_failure))
+
+    return updated
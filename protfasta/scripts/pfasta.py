@@ -154,9 +154,9 @@ def main() -> None:
     parser = argparse.ArgumentParser(description=dsc, formatter_class=RawTextHelpFormatter)
 
     # note nargs means EITHER 0 or 1 arguments are accepted
-    parser.add_argument("filename", nargs='?', help='Input FASTA file')
+    parser.add_argument("filename", nargs='?', help="Input FASTA file ('-' reads from STDIN)")
 
-    parser.add_argument("-o", help="Output fasta file (is created)") 
+    parser.add_argument("-o", help="Output fasta file (is created). '-' writes to STDOUT and implies --silent") 
     parser.add_argument("--non-unique-header", help="", action='store_true') 
     parser.add_argument("--duplicate-record", help="How to deal with duplicate records in the file.\nOptions are ['ignore', 'fail', 'remove'] (default = fail)") 
     parser.add_argument("--duplicate-sequence", help="How to deal with duplicate sequences in the file.\nOptions are ['ignore', 'fail', 'remove'] (default = ignore)") 
@@ -174,6 +174,10 @@ def main() -> None:
     args = parser.parse_args()
     silent = args.silent
 
+    # FASTA written to STDOUT must not be interleaved with status messages
+    if args.o == '-':
+        silent = True
+
     if args.version:
         print(VERSION_MAJ)
         sys.exit(0)
@@ -192,7 +196,7 @@ def main() -> None:
         print('........................')
 
 
-    if not path.exists(args.filename):
+    if args.filename != '-' and not path.exists(args.filename):
         exit_error('File %s does not exist'%(args.filename))
         
 
@@ -0,0 +1,250 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module implements :class:`SequenceStore`, the compact columnar
+container returned by ``read_fasta(..., return_store=True)``.  Instead of
+one Python list and two ``str`` objects per record, a store keeps every
+header in one packed byte buffer and every sequence in another, with the
+end offset of each record in an ``array('q')``.  A record costs its own
+bytes plus 16 bytes of offsets, against well over 100 bytes of object
+overhead in a ``list[list[str]]``.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Sequence
+from typing import Callable, Iterable, Iterator, Union
+
+from .protfasta_exceptions import ProtfastaException
+
+
+# Headers and sequences are stored as UTF-8. Sequences are almost always
+# ASCII, for which byte offsets and character offsets coincide; the
+# surrogatepass handler lets through anything a permissive decode produced.
+_ENCODING = 'utf-8'
+_ERRORS = 'surrogatepass'
+
+
+####################################################################################################
+#
+#
+class SequenceStore(Sequence):
+    """Compact, ordered collection of ``(header, sequence)`` records.
+
+    Returned by ``read_fasta(..., return_store=True)``.  Behaves like a
+    read-only list of ``(header, sequence)`` tuples -- it supports
+    ``len``, iteration, integer indexing (including negative indices)
+    and slicing (which returns a new store) -- while keeping all the
+    data in a few contiguous buffers::
+
+        store = protfasta.read_fasta('uniprot_trembl.fasta', return_store=True)
+        header, seq = store[0]
+        for header, seq in store[1000:2000]:
+            ...
+
+    Records can be added with :meth:`append` and :meth:`extend`, but
+    not changed or removed.  Decoding a record creates new ``str``
+    objects each time it is accessed, so convert the parts you need
+    with :meth:`to_dict` or :meth:`to_list` if they are used heavily.
+
+    Parameters
+    ----------
+    records : iterable of (str, str), optional
+        Initial ``(header, sequence)`` pairs (two-element lists are
+        accepted too).
+    """
+
+    def __init__(self, records: Iterable[Sequence[str]] = ()):
+        self._headers = bytearray()
+        self._header_ends = array('q')
+        self._sequences = bytearray()
+        self._sequence_ends = array('q')
+        self.extend(records)
+
+    # ..............................................................................
+    #
+    def append(self, record: Sequence[str]) -> None:
+        """Append one ``(header, sequence)`` pair to the end of the store."""
+        if len(record) != 2:
+            raise ProtfastaException('SequenceStore records must be (header, sequence) pairs:\n%s' % (str(record)))
+
+        (header, seq) = record
+        self._headers += header.encode(_ENCODING, _ERRORS)
+        self._header_ends.append(len(self._headers))
+        self._sequences += seq.encode(_ENCODING, _ERRORS)
+        self._sequence_ends.append(len(self._sequences))
+
+    def extend(self, records: Iterable[Sequence[str]]) -> None:
+        """Append every ``(header, sequence)`` pair in *records*."""
+        if isinstance(records, SequenceStore):
+            self._extend_store(records, 0, len(records))
+            return
+
+        for record in records:
+            self.append(record)
+
+    def _extend_store(self, other: 'SequenceStore', start: int, stop: int) -> None:
+        """Append records ``start:stop`` of *other* by copying buffer ranges."""
+        if start >= stop:
+            return
+
+        columns = ((self._headers, self._header_ends, other._headers, other._header_ends),
+                   (self._sequences, self._sequence_ends, other._sequences, other._sequence_ends))
+        for (buf, ends, other_buf, other_ends) in columns:
+            first = other_ends[start - 1] if start else 0
+            shift = len(buf) - first
+            buf += other_buf[first:other_ends[stop - 1]]
+            ends.extend(end + shift for end in other_ends[start:stop])
+
+    def _replace_sequences(self, func: Callable[[str], str]) -> int:
+        """Replace every sequence with ``func(sequence)``, in place.
+
+        Used by the invalid-residue conversion stage.  Converted
+        sequences are written back over the buffer, which only needs
+        extra memory if a sequence grows past the space freed before it
+        (in which case the unread remainder is copied out first).
+
+        Returns
+        -------
+        int
+            The number of sequences that changed.
+        """
+        buf = self._sequences
+        ends = self._sequence_ends
+
+        count = 0
+        write = 0
+        start = 0
+        src = buf
+        src_shift = 0
+
+        for idx in range(len(ends)):
+            end = ends[idx]
+            data = src[start - src_shift:end - src_shift]
+
+            seq = data.decode(_ENCODING, _ERRORS)
+            converted = func(seq)
+            changed = converted != seq
+            if changed:
+                count = count + 1
+                data = converted.encode(_ENCODING, _ERRORS)
+
+            if src is buf and write + len(data) > end:
+                # writing here would overwrite records not yet read
+                src = bytes(buf[end:])
+                src_shift = end
+                del buf[write:]
+
+            if src is buf:
+                if changed or write != start:
+                    buf[write:write + len(data)] = data
+            else:
+                buf += data
+
+            write = write + len(data)
+            ends[idx] = write
+            start = end
+
+        del buf[write:]
+        return count
+
+    # ..............................................................................
+    #
+    @staticmethod
+    def _span(ends: array, idx: int) -> tuple[int, int]:
+        return (ends[idx - 1] if idx else 0, ends[idx])
+
+    def header(self, idx: int) -> str:
+        """Return the header of record *idx*."""
+        (start, end) = self._span(self._header_ends, self._index(idx))
+        return self._headers[start:end].decode(_ENCODING, _ERRORS)
+
+    def sequence(self, idx: int) -> str:
+        """Return the sequence of record *idx*."""
+        (start, end) = self._span(self._sequence_ends, self._index(idx))
+        return self._sequences[start:end].decode(_ENCODING, _ERRORS)
+
+    def headers(self) -> Iterator[str]:
+        """Iterate over the headers, in order."""
+        buf = self._headers
+        start = 0
+        for end in self._header_ends:
+            yield buf[start:end].decode(_ENCODING, _ERRORS)
+            start = end
+
+    def sequences(self) -> Iterator[str]:
+        """Iterate over the sequences, in order."""
+        buf = self._sequences
+        start = 0
+        for end in self._sequence_ends:
+            yield buf[start:end].decode(_ENCODING, _ERRORS)
+            start = end
+
+    def _index(self, idx: int) -> int:
+        n = len(self._sequence_ends)
+        if idx < 0:
+            idx += n
+        if not 0 <= idx < n:
+            raise IndexError('SequenceStore index out of range')
+        return idx
+
+    # ..............................................................................
+    #
+    def __len__(self) -> int:
+        return len(self._sequence_ends)
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[tuple[str, str], 'SequenceStore']:
+        if isinstance(idx, slice):
+            (start, stop, step) = idx.indices(len(self))
+            out = SequenceStore()
+            if step == 1:
+                out._extend_store(self, start, stop)
+            else:
+                out.extend(self[i] for i in range(start, stop, step))
+            return out
+
+        idx = self._index(idx)
+        return (self.header(idx), self.sequence(idx))
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        return zip(self.headers(), self.sequences())
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SequenceStore):
+            return NotImplemented
+        return (self._header_ends == other._header_ends and self._sequence_ends == other._sequence_ends
+                and self._headers == other._headers and self._sequences == other._sequences)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return 'SequenceStore(%i records, %i residues)' % (len(self), len(self._sequences))
+
+    # ..............................................................................
+    #
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes held in the store's buffers."""
+        return (len(self._headers) + len(self._sequences)
+                + self._header_ends.itemsize * (len(self._header_ends) + len(self._sequence_ends)))
+
+    def to_dict(self) -> dict[str, str]:
+        """Return a ``header -> sequence`` dictionary (the last duplicate header wins)."""
+        return dict(self)
+
+    def to_list(self) -> list[list[str]]:
+        """Return a list of ``[header, sequence]`` lists, as ``return_list=True`` would."""
+        return [[header, seq] for (header, seq) in self]
@@ -167,6 +167,37 @@ class TestCLIBasicRead:
         assert "pfasta version" in capsys.readouterr().out
 
 
+class TestCLICompressedInput:
+    """Compressed input files are read transparently."""
+
+    def test_gzip_input(self, tmp_path, monkeypatch):
+        import gzip
+        infile = tmp_path / "in.fasta.gz"
+        with open(SIMPLE_FILE, "rb") as fh:
+            infile.write_bytes(gzip.compress(fh.read()))
+        outfile = str(tmp_path / "out.fasta")
+        _run_main(str(infile), "-o", outfile, "--silent", monkeypatch=monkeypatch)
+        assert protfasta.read_fasta(outfile) == protfasta.read_fasta(SIMPLE_FILE)
+
+
+class TestCLIStdio:
+    """'-' reads STDIN and '-o -' writes STDOUT, so pfasta can sit in a pipe."""
+
+    def test_stdin_to_stdout(self, monkeypatch, capsysbinary):
+        import gzip
+        import io
+        with open(SIMPLE_FILE, "rb") as fh:
+            data = gzip.compress(fh.read())
+        monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data)))
+        _run_main("-", "-o", "-", monkeypatch=monkeypatch)
+
+        # status messages are suppressed, so STDOUT is pure FASTA
+        out = capsysbinary.readouterr().out
+        assert out.startswith(b">")
+        got = protfasta.read_fasta(io.BytesIO(out))
+        assert got == protfasta.read_fasta(SIMPLE_FILE)
+
+
 class TestCLINoOutputFile:
     """--no-outputfile prevents file creation."""
 
@@ -30,16 +30,63 @@ Organized into test classes by functional area:
 - TestFileOpenErrors: OS-level file errors surface as ProtfastaException
 - TestEndToEndCombinations: Combined parameter interactions
 - TestReadFastaStream: read_fasta_stream streaming parser
+- TestBlockEngine: engine='block' parity with the line parser
+- TestMmap: mmap=True parity with the default parser
+- TestCompressedInput: gzip/bz2/xz/zstd input detected by magic bytes
+- TestBGZF: block-parallel BGZF decompression with workers > 1
+- TestShardedRead: read_fasta(workers=N) on uncompressed files
+- TestFastaIndex: index_fasta .fai builder and FastaIndex reader
+- TestLazyMapping: read_fasta(lazy=True) deferred mapping
+- TestSequenceStore: read_fasta(return_store=True) compact container
+- TestEncode: uint8 integer encoding of sequences (needs numpy)
+- TestCache: read_fasta(cache=...) on-disk cache of sanitized records
+- TestAsync: read_fasta_async and read_fasta_stream_async
+- TestPrefetch: read_fasta_stream(prefetch=N) background reader thread
+- TestStreamBatches: read_fasta_stream(batch_size=.../batch_residues=...) batched yields
+- TestFileObjects: file objects and '-' (stdin/stdout) for readers and writers
+- TestReadFastaMany: read_fasta_many concurrent multi-file ingestion
+- TestFastaWriter: incremental FastaWriter context manager
+- TestCompressedOutput: gzip/BGZF/xz output with threaded BGZF compression
+- TestBatchedWrite: batched record formatting behind write_fasta and FastaWriter
+- TestSpillDedup: disk-spilling duplicate detection (duplicate_memory_limit)
+- TestBloomDedup: Bloom pre-filter for streaming duplicate detection (duplicate_filter)
+- TestDuplicateDigest: pluggable sequence digests for duplicate detection (duplicate_digest)
+- TestNearDuplicates: MinHash/LSH near-duplicate removal (needs numpy)
+- TestCluster: greedy identity clustering (cluster)
+- TestParallelDedup: hash-partitioned duplicate detection with read_fasta(workers=N)
+- TestCompactHeaders: front-coded header storage and digest-based header checks (compact_headers)
 """
 
 import protfasta
 from protfasta.protfasta_exceptions import ProtfastaException
 from protfasta import _configs
+from protfasta import cache as _cache
 from protfasta import utilities as _utilities
 from protfasta import io as _io
+from protfasta import encode as _encode
+from protfasta import aio as _aio
+from protfasta import _bgzf
+from protfasta import writer as _writer
+from protfasta import dedup as _dedup
+from protfasta import _cluster
+from protfasta import headers as _headers
+from protfasta import _parallel
+from protfasta import protfasta as _protfasta
+from protfasta.lazy import LazyFastaMapping
 import pytest
+import asyncio
+import bz2
+import gc
+import gzip
+import inspect
+import io
+import lzma
 import sys
+import threading
+import time
+import warnings
 import os
+import re
 
 from pathlib import Path
 
@@ -1715,3 +1762,2888 @@ class TestReadFastaStream:
                 duplicate_sequence_action='ignore',
             ))
         assert [list(r) for r in streamed] == ref
+
+
+# ---------------------------------------------------------------------------
+# TestBlockEngine
+# ---------------------------------------------------------------------------
+ALL_TEST_FILES = [
+    SIMPLE_FILE,
+    DUPLICATE_RECORD_FILE,
+    DUPLICATE_SEQ_FILE,
+    BADCHAR_FILE,
+    NONSTANDARD_FILE,
+    FIXABLE_INVALID_FILE,
+    UNFIXABLE_INVALID_FILE,
+    ALIGNED_VALID_FILE,
+    ALIGNED_CONVERTABLE_FILE,
+    ALIGNED_UNCONVERTABLE_FILE,
+]
+
+# Awkward inputs where deleting newlines is not the same as stripping each
+# line, so the block engine has to fall back to line-by-line handling.
+BLOCK_EDGE_CASES = [
+    '>h1\nACD\nEFG\n>h2\nKLM\n',
+    '>h1\r\nACD\r\nEFG\r\n>h2\r\nKLM\r\n',
+    '>h1\rACD\rEFG\r>h2\rKLM\r',
+    '>h1\nAC \nD\t\n  \nEF\n',
+    '>h1  \nacd\nefg\n',
+    'junk before\nheader\n>h1\nACD\n',
+    'junk\r>h1\nACD\n',
+    '>empty\n\n>h1\nACD\n>trailing-empty\n',
+    '>h1\nAC-D*\nE F\n',
+    '>h1\nACDÉF\n>h2\nG\u00a0\nH\n',
+    '>h1\nACD\x1c\nEF\x0c\n',
+    '>h1\nACD',
+    '>h1\nACD\r\n>h2\rEF\n',
+    '',
+]
+
+
+class TestBlockEngine:
+    """engine='block' must return exactly what the line parser returns."""
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    def test_internal_parse_parity(self, filename):
+        ref = _io.internal_parse_fasta_file(filename, expect_unique_header=False)
+        got = _io.internal_parse_fasta_file(filename, expect_unique_header=False, engine='block')
+        assert got == ref
+
+    @pytest.mark.parametrize('text', BLOCK_EDGE_CASES)
+    @pytest.mark.parametrize('block_size', [1, 2, 3, 7, 4096])
+    def test_edge_case_parity(self, text, block_size):
+        import io
+        data = text.encode('utf-8')
+        ref = list(_io._iter_lines(io.StringIO(data.decode('utf-8'), newline=None)))
+        got = list(_io._iter_fasta_blocks(io.BytesIO(data), 'utf-8', block_size))
+        assert got == ref
+
+    @pytest.mark.parametrize('text', BLOCK_EDGE_CASES)
+    def test_edge_case_file_parity(self, text, tmp_path):
+        f = tmp_path / 'edge.fasta'
+        f.write_bytes(text.encode('utf-8'))
+        assert list(_io._iter_fasta(str(f), engine='block')) == list(_io._iter_fasta(str(f)))
+
+    def test_read_fasta_parity(self):
+        assert protfasta.read_fasta(SIMPLE_FILE, engine='block') == protfasta.read_fasta(SIMPLE_FILE)
+
+    def test_read_fasta_sanitization_parity(self):
+        ref = protfasta.read_fasta(FIXABLE_INVALID_FILE, invalid_sequence_action='convert', return_list=True)
+        got = protfasta.read_fasta(FIXABLE_INVALID_FILE, invalid_sequence_action='convert', return_list=True,
+                                   engine='block')
+        assert got == ref
+
+    def test_header_parser_applied(self):
+        def first_word(s):
+            return s.split()[0]
+        result = protfasta.read_fasta(SIMPLE_FILE, header_parser=first_word, engine='block')
+        assert WASL_HEADER.split()[0] in result
+
+    def test_duplicate_header_detected(self):
+        with pytest.raises(ProtfastaException, match='duplicate header'):
+            protfasta.read_fasta(DUPLICATE_RECORD_FILE, engine='block')
+
+    def test_stream_parity(self):
+        ref = list(protfasta.read_fasta_stream(SIMPLE_FILE))
+        assert list(protfasta.read_fasta_stream(SIMPLE_FILE, engine='block')) == ref
+
+    def test_invalid_engine_raises(self):
+        with pytest.raises(ProtfastaException, match='engine'):
+            protfasta.read_fasta(SIMPLE_FILE, engine='turbo')
+
+    def test_invalid_engine_raises_streaming(self):
+        with pytest.raises(ProtfastaException, match='engine'):
+            protfasta.read_fasta_stream(SIMPLE_FILE, engine='turbo')
+
+    def test_missing_file(self):
+        with pytest.raises(ProtfastaException, match='Unable to find file'):
+            protfasta.read_fasta('/nonexistent/path/file.fasta', engine='block')
+
+    def test_verbose_output(self, capsys):
+        _io.internal_parse_fasta_file(SIMPLE_FILE, verbose=True, engine='block')
+        captured = capsys.readouterr()
+        assert 'block engine' in captured.out
+        assert 'Parsed file' in captured.out
+
+
+# ---------------------------------------------------------------------------
+# TestMmap
+# ---------------------------------------------------------------------------
+class TestMmap:
+    """mmap=True must return exactly what the default parser returns."""
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    def test_internal_parse_parity(self, filename):
+        ref = _io.internal_parse_fasta_file(filename, expect_unique_header=False)
+        got = _io.internal_parse_fasta_file(filename, expect_unique_header=False, use_mmap=True)
+        assert got == ref
+
+    @pytest.mark.parametrize('text', BLOCK_EDGE_CASES)
+    @pytest.mark.parametrize('window', [1, 2, 3, 7, 4096])
+    def test_window_parity(self, text, window):
+        import io
+        data = text.encode('utf-8')
+        ref = list(_io._iter_lines(io.StringIO(data.decode('utf-8'), newline=None)))
+        got = list(_io._iter_fasta_mmap(data, 'utf-8', window))
+        assert got == ref
+
+    @pytest.mark.parametrize('text', BLOCK_EDGE_CASES)
+    def test_edge_case_file_parity(self, text, tmp_path):
+        f = tmp_path / 'edge.fasta'
+        f.write_bytes(text.encode('utf-8'))
+        assert list(_io._iter_fasta(str(f), use_mmap=True)) == list(_io._iter_fasta(str(f)))
+
+    def test_empty_file(self, tmp_path):
+        f = tmp_path / 'empty.fasta'
+        f.write_bytes(b'')
+        assert protfasta.read_fasta(str(f), mmap=True) == {}
+
+    def test_read_fasta_parity(self):
+        assert protfasta.read_fasta(SIMPLE_FILE, mmap=True) == protfasta.read_fasta(SIMPLE_FILE)
+
+    def test_header_parser_applied(self):
+        def first_word(s):
+            return s.split()[0]
+        result = protfasta.read_fasta(SIMPLE_FILE, header_parser=first_word, mmap=True)
+        assert WASL_HEADER.split()[0] in result
+
+    def test_duplicate_header_detected(self):
+        with pytest.raises(ProtfastaException, match='duplicate header'):
+            protfasta.read_fasta(DUPLICATE_RECORD_FILE, mmap=True)
+
+    def test_stream_parity(self):
+        ref = list(protfasta.read_fasta_stream(SIMPLE_FILE))
+        assert list(protfasta.read_fasta_stream(SIMPLE_FILE, mmap=True)) == ref
+
+    def test_invalid_mmap_raises(self):
+        with pytest.raises(ProtfastaException, match='mmap'):
+            protfasta.read_fasta(SIMPLE_FILE, mmap='yes')
+
+    def test_missing_file(self):
+        with pytest.raises(ProtfastaException, match='Unable to find file'):
+            protfasta.read_fasta('/nonexistent/path/file.fasta', mmap=True)
+
+    def test_verbose_output(self, capsys):
+        _io.internal_parse_fasta_file(SIMPLE_FILE, verbose=True, use_mmap=True)
+        captured = capsys.readouterr()
+        assert 'memory-mapped' in captured.out
+
+
+# ---------------------------------------------------------------------------
+# TestCompressedInput
+# ---------------------------------------------------------------------------
+def _compress(data, compression):
+    import bz2
+    import gzip
+    import lzma
+    return {'gzip': gzip.compress, 'bz2': bz2.compress, 'xz': lzma.compress}[compression](data)
+
+
+class TestCompressedInput:
+    """Compressed files are detected by magic bytes and read transparently."""
+
+    @pytest.mark.parametrize('compression', ['gzip', 'bz2', 'xz'])
+    @pytest.mark.parametrize('kwargs', [{}, {'engine': 'block'}, {'mmap': True}])
+    def test_read_fasta_parity(self, compression, kwargs, tmp_path):
+        f = tmp_path / 'seqs.compressed'
+        f.write_bytes(_compress(Path(SIMPLE_FILE).read_bytes(), compression))
+        assert protfasta.read_fasta(str(f), **kwargs) == protfasta.read_fasta(SIMPLE_FILE)
+
+    @pytest.mark.parametrize('compression', ['gzip', 'bz2', 'xz'])
+    @pytest.mark.parametrize('engine', ['line', 'block'])
+    def test_stream_parity(self, compression, engine, tmp_path):
+        f = tmp_path / 'seqs.compressed'
+        f.write_bytes(_compress(Path(SIMPLE_FILE).read_bytes(), compression))
+        ref = list(protfasta.read_fasta_stream(SIMPLE_FILE))
+        assert list(protfasta.read_fasta_stream(str(f), engine=engine)) == ref
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    def test_internal_parse_parity(self, filename, tmp_path):
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(_compress(Path(filename).read_bytes(), 'gzip'))
+        ref = _io.internal_parse_fasta_file(filename, expect_unique_header=False)
+        assert _io.internal_parse_fasta_file(str(f), expect_unique_header=False) == ref
+
+    def test_detection_ignores_extension(self, tmp_path):
+        # a plain file named .gz is read as plain text
+        f = tmp_path / 'plain.fasta.gz'
+        f.write_bytes(Path(SIMPLE_FILE).read_bytes())
+        assert protfasta.read_fasta(str(f)) == protfasta.read_fasta(SIMPLE_FILE)
+
+    @pytest.mark.parametrize('head, expected', [
+        (b'\x1f\x8b\x08\x04\x00\x00', 'gzip'),
+        (b'BZh91A', 'bz2'),
+        (b'\xfd7zXZ\x00', 'xz'),
+        (b'\x28\xb5\x2f\xfd\x00\x00', 'zstd'),
+        (b'>sp|P1', None),
+        (b'', None),
+    ])
+    def test_sniff_compression(self, head, expected):
+        assert _io._sniff_compression(head) == expected
+
+    @pytest.mark.parametrize('engine', ['line', 'block'])
+    def test_truncated_file_raises(self, engine, tmp_path):
+        f = tmp_path / 'truncated.fasta.gz'
+        f.write_bytes(_compress(Path(SIMPLE_FILE).read_bytes(), 'gzip')[:200])
+        with pytest.raises(ProtfastaException, match='Unable to read file'):
+            protfasta.read_fasta(str(f), engine=engine)
+
+    def test_truncated_file_raises_streaming(self, tmp_path):
+        f = tmp_path / 'truncated.fasta.gz'
+        f.write_bytes(_compress(Path(SIMPLE_FILE).read_bytes(), 'gzip')[:200])
+        with pytest.raises(ProtfastaException, match='Unable to read file'):
+            list(protfasta.read_fasta_stream(str(f)))
+
+    @pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='needs os.mkfifo')
+    @pytest.mark.parametrize('compression', ['gzip', 'bz2', 'xz'])
+    @pytest.mark.parametrize('stream', [False, True])
+    def test_fifo(self, compression, stream, tmp_path):
+        # a FIFO cannot be reopened, so the bytes peeked to detect the
+        # compression must be read through the same handle
+        import threading
+        fifo = tmp_path / 'seqs.fifo'
+        os.mkfifo(fifo)
+        data = _compress(Path(SIMPLE_FILE).read_bytes(), compression)
+        done = threading.Event()
+
+        def feed():
+            with open(fifo, 'wb') as fh:
+                fh.write(data)
+            # a reader that reopened the FIFO would block forever; give it
+            # an end of file instead so the test fails rather than hangs
+            while not done.wait(0.05):
+                try:
+                    os.close(os.open(fifo, os.O_WRONLY | os.O_NONBLOCK))
+                except OSError:
+                    pass
+
+        writer = threading.Thread(target=feed)
+        writer.start()
+        try:
+            if stream:
+                result = dict(protfasta.read_fasta_stream(str(fifo)))
+            else:
+                result = protfasta.read_fasta(str(fifo))
+        finally:
+            done.set()
+            writer.join()
+        assert result == protfasta.read_fasta(SIMPLE_FILE)
+
+    def test_zstd(self, tmp_path):
+        zstandard = pytest.importorskip('zstandard')
+        f = tmp_path / 'seqs.fasta.zst'
+        f.write_bytes(zstandard.ZstdCompressor().compress(Path(SIMPLE_FILE).read_bytes()))
+        assert protfasta.read_fasta(str(f)) == protfasta.read_fasta(SIMPLE_FILE)
+
+
+# ---------------------------------------------------------------------------
+# TestBGZF
+# ---------------------------------------------------------------------------
+def _bgzf_compress(data, chunk):
+    """BGZF-compress *data* into blocks of *chunk* bytes, so that records
+    straddle block boundaries."""
+    from protfasta import _bgzf
+    blocks = [_bgzf.compress_block(data[i:i + chunk]) for i in range(0, len(data), chunk)]
+    return b''.join(blocks) + _bgzf.EOF_BLOCK
+
+
+class TestBGZF:
+    """workers > 1 decompresses and parses BGZF blocks in a process pool."""
+
+    def test_roundtrip_with_gzip(self):
+        import gzip
+        from protfasta import _bgzf
+        data = Path(SIMPLE_FILE).read_bytes()
+        assert gzip.decompress(_bgzf.compress(data)) == data
+        assert _bgzf.is_bgzf(_bgzf.compress(data))
+        assert not _bgzf.is_bgzf(gzip.compress(data))
+
+    def test_iter_blocks(self):
+        import io
+        from protfasta import _bgzf
+        data = Path(SIMPLE_FILE).read_bytes()
+        blocks = list(_bgzf.iter_blocks(io.BytesIO(_bgzf_compress(data, 100))))
+        assert sum(size for _, size in blocks) == len(data)
+        assert b''.join(_bgzf.decompress_block(block) for block, _ in blocks) == data
+
+    def test_truncated_block_raises(self):
+        import io
+        from protfasta import _bgzf
+        data = _bgzf.compress(Path(SIMPLE_FILE).read_bytes())
+        with pytest.raises(ProtfastaException, match='BGZF'):
+            list(_bgzf.iter_blocks(io.BytesIO(data[:50])))
+
+    @pytest.mark.parametrize('text', BLOCK_EDGE_CASES)
+    @pytest.mark.parametrize('chunk', [1, 3, 7, 4096])
+    @pytest.mark.parametrize('batch_size', [1, 5, 4096])
+    def test_edge_case_parity(self, text, chunk, batch_size):
+        import io
+        data = text.encode('utf-8')
+        ref = list(_io._iter_lines(io.StringIO(data.decode('utf-8'), newline=None)))
+        fh = io.BytesIO(_bgzf_compress(data, chunk))
+        assert list(_io._iter_fasta_bgzf(fh, 'utf-8', 2, batch_size)) == ref
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    def test_internal_parse_parity(self, filename, tmp_path):
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(_bgzf_compress(Path(filename).read_bytes(), 500))
+        ref = _io.internal_parse_fasta_file(filename, expect_unique_header=False)
+        assert _io.internal_parse_fasta_file(str(f), expect_unique_header=False, workers=2) == ref
+
+    def test_read_fasta_parity(self, tmp_path):
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(_bgzf_compress(Path(SIMPLE_FILE).read_bytes(), 500))
+        assert protfasta.read_fasta(str(f), workers=2) == protfasta.read_fasta(SIMPLE_FILE)
+
+    def test_header_parser_applied_in_parent(self, tmp_path):
+        # a lambda cannot be pickled, so this also checks it never reaches a worker
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(_bgzf_compress(Path(SIMPLE_FILE).read_bytes(), 500))
+        result = protfasta.read_fasta(str(f), header_parser=lambda s: s.split()[0], workers=2)
+        assert WASL_HEADER.split()[0] in result
+
+    def test_stream_parity(self, tmp_path):
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(_bgzf_compress(Path(SIMPLE_FILE).read_bytes(), 500))
+        ref = list(protfasta.read_fasta_stream(SIMPLE_FILE))
+        assert list(protfasta.read_fasta_stream(str(f), workers=2)) == ref
+
+    def test_stream_closed_early(self, tmp_path):
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(_bgzf_compress(Path(SIMPLE_FILE).read_bytes(), 500))
+        stream = protfasta.read_fasta_stream(str(f), workers=2)
+        first = next(stream)
+        stream.close()
+        assert first == next(protfasta.read_fasta_stream(SIMPLE_FILE))
+
+    def test_non_bgzf_ignores_workers(self, tmp_path):
+        import gzip
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(gzip.compress(Path(SIMPLE_FILE).read_bytes()))
+        assert protfasta.read_fasta(str(f), workers=2) == protfasta.read_fasta(SIMPLE_FILE)
+        assert protfasta.read_fasta(SIMPLE_FILE, workers=2) == protfasta.read_fasta(SIMPLE_FILE)
+
+    def test_corrupt_block_raises(self, tmp_path):
+        data = bytearray(_bgzf_compress(Path(SIMPLE_FILE).read_bytes(), 500))
+        data[30] ^= 0xff
+        f = tmp_path / 'corrupt.fasta.gz'
+        f.write_bytes(bytes(data))
+        with pytest.raises(ProtfastaException, match='Unable to read file'):
+            protfasta.read_fasta(str(f), workers=2)
+
+    @pytest.mark.parametrize('workers', [0, -1, 2.0, '2', True])
+    def test_invalid_workers_raises(self, workers):
+        with pytest.raises(ProtfastaException, match='workers'):
+            protfasta.read_fasta(SIMPLE_FILE, workers=workers)
+
+
+# ---------------------------------------------------------------------------
+# TestShardedRead
+# ---------------------------------------------------------------------------
+INVALID_ACTIONS = ['ignore', 'fail', 'remove', 'convert', 'convert-ignore', 'convert-remove']
+
+
+def _outcome(**kwargs):
+    """Return read_fasta's result, or the message of the exception it raised."""
+    try:
+        return protfasta.read_fasta(**kwargs)
+    except ProtfastaException as e:
+        return 'raised: %s' % e
+
+
+class TestShardedRead:
+    """read_fasta(workers=N) on uncompressed files must match a serial read."""
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    @pytest.mark.parametrize('invalid_sequence_action', INVALID_ACTIONS)
+    def test_parity(self, filename, invalid_sequence_action):
+        kwargs = dict(filename=filename, expect_unique_header=False, duplicate_record_action='ignore',
+                      invalid_sequence_action=invalid_sequence_action, return_list=True)
+        assert _outcome(workers=3, **kwargs) == _outcome(**kwargs)
+
+    @pytest.mark.parametrize('duplicate_record_action', ['ignore', 'fail', 'remove'])
+    @pytest.mark.parametrize('duplicate_sequence_action', ['ignore', 'fail', 'remove'])
+    @pytest.mark.parametrize('invalid_sequence_action', ['fail', 'convert', 'convert-remove'])
+    def test_duplicates_across_shards(self, duplicate_record_action, duplicate_sequence_action,
+                                      invalid_sequence_action, tmp_path):
+        # every duplicate lands in a different shard from its original
+        text = ''.join('>h%i\nACDE%s\n' % (i, 'X' * (i % 3)) for i in range(40))
+        text += ''.join('>h%i\nACDE%s\n' % (i, 'X' * (i % 3)) for i in range(0, 40, 7))
+        text += ''.join('>new%i\nACDE%s\n' % (i, 'X' * (i % 3)) for i in range(0, 40, 11))
+        f = tmp_path / 'dups.fasta'
+        f.write_text(text)
+        kwargs = dict(filename=str(f), expect_unique_header=False,
+                      duplicate_record_action=duplicate_record_action,
+                      duplicate_sequence_action=duplicate_sequence_action,
+                      invalid_sequence_action=invalid_sequence_action, return_list=True)
+        assert _outcome(workers=4, **kwargs) == _outcome(**kwargs)
+
+    def test_duplicate_header_across_shards(self, tmp_path):
+        f = tmp_path / 'dups.fasta'
+        f.write_text(''.join('>h%i\nACDE\n' % i for i in range(50)) + '>h0\nKLM\n')
+        with pytest.raises(ProtfastaException, match='duplicate header'):
+            protfasta.read_fasta(str(f), workers=4)
+
+    def test_read_fasta_parity(self):
+        assert protfasta.read_fasta(SIMPLE_FILE, workers=4) == protfasta.read_fasta(SIMPLE_FILE)
+
+    def test_header_parser_applied_in_parent(self):
+        result = protfasta.read_fasta(SIMPLE_FILE, header_parser=lambda s: s.split()[0], workers=2)
+        assert WASL_HEADER.split()[0] in result
+
+    def test_correction_dictionary(self):
+        kwargs = dict(filename=FIXABLE_INVALID_FILE, invalid_sequence_action='convert',
+                      correction_dictionary={'X': 'A', 'B': 'A', 'U': 'A', 'Z': 'A', '*': '', '-': '', ' ': ''})
+        assert _outcome(workers=2, **kwargs) == _outcome(**kwargs)
+
+    def test_verbose_parity(self, capsys):
+        kwargs = dict(filename=FIXABLE_INVALID_FILE, invalid_sequence_action='convert-remove', verbose=True)
+        protfasta.read_fasta(**kwargs)
+        serial = capsys.readouterr().out.splitlines()
+        protfasta.read_fasta(workers=2, **kwargs)
+        sharded = capsys.readouterr().out.splitlines()
+        assert 'shards' in sharded[0]
+        assert sharded[1:] == serial[1:]
+
+    def test_empty_file(self, tmp_path):
+        f = tmp_path / 'empty.fasta'
+        f.write_bytes(b'')
+        assert protfasta.read_fasta(str(f), workers=2) == {}
+
+    def test_compressed_file_falls_back(self, tmp_path):
+        import gzip
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(gzip.compress(Path(SIMPLE_FILE).read_bytes()))
+        assert protfasta.read_fasta(str(f), workers=2) == protfasta.read_fasta(SIMPLE_FILE)
+
+    @pytest.mark.parametrize('text', BLOCK_EDGE_CASES)
+    @pytest.mark.parametrize('n_shards', [1, 2, 3, 50])
+    def test_shard_offsets(self, text, n_shards):
+        import io
+        from protfasta import _parallel
+        data = text.encode('utf-8')
+        shards = _parallel.shard_offsets(data, n_shards)
+        assert [start for start, _ in shards[1:]] == [end for _, end in shards[:-1]]
+        for start, _ in shards[1:]:
+            assert data[start - 1:start + 1] == b'\n>'
+        got = [rec for start, end in shards for rec in _io._iter_fasta_mmap(data, 'utf-8', start=start, end=end)]
+        assert got == list(_io._iter_lines(io.StringIO(text, newline=None)))
+
+
+# ---------------------------------------------------------------------------
+# TestFastaIndex
+# ---------------------------------------------------------------------------
+INDEXABLE_FILES = [
+    SIMPLE_FILE,
+    DUPLICATE_SEQ_FILE,
+    BADCHAR_FILE,
+    NONSTANDARD_FILE,
+    ALIGNED_VALID_FILE,
+    ALIGNED_CONVERTABLE_FILE,
+    ALIGNED_UNCONVERTABLE_FILE,
+]
+
+
+def _first_word(s):
+    return s.split()[0]
+
+
+class TestFastaIndex:
+    """index_fasta() writes a samtools .fai index; FastaIndex reads through it."""
+
+    @pytest.fixture
+    def fasta(self, tmp_path):
+        f = tmp_path / 'seqs.fasta'
+        f.write_bytes(Path(SIMPLE_FILE).read_bytes())
+        return f
+
+    @pytest.fixture
+    def unterminated(self, tmp_path):
+        # the final line is full-length and has no trailing newline
+        f = tmp_path / 'unterminated.fasta'
+        f.write_bytes(b'>a\nACDEF\nGHIKL\n>b desc\nMNPQR\nSTVWY')
+        return f
+
+    def test_fai_format(self, fasta):
+        path = protfasta.index_fasta(fasta)
+        assert path == str(fasta) + '.fai'
+        first = Path(path).read_text().splitlines()[0]
+        assert first == '%s\t%i\t%i\t%i\t%i' % (WASL_HEADER.split()[0], len(WASL_SEQ), len(WASL_HEADER) + 2, 60, 61)
+
+    def test_fai_format_single_line_crlf_and_empty(self, tmp_path):
+        f = tmp_path / 'seqs.fasta'
+        f.write_bytes(b'>a desc\nACDEF\n>b\r\nAC\r\nDE\r\nF\r\n>c\n>d\nKLM')
+        protfasta.index_fasta(f)
+        assert (tmp_path / 'seqs.fasta.fai').read_text().splitlines() == [
+            'a\t5\t8\t5\t6',
+            'b\t5\t18\t2\t4',
+            'c\t0\t32\t0\t0',
+            'd\t3\t35\t3\t3',
+        ]
+
+    @pytest.mark.parametrize('filename', INDEXABLE_FILES)
+    def test_parity_with_read_fasta(self, filename, tmp_path):
+        f = tmp_path / 'seqs.fasta'
+        f.write_bytes(Path(filename).read_bytes())
+        ref = protfasta.read_fasta(str(f), header_parser=_first_word, expect_unique_header=False,
+                                   duplicate_record_action='ignore', invalid_sequence_action='ignore')
+        with protfasta.FastaIndex(f) as idx:
+            assert dict(idx) == ref
+
+    def test_fetch_subsequences(self, fasta):
+        name = WASL_HEADER.split()[0]
+        with protfasta.FastaIndex(fasta) as idx:
+            for start, end in [(0, 0), (0, 1), (55, 65), (59, 61), (60, 120), (0, len(WASL_SEQ)), (500, 505)]:
+                assert idx.fetch(name, start, end) == WASL_SEQ[start:end]
+            assert idx.fetch(name, 490) == WASL_SEQ[490:]
+            assert idx.fetch(name, end=5) == WASL_SEQ[:5]
+            assert idx.length(name) == len(WASL_SEQ)
+
+    def test_mapping_interface(self, fasta):
+        name = WASL_HEADER.split()[0]
+        with protfasta.FastaIndex(fasta) as idx:
+            assert len(idx) == 9
+            assert name in idx
+            assert 'missing' not in idx
+            assert idx.get('missing') is None
+            with pytest.raises(KeyError):
+                idx['missing']
+            with pytest.raises(ProtfastaException, match='not found'):
+                idx.fetch('missing')
+
+    @pytest.mark.parametrize('start, end', [(-1, 5), (5, 4), (0, 506)])
+    def test_invalid_coordinates(self, fasta, start, end):
+        with protfasta.FastaIndex(fasta) as idx:
+            with pytest.raises(ProtfastaException, match='Invalid coordinates'):
+                idx.fetch(WASL_HEADER.split()[0], start, end)
+
+    def test_builds_missing_index(self, fasta):
+        assert not os.path.exists(str(fasta) + '.fai')
+        with protfasta.FastaIndex(fasta):
+            pass
+        assert os.path.exists(str(fasta) + '.fai')
+
+    def test_missing_index_without_build(self, fasta):
+        with pytest.raises(ProtfastaException, match='missing or out of date'):
+            protfasta.FastaIndex(fasta, build=False)
+
+    def test_stale_index_detected(self, fasta):
+        path = protfasta.index_fasta(fasta)
+        fasta.write_bytes(b'>new\nKLM\n' + Path(SIMPLE_FILE).read_bytes())
+        st = os.stat(path)
+        os.utime(fasta, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with pytest.raises(ProtfastaException, match='out of date'):
+            protfasta.FastaIndex(fasta, build=False)
+        with protfasta.FastaIndex(fasta) as idx:
+            assert idx['new'] == 'KLM'
+
+    def test_truncated_file_detected(self, fasta):
+        path = protfasta.index_fasta(fasta)
+        fasta.write_bytes(Path(SIMPLE_FILE).read_bytes()[:1000])
+        st = os.stat(fasta)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with pytest.raises(ProtfastaException, match='out of date'):
+            protfasta.FastaIndex(fasta, build=False)
+
+    def test_unterminated_final_line(self, unterminated):
+        path = protfasta.index_fasta(unterminated)
+        index_mtime = os.stat(path).st_mtime_ns
+        with protfasta.FastaIndex(unterminated, build=False) as idx:
+            assert dict(idx) == {'a': 'ACDEFGHIKL', 'b': 'MNPQRSTVWY'}
+            assert idx.fetch('b', 5) == 'STVWY'
+        with protfasta.FastaIndex(unterminated):
+            pass
+        assert os.stat(path).st_mtime_ns == index_mtime
+
+    def test_truncated_unterminated_file_detected(self, unterminated):
+        path = protfasta.index_fasta(unterminated)
+        unterminated.write_bytes(unterminated.read_bytes()[:-1])
+        st = os.stat(unterminated)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with pytest.raises(ProtfastaException, match='out of date'):
+            protfasta.FastaIndex(unterminated, build=False)
+
+    def test_file_changed_after_open(self, fasta):
+        with protfasta.FastaIndex(fasta) as idx:
+            fasta.write_bytes(Path(SIMPLE_FILE).read_bytes() + b'>x\nA\n')
+            with pytest.raises(ProtfastaException, match='has changed'):
+                idx.fetch(WASL_HEADER.split()[0])
+
+    def test_custom_index_filename(self, fasta, tmp_path):
+        path = protfasta.index_fasta(fasta, tmp_path / 'custom.fai')
+        assert path == str(tmp_path / 'custom.fai')
+        with protfasta.FastaIndex(fasta, index_filename=path, build=False) as idx:
+            assert len(idx) == 9
+
+    @pytest.mark.parametrize('text, match', [
+        (b'>a\nACDEF\nAC\nACDEF\n', 'different lengths'),
+        (b'>a\nACD\nACDEF\n', 'different lengths'),
+        (b'>a\nACD\n\nACD\n', 'different lengths'),
+        (b'>a\nACD\nACD\r\n', 'line endings'),
+        (b'>a\nACD\n>a\nKLM\n', 'duplicate record name'),
+        (b'>\nACD\n', 'empty header'),
+    ])
+    def test_unindexable_files(self, text, match, tmp_path):
+        f = tmp_path / 'bad.fasta'
+        f.write_bytes(text)
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.index_fasta(f)
+
+    def test_compressed_file_rejected(self, tmp_path):
+        import gzip
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(gzip.compress(Path(SIMPLE_FILE).read_bytes()))
+        with pytest.raises(ProtfastaException, match='compressed'):
+            protfasta.index_fasta(f)
+
+    def test_missing_file(self):
+        with pytest.raises(ProtfastaException, match='Unable to find file'):
+            protfasta.index_fasta('/nonexistent/path/file.fasta')
+
+
+# ---------------------------------------------------------------------------
+# TestLazyMapping
+# ---------------------------------------------------------------------------
+def _lookup_all(mapping):
+    """Look up every key, recording the exception message for failures."""
+    out = {}
+    for key in mapping:
+        try:
+            out[key] = mapping[key]
+        except ProtfastaException as e:
+            out[key] = 'raised: %s' % e
+    return out
+
+
+class TestLazyMapping:
+    """read_fasta(lazy=True) returns a mapping that reads sequences on lookup."""
+
+    LOOSE = dict(expect_unique_header=False, duplicate_record_action='ignore')
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    @pytest.mark.parametrize('invalid_sequence_action', ['ignore', 'convert-ignore'])
+    def test_parity(self, filename, invalid_sequence_action):
+        ref = protfasta.read_fasta(filename, invalid_sequence_action=invalid_sequence_action, **self.LOOSE)
+        lazy = protfasta.read_fasta(filename, invalid_sequence_action=invalid_sequence_action, lazy=True, **self.LOOSE)
+        assert list(lazy) == list(ref)
+        assert dict(lazy) == ref
+
+    @pytest.mark.parametrize('filename', [BADCHAR_FILE, FIXABLE_INVALID_FILE, UNFIXABLE_INVALID_FILE])
+    @pytest.mark.parametrize('invalid_sequence_action', ['fail', 'convert'])
+    def test_failures_raised_on_lookup(self, filename, invalid_sequence_action):
+        lazy = protfasta.read_fasta(filename, invalid_sequence_action=invalid_sequence_action, lazy=True, **self.LOOSE)
+        looked_up = _lookup_all(lazy)
+        failures = [v for v in looked_up.values() if v.startswith('raised: ')]
+        try:
+            protfasta.read_fasta(filename, invalid_sequence_action=invalid_sequence_action, **self.LOOSE)
+        except ProtfastaException as e:
+            # the eager read raises on the first failing record
+            assert failures[0] == 'raised: %s' % e
+        else:
+            assert not failures
+
+    @pytest.mark.parametrize('text', BLOCK_EDGE_CASES + [
+        '>h1\r\nACD\r\n\r\n>h2\r\nEF\r\n',
+        '>h1\n \n>h2\nEF\n',
+        '>h1\n\x1c\n>h2\nEF\n',
+    ])
+    def test_edge_case_parity(self, text, tmp_path):
+        f = tmp_path / 'edge.fasta'
+        f.write_bytes(text.encode('utf-8'))
+        ref = protfasta.read_fasta(str(f), invalid_sequence_action='ignore', **self.LOOSE)
+        lazy = protfasta.read_fasta(str(f), invalid_sequence_action='ignore', lazy=True, **self.LOOSE)
+        assert list(lazy.items()) == list(ref.items())
+
+    def test_duplicate_headers_last_wins(self, tmp_path):
+        f = tmp_path / 'dups.fasta'
+        f.write_text('>a\nACD\n>b\nEFG\n>a\nKLM\n')
+        lazy = protfasta.read_fasta(str(f), lazy=True, **self.LOOSE)
+        assert list(lazy.items()) == [('a', 'KLM'), ('b', 'EFG')]
+
+    def test_duplicate_header_detected(self):
+        with pytest.raises(ProtfastaException, match='duplicate header'):
+            protfasta.read_fasta(DUPLICATE_RECORD_FILE, lazy=True)
+
+    def test_header_parser(self):
+        lazy = protfasta.read_fasta(SIMPLE_FILE, header_parser=_first_word, lazy=True)
+        assert lazy[WASL_HEADER.split()[0]] == WASL_SEQ
+
+    def test_mapping_interface(self):
+        with protfasta.read_fasta(SIMPLE_FILE, lazy=True) as lazy:
+            assert isinstance(lazy, LazyFastaMapping)
+            assert len(lazy) == 9
+            assert WASL_HEADER in lazy
+            assert lazy.get('missing') is None
+            with pytest.raises(KeyError):
+                lazy['missing']
+
+    def test_file_changed_after_open(self, tmp_path):
+        f = tmp_path / 'seqs.fasta'
+        f.write_bytes(Path(SIMPLE_FILE).read_bytes())
+        lazy = protfasta.read_fasta(str(f), lazy=True)
+        f.write_bytes(Path(SIMPLE_FILE).read_bytes() + b'>x\nA\n')
+        with pytest.raises(ProtfastaException, match='has changed'):
+            lazy[WASL_HEADER]
+        lazy.close()
+
+    def test_empty_file(self, tmp_path):
+        f = tmp_path / 'empty.fasta'
+        f.write_bytes(b'')
+        assert dict(protfasta.read_fasta(str(f), lazy=True)) == {}
+
+    def test_compressed_file_rejected(self, tmp_path):
+        import gzip
+        f = tmp_path / 'seqs.fasta.gz'
+        f.write_bytes(gzip.compress(Path(SIMPLE_FILE).read_bytes()))
+        with pytest.raises(ProtfastaException, match='uncompressed'):
+            protfasta.read_fasta(str(f), lazy=True)
+
+    def test_verbose_output(self, capsys):
+        protfasta.read_fasta(SIMPLE_FILE, lazy=True, verbose=True)
+        assert 'Indexed 9 sequences' in capsys.readouterr().out
+
+    @pytest.mark.parametrize('kwargs', [
+        {'lazy': 'yes'},
+        {'lazy': True, 'return_list': True},
+        {'lazy': True, 'output_filename': 'out.fasta'},
+        {'lazy': True, 'duplicate_sequence_action': 'remove'},
+        {'lazy': True, 'expect_unique_header': False, 'duplicate_record_action': 'remove'},
+        {'lazy': True, 'invalid_sequence_action': 'remove'},
+        {'lazy': True, 'invalid_sequence_action': 'convert-remove'},
+    ])
+    def test_incompatible_options(self, kwargs):
+        with pytest.raises(ProtfastaException, match='lazy'):
+            protfasta.read_fasta(SIMPLE_FILE, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# TestSequenceStore
+# ---------------------------------------------------------------------------
+def _store_outcome(**kwargs):
+    """Like _outcome, but with return_store=True and the store unpacked to a list."""
+    result = _outcome(return_store=True, **kwargs)
+    return result if isinstance(result, str) else result.to_list()
+
+
+class TestSequenceStore:
+    """read_fasta(return_store=True) and the SequenceStore container."""
+
+    RECORDS = [('h1', 'ACDE'), ('h2', ''), ('h3 long header', 'KLMNPQ'), ('h1', 'W')]
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    @pytest.mark.parametrize('invalid_sequence_action', INVALID_ACTIONS)
+    def test_parity(self, filename, invalid_sequence_action):
+        kwargs = dict(filename=filename, expect_unique_header=False, duplicate_record_action='ignore',
+                      invalid_sequence_action=invalid_sequence_action)
+        assert _store_outcome(**kwargs) == _outcome(return_list=True, **kwargs)
+
+    @pytest.mark.parametrize('duplicate_record_action', ['ignore', 'fail', 'remove'])
+    @pytest.mark.parametrize('duplicate_sequence_action', ['ignore', 'fail', 'remove'])
+    @pytest.mark.parametrize('read_options', [{}, {'engine': 'block'}, {'mmap': True}, {'workers': 3}])
+    def test_pipeline_parity(self, duplicate_record_action, duplicate_sequence_action, read_options):
+        kwargs = dict(filename=DUPLICATE_SEQ_FILE, expect_unique_header=False,
+                      duplicate_record_action=duplicate_record_action,
+                      duplicate_sequence_action=duplicate_sequence_action,
+                      invalid_sequence_action='convert-remove', **read_options)
+        assert _store_outcome(**kwargs) == _outcome(return_list=True, **kwargs)
+
+    def test_returns_store(self):
+        store = protfasta.read_fasta(SIMPLE_FILE, return_store=True)
+        assert isinstance(store, protfasta.SequenceStore)
+        assert store.to_dict() == protfasta.read_fasta(SIMPLE_FILE)
+
+    def test_sequence_interface(self):
+        store = protfasta.SequenceStore(self.RECORDS)
+        assert len(store) == 4
+        assert list(store) == self.RECORDS
+        assert store[2] == ('h3 long header', 'KLMNPQ')
+        assert store[-1] == ('h1', 'W')
+        assert store.header(0) == 'h1' and store.sequence(-2) == 'KLMNPQ'
+        assert list(store.headers()) == [h for h, _ in self.RECORDS]
+        assert list(store.sequences()) == [s for _, s in self.RECORDS]
+        assert ('h2', '') in store
+        assert store.to_dict() == {'h1': 'W', 'h2': '', 'h3 long header': 'KLMNPQ'}
+        assert store.to_list() == [list(r) for r in self.RECORDS]
+        assert repr(store) == 'SequenceStore(4 records, 11 residues)'
+        with pytest.raises(IndexError):
+            store[4]
+        with pytest.raises(IndexError):
+            store[-5]
+
+    @pytest.mark.parametrize('sl', [slice(None), slice(1, 3), slice(2, None), slice(None, None, 2),
+                                    slice(None, None, -1), slice(3, 1), slice(-3, -1)])
+    def test_slicing(self, sl):
+        store = protfasta.SequenceStore(self.RECORDS)
+        part = store[sl]
+        assert isinstance(part, protfasta.SequenceStore)
+        assert list(part) == self.RECORDS[sl]
+
+    def test_extend_and_equality(self):
+        store = protfasta.SequenceStore(self.RECORDS[:2])
+        store.extend(protfasta.SequenceStore(self.RECORDS[2:]))
+        assert store == protfasta.SequenceStore(self.RECORDS)
+        store.extend(store)
+        assert list(store) == self.RECORDS * 2
+        assert store != protfasta.SequenceStore(self.RECORDS)
+
+    def test_bad_record_raises(self):
+        with pytest.raises(ProtfastaException, match='pairs'):
+            protfasta.SequenceStore([('h1', 'ACDE', 'extra')])
+
+    def test_non_ascii(self):
+        records = [('hé', 'ACÅD'), ('h2', 'EF')]
+        store = protfasta.SequenceStore(records)
+        assert list(store) == records
+        assert list(store[1:]) == records[1:]
+
+    def test_nbytes_is_compact(self):
+        store = protfasta.read_fasta(SIMPLE_FILE, return_store=True)
+        data = sum(len(h) + len(s) for h, s in store)
+        assert store.nbytes == data + 16 * len(store)
+
+    @pytest.mark.parametrize('correction_dictionary', [
+        {'X': ''},                  # every converted record shrinks
+        {'X': 'GGGG'},              # converted records grow past the space freed
+        {'X': 'G', 'B': 'NNN'},     # both
+    ])
+    def test_convert_in_place(self, correction_dictionary, tmp_path):
+        f = tmp_path / 'convert.fasta'
+        seqs = ('ACX', 'XXB', 'KLM', 'BXBX')
+        f.write_text(''.join('>h%i\n%s\n' % (i, seqs[i % 4] * (i % 5 + 1)) for i in range(30)))
+        kwargs = dict(filename=str(f), invalid_sequence_action='convert-ignore',
+                      correction_dictionary=correction_dictionary)
+        assert _store_outcome(**kwargs) == _outcome(return_list=True, **kwargs)
+
+    def test_write_fasta(self, tmp_path):
+        store = protfasta.read_fasta(SIMPLE_FILE, return_store=True)
+        out = tmp_path / 'out.fasta'
+        protfasta.write_fasta(store, str(out))
+        assert protfasta.read_fasta(str(out)) == store.to_dict()
+
+    @pytest.mark.parametrize('kwargs', [
+        {'return_store': 'yes'},
+        {'return_store': True, 'return_list': True},
+        {'return_store': True, 'lazy': True},
+    ])
+    def test_incompatible_options(self, kwargs):
+        with pytest.raises(ProtfastaException, match='return_store'):
+            protfasta.read_fasta(SIMPLE_FILE, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# TestEncode
+# ---------------------------------------------------------------------------
+class TestEncode:
+    """Integer encoding of sequences (read_fasta(encode='uint8') and protfasta.encode)."""
+
+    @pytest.fixture
+    def np(self):
+        return pytest.importorskip('numpy')
+
+    def _expected(self, seq, alignment=False):
+        alphabet = _configs.STANDARD_AAS_WITH_GAP if alignment else _configs.STANDARD_AAS
+        return [alphabet.index(c) for c in seq]
+
+    def test_encode_sequence(self, np):
+        codes = _encode.encode_sequence('ACDEFGHIKLMNPQRSTVWY')
+        assert codes.dtype == np.uint8
+        assert codes.tolist() == list(range(20))
+        assert _encode.encode_sequence('acdy').tolist() == [0, 1, 2, 19]
+        assert _encode.encode_sequence('').tolist() == []
+
+    def test_gap_code(self, np):
+        assert _encode.encode_sequence('A-C', alignment=True).tolist() == [0, 20, 1]
+        with pytest.raises(ProtfastaException, match="invalid amino acid '-'"):
+            _encode.encode_sequence('A-C')
+
+    def test_round_trip(self, np):
+        assert _encode.decode_sequence(_encode.encode_sequence(WASL_SEQ)) == WASL_SEQ
+        assert _encode.decode_sequence(_encode.encode_sequence('A-C', alignment=True), alignment=True) == 'A-C'
+        with pytest.raises(ProtfastaException, match='Cannot decode'):
+            _encode.decode_sequence([20])
+
+    def test_read_fasta_dict(self, np):
+        seqs = protfasta.read_fasta(SIMPLE_FILE)
+        encoded = protfasta.read_fasta(SIMPLE_FILE, encode='uint8')
+        assert list(encoded) == list(seqs)
+        for header, seq in seqs.items():
+            assert encoded[header].tolist() == self._expected(seq)
+
+    def test_read_fasta_list_alignment(self, np):
+        seqs = protfasta.read_fasta(ALIGNED_VALID_FILE, alignment=True, return_list=True)
+        encoded = protfasta.read_fasta(ALIGNED_VALID_FILE, alignment=True, return_list=True, encode='uint8')
+        assert [h for h, _ in encoded] == [h for h, _ in seqs]
+        assert [a.tolist() for _, a in encoded] == [self._expected(s, True) for _, s in seqs]
+
+    @pytest.mark.parametrize('container', ['dict', 'list', 'store'])
+    def test_encode_concatenated(self, container, np):
+        records = protfasta.read_fasta(SIMPLE_FILE, return_list=True)
+        data = {'dict': dict(records), 'list': records, 'store': protfasta.SequenceStore(records)}[container]
+        (headers, codes, offsets) = _encode.encode_concatenated(data)
+        assert headers == [h for h, _ in records]
+        assert offsets.dtype == np.int64 and len(offsets) == len(records) + 1
+        for i, (_h, seq) in enumerate(records):
+            assert codes[offsets[i]:offsets[i + 1]].tolist() == self._expected(seq)
+
+    @pytest.mark.parametrize('container', ['list', 'store'])
+    @pytest.mark.parametrize('bad', ['X', 'é'])
+    def test_invalid_residue_reported(self, np, container, bad):
+        records = [['h1', 'ACDE'], ['h2', 'AC%sD' % bad]]
+        data = protfasta.SequenceStore(records) if container == 'store' else records
+        with pytest.raises(ProtfastaException, match="'%s' in entry >h2" % bad):
+            _encode.encode_concatenated(data)
+
+    def test_invalid_after_ignore_raises(self, np):
+        with pytest.raises(ProtfastaException, match='Cannot encode'):
+            protfasta.read_fasta(BADCHAR_FILE, invalid_sequence_action='ignore', encode='uint8')
+
+    def test_arrays_share_one_buffer(self, np):
+        encoded = protfasta.read_fasta(SIMPLE_FILE, return_list=True, encode='uint8')
+        bases = {id(arr.base) for _, arr in encoded}
+        assert len(bases) == 1
+
+    @pytest.mark.parametrize('kwargs', [
+        {'encode': 'int64'},
+        {'encode': 'uint8', 'lazy': True},
+        {'encode': 'uint8', 'return_store': True},
+    ])
+    def test_bad_options(self, np, kwargs):
+        with pytest.raises(ProtfastaException, match='encode'):
+            protfasta.read_fasta(SIMPLE_FILE, **kwargs)
+
+    def test_without_numpy(self, monkeypatch):
+        # a None entry in sys.modules makes 'import numpy' raise ImportError
+        monkeypatch.setitem(sys.modules, 'numpy', None)
+        with pytest.raises(ProtfastaException, match='requires numpy'):
+            protfasta.read_fasta(SIMPLE_FILE, encode='uint8')
+
+
+# ---------------------------------------------------------------------------
+# TestCache
+# ---------------------------------------------------------------------------
+# a global read by the header_parser of the cache-key tests
+_CACHE_SUFFIX = ''
+
+
+class TestCache:
+    """read_fasta(cache=...) and the FastaCache on-disk cache."""
+
+    @pytest.fixture
+    def fasta(self, tmp_path):
+        f = tmp_path / 'seqs.fasta'
+        f.write_bytes(Path(SIMPLE_FILE).read_bytes())
+        return f
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return protfasta.FastaCache(tmp_path / 'cache')
+
+    @pytest.fixture
+    def no_parse(self, monkeypatch):
+        """Call to make any further parse fail, proving a result came from the cache."""
+        def block():
+            def fail(*args, **kwargs):
+                raise AssertionError('file was parsed despite a cache hit')
+            monkeypatch.setattr(protfasta, '_read_and_sanitize', fail)
+        return block
+
+    @pytest.mark.parametrize('kwargs', [{}, {'return_list': True}, {'return_store': True},
+                                        {'invalid_sequence_action': 'convert-remove'},
+                                        {'header_parser': _first_word}])
+    def test_hit_matches_uncached(self, fasta, cache, no_parse, kwargs):
+        expected = protfasta.read_fasta(str(fasta), **kwargs)
+        assert protfasta.read_fasta(str(fasta), cache=cache, **kwargs) == expected
+        assert len(cache) == 1
+        no_parse()
+        assert protfasta.read_fasta(str(fasta), cache=cache, **kwargs) == expected
+
+    def test_entry_shared_across_return_types(self, fasta, cache, no_parse):
+        expected = protfasta.read_fasta(str(fasta), return_list=True)
+        protfasta.read_fasta(str(fasta), cache=cache)
+        no_parse()
+        assert protfasta.read_fasta(str(fasta), cache=cache, return_list=True) == expected
+        assert protfasta.read_fasta(str(fasta), cache=cache, return_store=True).to_list() == expected
+
+    @pytest.mark.parametrize('kwargs', [
+        {'invalid_sequence_action': 'convert'},
+        {'alignment': True, 'invalid_sequence_action': 'ignore'},
+        {'correction_dictionary': {'X': 'A'}},
+        {'header_parser': lambda s: s[:10]},
+        {'expect_unique_header': False, 'duplicate_record_action': 'remove'},
+    ])
+    def test_options_change_key(self, fasta, cache, kwargs):
+        protfasta.read_fasta(str(fasta), cache=cache)
+        protfasta.read_fasta(str(fasta), cache=cache, **kwargs)
+        assert len(cache) == 2
+
+    def test_same_header_parser_code_hits(self, fasta, cache):
+        protfasta.read_fasta(str(fasta), cache=cache, header_parser=lambda s: s.split()[0])
+        protfasta.read_fasta(str(fasta), cache=cache, header_parser=lambda s: s.split()[0])
+        assert len(cache) == 1
+
+    def test_bound_method_parser_bypasses(self, fasta, cache):
+        class Prefixer:
+            def __init__(self, prefix):
+                self.prefix = prefix
+
+            def parse(self, header):
+                return self.prefix + header
+
+        first = protfasta.read_fasta(str(fasta), cache=cache, header_parser=Prefixer('_X').parse)
+        second = protfasta.read_fasta(str(fasta), cache=cache, header_parser=Prefixer('_Y').parse)
+        assert all(header.startswith('_X') for header in first)
+        assert all(header.startswith('_Y') for header in second)
+        assert len(cache) == 0
+
+    def test_partial_parser_bypasses(self, fasta, cache):
+        import functools
+        protfasta.read_fasta(str(fasta), cache=cache, header_parser=functools.partial(re.sub, ' ', '_'))
+        assert len(cache) == 0
+
+    def test_header_parser_globals_change_key(self, fasta, cache, monkeypatch):
+        monkeypatch.setitem(globals(), '_CACHE_SUFFIX', '_X')
+        first = protfasta.read_fasta(str(fasta), cache=cache, header_parser=lambda h: h[:10] + _CACHE_SUFFIX)
+        monkeypatch.setitem(globals(), '_CACHE_SUFFIX', '_Y')
+        second = protfasta.read_fasta(str(fasta), cache=cache, header_parser=lambda h: h[:10] + _CACHE_SUFFIX)
+        assert all(header.endswith('_X') for header in first)
+        assert all(header.endswith('_Y') for header in second)
+        assert len(cache) == 2
+
+        # reading the same global value again is a hit
+        protfasta.read_fasta(str(fasta), cache=cache, header_parser=lambda h: h[:10] + _CACHE_SUFFIX)
+        assert len(cache) == 2
+
+    def test_header_parser_unkeyable_global_bypasses(self, fasta, cache, monkeypatch):
+        class Suffix:
+            value = '_X'
+
+        monkeypatch.setitem(globals(), '_CACHE_SUFFIX', Suffix)
+        first = protfasta.read_fasta(str(fasta), cache=cache, header_parser=lambda h: h + _CACHE_SUFFIX.value)
+        Suffix.value = '_Y'
+        second = protfasta.read_fasta(str(fasta), cache=cache, header_parser=lambda h: h + _CACHE_SUFFIX.value)
+        assert all(header.endswith('_X') for header in first)
+        assert all(header.endswith('_Y') for header in second)
+        assert len(cache) == 0
+
+    def test_callable_key(self):
+        import functools
+        assert _cache._callable_key(_first_word) == _cache._callable_key(_first_word)
+        assert _cache._callable_key(lambda h: re.sub('x', 'y', h)) is not None
+        assert _cache._callable_key(lambda h, table={'a': ('b', 1)}: table.get(h, h)) is not None
+        assert _cache._callable_key(functools.partial(_first_word)) is None
+        assert _cache._callable_key(str.upper) is None
+        assert _cache._callable_key('abc'.__add__) is None
+
+    def test_unkeyable_parser_verbose(self, fasta, cache, capsys):
+        protfasta.read_fasta(str(fasta), cache=cache, header_parser=str.upper, verbose=True)
+        assert 'without the cache' in capsys.readouterr().out
+
+    def test_modified_file_misses(self, fasta, cache):
+        protfasta.read_fasta(str(fasta), cache=cache)
+        fasta.write_text('>new\nACDE\n')
+        os.utime(fasta, ns=(1, 1))
+        assert protfasta.read_fasta(str(fasta), cache=cache) == {'new': 'ACDE'}
+
+    def test_clear(self, fasta, cache, tmp_path):
+        other = tmp_path / 'other.fasta'
+        other.write_text('>a\nACDE\n')
+        protfasta.read_fasta(str(fasta), cache=cache)
+        protfasta.read_fasta(str(fasta), cache=cache, invalid_sequence_action='convert')
+        protfasta.read_fasta(str(other), cache=cache)
+        assert cache.clear(fasta) == 2
+        assert len(cache) == 1
+        assert cache.clear() == 1
+        assert len(cache) == 0 and cache.size == 0
+
+    def test_lru_eviction(self, tmp_path):
+        files = []
+        for name in 'abc':
+            f = tmp_path / ('%s.fasta' % name)
+            f.write_text('>%s\n%s\n' % (name, 'ACDEFGHIKL' * 100))
+            files.append(str(f))
+
+        probe = protfasta.FastaCache(tmp_path / 'probe')
+        protfasta.read_fasta(files[0], cache=probe)
+        entry_size = probe.size
+
+        cache = protfasta.FastaCache(tmp_path / 'cache', max_bytes=2 * entry_size)
+
+        def entry(filename):
+            (name,) = [n for n in os.listdir(cache.directory) if n.startswith(cache._file_prefix(filename))]
+            return os.path.join(cache.directory, name)
+
+        protfasta.read_fasta(files[0], cache=cache)
+        protfasta.read_fasta(files[1], cache=cache)
+        os.utime(entry(files[0]), ns=(10**9, 10**9))
+        os.utime(entry(files[1]), ns=(2 * 10**9, 2 * 10**9))
+
+        # a hit marks files[0] as recently used, so files[1] is evicted instead
+        protfasta.read_fasta(files[0], cache=cache)
+        protfasta.read_fasta(files[2], cache=cache)
+        assert len(cache) == 2
+        assert sorted(os.listdir(cache.directory)) == sorted(os.path.basename(entry(f)) for f in (files[0], files[2]))
+        assert cache.size <= cache.max_bytes
+
+    def test_oversized_entry_not_written(self, fasta, tmp_path):
+        cache = protfasta.FastaCache(tmp_path / 'cache', max_bytes=10)
+        assert protfasta.read_fasta(str(fasta), cache=cache) == protfasta.read_fasta(str(fasta))
+        assert len(cache) == 0
+
+    def test_corrupt_entry_is_a_miss(self, fasta, cache):
+        protfasta.read_fasta(str(fasta), cache=cache)
+        (entry,) = os.listdir(cache.directory)
+        path = os.path.join(cache.directory, entry)
+        with open(path, 'r+b') as fh:
+            fh.truncate(40)
+        assert protfasta.read_fasta(str(fasta), cache=cache) == protfasta.read_fasta(str(fasta))
+        assert os.path.getsize(path) > 40
+
+    def test_default_directory(self, fasta, tmp_path, monkeypatch):
+        monkeypatch.setenv('PROTFASTA_CACHE_DIR', str(tmp_path / 'env-cache'))
+        protfasta.read_fasta(str(fasta), cache=True)
+        assert len(protfasta.FastaCache()) == 1
+
+    def test_directory_path(self, fasta, tmp_path):
+        protfasta.read_fasta(str(fasta), cache=tmp_path / 'path-cache')
+        assert len(protfasta.FastaCache(tmp_path / 'path-cache')) == 1
+
+    def test_hit_writes_output_and_reports(self, fasta, cache, tmp_path, capsys):
+        protfasta.read_fasta(str(fasta), cache=cache)
+        out = tmp_path / 'out.fasta'
+        protfasta.read_fasta(str(fasta), cache=cache, output_filename=str(out), verbose=True)
+        assert 'from cache' in capsys.readouterr().out
+        assert protfasta.read_fasta(str(out)) == protfasta.read_fasta(str(fasta))
+
+    @pytest.mark.parametrize('kwargs', [{'cache': 1}, {'cache': True, 'lazy': True}])
+    def test_bad_options(self, kwargs):
+        with pytest.raises(ProtfastaException, match='cache'):
+            protfasta.read_fasta(SIMPLE_FILE, **kwargs)
+
+    def test_bad_max_bytes(self):
+        with pytest.raises(ProtfastaException, match='max_bytes'):
+            protfasta.FastaCache(max_bytes=0)
+
+
+# ---------------------------------------------------------------------------
+# TestAsync
+# ---------------------------------------------------------------------------
+def _collect_async(stream):
+    """Drain an async record stream from synchronous test code."""
+    async def run():
+        async with stream as records:
+            return [record async for record in records]
+    return asyncio.run(run())
+
+
+class TestAsync:
+    """read_fasta_async and read_fasta_stream_async (asyncio wrappers)."""
+
+    @pytest.mark.parametrize('kwargs', [{}, {'return_list': True},
+                                        {'invalid_sequence_action': 'convert-remove', 'return_store': True}])
+    def test_read_fasta_async_parity(self, kwargs):
+        result = asyncio.run(protfasta.read_fasta_async(SIMPLE_FILE, **kwargs))
+        assert result == protfasta.read_fasta(SIMPLE_FILE, **kwargs)
+
+    def test_read_fasta_async_errors_propagate(self):
+        with pytest.raises(ProtfastaException, match='invalid amino acid'):
+            asyncio.run(protfasta.read_fasta_async(BADCHAR_FILE))
+        with pytest.raises(ProtfastaException, match='lazy'):
+            asyncio.run(protfasta.read_fasta_async(SIMPLE_FILE, lazy=True))
+
+    def test_read_fasta_async_executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            result = asyncio.run(protfasta.read_fasta_async(SIMPLE_FILE, executor=pool))
+        assert result == protfasta.read_fasta(SIMPLE_FILE)
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    @pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+    def test_stream_parity(self, filename, chunk_size):
+        kwargs = dict(invalid_sequence_action='ignore', return_list=True)
+        stream = protfasta.read_fasta_stream_async(filename, chunk_size=chunk_size, read_ahead=2, **kwargs)
+        assert _collect_async(stream) == list(protfasta.read_fasta_stream(filename, **kwargs))
+
+    @pytest.mark.parametrize('kwargs', [
+        {'batch_size': 2},
+        {'batch_residues': 500},
+        {'batch_size': 3, 'return_store': True},
+    ])
+    @pytest.mark.parametrize('chunk_size', [1, 1024])
+    def test_stream_batch_options_passed_on(self, kwargs, chunk_size):
+        # the same keywords yield the same items as read_fasta_stream
+        stream = protfasta.read_fasta_stream_async(SIMPLE_FILE, chunk_size=chunk_size, **kwargs)
+        items = _collect_async(stream)
+        ref = list(protfasta.read_fasta_stream(SIMPLE_FILE, **kwargs))
+        assert [list(item) for item in items] == [list(item) for item in ref]
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 1024])
+    def test_stream_prefix_before_error(self, chunk_size, tmp_path):
+        f = tmp_path / 'bad.fasta'
+        f.write_text(''.join('>h%i\n%s\n' % (i, 'ACDX' if i == 5 else 'ACDE') for i in range(10)))
+        seen = []
+
+        async def run():
+            async with protfasta.read_fasta_stream_async(str(f), chunk_size=chunk_size) as records:
+                async for (header, _seq) in records:
+                    seen.append(header)
+
+        with pytest.raises(ProtfastaException, match='invalid amino acid'):
+            asyncio.run(run())
+        assert seen == ['h0', 'h1', 'h2', 'h3', 'h4']
+
+    def test_stream_validates_on_call(self):
+        # no event loop is needed for argument errors
+        with pytest.raises(ProtfastaException, match='invalid_sequence_action'):
+            protfasta.read_fasta_stream_async(SIMPLE_FILE, invalid_sequence_action='bogus')
+        with pytest.raises(ProtfastaException, match='read_ahead'):
+            protfasta.read_fasta_stream_async(SIMPLE_FILE, read_ahead=0)
+        with pytest.raises(ProtfastaException, match='chunk_size'):
+            protfasta.read_fasta_stream_async(SIMPLE_FILE, chunk_size='10')
+
+    def test_stream_error_mid_file(self):
+        stream = protfasta.read_fasta_stream_async(BADCHAR_FILE, chunk_size=1)
+        with pytest.raises(ProtfastaException, match='invalid amino acid'):
+            _collect_async(stream)
+
+    def test_backpressure(self):
+        produced = []
+
+        def records():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        async def run():
+            stream = _aio.AsyncRecordStream(records, read_ahead=2, chunk_size=5)
+            async with stream:
+                for _ in range(10):
+                    await stream.__anext__()
+                await asyncio.sleep(0.3)
+                # two queued chunks plus one waiting to be queued, beyond the two consumed
+                assert len(produced) <= 5 * (2 + 2 + 1)
+
+        asyncio.run(run())
+        assert len(produced) < 1000
+
+    def test_aclose_closes_reader(self):
+        state = {'closed': False}
+
+        def records():
+            try:
+                for i in range(10**6):
+                    yield i
+            finally:
+                state['closed'] = True
+
+        async def run():
+            stream = _aio.AsyncRecordStream(records, read_ahead=1, chunk_size=10)
+            async for i in stream:
+                if i == 25:
+                    break
+            await stream.aclose()
+            assert state['closed']
+
+        asyncio.run(run())
+
+    def test_abandoned_stream_releases_reader(self):
+        state = {'closed': False}
+
+        def records():
+            try:
+                for i in range(10**6):
+                    yield i
+            finally:
+                state['closed'] = True
+
+        async def run():
+            stream = _aio.AsyncRecordStream(records, read_ahead=1, chunk_size=10)
+            async for _ in stream:
+                break
+            del stream
+            gc.collect()
+            for _ in range(50):
+                if state['closed']:
+                    break
+                await asyncio.sleep(0.05)
+            assert state['closed']
+
+        asyncio.run(run())
+
+    def test_event_loop_not_blocked(self):
+        def records():
+            for i in range(5):
+                time.sleep(0.05)
+                yield i
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            out = [i async for i in _aio.AsyncRecordStream(records, chunk_size=5)]
+            task.cancel()
+            return out, ticks
+
+        (out, ticks) = asyncio.run(run())
+        assert out == list(range(5))
+        assert ticks >= 5
+
+
+# ---------------------------------------------------------------------------
+# TestPrefetch
+# ---------------------------------------------------------------------------
+def _prefetch_threads():
+    return [t for t in threading.enumerate() if t.name == 'protfasta-prefetch']
+
+
+class TestPrefetch:
+    """read_fasta_stream(prefetch=N) reads ahead in a background thread."""
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    @pytest.mark.parametrize('prefetch', [1, 3, 1000])
+    @pytest.mark.parametrize('kwargs', [
+        {'invalid_sequence_action': 'ignore'},
+        {'invalid_sequence_action': 'convert-remove', 'duplicate_sequence_action': 'remove',
+         'duplicate_record_action': 'remove', 'silence_warnings': True},
+    ])
+    def test_parity(self, filename, prefetch, kwargs):
+        ref = list(protfasta.read_fasta_stream(filename, **kwargs))
+        assert list(protfasta.read_fasta_stream(filename, prefetch=prefetch, **kwargs)) == ref
+
+    def test_order_across_batches(self, tmp_path):
+        f = tmp_path / 'many.fasta'
+        f.write_text(''.join('>s%i\nACDE\n' % i for i in range(2000)))
+        headers = [h for (h, _s) in protfasta.read_fasta_stream(str(f), prefetch=700)]
+        assert headers == ['s%i' % i for i in range(2000)]
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({}, 'invalid amino acid'),
+        ({'invalid_sequence_action': 'ignore', 'duplicate_sequence_action': 'fail', 'silence_warnings': True},
+         'duplicate sequences'),
+    ])
+    def test_errors_raised_in_consumer(self, kwargs, match):
+        filename = BADCHAR_FILE if not kwargs else DUPLICATE_SEQ_FILE
+        with pytest.raises(ProtfastaException, match=match):
+            list(protfasta.read_fasta_stream(filename, prefetch=2, **kwargs))
+        assert _prefetch_threads() == []
+
+    def test_thread_error_reraised(self):
+        def parser(header):
+            if 'WASL' in header:
+                raise ValueError('bad header')
+            return header
+
+        stream = protfasta.read_fasta_stream(SIMPLE_FILE, header_parser=parser, check_header_parser=False, prefetch=1)
+        with pytest.raises(ValueError, match='bad header'):
+            list(stream)
+        assert _prefetch_threads() == []
+
+    @pytest.mark.parametrize('error', ['header_parser', 'invalid'])
+    def test_prefix_before_error(self, error, tmp_path):
+        # records read before an error are yielded whatever prefetch is
+        f = tmp_path / 'bad.fasta'
+        f.write_text(''.join('>h%i\n%s\n' % (i, 'ACDX' if i == 5 else 'ACDE') for i in range(10)))
+
+        def parser(header):
+            if header == 'h5':
+                raise ValueError('bad header')
+            return header
+
+        kwargs = {'header_parser': parser, 'check_header_parser': False} if error == 'header_parser' else {}
+        prefixes = []
+        for prefetch in [0, 1, 2, 3, 4, 100]:
+            seen = []
+            with pytest.raises((ValueError, ProtfastaException)):
+                for (header, _seq) in protfasta.read_fasta_stream(str(f), prefetch=prefetch, **kwargs):
+                    seen.append(header)
+            prefixes.append(seen)
+        assert prefixes == [['h0', 'h1', 'h2', 'h3', 'h4']] * len(prefixes)
+        assert _prefetch_threads() == []
+
+    def test_early_exit_stops_thread(self, tmp_path):
+        f = tmp_path / 'many.fasta'
+        f.write_text(''.join('>s%i\nACDE\n' % i for i in range(5000)))
+        stream = protfasta.read_fasta_stream(str(f), prefetch=10)
+        assert next(stream) == ('s0', 'ACDE')
+        stream.close()
+        assert _prefetch_threads() == []
+
+    @pytest.mark.parametrize('prefetch', [-1, 1.5, True, '4'])
+    def test_invalid_prefetch(self, prefetch):
+        with pytest.raises(ProtfastaException, match='prefetch'):
+            protfasta.read_fasta_stream(SIMPLE_FILE, prefetch=prefetch)
+
+
+# ---------------------------------------------------------------------------
+# TestStreamBatches
+# ---------------------------------------------------------------------------
+class TestStreamBatches:
+    """read_fasta_stream(batch_size=K / batch_residues=R) yields record batches."""
+
+    @pytest.fixture
+    def many(self, tmp_path):
+        f = tmp_path / 'many.fasta'
+        f.write_text(''.join('>s%i\n%s\n' % (i, 'ACDEFGHIK'[:1 + i % 9]) for i in range(1000)))
+        return str(f)
+
+    @pytest.mark.parametrize('batch_size', [1, 7, 1000, 5000])
+    def test_batch_size(self, many, batch_size):
+        ref = list(protfasta.read_fasta_stream(many))
+        batches = list(protfasta.read_fasta_stream(many, batch_size=batch_size))
+        assert all(type(b) is list for b in batches)
+        assert [r for b in batches for r in b] == ref
+        assert all(len(b) == batch_size for b in batches[:-1])
+        assert 0 < len(batches[-1]) <= batch_size
+
+    @pytest.mark.parametrize('batch_residues', [1, 50, 10**6])
+    def test_batch_residues(self, many, batch_residues):
+        ref = list(protfasta.read_fasta_stream(many))
+        batches = list(protfasta.read_fasta_stream(many, batch_residues=batch_residues))
+        assert [r for b in batches for r in b] == ref
+        for b in batches[:-1]:
+            residues = sum(len(s) for (_h, s) in b)
+            assert residues >= batch_residues
+            assert residues - len(b[-1][1]) < batch_residues
+
+    def test_whichever_limit_first(self, many):
+        for b in protfasta.read_fasta_stream(many, batch_size=10, batch_residues=30):
+            assert len(b) <= 10
+            assert sum(len(s) for (_h, s) in b[:-1]) < 30
+
+    def test_return_store_batches(self, many):
+        ref = list(protfasta.read_fasta_stream(many))
+        batches = list(protfasta.read_fasta_stream(many, batch_size=64, return_store=True))
+        assert all(isinstance(b, protfasta.SequenceStore) for b in batches)
+        assert [r for b in batches for r in b] == ref
+
+    def test_return_list_records(self):
+        batches = list(protfasta.read_fasta_stream(SIMPLE_FILE, batch_size=2, return_list=True))
+        assert [r for b in batches for r in b] == list(protfasta.read_fasta_stream(SIMPLE_FILE, return_list=True))
+
+    def test_sanitization_and_output(self, tmp_path):
+        out = tmp_path / 'out.fasta'
+        kwargs = dict(invalid_sequence_action='convert-remove', duplicate_sequence_action='remove',
+                      silence_warnings=True)
+        ref = list(protfasta.read_fasta_stream(FIXABLE_INVALID_FILE, **kwargs))
+        batches = list(protfasta.read_fasta_stream(FIXABLE_INVALID_FILE, batch_size=3, output_filename=str(out),
+                                                   prefetch=2, **kwargs))
+        assert [r for b in batches for r in b] == ref
+        assert protfasta.read_fasta(str(out), return_list=True) == [list(r) for r in ref]
+
+    def test_empty_file(self, tmp_path):
+        f = tmp_path / 'empty.fasta'
+        f.write_text('')
+        assert list(protfasta.read_fasta_stream(str(f), batch_size=10, return_store=True)) == []
+
+    def test_return_store_requires_batching(self):
+        with pytest.raises(ProtfastaException, match='batch_size'):
+            protfasta.read_fasta_stream(SIMPLE_FILE, return_store=True)
+        with pytest.raises(ProtfastaException, match='return_list'):
+            protfasta.read_fasta_stream(SIMPLE_FILE, batch_size=4, return_store=True, return_list=True)
+
+    @pytest.mark.parametrize('kwargs', [
+        {'batch_size': 0},
+        {'batch_size': 2.0},
+        {'batch_residues': -5},
+        {'batch_residues': True},
+    ])
+    def test_invalid_values(self, kwargs):
+        with pytest.raises(ProtfastaException, match=list(kwargs)[0]):
+            protfasta.read_fasta_stream(SIMPLE_FILE, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# TestFileObjects
+# ---------------------------------------------------------------------------
+def _simple_bytes():
+    with open(SIMPLE_FILE, 'rb') as fh:
+        return fh.read()
+
+
+class _ReadOnly:
+    """File-like object outside the io hierarchy, with only read()."""
+
+    def __init__(self, data):
+        self._buf = io.BytesIO(data)
+
+    def read(self, n=-1):
+        return self._buf.read(n)
+
+
+class TestFileObjects:
+    """Readers accept file objects and '-'; writers accept writable handles and '-'."""
+
+    @pytest.mark.parametrize('kwargs', [{}, {'engine': 'block'}, {'mmap': True}, {'workers': 2}])
+    @pytest.mark.parametrize('make', [
+        lambda data: io.BytesIO(data),
+        lambda data: io.StringIO(data.decode('utf-8')),
+        lambda data: io.BytesIO(gzip.compress(data)),
+        lambda data: io.BufferedReader(io.BytesIO(bz2.compress(data))),
+        lambda data: _ReadOnly(data),
+    ])
+    def test_read_fasta_parity(self, make, kwargs):
+        fh = make(_simple_bytes())
+        assert protfasta.read_fasta(fh, **kwargs) == protfasta.read_fasta(SIMPLE_FILE)
+        # the caller's file object is left open
+        assert not getattr(fh, 'closed', False)
+
+    def test_stdin(self, monkeypatch):
+        monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(gzip.compress(_simple_bytes()))))
+        assert protfasta.read_fasta('-', return_list=True) == protfasta.read_fasta(SIMPLE_FILE, return_list=True)
+
+    def test_path_named_dash(self, tmp_path, monkeypatch):
+        # only the string '-' means stdin; a Path is always a file
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / '-').write_bytes(_simple_bytes())
+        assert protfasta.read_fasta(Path('-')) == protfasta.read_fasta(SIMPLE_FILE)
+
+    def test_stream_from_file_object(self):
+        out = io.StringIO()
+        kwargs = dict(invalid_sequence_action='convert')
+        got = list(protfasta.read_fasta_stream(io.BytesIO(_simple_bytes()), output_filename=out, **kwargs))
+        assert got == list(protfasta.read_fasta_stream(SIMPLE_FILE, **kwargs))
+        assert protfasta.read_fasta(io.StringIO(out.getvalue()), return_list=True) == [list(r) for r in got]
+
+    def test_stream_to_stdout(self, capsys):
+        list(protfasta.read_fasta_stream(SIMPLE_FILE, output_filename='-'))
+        assert protfasta.read_fasta(io.StringIO(capsys.readouterr().out)) == protfasta.read_fasta(SIMPLE_FILE)
+
+    @pytest.mark.parametrize('make, value', [
+        (io.BytesIO, lambda fh: fh.getvalue().decode('utf-8')),
+        (io.StringIO, lambda fh: fh.getvalue()),
+    ])
+    def test_write_fasta_handle(self, tmp_path, make, value):
+        data = protfasta.read_fasta(SIMPLE_FILE)
+        path = tmp_path / 'ref.fasta'
+        protfasta.write_fasta(data, str(path))
+        fh = make()
+        protfasta.write_fasta(data, fh)
+        protfasta.write_fasta(data, fh, append_to_fasta=True)
+        assert not fh.closed
+        assert value(fh) == path.read_text() * 2
+
+    def test_write_fasta_stdout(self, tmp_path, capsys):
+        data = protfasta.read_fasta(SIMPLE_FILE)
+        path = tmp_path / 'ref.fasta'
+        protfasta.write_fasta(data, str(path))
+        print('before')
+        protfasta.write_fasta(data, '-')
+        assert capsys.readouterr().out == 'before\n' + path.read_text()
+
+    def test_read_fasta_output_to_handle(self):
+        out = io.StringIO()
+        result = protfasta.read_fasta(SIMPLE_FILE, output_filename=out)
+        assert protfasta.read_fasta(io.StringIO(out.getvalue())) == result
+
+    @pytest.mark.parametrize('kwargs', [{'lazy': True}, {'cache': True}])
+    def test_stream_needs_path(self, kwargs):
+        with pytest.raises(ProtfastaException, match='requires a file path'):
+            protfasta.read_fasta(io.BytesIO(_simple_bytes()), **kwargs)
+
+    @pytest.mark.parametrize('bad', [0, 1.5, b'file.fasta', None])
+    def test_still_rejects_non_files(self, bad):
+        with pytest.raises(ProtfastaException, match='filename'):
+            protfasta.read_fasta(bad)
+
+    def test_bad_output_filename(self):
+        with pytest.raises(ProtfastaException, match='output_filename'):
+            protfasta.read_fasta(SIMPLE_FILE, output_filename=5)
+
+
+# ---------------------------------------------------------------------------
+# TestReadFastaMany
+# ---------------------------------------------------------------------------
+class TestReadFastaMany:
+    """read_fasta_many reads many files with one set of options."""
+
+    @pytest.fixture
+    def proteomes(self, tmp_path):
+        for i in range(6):
+            records = ''.join('>p%i_%i\nACDEF%s\n' % (i, j, 'G' * j) for j in range(5))
+            (tmp_path / ('p%i.fasta' % i)).write_text(records)
+        return tmp_path
+
+    @pytest.mark.parametrize('workers, pool', [(1, 'thread'), (3, 'thread'), (2, 'process')])
+    def test_parity(self, workers, pool):
+        files = [SIMPLE_FILE, FIXABLE_INVALID_FILE, ALIGNED_VALID_FILE]
+        kwargs = dict(invalid_sequence_action='convert-ignore', header_parser=_first_word)
+        (results, failures) = protfasta.read_fasta_many(files, workers=workers, pool=pool, **kwargs)
+        assert failures == {}
+        assert list(results) == files
+        for f in files:
+            assert results[f] == protfasta.read_fasta(f, **kwargs)
+
+    def test_glob(self, proteomes):
+        (results, failures) = protfasta.read_fasta_many(str(proteomes / '*.fasta'), return_list=True)
+        assert list(results) == [str(proteomes / ('p%i.fasta' % i)) for i in range(6)]
+        assert results[str(proteomes / 'p2.fasta')][1] == ['p2_1', 'ACDEFG']
+
+    def test_recursive_glob_and_single_path(self, proteomes):
+        (proteomes / 'sub').mkdir()
+        (proteomes / 'sub' / 'extra.fasta').write_text('>x\nACDE\n')
+        (results, _failures) = protfasta.read_fasta_many(str(proteomes / '**' / '*.fasta'))
+        assert len(results) == 7
+        (results, _failures) = protfasta.read_fasta_many(proteomes / 'p0.fasta')
+        assert list(results) == [str(proteomes / 'p0.fasta')]
+
+    @pytest.mark.parametrize('workers', [1, 4])
+    def test_failures_do_not_abort(self, proteomes, workers):
+        files = [str(proteomes / 'p0.fasta'), str(proteomes / 'missing.fasta'), BADCHAR_FILE,
+                 str(proteomes / 'p1.fasta')]
+        (results, failures) = protfasta.read_fasta_many(files, workers=workers)
+        assert list(results) == [files[0], files[3]]
+        assert list(failures) == [files[1], files[2]]
+        assert all(isinstance(e, ProtfastaException) for e in failures.values())
+        assert 'Unable to find file' in str(failures[files[1]])
+
+    def test_merge(self, proteomes):
+        files = [str(proteomes / 'p1.fasta'), str(proteomes / 'p0.fasta')]
+        (merged, failures) = protfasta.read_fasta_many(files, merge=True, workers=2)
+        assert failures == {}
+        assert merged[0] == (files[0], 'p1_0', 'ACDEF')
+        assert merged[5] == (files[1], 'p0_0', 'ACDEF')
+        assert len(merged) == 10
+
+    def test_header_parser_checked_once(self, proteomes):
+        calls = []
+
+        def parser(header):
+            calls.append(header)
+            return header
+
+        protfasta.read_fasta_many(str(proteomes / '*.fasta'), header_parser=parser)
+        # one trial call during validation, then one per record
+        assert len(calls) == 1 + 6 * 5
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({'workers': 0}, 'workers'),
+        ({'pool': 'fiber'}, 'pool'),
+        ({'merge': 1}, 'merge'),
+        ({'lazy': True}, 'lazy'),
+        ({'output_filename': 'x.fasta'}, 'output_filename'),
+        ({'merge': True, 'return_store': True}, 'merge'),
+        ({'invalid_sequence_action': 'bogus'}, 'invalid_sequence_action'),
+        ({'not_a_keyword': 1}, 'Invalid keyword'),
+        ({'merge': True, 'compact_headers': True}, 'compact_headers'),
+        ({'compact_headers': True, 'return_store': True}, 'compact_headers'),
+        ({'compact_headers': 'yes'}, 'compact_headers'),
+        ({'output_compression': 'rar'}, 'output_compression'),
+    ])
+    def test_invalid_options(self, kwargs, match):
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.read_fasta_many([SIMPLE_FILE], **kwargs)
+
+    def test_options_checked_like_read_fasta(self):
+        # every option read_fasta accepts is validated by the shared helper
+        params = set(inspect.signature(protfasta.read_fasta).parameters) - {'filename'}
+        assert params == set(inspect.signature(protfasta._check_read_fasta_options).parameters)
+
+    def test_no_match(self, tmp_path):
+        with pytest.raises(ProtfastaException, match='No files match'):
+            protfasta.read_fasta_many(str(tmp_path / '*.fasta'))
+
+
+# ---------------------------------------------------------------------------
+# TestFastaWriter
+# ---------------------------------------------------------------------------
+class TestFastaWriter:
+    """FastaWriter writes records incrementally, formatted as by write_fasta."""
+
+    @pytest.mark.parametrize('linelength', [60, 7, 2, 0, None])
+    def test_matches_write_fasta(self, tmp_path, linelength):
+        data = protfasta.read_fasta(SIMPLE_FILE, return_list=True)
+        ref = tmp_path / 'ref.fasta'
+        protfasta.write_fasta(data, str(ref), linelength=linelength)
+
+        out = tmp_path / 'out.fasta'
+        with protfasta.FastaWriter(str(out), linelength=linelength) as writer:
+            for (header, seq) in data:
+                writer.write(header, seq)
+        assert out.read_text() == ref.read_text()
+        assert writer.count == len(data)
+        assert writer.closed
+
+    @pytest.mark.parametrize('make', [
+        lambda: protfasta.read_fasta(SIMPLE_FILE),
+        lambda: protfasta.read_fasta(SIMPLE_FILE, return_list=True),
+        lambda: protfasta.read_fasta(SIMPLE_FILE, return_store=True),
+        lambda: protfasta.read_fasta_stream(SIMPLE_FILE),
+    ])
+    def test_write_many(self, tmp_path, make):
+        ref = tmp_path / 'ref.fasta'
+        protfasta.write_fasta(protfasta.read_fasta(SIMPLE_FILE), str(ref))
+        out = tmp_path / 'out.fasta'
+        with protfasta.FastaWriter(out) as writer:
+            assert writer.write_many(make()) == len(protfasta.read_fasta(SIMPLE_FILE))
+        assert out.read_text() == ref.read_text()
+
+    def test_generator_consumed_lazily(self, tmp_path):
+        with protfasta.FastaWriter(tmp_path / 'out.fasta') as writer:
+            def records():
+                for i in range(100):
+                    # every earlier record has been written before the next is produced
+                    assert writer.count == i
+                    yield ('s%i' % i, 'ACDE')
+            writer.write_many(records())
+        assert len(protfasta.read_fasta(str(tmp_path / 'out.fasta'))) == 100
+
+    def test_append_and_buffer_size(self, tmp_path):
+        out = tmp_path / 'out.fasta'
+        with protfasta.FastaWriter(out, buffer_size=16) as writer:
+            writer.write('a', 'ACDE')
+        with protfasta.FastaWriter(out, append=True) as writer:
+            writer.write('b', 'KLMN')
+        assert protfasta.read_fasta(str(out)) == {'a': 'ACDE', 'b': 'KLMN'}
+
+    def test_file_object_left_open(self):
+        fh = io.StringIO()
+        with protfasta.FastaWriter(fh) as writer:
+            writer.write('a', 'ACDE')
+        assert not fh.closed
+        assert fh.getvalue() == '>a\nACDE\n\n'
+
+    def test_errors(self, tmp_path):
+        writer = protfasta.FastaWriter(tmp_path / 'out.fasta')
+        with pytest.raises(ProtfastaException, match='empty'):
+            writer.write('a', '')
+        with pytest.raises(ProtfastaException, match='pairs'):
+            writer.write_many([('a', 'ACDE', 'extra')])
+        with pytest.raises(ProtfastaException, match='pairs'):
+            writer.write_many([5])
+        writer.close()
+        with pytest.raises(ProtfastaException, match='closed'):
+            writer.write('a', 'ACDE')
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({'linelength': 'sixty'}, 'linelength'),
+        ({'append': 'yes'}, 'append'),
+        ({'buffer_size': 0}, 'buffer_size'),
+    ])
+    def test_invalid_arguments(self, tmp_path, kwargs, match):
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.FastaWriter(tmp_path / 'out.fasta', **kwargs)
+
+    def test_invalid_filename(self):
+        with pytest.raises(ProtfastaException, match='filename'):
+            protfasta.FastaWriter(3)
+
+
+# ---------------------------------------------------------------------------
+# Compressed output (compression='gzip' / 'bgzf' / 'xz')
+# ---------------------------------------------------------------------------
+
+def _many_records(n=3000):
+    """Enough sequence for several 64 KiB BGZF blocks."""
+    return {'seq_%i' % i: (_configs.STANDARD_AAS[i % 20] + 'ACDEFGHIKLMNPQRSTVWY') * (1 + i % 7) for i in range(n)}
+
+
+class TestCompressedOutput:
+    """write_fasta, FastaWriter and read_fasta output compress on request."""
+
+    @pytest.mark.parametrize('compression, opener', [
+        ('gzip', gzip.open),
+        ('bgzf', gzip.open),
+        ('xz', lzma.open),
+    ])
+    def test_round_trip(self, tmp_path, compression, opener):
+        data = _many_records()
+        plain = tmp_path / 'plain.fasta'
+        protfasta.write_fasta(data, plain)
+
+        out = tmp_path / 'out.fasta.z'
+        protfasta.write_fasta(data, out, compression=compression, threads=2)
+        with opener(out, 'rb') as fh:
+            assert fh.read() == plain.read_bytes()
+        assert protfasta.read_fasta(out) == data
+
+    def test_bgzf_blocks(self, tmp_path):
+        data = _many_records()
+        out = tmp_path / 'out.fasta.gz'
+        protfasta.write_fasta(data, out, compression='bgzf', threads=3)
+
+        raw = out.read_bytes()
+        assert _bgzf.is_bgzf(raw[:32])
+        assert raw.endswith(_bgzf.EOF_BLOCK)
+        with open(out, 'rb') as fh:
+            blocks = list(_bgzf.iter_blocks(fh))
+        assert len(blocks) > 2
+
+        # the block-parallel reader accepts the output
+        assert protfasta.read_fasta(out, workers=2) == data
+
+    def test_bgzf_threads_identical(self, tmp_path):
+        data = _many_records()
+        one = tmp_path / 'one.fasta.gz'
+        four = tmp_path / 'four.fasta.gz'
+        protfasta.write_fasta(data, one, compression='bgzf', threads=1)
+        protfasta.write_fasta(data, four, compression='bgzf', threads=4)
+        assert one.read_bytes() == four.read_bytes()
+
+    @pytest.mark.parametrize('compression', ['gzip', 'bgzf', 'xz'])
+    def test_fasta_writer(self, tmp_path, compression):
+        data = _many_records(500)
+        out = tmp_path / 'out.fasta.z'
+        with protfasta.FastaWriter(out, compression=compression, threads=2) as writer:
+            writer.write_many(data)
+        assert protfasta.read_fasta(out) == data
+
+    @pytest.mark.parametrize('compression', ['gzip', 'bgzf', 'xz'])
+    def test_append(self, tmp_path, compression):
+        out = tmp_path / 'out.fasta.z'
+        protfasta.write_fasta({'a': 'ACDE'}, out, compression=compression)
+        protfasta.write_fasta({'b': 'KLMN'}, out, compression=compression, append_to_fasta=True)
+        assert protfasta.read_fasta(out) == {'a': 'ACDE', 'b': 'KLMN'}
+
+    def test_binary_file_object(self):
+        buf = io.BytesIO()
+        protfasta.write_fasta({'a': 'ACDE'}, buf, compression='bgzf')
+        assert not buf.closed
+        assert gzip.decompress(buf.getvalue()) == b'>a\nACDE\n\n'
+        assert buf.getvalue().endswith(_bgzf.EOF_BLOCK)
+
+    def test_text_file_object_rejected(self):
+        with pytest.raises(ProtfastaException, match='text stream'):
+            protfasta.write_fasta({'a': 'ACDE'}, io.StringIO(), compression='gzip')
+
+    def test_read_fasta_output(self, tmp_path):
+        out = tmp_path / 'out.fasta.gz'
+        seqs = protfasta.read_fasta(SIMPLE_FILE, output_filename=out, output_compression='bgzf')
+        assert protfasta.read_fasta(out) == seqs
+
+    def test_stream_output(self, tmp_path):
+        out = tmp_path / 'out.fasta.xz'
+        seqs = dict(protfasta.read_fasta_stream(SIMPLE_FILE, output_filename=out, output_compression='xz'))
+        assert protfasta.read_fasta(out) == seqs
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({'compression': 'zip'}, 'compression'),
+        ({'compression': 'bgzf', 'threads': 0}, 'threads'),
+        ({'compression': 'bgzf', 'threads': 1.5}, 'threads'),
+    ])
+    def test_invalid_arguments(self, tmp_path, kwargs, match):
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.write_fasta({'a': 'ACDE'}, tmp_path / 'out.fasta', **kwargs)
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.FastaWriter(tmp_path / 'out.fasta', **kwargs)
+
+    def test_invalid_output_compression(self, tmp_path):
+        with pytest.raises(ProtfastaException, match='output_compression'):
+            protfasta.read_fasta(SIMPLE_FILE, output_filename=tmp_path / 'out.fasta', output_compression='zip')
+
+
+# ---------------------------------------------------------------------------
+# Batched record formatting (writer.write_records)
+# ---------------------------------------------------------------------------
+
+def _per_line(records, linelength):
+    """Reference formatting: one piece per header and per sequence line."""
+    linelength = _writer.normalize_linelength(linelength)
+    out = []
+    for (header, seq) in records:
+        out.append('>%s\n' % (header))
+        if linelength:
+            for start in range(0, len(seq), linelength):
+                out.append(seq[start:start + linelength] + '\n')
+        else:
+            out.append(seq + '\n')
+        out.append('\n')
+    return ''.join(out)
+
+
+class TestBatchedWrite:
+    """write_records formats records in batches, byte-identical to per-line output."""
+
+    RECORDS = [('a', 'A'), ('b', 'ACDEF'), ('c', 'ACDEFG'), ('d', 'ACDEFGHIKL' * 13),
+               ('e', 'ACDEFGHIKLMNPQRSTVWY' * 3), ('f f|x', 'MK')]
+
+    @pytest.mark.parametrize('linelength', [60, 5, 7, 20, 1, 0, None, False, 1000])
+    @pytest.mark.parametrize('batch', [1, 10, 1024 * 1024])
+    def test_matches_per_line(self, monkeypatch, linelength, batch):
+        monkeypatch.setattr(_writer, '_FORMAT_BATCH', batch)
+        fh = io.StringIO()
+        assert _writer.write_records(fh, self.RECORDS, _writer.normalize_linelength(linelength)) == len(self.RECORDS)
+        assert fh.getvalue() == _per_line(self.RECORDS, linelength)
+
+    @pytest.mark.parametrize('linelength', [60, 7, 0])
+    def test_write_fasta_file(self, tmp_path, linelength):
+        data = _many_records(500)
+        out = tmp_path / 'out.fasta'
+        protfasta.write_fasta(data, out, linelength=linelength)
+        assert out.read_text() == _per_line(data.items(), linelength)
+
+    def test_non_ascii_sequences(self):
+        records = [('a', 'ACDÉFGHIKL' * 3), ('é', 'ACDEFGHIKL' * 3)]
+        fh = io.StringIO()
+        _writer.write_records(fh, records, 7)
+        assert fh.getvalue() == _per_line(records, 7)
+
+    def test_error_keeps_earlier_records(self, monkeypatch):
+        monkeypatch.setattr(_writer, '_FORMAT_BATCH', 1024 * 1024)
+        fh = io.StringIO()
+        with pytest.raises(ProtfastaException, match='empty'):
+            _writer.write_records(fh, [('a', 'ACDE'), ('b', 'KLMN'), ('c', '')], 60)
+        assert fh.getvalue() == '>a\nACDE\n\n>b\nKLMN\n\n'
+
+    def test_fasta_writer_count_after_error(self, tmp_path):
+        with protfasta.FastaWriter(tmp_path / 'out.fasta') as writer:
+            with pytest.raises(ProtfastaException, match='empty'):
+                writer.write_many([('a', 'ACDE'), ('b', ''), ('c', 'KLMN')])
+            assert writer.count == 1
+        assert protfasta.read_fasta(tmp_path / 'out.fasta') == {'a': 'ACDE'}
+
+    def test_line_struct_cached(self):
+        assert _writer._line_struct(125, 60) is _writer._line_struct(125, 60)
+        assert _writer._line_struct(125, 60).unpack(b'A' * 125) == (b'A' * 60, b'A' * 60, b'A' * 5)
+
+
+# ---------------------------------------------------------------------------
+# Disk-spilling duplicate sequence detection (duplicate_memory_limit)
+# ---------------------------------------------------------------------------
+
+def _duplicate_heavy_fasta(path, n=3000, pool=300, seed=0):
+    """Write *n* records drawn from *pool* distinct sequences; return the path."""
+    import random
+    rng = random.Random(seed)
+    seqs = [''.join(rng.choices(_configs.STANDARD_AAS, k=rng.randint(5, 60))) for _ in range(pool)]
+    protfasta.write_fasta({'seq_%i' % i: rng.choice(seqs) for i in range(n)}, path)
+    return path
+
+
+class TestSpillDedup:
+    """duplicate_memory_limit finds the same duplicates as the in-memory check."""
+
+    @pytest.mark.parametrize('limit', [10 ** 9, 5000, 200])
+    def test_spill_duplicates_matches_seen_set(self, tmp_path, limit, monkeypatch):
+        monkeypatch.setattr(_dedup, '_MERGE_FAN_IN', 3)
+        import random
+        rng = random.Random(1)
+        values = [rng.randrange(400) for _ in range(3000)]
+        entries = [(i, _utilities._seq_hash(str(v))) for (i, v) in enumerate(values)]
+
+        expected = []
+        first = {}
+        for (i, v) in enumerate(values):
+            if v in first:
+                expected.append((i, first[v]))
+            else:
+                first[v] = i
+
+        assert list(_dedup.spill_duplicates(entries, limit, tmp_path)) == expected
+        assert os.listdir(tmp_path) == []
+
+    def test_external_sorter(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(_dedup, '_MERGE_FAN_IN', 2)
+        keys = [os.urandom(6) for _ in range(1000)]
+        with _dedup.ExternalSorter(600, tmp_path) as sorter:
+            for key in keys:
+                sorter.add(key)
+            assert list(sorter.sorted()) == sorted(keys)
+        assert os.listdir(tmp_path) == []
+
+    @pytest.mark.parametrize('limit', [10 ** 9, 3000])
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {'invalid_sequence_action': 'remove'},
+        {'duplicate_record_action': 'remove'},
+        {'batch_size': 100},
+        {'prefetch': 64},
+    ])
+    def test_remove_matches_in_memory(self, tmp_path, limit, kwargs):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta')
+        expected = list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove', silence_warnings=True,
+                                                    **kwargs))
+        spilled = list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove',
+                                                   duplicate_memory_limit=limit,
+                                                   duplicate_spill_dir=tmp_path, silence_warnings=True, **kwargs))
+        assert spilled == expected
+        assert sorted(os.listdir(tmp_path)) == ['dups.fasta']
+
+    def test_matches_remove_duplicate_sequences(self, tmp_path):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta')
+        data = protfasta.read_fasta(path, return_list=True)
+        expected = _utilities.remove_duplicate_sequences(data)
+        spilled = list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove',
+                                                   duplicate_memory_limit=2000, return_list=True))
+        assert spilled == expected
+
+    def test_fail_matches_in_memory(self, tmp_path):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta')
+        with pytest.raises(ProtfastaException) as expected:
+            list(protfasta.read_fasta_stream(path, duplicate_sequence_action='fail', silence_warnings=True))
+
+        seen = []
+        with pytest.raises(ProtfastaException) as spilled:
+            for record in protfasta.read_fasta_stream(path, duplicate_sequence_action='fail',
+                                                      duplicate_memory_limit=2000):
+                seen.append(record)
+        assert str(spilled.value) == str(expected.value)
+        assert 'duplicate sequences' in str(spilled.value)
+        assert len(seen) > 0
+
+    def test_duplicate_header_still_raises(self, tmp_path):
+        path = tmp_path / 'dup_header.fasta'
+        path.write_text('>a\nACDE\n>b\nACDE\n>a\nKLMN\n>c\nKLMN\n')
+        with pytest.raises(ProtfastaException, match='duplicate header'):
+            list(protfasta.read_fasta_stream(path, expect_unique_header=True, duplicate_record_action='remove',
+                                             duplicate_sequence_action='remove', duplicate_memory_limit=100,
+                                             silence_warnings=True))
+
+    def test_no_memory_warning(self, tmp_path):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta', n=10)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove', duplicate_memory_limit=1000))
+
+    def test_abandoned_stream_cleans_up(self, tmp_path):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta')
+        spill = tmp_path / 'spill'
+        spill.mkdir()
+        stream = protfasta.read_fasta_stream(path, duplicate_sequence_action='remove', duplicate_memory_limit=500,
+                                             duplicate_spill_dir=spill)
+        next(stream)
+        assert os.listdir(spill) != []
+        stream.close()
+        assert os.listdir(spill) == []
+
+    def test_stream_input_rejected(self):
+        with pytest.raises(ProtfastaException, match='file path'):
+            protfasta.read_fasta_stream(io.BytesIO(b'>a\nACDE\n'), duplicate_sequence_action='remove',
+                                        duplicate_memory_limit=1000)
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({'duplicate_memory_limit': 0}, 'duplicate_memory_limit'),
+        ({'duplicate_memory_limit': '1G'}, 'duplicate_memory_limit'),
+        ({'duplicate_memory_limit': 1000, 'duplicate_spill_dir': 3}, 'duplicate_spill_dir'),
+    ])
+    def test_invalid_arguments(self, kwargs, match):
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.read_fasta_stream(SIMPLE_FILE, duplicate_sequence_action='remove', **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Bloom pre-filter for streaming duplicate detection (duplicate_filter)
+# ---------------------------------------------------------------------------
+
+class TestBloomDedup:
+    """duplicate_filter='bloom' keeps exact results with a smaller lookup table."""
+
+    @pytest.mark.parametrize('capacity', [50, 5000])
+    def test_no_false_negatives(self, capacity):
+        bloom = _dedup.BloomFilter(capacity, 0.01)
+        items = [_utilities._seq_hash(str(i)) for i in range(5000)]
+        for item in items:
+            bloom.add(item)
+        assert all(item in bloom for item in items)
+        assert all(bloom.add(item) for item in items)
+        assert len(bloom) <= 5000
+
+    def test_false_positive_rate(self):
+        bloom = _dedup.BloomFilter(20000, 0.01)
+        for i in range(20000):
+            bloom.add(_utilities._seq_hash('in-%i' % i))
+        false_positives = sum(_utilities._seq_hash('out-%i' % i) in bloom for i in range(20000))
+        assert false_positives < 20000 * 0.02
+        assert bloom.nbytes < 20000 * 4
+
+    def test_candidates_cover_duplicates(self):
+        digests = [_utilities._seq_hash(str(i % 700)) for i in range(3000)]
+        candidates = _dedup.bloom_candidates(enumerate(digests), 1024, 0.01)
+        assert set(digests[700:]) <= candidates
+
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {'invalid_sequence_action': 'remove'},
+        {'duplicate_record_action': 'remove'},
+        {'duplicate_filter_fpr': 0.5},
+        {'batch_size': 100, 'prefetch': 64},
+    ])
+    def test_remove_matches_in_memory(self, tmp_path, kwargs):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta')
+        fpr = kwargs.pop('duplicate_filter_fpr', 0.01)
+        expected = list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove', silence_warnings=True,
+                                                    **kwargs))
+        filtered = list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove', duplicate_filter='bloom',
+                                                    duplicate_filter_fpr=fpr, silence_warnings=True, **kwargs))
+        assert filtered == expected
+
+    def test_fail_matches_in_memory(self, tmp_path):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta')
+        with pytest.raises(ProtfastaException) as expected:
+            list(protfasta.read_fasta_stream(path, duplicate_sequence_action='fail', silence_warnings=True))
+        with pytest.raises(ProtfastaException) as filtered:
+            list(protfasta.read_fasta_stream(path, duplicate_sequence_action='fail', duplicate_filter='bloom',
+                                             silence_warnings=True))
+        assert str(filtered.value) == str(expected.value)
+
+    def test_verbose_reports_candidates(self, tmp_path, capsys):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta', n=50, pool=10)
+        list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove', duplicate_filter='bloom',
+                                         verbose=True, silence_warnings=True))
+        assert 'candidate sequences' in capsys.readouterr().out
+
+    def test_stream_input_rejected(self):
+        with pytest.raises(ProtfastaException, match='file path'):
+            protfasta.read_fasta_stream(io.BytesIO(b'>a\nACDE\n'), duplicate_sequence_action='remove',
+                                        duplicate_filter='bloom')
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({'duplicate_filter': 'cuckoo'}, 'duplicate_filter'),
+        ({'duplicate_filter': 'bloom', 'duplicate_filter_fpr': 0}, 'duplicate_filter_fpr'),
+        ({'duplicate_filter': 'bloom', 'duplicate_filter_fpr': 1.5}, 'duplicate_filter_fpr'),
+        ({'duplicate_filter': 'bloom', 'duplicate_filter_fpr': '1%'}, 'duplicate_filter_fpr'),
+        ({'duplicate_filter': 'bloom', 'duplicate_memory_limit': 1000}, 'cannot be combined'),
+    ])
+    def test_invalid_arguments(self, kwargs, match):
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.read_fasta_stream(SIMPLE_FILE, duplicate_sequence_action='remove', **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Pluggable sequence digests (duplicate_digest)
+# ---------------------------------------------------------------------------
+
+def _available_digests():
+    """The names in SEQUENCE_DIGESTS whose implementation can be loaded here."""
+    available = []
+    for name in _utilities.SEQUENCE_DIGESTS:
+        try:
+            _utilities._digest_function(name)
+        except ProtfastaException:
+            continue
+        available.append(name)
+    return available
+
+
+class TestDuplicateDigest:
+    """Every duplicate_digest gives the same records as the default."""
+
+    @pytest.mark.parametrize('name', _available_digests())
+    def test_digest_function(self, name):
+        digest = _utilities._digest_function(name)
+        width = 16 if name.endswith('-16') or name.endswith('-128') else 8
+        assert len(digest('ACDEFGHIK')) == width
+        assert digest('ACDEFGHIK') == digest(''.join(['ACDEF', 'GHIK']))
+        assert digest('ACDEFGHIK') != digest('ACDEFGHIL')
+        assert digest('ACDÉ') != digest('ACDÊ')
+
+    def test_stdlib_digests_always_available(self):
+        assert {'blake2b-16', 'blake2b-8', 'builtin-64'} <= set(_available_digests())
+        assert _utilities._digest_function('blake2b-16') is _utilities._seq_hash
+
+    def test_xxh3_without_xxhash(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, 'xxhash', None)
+        with pytest.raises(ProtfastaException, match='xxhash'):
+            protfasta.read_fasta(SIMPLE_FILE, duplicate_digest='xxh3-128')
+
+    @pytest.mark.parametrize('bad', ['md5', 'BLAKE2B-16', None, 16])
+    def test_invalid_digest(self, bad):
+        with pytest.raises(ProtfastaException, match='duplicate_digest'):
+            protfasta.read_fasta(SIMPLE_FILE, duplicate_digest=bad)
+        with pytest.raises(ProtfastaException, match='duplicate_digest'):
+            protfasta.read_fasta_stream(SIMPLE_FILE, duplicate_digest=bad)
+        with pytest.raises(ProtfastaException, match='duplicate_digest'):
+            protfasta.read_fasta_many([SIMPLE_FILE], duplicate_digest=bad)
+
+    @pytest.mark.parametrize('name', _available_digests())
+    def test_read_fasta_matches_default(self, tmp_path, name):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta')
+        expected = protfasta.read_fasta(path, duplicate_sequence_action='remove', return_list=True)
+        assert protfasta.read_fasta(path, duplicate_sequence_action='remove', return_list=True,
+                                    duplicate_digest=name) == expected
+
+        with pytest.raises(ProtfastaException) as default_error:
+            protfasta.read_fasta(path, duplicate_sequence_action='fail')
+        with pytest.raises(ProtfastaException) as digest_error:
+            protfasta.read_fasta(path, duplicate_sequence_action='fail', duplicate_digest=name)
+        assert str(digest_error.value) == str(default_error.value)
+
+    @pytest.mark.parametrize('name', _available_digests())
+    def test_duplicate_records(self, name):
+        records = protfasta.read_fasta(DUPLICATE_RECORD_FILE, expect_unique_header=False,
+                                       duplicate_record_action='remove', return_list=True, duplicate_digest=name)
+        assert records == protfasta.read_fasta(DUPLICATE_RECORD_FILE, expect_unique_header=False,
+                                               duplicate_record_action='remove', return_list=True)
+        with pytest.raises(ProtfastaException, match='duplicate entries'):
+            protfasta.read_fasta(DUPLICATE_RECORD_FILE, expect_unique_header=False, duplicate_record_action='fail',
+                                 duplicate_digest=name)
+
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {'prefetch': 64},
+        {'duplicate_memory_limit': 2000},
+        {'duplicate_filter': 'bloom'},
+        {'duplicate_record_action': 'remove'},
+    ])
+    @pytest.mark.parametrize('name', ['blake2b-8', 'builtin-64'])
+    def test_stream_matches_default(self, tmp_path, name, kwargs):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta')
+        expected = list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove', silence_warnings=True))
+        streamed = list(protfasta.read_fasta_stream(path, duplicate_sequence_action='remove', silence_warnings=True,
+                                                    duplicate_digest=name, **kwargs))
+        assert streamed == expected
+
+    def test_cache_keyed_on_digest(self, tmp_path):
+        cache = protfasta.FastaCache(tmp_path / 'cache')
+        protfasta.read_fasta(SIMPLE_FILE, cache=cache)
+        protfasta.read_fasta(SIMPLE_FILE, cache=cache, duplicate_digest='builtin-64')
+        assert len(cache) == 2
+
+
+# ---------------------------------------------------------------------------
+# MinHash/LSH near-duplicate removal (remove_near_duplicates)
+# ---------------------------------------------------------------------------
+
+def _near_duplicate_records(n=400, seed=0):
+    """Return ``(records, planted)``: distinct sequences plus mutated and truncated copies of some."""
+    import random
+    rng = random.Random(seed)
+    records = []
+    planted = set()
+    for i in range(n):
+        seq = ''.join(rng.choices(_configs.STANDARD_AAS, k=rng.randint(300, 500)))
+        records.append(('base_%i' % i, seq))
+        if i % 4 == 0:
+            mutant = list(seq)
+            mutant[rng.randrange(len(seq))] = rng.choice(_configs.STANDARD_AAS)
+            records.append(('mutant_%i' % i, ''.join(mutant)))
+            planted.add('mutant_%i' % i)
+        if i % 5 == 0:
+            records.append(('truncated_%i' % i, seq[:len(seq) - 5]))
+            planted.add('truncated_%i' % i)
+    return (records, planted)
+
+
+class TestNearDuplicates:
+    """remove_near_duplicates drops near-identical sequences, reproducibly."""
+
+    @pytest.fixture(autouse=True)
+    def np(self):
+        return pytest.importorskip('numpy')
+
+    def test_signatures_match_reference(self):
+        (a, b) = _dedup._minhash_parameters(16, 3)
+        mask = 2 ** 64 - 1
+
+        def reference(seq, kmer):
+            enc = seq.encode()
+            if len(enc) < kmer:
+                codes = {int.from_bytes(enc, 'big')}
+            else:
+                codes = {int.from_bytes(enc[i:i + kmer], 'big') for i in range(len(enc) - kmer + 1)}
+            xs = []
+            for z in codes:
+                z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9 & mask
+                z = (z ^ (z >> 27)) * 0x94d049bb133111eb & mask
+                xs.append((z ^ (z >> 31)) >> 32)
+            return [min(((int(ai) * x + int(bi)) & mask) >> 32 for x in xs) for (ai, bi) in zip(a, b)]
+
+        seqs = ['ACDEFGHIKLMNPQRSTVWY' * 3, 'MKV', 'A', '', 'WWWWWWWW']
+        signatures = _dedup.minhash_signatures(seqs, 5, a, b)
+        for (seq, signature) in zip(seqs, signatures):
+            assert list(signature) == reference(seq, 5)
+
+    def test_signature_blocks(self, monkeypatch):
+        (records, _planted) = _near_duplicate_records(40)
+        seqs = [seq for (_header, seq) in records]
+        (a, b) = _dedup._minhash_parameters(32, 0)
+        expected = _dedup.minhash_signatures(seqs, 4, a, b)
+        monkeypatch.setattr(_dedup, '_SIGNATURE_BLOCK', 100)
+        assert (_dedup.minhash_signatures(seqs, 4, a, b) == expected).all()
+
+    def test_lsh_bands(self):
+        for (num_perm, threshold) in [(128, 0.9), (128, 0.5), (64, 0.8), (1, 1.0)]:
+            (bands, rows) = _dedup.lsh_bands(num_perm, threshold)
+            assert 1 <= bands * rows <= num_perm
+            assert 1 - (1 - threshold ** rows) ** bands > 0.5
+
+    def test_removes_planted_near_duplicates(self):
+        (records, planted) = _near_duplicate_records()
+        kept = protfasta.remove_near_duplicates(records)
+        kept_headers = {header for (header, _seq) in kept}
+        assert all(header.startswith('base_') for header in kept_headers)
+        assert len(kept_headers) == 400
+        assert kept == [record for record in records if record[0] in kept_headers]
+
+    def test_exact_duplicates_always_removed(self):
+        records = [('a', 'MKVLAAGIVALLLAAGC'), ('b', 'MKVLAAGIVALLLAAGC'), ('c', 'MKVLA'), ('d', 'MKVLA')]
+        assert protfasta.remove_near_duplicates(records, threshold=1.0) == [records[0], records[2]]
+
+    def test_near_duplicates_reports_matches(self):
+        (records, planted) = _near_duplicate_records(40)
+        positions = {header: i for (i, (header, _seq)) in enumerate(records)}
+        for (record, match) in _dedup.near_duplicates(records):
+            if record[0] in planted:
+                assert match == positions['base_%s' % record[0].split('_')[1]]
+            else:
+                assert match is None
+
+    def test_container_types(self):
+        (records, _planted) = _near_duplicate_records(40)
+        expected = protfasta.remove_near_duplicates(records)
+
+        as_dict = protfasta.remove_near_duplicates(dict(records))
+        assert list(as_dict.items()) == expected
+
+        as_store = protfasta.remove_near_duplicates(protfasta.SequenceStore(records))
+        assert isinstance(as_store, protfasta.SequenceStore)
+        assert [tuple(r) for r in as_store] == expected
+
+        assert protfasta.remove_near_duplicates(iter(records)) == expected
+
+    def test_stream_input(self, tmp_path):
+        (records, _planted) = _near_duplicate_records(40)
+        path = tmp_path / 'near.fasta'
+        protfasta.write_fasta(dict(records), path)
+        streamed = protfasta.remove_near_duplicates(protfasta.read_fasta_stream(path))
+        assert streamed == protfasta.remove_near_duplicates(records)
+
+    def test_reproducible(self):
+        (records, _planted) = _near_duplicate_records(200, seed=4)
+        kwargs = dict(threshold=0.6, kmer=3, num_perm=64)
+        first = protfasta.remove_near_duplicates(records, seed=7, **kwargs)
+        assert protfasta.remove_near_duplicates(records, seed=7, **kwargs) == first
+        assert protfasta.remove_near_duplicates(records, seed=7, workers=2, **kwargs) == first
+
+    def test_workers_with_small_chunks(self, monkeypatch):
+        monkeypatch.setattr(_dedup, '_SIGNATURE_CHUNK', 7)
+        (records, _planted) = _near_duplicate_records(60)
+        flagged = list(_dedup.near_duplicates(records, workers=2))
+        assert flagged == list(_dedup.near_duplicates(records))
+
+    def test_verbose(self, capsys):
+        (records, planted) = _near_duplicate_records(40)
+        protfasta.remove_near_duplicates(records, verbose=True)
+        out = capsys.readouterr().out
+        assert 'Removed %i of %i due to near-duplicate sequences' % (len(planted), len(records)) in out
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({'threshold': 0}, 'threshold'),
+        ({'threshold': 1.5}, 'threshold'),
+        ({'threshold': '0.9'}, 'threshold'),
+        ({'kmer': 0}, 'kmer'),
+        ({'kmer': 9}, 'kmer'),
+        ({'num_perm': 0}, 'num_perm'),
+        ({'seed': -1}, 'seed'),
+        ({'seed': 1.5}, 'seed'),
+        ({'workers': 0}, 'workers'),
+    ])
+    def test_invalid_options(self, kwargs, match):
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.remove_near_duplicates([('a', 'ACDE')], **kwargs)
+
+    def test_without_numpy(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, 'numpy', None)
+        with pytest.raises(ProtfastaException, match='requires numpy'):
+            protfasta.remove_near_duplicates([('a', 'ACDE')])
+
+
+
+# ---------------------------------------------------------------------------
+# Greedy identity clustering (cluster)
+# ---------------------------------------------------------------------------
+
+def _lcs_reference(a, b):
+    """Longest common subsequence length by the textbook dynamic program."""
+    row = [0] * (len(b) + 1)
+    for x in a:
+        diagonal = 0
+        for (j, y) in enumerate(b):
+            (diagonal, row[j + 1]) = (row[j + 1], diagonal + 1 if x == y else max(row[j + 1], row[j]))
+    return row[-1]
+
+
+def _edit_distance_reference(a, b):
+    """Fewest edits turning *a* into a substring of *b*, by the textbook dynamic program."""
+    row = [0] * (len(b) + 1)
+    for (i, x) in enumerate(a, 1):
+        previous = row
+        row = [i] + [0] * len(b)
+        for (j, y) in enumerate(b, 1):
+            row[j] = min(previous[j - 1] + (x != y), previous[j] + 1, row[j - 1] + 1)
+    return min(row)
+
+
+def _cluster_reference(seqs, identity):
+    """Greedy clustering comparing every sequence with every representative (no word filter)."""
+    import math
+    order = sorted(range(len(seqs)), key=lambda i: -len(seqs[i]))
+    reps = []
+    result = [None] * len(seqs)
+    for i in order:
+        need = math.ceil(identity * len(seqs[i]) - 1e-9)
+        for rep in reps:
+            aligned = len(seqs[i]) - _edit_distance_reference(seqs[i], seqs[rep])
+            if aligned >= need:
+                result[i] = (rep, aligned)
+                break
+        else:
+            reps.append(i)
+            result[i] = (i, len(seqs[i]))
+    return result
+
+
+class TestCluster:
+    """cluster groups sequences around their longest member at an identity threshold."""
+
+    def test_lcs_matches_reference(self):
+        import random
+        rng = random.Random(1)
+        for _ in range(200):
+            a = ''.join(rng.choices('ACDEG', k=rng.randint(0, 70)))
+            b = ''.join(rng.choices('ACDEG', k=rng.randint(0, 70)))
+            assert _cluster.lcs_length(len(a), _cluster.residue_masks(a), b) == _lcs_reference(a, b)
+
+    def test_edit_distance_matches_reference(self):
+        import random
+        rng = random.Random(2)
+        for _ in range(300):
+            a = ''.join(rng.choices('ACDEG', k=rng.randint(0, 50)))
+            b = ''.join(rng.choices('ACDEG', k=rng.randint(0, 70)))
+            distance = _cluster.edit_distance(len(a), _cluster.residue_masks(a), b)
+            assert distance == _edit_distance_reference(a, b)
+            assert len(a) - distance <= _lcs_reference(a, b)
+
+    @pytest.mark.parametrize('identity', [0.5, 0.6, 0.7, 0.9])
+    def test_unrelated_lengths_do_not_cluster(self, identity):
+        # a short sequence must not match a long one by pairing its residues
+        # with ones scattered along it
+        import random
+        rng = random.Random(7)
+        records = [('long_%i' % i, ''.join(rng.choices(_configs.STANDARD_AAS, k=2000))) for i in range(5)]
+        records += [('short_%i' % i, ''.join(rng.choices(_configs.STANDARD_AAS, k=40))) for i in range(200)]
+        (representatives, membership) = protfasta.cluster(records, identity=identity)
+        assert list(representatives) == [header for (header, _seq) in records]
+        assert all(rep == header for (header, (rep, _identity)) in membership.items())
+
+    def test_fragment_and_gapped_member(self):
+        import random
+        rng = random.Random(8)
+        long = ''.join(rng.choices(_configs.STANDARD_AAS, k=300))
+        fragment = long[100:160]
+        gapped = long[:120] + long[125:]
+        records = [('long', long), ('fragment', fragment), ('gapped', gapped)]
+        (_representatives, membership) = protfasta.cluster(records, identity=0.9)
+        assert membership['fragment'] == ('long', 1.0)
+        # an internal gap counts against the match, whichever sequence it is in
+        assert membership['gapped'] == ('long', 290 / 295)
+        inserted = fragment[:30] + 'W' * 10 + fragment[30:]
+        (_representatives, membership) = protfasta.cluster([('long', long), ('inserted', inserted)], identity=0.8)
+        assert membership['inserted'] == ('long', 60 / 70)
+        (_representatives, membership) = protfasta.cluster([('long', long), ('inserted', inserted)], identity=0.9)
+        assert membership['inserted'] == ('inserted', 1.0)
+
+    def test_default_word_length(self):
+        assert [_cluster.default_word_length(t) for t in (1.0, 0.7, 0.65, 0.6, 0.55, 0.5)] == [5, 5, 4, 4, 3, 3]
+
+    def test_matches_unfiltered_reference(self):
+        import random
+        rng = random.Random(3)
+        seqs = []
+        for _ in range(25):
+            seq = ''.join(rng.choices(_configs.STANDARD_AAS, k=rng.randint(30, 60)))
+            seqs += [seq, seq[:-3], seq[:10] + 'W' + seq[11:]]
+        rng.shuffle(seqs)
+        for identity in (0.9, 0.8):
+            assert _cluster.greedy_cluster(seqs, identity, 5) == _cluster_reference(seqs, identity)
+
+    @pytest.mark.parametrize('identity', [1.0, 0.95, 0.9])
+    def test_repeated_words_match_reference(self, identity):
+        # repeated k-mers must not keep a sequence from reaching the number
+        # of shared words the filter asks for (at these identities the
+        # filter never asks for fewer than one, so it loses no match)
+        import random
+        rng = random.Random(4)
+        seqs = ['MKTAYIAKQRQISFVKSHFSRQMKTAYIAKQRQ'] * 2 + ['AC' * 20] * 2
+        for alphabet in ('AC', 'ACD', 'KR', 'QQQQE'):
+            for _ in range(10):
+                seq = ''.join(rng.choices(alphabet, k=rng.randint(20, 50)))
+                seqs += [seq, seq[:-2], seq[:8] + 'W' + seq[9:]]
+        for _ in range(10):
+            unit = ''.join(rng.choices(_configs.STANDARD_AAS, k=rng.randint(3, 8)))
+            seq = unit * rng.randint(4, 10)
+            seqs += [seq, seq[1:], 'M' + seq]
+        rng.shuffle(seqs)
+        assert _cluster.greedy_cluster(seqs, identity, 5) == _cluster_reference(seqs, identity)
+        assert protfasta.cluster({'a': seqs[0], 'b': seqs[0]}, identity=identity)[1]['b'] == ('a', 1.0)
+
+    def test_planted_clusters(self):
+        (records, planted) = _near_duplicate_records(200)
+        (representatives, membership) = protfasta.cluster(records)
+        assert list(representatives) == [header for (header, _seq) in records if header.startswith('base_')]
+        assert list(membership) == [header for (header, _seq) in records]
+        for (header, (rep, identity)) in membership.items():
+            if header in planted:
+                assert rep == 'base_%s' % header.split('_')[1]
+                assert 0.9 <= identity <= 1.0
+            else:
+                assert (rep, identity) == (header, 1.0)
+
+    def test_longest_member_is_representative(self):
+        records = [('short', 'MKVLAAGIVALLLAAG'), ('long', 'MKVLAAGIVALLLAAGCSS')]
+        (representatives, membership) = protfasta.cluster(records, identity=0.8)
+        assert representatives == {'long': 'MKVLAAGIVALLLAAGCSS'}
+        assert membership == {'short': ('long', 1.0), 'long': ('long', 1.0)}
+
+    def test_short_sequences_cluster_when_identical(self):
+        records = [('a', 'MKV'), ('b', 'MKV'), ('c', 'MKI')]
+        (representatives, membership) = protfasta.cluster(records, identity=0.5)
+        assert list(representatives) == ['a', 'c']
+        assert membership['b'] == ('a', 1.0)
+
+    def test_batches_and_workers(self, monkeypatch):
+        (records, _planted) = _near_duplicate_records(80, seed=2)
+        seqs = [seq for (_header, seq) in records]
+        expected = _cluster.greedy_cluster(seqs, 0.9, 5)
+        for batch in (1, 7):
+            monkeypatch.setattr(_cluster, '_BATCH', batch)
+            assert _cluster.greedy_cluster(seqs, 0.9, 5) == expected
+            assert _cluster.greedy_cluster(seqs, 0.9, 5, workers=2) == expected
+
+    def test_input_types(self, tmp_path):
+        (records, _planted) = _near_duplicate_records(40)
+        expected = protfasta.cluster(records)
+        path = tmp_path / 'cluster.fasta'
+        protfasta.write_fasta(dict(records), path)
+        assert protfasta.cluster(path) == expected
+        assert protfasta.cluster(str(path), invalid_sequence_action='fail') == expected
+        assert protfasta.cluster(dict(records)) == expected
+        assert protfasta.cluster(protfasta.SequenceStore(records)) == expected
+        assert protfasta.cluster(iter(records)) == expected
+
+    def test_verbose(self, capsys):
+        (records, _planted) = _near_duplicate_records(40)
+        (representatives, _membership) = protfasta.cluster(records, verbose=True)
+        out = capsys.readouterr().out
+        assert 'Clustered %i sequences into %i clusters' % (len(records), len(representatives)) in out
+
+    def test_duplicate_headers(self):
+        with pytest.raises(ProtfastaException, match='unique headers'):
+            protfasta.cluster([('a', 'MKVLA'), ('b', 'MKVLA'), ('a', 'WWWW')])
+
+    def test_read_options_need_a_file(self):
+        with pytest.raises(ProtfastaException, match='invalid_sequence_action'):
+            protfasta.cluster({'a': 'MKVLA'}, invalid_sequence_action='fail')
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({'identity': 0.4}, 'identity'),
+        ({'identity': 1.1}, 'identity'),
+        ({'identity': '0.9'}, 'identity'),
+        ({'word_length': 1}, 'word_length'),
+        ({'word_length': 6}, 'word_length'),
+        ({'workers': 0}, 'workers'),
+    ])
+    def test_invalid_options(self, kwargs, match):
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.cluster([('a', 'ACDE')], **kwargs)
+
+
+
+# ---------------------------------------------------------------------------
+# Hash-partitioned duplicate detection (read_fasta(workers=N))
+# ---------------------------------------------------------------------------
+
+class TestParallelDedup:
+    """Duplicate checks run by the workers of a sharded read must match the serial scan."""
+
+    @staticmethod
+    def _repeats(tmp_path, raw, workers, find_repeats, digest_function=_utilities._seq_hash):
+        path = tmp_path / 'raw.fasta'
+        path.write_text(''.join('>%s\n%s\n' % (header, seq) for (header, seq) in raw))
+        (parsed, _outcomes, repeats) = _parallel.parse_sharded(str(path), workers, expect_unique_header=False,
+                                                               find_repeats=find_repeats,
+                                                               digest_function=digest_function)
+        assert parsed == raw
+        return repeats
+
+    @pytest.mark.parametrize('digest', ['blake2b-16', 'builtin-64'])
+    @pytest.mark.parametrize('by_record', [True, False])
+    def test_matches_serial(self, digest, by_record, tmp_path):
+        import random
+        rng = random.Random(5)
+        pool = [''.join(rng.choices(_configs.STANDARD_AAS, k=rng.randint(5, 40))) for _ in range(50)]
+        raw = [['h%i' % (i % 70), rng.choice(pool)] for i in range(500)]
+        digest_function = _utilities._digest_function(digest)
+        serial = _utilities.remove_duplicates if by_record else _utilities.remove_duplicate_sequences
+        repeats = self._repeats(tmp_path, raw, 3, (by_record,), digest_function)[by_record]
+        assert repeats == sorted(repeats)
+        assert all(earlier < position for (position, earlier) in repeats)
+        assert _protfasta._without_positions(raw, repeats) == serial(raw, digest_function)
+
+    def test_both_checks(self, tmp_path):
+        raw = [['a', 'MKV'], ['b', 'QQQ'], ['c', 'WWW'], ['d', 'QQQ'], ['e', 'MKV'], ['a', 'MKV']]
+        repeats = self._repeats(tmp_path, raw, 2, (True, False))
+        assert repeats == {True: [(5, 0)], False: [(3, 1), (4, 0), (5, 0)]}
+        assert self._repeats(tmp_path, raw, 2, ()) == {}
+
+    def test_more_workers_than_records(self, tmp_path):
+        assert self._repeats(tmp_path, [['a', 'MKV'], ['b', 'MKV']], 5, (False,)) == {False: [(1, 0)]}
+
+    def test_repeats_among_survivors(self):
+        # a/MKV, a/MKV, b/QQQ, c/MKV, b/QQQ, d/QQQ: records 1 and 4 repeat
+        repeats = [(1, 0), (3, 0), (4, 2), (5, 2)]
+        assert _protfasta._repeats_among(repeats, [1, 4]) == [(2, 0), (3, 1)]
+        assert _protfasta._repeats_among(repeats, []) == repeats
+
+    @pytest.mark.parametrize('duplicate_record_action', ['fail', 'remove'])
+    def test_repeat_of_later_sequence_under_header(self, duplicate_record_action, tmp_path):
+        # the third record repeats the second, not the first, under header h
+        f = tmp_path / 'repeat.fasta'
+        f.write_text('>h\nAAA\n>h\nCCC\n>h\nCCC\n')
+        kwargs = dict(filename=str(f), expect_unique_header=False, return_list=True,
+                      duplicate_record_action=duplicate_record_action)
+        outcomes = [_outcome(workers=workers, **kwargs) for workers in (1, 2, 3)]
+        assert outcomes == [outcomes[0]] * len(outcomes)
+        try:
+            streamed = [list(record) for record in protfasta.read_fasta_stream(silence_warnings=True, **kwargs)]
+        except ProtfastaException as e:
+            streamed = 'raised: %s' % e
+        assert streamed == outcomes[0]
+        if duplicate_record_action == 'fail':
+            assert outcomes[0].startswith('raised: Found duplicate entries')
+        else:
+            assert outcomes[0] == [['h', 'AAA'], ['h', 'CCC']]
+
+    @pytest.mark.parametrize('header_parser', [None, _first_word])
+    @pytest.mark.parametrize('duplicate_record_action', ['ignore', 'fail', 'remove'])
+    @pytest.mark.parametrize('duplicate_sequence_action', ['ignore', 'fail', 'remove'])
+    def test_read_fasta_parity(self, duplicate_record_action, duplicate_sequence_action, header_parser, tmp_path):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta', n=600, pool=80)
+        with open(path, 'a') as fh:
+            fh.write('>seq_3\n%s\n' % (protfasta.read_fasta(path)['seq_3']))
+        kwargs = dict(filename=str(path), expect_unique_header=False, header_parser=header_parser,
+                      duplicate_record_action=duplicate_record_action,
+                      duplicate_sequence_action=duplicate_sequence_action, return_list=True)
+        assert _outcome(workers=3, **kwargs) == _outcome(**kwargs)
+
+    def test_workers_find_repeats(self, tmp_path, monkeypatch):
+        # with a sharded read, no serial scan runs in the parent
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta', n=600, pool=80)
+        expected = protfasta.read_fasta(path, duplicate_record_action='remove', duplicate_sequence_action='remove',
+                                        return_list=True)
+
+        def forbidden(*args, **kwargs):
+            raise AssertionError('serial scan should not run')
+
+        for name in ('remove_duplicates', 'remove_duplicate_sequences', 'fail_on_duplicates',
+                     'fail_on_duplicate_sequences'):
+            monkeypatch.setattr(_utilities, name, forbidden)
+        assert protfasta.read_fasta(path, duplicate_record_action='remove', duplicate_sequence_action='remove',
+                                    return_list=True, workers=2) == expected
+        with pytest.raises(ProtfastaException, match='duplicate sequences'):
+            protfasta.read_fasta(path, duplicate_sequence_action='fail', workers=2)
+
+    @pytest.mark.parametrize('kwargs, find_repeats', [
+        ({}, (True,)),
+        ({'expect_unique_header': False, 'duplicate_record_action': 'ignore',
+          'duplicate_sequence_action': 'remove'}, (False,)),
+        ({'expect_unique_header': False, 'duplicate_record_action': 'remove',
+          'duplicate_sequence_action': 'remove'}, (True, False)),
+        ({'expect_unique_header': False, 'duplicate_record_action': 'remove', 'header_parser': _first_word}, ()),
+        ({'duplicate_sequence_action': 'remove', 'duplicate_digest': 'builtin-64'}, ()),
+    ])
+    def test_checks_sent_to_workers(self, kwargs, find_repeats, monkeypatch, tmp_path):
+        monkeypatch.delenv('PYTHONHASHSEED', raising=False)
+        monkeypatch.setattr(_parallel.multiprocessing, 'get_start_method', lambda allow_none=False: None)
+        monkeypatch.setattr(_parallel.multiprocessing, 'get_all_start_methods', lambda: ['spawn', 'fork'])
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta', n=100, pool=80)
+        calls = []
+        real = _parallel.parse_sharded
+
+        def parse_sharded(*args, **options):
+            calls.append(options['find_repeats'])
+            return real(*args, **options)
+
+        monkeypatch.setattr(_parallel, 'parse_sharded', parse_sharded)
+        protfasta.read_fasta(str(path), workers=2, **kwargs)
+        assert calls == [find_repeats]
+
+    def test_process_local_digest_without_fork(self, monkeypatch):
+        monkeypatch.delenv('PYTHONHASHSEED', raising=False)
+        monkeypatch.setattr(_parallel.multiprocessing, 'get_start_method', lambda allow_none=False: None)
+        monkeypatch.setattr(_parallel.multiprocessing, 'get_all_start_methods', lambda: ['spawn', 'fork'])
+        assert not _parallel.digests_agree_across_processes(_utilities._seq_hash_builtin_64)
+        assert _parallel.digests_agree_across_processes(_utilities._seq_hash)
+
+    def test_store_positions(self):
+        raw = protfasta.SequenceStore([['a', 'MKV'], ['b', 'QQQ'], ['c', 'MKV']])
+        removed = _protfasta._deal_with_duplicate_sequences(raw, 'remove', repeats=[(2, 0)])
+        assert isinstance(removed, protfasta.SequenceStore)
+        assert [list(record) for record in removed] == [['a', 'MKV'], ['b', 'QQQ']]
+
+    def test_default_start_method(self, monkeypatch, tmp_path):
+        # the pool never forces a start method
+        import concurrent.futures
+        contexts = []
+        real = concurrent.futures.ProcessPoolExecutor
+
+        def pool(*args, **kwargs):
+            contexts.append(kwargs.get('mp_context'))
+            return real(*args, **kwargs)
+
+        monkeypatch.setattr(_parallel, 'ProcessPoolExecutor', pool)
+        raw = [['a', 'MKV'], ['b', 'QQQ'], ['c', 'MKV']]
+        assert self._repeats(tmp_path, raw, 2, (False,)) == {False: [(2, 0)]}
+        assert contexts == [None]
+
+    def test_spawned_workers(self, monkeypatch, tmp_path):
+        import multiprocessing
+        monkeypatch.delenv('PYTHONHASHSEED', raising=False)
+        previous = multiprocessing.get_start_method(allow_none=True)
+        multiprocessing.set_start_method('spawn', force=True)
+        try:
+            raw = [['a', 'MKV'], ['b', 'QQQ'], ['a', 'MKV'], ['d', 'QQQ']]
+            assert self._repeats(tmp_path, raw, 2, (True, False)) == {True: [(2, 0)], False: [(2, 0), (3, 1)]}
+            assert not _parallel.digests_agree_across_processes(_utilities._seq_hash_builtin_64)
+        finally:
+            multiprocessing.set_start_method(previous, force=True)
+
+
+
+# ---------------------------------------------------------------------------
+# Front-coded headers and digest-based header checks (compact_headers)
+# ---------------------------------------------------------------------------
+
+def _uniprot_headers(n, seed=0):
+    """Return *n* distinct UniProt-style headers."""
+    import random
+    rng = random.Random(seed)
+    species = [('Homo sapiens', 9606), ('Mus musculus', 10090), ('Danio rerio', 7955)]
+    headers = set()
+    while len(headers) < n:
+        (name, taxon) = rng.choice(species)
+        headers.add('sp|P%05i|PROT%i_HUMAN Uncharacterized protein %i OS=%s OX=%i GN=G%i PE=1 SV=%i'
+                    % (rng.randrange(100000), rng.randrange(500), rng.randrange(50), name, taxon, rng.randrange(500),
+                       rng.randint(1, 3)))
+    return sorted(headers)
+
+
+class TestCompactHeaders:
+    """compact_headers stores headers front-coded and checks uniqueness on digests."""
+
+    LOOSE = dict(expect_unique_header=False, duplicate_record_action='ignore')
+
+    @pytest.mark.parametrize('n', [0, 1, 16, 17, 100])
+    def test_front_coded_round_trip(self, n):
+        headers = _uniprot_headers(n)
+        table = _headers.FrontCodedHeaders(h.encode() for h in headers)
+        assert len(table) == n
+        assert list(table) == headers
+        assert [table[rank] for rank in range(n)] == headers
+        assert [table.rank(h) for h in headers] == list(range(n))
+
+    def test_front_coded_absent_and_long(self):
+        headers = sorted(['b' * 300, 'b' * 300 + 'c', 'bb', 'é-protein', 'm'])
+        table = _headers.FrontCodedHeaders(h.encode('utf-8') for h in headers)
+        assert list(table) == headers
+        for absent in ['', 'a', 'b', 'b' * 299, 'bc', 'z', '\U0010ffff']:
+            assert table.rank(absent) == -1
+        assert table.rank(5) == -1
+        with pytest.raises(IndexError):
+            table[len(headers)]
+
+    def test_front_coding_shrinks_headers(self):
+        headers = _uniprot_headers(2000)
+        table = _headers.FrontCodedHeaders(h.encode() for h in headers)
+        assert table.nbytes < 0.7 * sum(sys.getsizeof(h) for h in headers)
+
+        # sorted neighbours sharing everything but a counter
+        headers = sorted('tr|A0A0%06i|A0A0%06i_HUMAN Uncharacterized protein' % (i, i) for i in range(2000))
+        table = _headers.FrontCodedHeaders(h.encode() for h in headers)
+        assert table.nbytes < 0.9 * sum(len(h) for h in headers)
+
+    @pytest.mark.parametrize('filename', ALL_TEST_FILES)
+    def test_read_fasta_parity(self, filename):
+        ref = protfasta.read_fasta(filename, invalid_sequence_action='ignore', **self.LOOSE)
+        compact = protfasta.read_fasta(filename, invalid_sequence_action='ignore', compact_headers=True, **self.LOOSE)
+        assert isinstance(compact, protfasta.CompactFastaMapping)
+        assert list(compact) == list(ref)
+        assert list(compact.items()) == list(ref.items())
+        assert all(compact[header] == seq for (header, seq) in ref.items())
+        assert compact.to_dict() == ref
+        assert compact == ref
+
+    def test_duplicate_headers_last_wins(self):
+        records = [['b', 'MKV'], ['a', 'QQQ'], ['b', 'WWW'], ['c', 'AAA'], ['a', 'CCC']]
+        expected = {}
+        for (header, seq) in records:
+            expected[header] = seq
+        compact = _headers.CompactFastaMapping(records)
+        assert list(compact.items()) == list(expected.items())
+        assert list(_headers.CompactFastaMapping(protfasta.SequenceStore(records)).items()) == list(expected.items())
+
+    def test_lookups(self):
+        compact = protfasta.read_fasta(SIMPLE_FILE, compact_headers=True)
+        header = next(iter(compact))
+        assert header in compact
+        assert 'no such header' not in compact
+        with pytest.raises(KeyError):
+            compact['no such header']
+        assert compact.get('no such header') is None
+        assert len(compact) == len(protfasta.read_fasta(SIMPLE_FILE))
+
+    def test_duplicate_header_message(self):
+        with pytest.raises(ProtfastaException) as default:
+            protfasta.read_fasta(DUPLICATE_RECORD_FILE)
+        for kwargs in ({'compact_headers': True}, {'return_store': True}):
+            with pytest.raises(ProtfastaException) as compact:
+                protfasta.read_fasta(DUPLICATE_RECORD_FILE, **kwargs)
+            assert str(compact.value) == str(default.value)
+
+    def test_store_checks_header_digests(self, monkeypatch):
+        keys = []
+
+        def digest(header):
+            keys.append(header)
+            return _utilities._seq_hash(header)
+
+        monkeypatch.setattr(_io, '_header_digest', digest)
+        store = protfasta.read_fasta(SIMPLE_FILE, return_store=True)
+        assert keys == list(store.headers())
+
+        keys.clear()
+        protfasta.read_fasta(SIMPLE_FILE, return_list=True)
+        assert keys == []
+
+    @pytest.mark.parametrize('kwargs', [
+        {'duplicate_record_action': 'remove'},
+        {'duplicate_record_action': 'remove', 'duplicate_sequence_action': 'remove', 'duplicate_memory_limit': 2000},
+        {'duplicate_record_action': 'remove', 'duplicate_sequence_action': 'remove', 'duplicate_filter': 'bloom'},
+        {'expect_unique_header': True},
+    ])
+    def test_stream_parity(self, kwargs, tmp_path):
+        path = _duplicate_heavy_fasta(tmp_path / 'dups.fasta', n=400, pool=60)
+        with open(path, 'a') as fh:
+            fh.write('>seq_7\n%s\n>seq_7\nWWWW\n' % (protfasta.read_fasta(path)['seq_7']))
+        kwargs = dict(dict(expect_unique_header=False, silence_warnings=True, return_list=True), **kwargs)
+
+        def outcome(**extra):
+            try:
+                return list(protfasta.read_fasta_stream(path, **kwargs, **extra))
+            except ProtfastaException as e:
+                return 'raised: %s' % e
+
+        assert outcome(compact_headers=True) == outcome()
+
+    def test_with_cache(self, tmp_path):
+        first = protfasta.read_fasta(SIMPLE_FILE, compact_headers=True, cache=tmp_path)
+        second = protfasta.read_fasta(SIMPLE_FILE, compact_headers=True, cache=tmp_path)
+        assert isinstance(second, protfasta.CompactFastaMapping)
+        assert list(second.items()) == list(first.items())
+
+    @pytest.mark.parametrize('kwargs, match', [
+        ({'compact_headers': 1}, 'compact_headers'),
+        ({'compact_headers': True, 'return_list': True}, 'return_list'),
+        ({'compact_headers': True, 'lazy': True}, 'lazy'),
+        ({'compact_headers': True, 'return_store': True}, 'return_store'),
+        ({'compact_headers': True, 'encode': 'uint8'}, 'encode'),
+    ])
+    def test_invalid_options(self, kwargs, match):
+        pytest.importorskip('numpy') if 'encode' in kwargs else None
+        with pytest.raises(ProtfastaException, match=match):
+            protfasta.read_fasta(SIMPLE_FILE, **kwargs)
+
@@ -5,11 +5,13 @@ duplicate handling used by the protfasta processing pipeline.
 
 from __future__ import annotations
 
-from typing import Optional, cast
+from typing import Callable, Optional, cast
 
 import hashlib
+import sys
 
 from .protfasta_exceptions import ProtfastaException
+from .store import SequenceStore
 from ._configs import (
     STANDARD_CONVERSION,
     STANDARD_CONVERSION_WITH_GAP,
@@ -40,6 +42,71 @@ def _seq_hash(seq: str) -> bytes:
     return hashlib.blake2b(seq.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
 
 
+# Names accepted by ``duplicate_digest``.  The xxh3 digests need the
+# optional xxhash package.
+SEQUENCE_DIGESTS = ['blake2b-16', 'blake2b-8', 'builtin-64', 'xxh3-64', 'xxh3-128']
+
+
+def _seq_hash_blake2b_8(seq: str) -> bytes:
+    """Return an 8-byte blake2b digest of *seq* (see :func:`_seq_hash`)."""
+    return hashlib.blake2b(seq.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+
+
+def _seq_hash_builtin_64(seq: str) -> bytes:
+    """Return Python's own 64-bit hash of *seq* as 8 bytes.
+
+    The interpreter hashes the string directly (SipHash, keyed per
+    process), so there is no encode step, and the hash is cached on the
+    string object.  Digests are therefore only comparable within one
+    interpreter process.
+    """
+    return hash(seq).to_bytes(8, 'little', signed=True)
+
+
+def _digest_function(name: str) -> Callable[[str], bytes]:
+    """Return the sequence digest function called *name*.
+
+    All digests are fixed-width ``bytes``; duplicate detection treats two
+    sequences with the same digest as the same sequence.  The chance
+    that any two of *n* distinct sequences collide is about
+    ``n**2 / 2**(bits + 1)``:
+
+    ==============  ====  ==================  ==================
+    name            bits  10**8 sequences     10**9 sequences
+    ==============  ====  ==================  ==================
+    ``blake2b-16``  128   ~1.5e-23            ~1.5e-21
+    ``xxh3-128``    128   ~1.5e-23            ~1.5e-21
+    ``blake2b-8``   64    ~2.7e-4             ~0.027
+    ``xxh3-64``     64    ~2.7e-4             ~0.027
+    ``builtin-64``  64    ~2.7e-4             ~0.027
+    ==============  ====  ==================  ==================
+
+    Raises
+    ------
+    ProtfastaException
+        If *name* is unknown or its implementation is unavailable.
+    """
+    if name == 'blake2b-16':
+        return _seq_hash
+    if name == 'blake2b-8':
+        return _seq_hash_blake2b_8
+
+    if name == 'builtin-64':
+        if sys.hash_info.width < 64:
+            raise ProtfastaException("duplicate digest 'builtin-64' requires a 64-bit Python build")
+        return _seq_hash_builtin_64
+
+    if name in ('xxh3-64', 'xxh3-128'):
+        try:
+            import xxhash
+        except ImportError:
+            raise ProtfastaException("duplicate digest %r requires the xxhash package (pip install xxhash)" % (name))
+        xxh3 = xxhash.xxh3_64_digest if name == 'xxh3-64' else xxhash.xxh3_128_digest
+        return lambda seq: xxh3(seq.encode('utf-8', 'surrogatepass'))
+
+    raise ProtfastaException('Unknown duplicate digest %r (must be one of %s)' % (name, ', '.join(SEQUENCE_DIGESTS)))
+
+
 
 
 
@@ -199,7 +266,8 @@ def convert_invalid_sequences(
     Parameters
     ----------
     dataset : list[list[str]]
-        Parsed FASTA data -- a list of ``[header, sequence]`` pairs.
+        Parsed FASTA data -- a list of ``[header, sequence]`` pairs,
+        or a :class:`~protfasta.store.SequenceStore`.
 
     correction_dictionary : dict[str, str] or None, optional
         Custom character-replacement mapping.  ``None`` uses the
@@ -216,6 +284,12 @@ def convert_invalid_sequences(
     """
 
     count = 0
+
+    # a SequenceStore rewrites its packed sequence buffer in place
+    if isinstance(dataset, SequenceStore):
+        count = dataset._replace_sequences(lambda s: convert_to_valid(s, correction_dictionary, alignment))
+        return (dataset, count)
+
     for idx in range(0,len(dataset)):
         s = dataset[idx][1]
         dataset[idx][1] = convert_to_valid(s, correction_dictionary, alignment)
@@ -239,7 +313,9 @@ def remove_invalid_sequences(
     Parameters
     ----------
     dataset : list[list[str]]
-        Parsed FASTA data -- a list of ``[header, sequence]`` pairs.
+        Parsed FASTA data -- a list of ``[header, sequence]`` pairs,
+        or a :class:`~protfasta.store.SequenceStore` (in which case a
+        store is returned).
 
     alignment : bool, optional
         When ``True``, dashes are treated as valid.  Default ``False``.
@@ -249,7 +325,12 @@ def remove_invalid_sequences(
     list[list[str]]
         Filtered list containing only entries with valid sequences.
     """
-    return [element for element in dataset if check_sequence_is_valid(element[1], alignment)[0]]
+    # an empty container of the same kind (list or SequenceStore)
+    updated = dataset[:0]
+    for element in dataset:
+        if check_sequence_is_valid(element[1], alignment)[0]:
+            updated.append(element)
+    return updated
      
 
        
@@ -336,7 +417,7 @@ def convert_list_to_dictionary(
 ####################################################################################################
 #
 #    
-def fail_on_duplicates(dataset: list[list[str]]) -> None:
+def fail_on_duplicates(dataset: list[list[str]], digest_function: Callable[[str], bytes] = _seq_hash) -> None:
     """Raise if any exact duplicate record exists in *dataset*.
 
     A duplicate record is defined as two entries with the same header
@@ -347,28 +428,39 @@ def fail_on_duplicates(dataset: list[list[str]]) -> None:
     dataset : list[list[str]]
         Parsed FASTA data -- a list of ``[header, sequence]`` pairs.
 
+    digest_function : callable, optional
+        Sequence digest used to compare sequences (see
+        :func:`_digest_function`).  Default :func:`_seq_hash`.
+
     Raises
     ------
     ProtfastaException
         On the first duplicate record found.
     """
-    # Store blake2b digests of sequences instead of full sequences to
-    # keep peak memory low for files with very long sequences.
-    lookup: dict[str, bytes] = {}
+    # Store sets of sequence digests per header instead of full sequences
+    # to keep peak memory low for files with very long sequences.  Every
+    # earlier sequence under a header counts, as in remove_duplicates.
+    lookup: dict[str, set[bytes]] = {}
     for entry in dataset:
-        digest = _seq_hash(entry[1])
-        if entry[0] not in lookup:
-            lookup[entry[0]] = digest
+        digest = digest_function(entry[1])
+        seen = lookup.get(entry[0])
+        if seen is None:
+            lookup[entry[0]] = {digest}
+        elif digest in seen:
+            raise ProtfastaException('Found duplicate entries of the following record\n:>%s\n%s'
+                                     % (entry[0], entry[1]))
         else:
-            if lookup[entry[0]] == digest:
-                raise ProtfastaException('Found duplicate entries of the following record\n:>%s\n%s' % (entry[0], entry[1]))
+            seen.add(digest)
 
 
 
 ####################################################################################################
 #
 #    
-def remove_duplicates(dataset: list[list[str]]) -> list[list[str]]:
+def remove_duplicates(
+    dataset: list[list[str]],
+    digest_function: Callable[[str], bytes] = _seq_hash,
+) -> list[list[str]]:
     """Remove exact duplicate records, keeping the first occurrence.
 
     A duplicate record is defined as two entries with the same header
@@ -378,7 +470,13 @@ def remove_duplicates(dataset: list[list[str]]) -> list[list[str]]:
     Parameters
     ----------
     dataset : list[list[str]]
-        Parsed FASTA data -- a list of ``[header, sequence]`` pairs.
+        Parsed FASTA data -- a list of ``[header, sequence]`` pairs,
+        or a :class:`~protfasta.store.SequenceStore` (in which case a
+        store is returned).
+
+    digest_function : callable, optional
+        Sequence digest used to compare sequences (see
+        :func:`_digest_function`).  Default :func:`_seq_hash`.
 
     Returns
     -------
@@ -388,11 +486,12 @@ def remove_duplicates(dataset: list[list[str]]) -> list[list[str]]:
     # Store sets of sequence hashes per header (instead of raw sequences)
     # to keep peak memory low.  O(1) membership test per header.
     lookup: dict[str, set[bytes]] = {}
-    updated: list[list[str]] = []
+    # an empty container of the same kind (list or SequenceStore)
+    updated = dataset[:0]
 
     for entry in dataset:
         header = entry[0]
-        digest = _seq_hash(entry[1])
+        digest = digest_function(entry[1])
 
         seen = lookup.get(header)
         if seen is None:
@@ -409,7 +508,7 @@ def remove_duplicates(dataset: list[list[str]]) -> list[list[str]]:
 ####################################################################################################
 #
 #    
-def fail_on_duplicate_sequences(dataset: list[list[str]]) -> None:
+def fail_on_duplicate_sequences(dataset: list[list[str]], digest_function: Callable[[str], bytes] = _seq_hash) -> None:
     """Raise if any two entries share the same sequence.
 
     Parameters
@@ -417,16 +516,20 @@ def fail_on_duplicate_sequences(dataset: list[list[str]]) -> None:
     dataset : list[list[str]]
         Parsed FASTA data -- a list of ``[header, sequence]`` pairs.
 
+    digest_function : callable, optional
+        Sequence digest used to compare sequences (see
+        :func:`_digest_function`).  Default :func:`_seq_hash`.
+
     Raises
     ------
     ProtfastaException
         On the first pair of entries that share a sequence.
     """
-    # Key by a 16-byte digest rather than the full sequence for memory
+    # Key by a fixed-width digest rather than the full sequence for memory
     # efficiency on large files.
     seq_to_header: dict[bytes, str] = {}
     for entry in dataset:
-        digest = _seq_hash(entry[1])
+        digest = digest_function(entry[1])
         if digest in seq_to_header:
             raise ProtfastaException('Found duplicate sequences associated with the following headers\n1. %s\n\n2. %s' % (seq_to_header[digest], entry[0]))
         seq_to_header[digest] = entry[0]
@@ -436,26 +539,36 @@ def fail_on_duplicate_sequences(dataset: list[list[str]]) -> None:
 ####################################################################################################
 #
 #    
-def remove_duplicate_sequences(dataset: list[list[str]]) -> list[list[str]]:
+def remove_duplicate_sequences(
+    dataset: list[list[str]],
+    digest_function: Callable[[str], bytes] = _seq_hash,
+) -> list[list[str]]:
     """Remove entries with duplicate sequences, keeping the first occurrence.
 
     Parameters
     ----------
     dataset : list[list[str]]
-        Parsed FASTA data -- a list of ``[header, sequence]`` pairs.
+        Parsed FASTA data -- a list of ``[header, sequence]`` pairs,
+        or a :class:`~protfasta.store.SequenceStore` (in which case a
+        store is returned).
+
+    digest_function : callable, optional
+        Sequence digest used to compare sequences (see
+        :func:`_digest_function`).  Default :func:`_seq_hash`.
 
     Returns
     -------
     list[list[str]]
         Filtered list with unique sequences, preserving original order.
     """
-    # Track seen sequences by their 16-byte digests to keep peak memory
+    # Track seen sequences by their digests to keep peak memory
     # low for files with long sequences.
     lookup: set[bytes] = set()
-    updated: list[list[str]] = []
+    # an empty container of the same kind (list or SequenceStore)
+    updated = dataset[:0]
 
     for entry in dataset:
-        digest = _seq_hash(entry[1])
+        digest = digest_function(entry[1])
         if digest in lookup:
             continue
         lookup.add(digest)
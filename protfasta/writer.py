@@ -0,0 +1,365 @@
+"""
+protfasta - A simple but robust FASTA parser explicitly for protein sequences.
+
+This module implements :class:`FastaWriter`, an incremental FASTA writer.
+Records are formatted as they arrive -- one at a time with
+:meth:`FastaWriter.write`, or from any iterable, including a generator
+such as :func:`protfasta.read_fasta_stream`, with
+:meth:`FastaWriter.write_many` -- so writing never needs the whole
+dataset in memory.  It also holds the batched record formatting
+(:func:`write_records`) shared with :func:`protfasta.write_fasta`.
+
+.............................................................................
+protfasta was developed by the Holehouse lab
+     Original release March 2020
+
+Question/comments/concerns? Raise an issue on github:
+https://github.com/holehouse-lab/protfasta
+
+Licensed under the MIT license.
+
+Be kind to each other.
+
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import struct
+from typing import Iterable, Optional, Sequence, Union
+
+from . import io as _io
+from .protfasta_exceptions import ProtfastaException
+from .store import SequenceStore
+
+
+# Default output buffer, matching write_fasta.
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# Residues formatted into one string before it is handed to the file in a
+# single write call.
+_FORMAT_BATCH = 1024 * 1024
+
+# Cached line-splitting structs, one per (sequence length, line length).
+_STRUCT_CACHE = 4096
+
+
+####################################################################################################
+#
+#
+def normalize_linelength(linelength) -> Union[int, bool]:
+    """Turn a ``linelength`` argument into residues per line, or ``False``.
+
+    ``0``, ``None`` and ``False`` mean one line per sequence; other
+    values are cast to ``int`` and clamped to at least 5.
+
+    Raises
+    ------
+    ProtfastaException
+        If *linelength* cannot be cast to an integer.
+    """
+    # the int() cast happens before any numerical comparison so that a
+    # non-numerical linelength raises a protfasta exception rather than an
+    # opaque TypeError
+    if linelength is None or linelength is False:
+        return False
+
+    try:
+        linelength = int(linelength)
+    except (TypeError, ValueError):
+        raise ProtfastaException("keyword 'linelength' must be an integer, or one of 0/None/False (got %s)"
+                                 % (repr(linelength)))
+
+    if linelength < 1:
+        return False
+    return max(linelength, 5)
+
+
+####################################################################################################
+#
+#
+def format_record(header: str, seq: str, linelength: Union[int, bool]) -> str:
+    """Return one FASTA record as text, ending with a blank separator line.
+
+    *seq* is wrapped at *linelength* residues per line (``False`` for a
+    single line); *linelength* should come from
+    :func:`normalize_linelength`.
+    """
+    if linelength and len(seq) > linelength:
+        seq = '\n'.join([seq[start:start + linelength] for start in range(0, len(seq), linelength)])
+    return '>%s\n%s\n\n' % (header, seq)
+
+
+@functools.lru_cache(maxsize=_STRUCT_CACHE)
+def _line_struct(length: int, linelength: int) -> struct.Struct:
+    """Return a struct that splits *length* bytes into *linelength*-byte lines."""
+    (full, rest) = divmod(length, linelength)
+    return struct.Struct(('%is' % linelength) * full + ('%is' % rest if rest else ''))
+
+
+def _format_batch(batch: list[Sequence[str]], linelength: int) -> str:
+    """Return the FASTA text of *batch*, wrapped at *linelength*, as :func:`format_record` would.
+
+    When the sequences are ASCII (the usual case) they are encoded once
+    for the whole batch, and each sequence is cut into lines by a single
+    ``struct`` unpack rather than a Python-level slice per line.
+    """
+    try:
+        buf = ''.join([seq for (_header, seq) in batch]).encode('ascii')
+    except UnicodeEncodeError:
+        return ''.join([format_record(header, seq, linelength) for (header, seq) in batch])
+
+    parts = []
+    append = parts.append
+    offset = 0
+    for (header, seq) in batch:
+        n = len(seq)
+        if n > linelength:
+            seq = b'\n'.join(_line_struct(n, linelength).unpack_from(buf, offset)).decode('ascii')
+        append('>%s\n%s\n\n' % (header, seq))
+        offset += n
+    return ''.join(parts)
+
+
+def write_records(fh, records: Iterable[Sequence[str]], linelength: Union[int, bool]) -> int:
+    """Format *records* in batches and write each batch with one call.
+
+    Wrapped records are collected until roughly :data:`_FORMAT_BATCH`
+    residues are pending, formatted together (see :func:`_format_batch`)
+    and handed to *fh* as one string, instead of issuing two ``write``
+    calls per line.  Single-line records (*linelength* ``False``) need no
+    slicing and are passed straight to *fh*, whose text buffer already
+    coalesces them more cheaply than building a batch string.  Output is
+    identical to formatting each record with :func:`format_record`.
+
+    Parameters
+    ----------
+    fh : file object
+        An open, writeable text file handle.
+
+    records : iterable of (header, sequence)
+        Consumed lazily; only the current batch is held in memory.
+
+    linelength : int or False
+        Residues per line, from :func:`normalize_linelength`.
+
+    Returns
+    -------
+    int
+        The number of records written.
+
+    Raises
+    ------
+    ProtfastaException
+        If an element is not a ``(header, sequence)`` pair or a sequence
+        is empty.  Records before the offending one are written first.
+    """
+    write = fh.write
+    batch = []
+    append = batch.append
+    pending = 0
+    count = 0
+    try:
+        for record in records:
+            try:
+                (header, seq) = record
+            except (TypeError, ValueError):
+                raise ProtfastaException('FASTA records must be (header, sequence) pairs:\n%s' % (str(record)))
+
+            n = len(seq)
+            if n < 1:
+                raise ProtfastaException('Sequence associated with [%s] is empty' % (header))
+
+            count += 1
+            if not linelength:
+                write('>')
+                write(header)
+                write('\n')
+                write(seq)
+                write('\n\n')
+                continue
+
+            append(record)
+            pending += n
+            if pending >= _FORMAT_BATCH:
+                text = _format_batch(batch, linelength)
+                batch.clear()
+                pending = 0
+                fh.write(text)
+    finally:
+        # also reached on error, so the records before a bad one are kept
+        if batch:
+            text = _format_batch(batch, linelength)
+            batch.clear()
+            fh.write(text)
+    return count
+
+
+####################################################################################################
+#
+#
+class FastaWriter:
+    """Write FASTA records incrementally, with bounded memory.
+
+    Use it as a context manager so the file is flushed and closed even
+    if an error interrupts writing::
+
+        with protfasta.FastaWriter('filtered.fasta') as writer:
+            for header, seq in protfasta.read_fasta_stream('huge.fasta'):
+                if len(seq) >= 50:
+                    writer.write(header, seq)
+
+    or hand it a whole iterable::
+
+        with protfasta.FastaWriter('clean.fasta') as writer:
+            writer.write_many(protfasta.read_fasta_stream('huge.fasta', invalid_sequence_action='convert'))
+
+    Only the record being written (plus the output buffer) is held in
+    memory.  Records are formatted exactly as by
+    :func:`protfasta.write_fasta`.
+
+    Parameters
+    ----------
+    filename : str, os.PathLike or file object
+        Destination path, ``'-'`` for standard output, or a writable
+        binary or text file object (left open when the writer closes).
+
+    linelength : int, bool, or None, optional
+        Maximum residues per line, as in :func:`protfasta.write_fasta`.
+        Default 60.
+
+    append : bool, optional
+        If ``True``, add to the end of an existing file instead of
+        overwriting it.  Default ``False``.
+
+    buffer_size : int, optional
+        Size in bytes of the output buffer.  Default 1 MiB.
+
+    compression : str or None, optional
+        ``'gzip'``, ``'bgzf'`` or ``'xz'`` to compress the output as it
+        is written, as in :func:`protfasta.write_fasta`.  Default
+        ``None``.
+
+    threads : int or None, optional
+        Number of threads compressing ``'bgzf'`` blocks.  ``None``
+        (default) uses one per CPU.
+
+    Raises
+    ------
+    ProtfastaException
+        If an argument is invalid.
+    """
+
+    def __init__(
+        self,
+        filename: Union[str, os.PathLike],
+        linelength: Union[int, bool, None] = 60,
+        append: bool = False,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        compression: Optional[str] = None,
+        threads: Optional[int] = None,
+    ):
+        if not isinstance(filename, (str, os.PathLike)) and not callable(getattr(filename, 'write', None)):
+            raise ProtfastaException("keyword 'filename' must be a string, path-like object or writable file object "
+                                     "(got %s)" % (type(filename).__name__))
+
+        if type(append) != bool:
+            raise ProtfastaException("keyword 'append' must be a boolean")
+
+        if type(buffer_size) != int or buffer_size < 1:
+            raise ProtfastaException("keyword 'buffer_size' must be a positive integer")
+
+        _io.check_compression(compression, threads)
+
+        self.linelength = normalize_linelength(linelength)
+        self.count = 0
+        self._fh = _io._open_output(filename, 'a' if append else 'w', buffer_size=buffer_size,
+                                    compression=compression, threads=threads)
+
+    # ..............................................................................
+    #
+    def write(self, header: str, seq: str) -> None:
+        """Write one record.
+
+        Parameters
+        ----------
+        header : str
+            The header, without the leading ``'>'``.
+
+        seq : str
+            The sequence.  Must be non-empty.
+
+        Raises
+        ------
+        ProtfastaException
+            If *seq* is empty or the writer is closed.
+        """
+        if self._fh.closed:
+            raise ProtfastaException('Cannot write to a closed FastaWriter')
+        if len(seq) < 1:
+            raise ProtfastaException('Sequence associated with [%s] is empty' % (header))
+
+        self._fh.write(format_record(header, seq, self.linelength))
+        self.count += 1
+
+    def write_many(self, records: Union[dict[str, str], SequenceStore, Iterable[Sequence[str]]]) -> int:
+        """Write every record in *records*, consuming it lazily.
+
+        Parameters
+        ----------
+        records : dict, SequenceStore or iterable of (header, sequence)
+            A ``header -> sequence`` dictionary, a store, or any iterable
+            of two-element pairs -- including a generator such as
+            :func:`protfasta.read_fasta_stream`, which is consumed one
+            record at a time.
+
+        Returns
+        -------
+        int
+            The number of records written.
+
+        Raises
+        ------
+        ProtfastaException
+            If an element is not a ``(header, sequence)`` pair, a
+            sequence is empty, or the writer is closed.  Records before
+            the offending one have already been written.
+        """
+        if self._fh.closed:
+            raise ProtfastaException('Cannot write to a closed FastaWriter')
+        if isinstance(records, dict):
+            records = records.items()
+
+        start = self.count
+
+        def counted():
+            # count each record once the next one is requested, i.e. once it
+            # has been formatted, so the count stays right if one fails
+            for record in records:
+                yield record
+                self.count += 1
+
+        write_records(self._fh, counted(), self.linelength)
+        return self.count - start
+
+    # ..............................................................................
+    #
+    @property
+    def closed(self) -> bool:
+        """``True`` once the writer has been closed."""
+        return self._fh.closed
+
+    def close(self) -> None:
+        """Flush the output and close the file (caller-owned file objects are only flushed)."""
+        self._fh.close()
+
+    def __enter__(self) -> 'FastaWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return 'FastaWriter(%r, %i records written%s)' % (getattr(self._fh, 'name', '<stream>'), self.count,
+                                                           ', closed' if self.closed else '')